@@ -42,6 +42,89 @@ class BaseConfig:
         'pool_pre_ping': True,
     }
     
+    # SMTP Connection Pool (sessões persistentes por conta)
+    SMTP_POOL_MAX_SIZE = int(os.environ.get('SMTP_POOL_MAX_SIZE', 3))
+    SMTP_POOL_IDLE_TIMEOUT = int(os.environ.get('SMTP_POOL_IDLE_TIMEOUT', 60))
+    SMTP_POOL_NOOP_INTERVAL = int(os.environ.get('SMTP_POOL_NOOP_INTERVAL', 5))
+    SMTP_POOL_ACQUIRE_TIMEOUT = int(os.environ.get('SMTP_POOL_ACQUIRE_TIMEOUT', 30))
+    SMTP_MAX_MESSAGES_PER_SESSION = int(os.environ.get('SMTP_MAX_MESSAGES_PER_SESSION', 100))
+    
+    # Sondagem de transporte (porta/SSL/TLS) e segundos a falhar de imediato após erro de ligação
+    SMTP_PROBE_TIMEOUT = int(os.environ.get('SMTP_PROBE_TIMEOUT', 10))
+    SMTP_TRANSPORT_RETRY_AFTER = int(os.environ.get('SMTP_TRANSPORT_RETRY_AFTER', 60))
+    
+    # Motor de entrega: 'sync' (smtplib + pool) ou 'async' (asyncio event loop)
+    SMTP_DELIVERY_ENGINE = os.environ.get('SMTP_DELIVERY_ENGINE', 'sync')
+    SMTP_ASYNC_MAX_IN_FLIGHT = int(os.environ.get('SMTP_ASYNC_MAX_IN_FLIGHT', 500))
+    SMTP_ASYNC_MAX_PER_RELAY = int(os.environ.get('SMTP_ASYNC_MAX_PER_RELAY', 50))
+    SMTP_ASYNC_MAX_PER_ACCOUNT = int(os.environ.get('SMTP_ASYNC_MAX_PER_ACCOUNT', 10))
+    SMTP_ASYNC_TIMEOUT = int(os.environ.get('SMTP_ASYNC_TIMEOUT', 30))
+    
+    # Outbox de envios em lote (persistida na BD, partilhada entre processos)
+    EMAIL_QUEUE_WORKERS = int(os.environ.get('EMAIL_QUEUE_WORKERS', 8))  # Máximo de workers no processo web (0 = só flask queue-worker)
+    EMAIL_QUEUE_MIN_WORKERS = int(os.environ.get('EMAIL_QUEUE_MIN_WORKERS', 1))  # Mínimo em horas sem trabalho (>= máximo = pool fixo)
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 50))
+    OUTBOX_LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', 120))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 1.0))
+    OUTBOX_SHUTDOWN_TIMEOUT = int(os.environ.get('OUTBOX_SHUTDOWN_TIMEOUT', 30))
+    OUTBOX_TRANSACTIONAL_WEIGHT = int(os.environ.get('OUTBOX_TRANSACTIONAL_WEIGHT', 8))  # Quantum DRR por conta
+    OUTBOX_BULK_WEIGHT = int(os.environ.get('OUTBOX_BULK_WEIGHT', 1))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))  # Depois disto: dead-letter
+    OUTBOX_RETRY_BASE_SECONDS = float(os.environ.get('OUTBOX_RETRY_BASE_SECONDS', 30))
+    OUTBOX_RETRY_MAX_SECONDS = float(os.environ.get('OUTBOX_RETRY_MAX_SECONDS', 3600))
+    # Resultados gravados por envio (1): "enviado" fica em disco antes do envio seguinte.
+    # Group commit opcional (N > 1): até N envios ou T segundos por transação; um processo que morra
+    # pode reenviar, quando o lease expirar, até N destinatários já enviados mas por gravar
+    OUTBOX_LOG_FLUSH_SIZE = int(os.environ.get('OUTBOX_LOG_FLUSH_SIZE', 1))
+    OUTBOX_LOG_FLUSH_INTERVAL = float(os.environ.get('OUTBOX_LOG_FLUSH_INTERVAL', 0.5))
+    # Autoscaling dos workers: drenar o backlog em N segundos, sem exceder o limite por relay (servidor:porta)
+    OUTBOX_AUTOSCALE_INTERVAL = float(os.environ.get('OUTBOX_AUTOSCALE_INTERVAL', 2))
+    OUTBOX_TARGET_DRAIN_SECONDS = float(os.environ.get('OUTBOX_TARGET_DRAIN_SECONDS', 10))
+    OUTBOX_MAX_QUEUE_AGE = float(os.environ.get('OUTBOX_MAX_QUEUE_AGE', 60))  # Pendente mais antigo: força subida
+    OUTBOX_SCALE_DOWN_DELAY = float(os.environ.get('OUTBOX_SCALE_DOWN_DELAY', 30))
+    OUTBOX_MAX_WORKERS_PER_RELAY = int(os.environ.get('OUTBOX_MAX_WORKERS_PER_RELAY', 4))
+    # Controlo de admissão: recusar bulk (429 + Retry-After) se a outbox demorar mais de N segundos a drenar (0 = desligado)
+    OUTBOX_ADMISSION_MAX_DRAIN_SECONDS = float(os.environ.get('OUTBOX_ADMISSION_MAX_DRAIN_SECONDS', 300))
+    OUTBOX_ADMISSION_WINDOW_SECONDS = float(os.environ.get('OUTBOX_ADMISSION_WINDOW_SECONDS', 60))  # Janela do débito
+    OUTBOX_ADMISSION_MIN_RATE = float(os.environ.get('OUTBOX_ADMISSION_MIN_RATE', 1.0))  # Débito assumido sem envios recentes
+    OUTBOX_ADMISSION_REFRESH_SECONDS = float(os.environ.get('OUTBOX_ADMISSION_REFRESH_SECONDS', 1.0))
+    # Lotes e streams transactional (prioridade escolhida pelo cliente) só ignoram a drenagem até este tamanho
+    OUTBOX_ADMISSION_TRANSACTIONAL_MAX_RECIPIENTS = int(os.environ.get('OUTBOX_ADMISSION_TRANSACTIONAL_MAX_RECIPIENTS', 100))
+    # Ingestão em stream (POST /api/v1/send/stream): destinatários por job e máximo por pedido
+    OUTBOX_INGEST_JOB_SIZE = int(os.environ.get('OUTBOX_INGEST_JOB_SIZE', 1000))
+    OUTBOX_INGEST_MAX_RECIPIENTS = int(os.environ.get('OUTBOX_INGEST_MAX_RECIPIENTS', 1000000))
+    # Envios agendados (send_at): lotes acima do limiar são espalhados pela janela (send_window no pedido sobrepõe)
+    OUTBOX_SCHEDULE_HORIZON_SECONDS = float(os.environ.get('OUTBOX_SCHEDULE_HORIZON_SECONDS', 60))
+    OUTBOX_SCHEDULE_MAX_DAYS = float(os.environ.get('OUTBOX_SCHEDULE_MAX_DAYS', 30))
+    OUTBOX_SCHEDULE_SPREAD_THRESHOLD = int(os.environ.get('OUTBOX_SCHEDULE_SPREAD_THRESHOLD', 500))
+    OUTBOX_SCHEDULE_WINDOW_SECONDS = float(os.environ.get('OUTBOX_SCHEDULE_WINDOW_SECONDS', 600))
+    # Stream de progresso dos jobs (SSE): polling da BD, heartbeat e duração máxima de cada ligação
+    OUTBOX_EVENTS_POLL_SECONDS = float(os.environ.get('OUTBOX_EVENTS_POLL_SECONDS', 1.0))
+    OUTBOX_EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('OUTBOX_EVENTS_HEARTBEAT_SECONDS', 15))
+    OUTBOX_EVENTS_MAX_SECONDS = float(os.environ.get('OUTBOX_EVENTS_MAX_SECONDS', 300))
+    # Templates compilados mantidos em cache por processo (LRU por template e versão)
+    TEMPLATE_CACHE_SIZE = int(os.environ.get('TEMPLATE_CACHE_SIZE', 512))
+    # Bytecode dos templates persistida entre processos: '' (desligada), 'filesystem' ou 'database'
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', '')
+    TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get('TEMPLATE_BYTECODE_CACHE_DIR')  # Default: diretório temporário
+    # Renderização em lote: pool de processos a partir do limiar (0 processos = um por core)
+    TEMPLATE_BATCH_PROCESSES = int(os.environ.get('TEMPLATE_BATCH_PROCESSES', 0))
+    TEMPLATE_BATCH_PARALLEL_THRESHOLD = int(os.environ.get('TEMPLATE_BATCH_PARALLEL_THRESHOLD', 2000))
+    TEMPLATE_BATCH_CHUNK_SIZE = int(os.environ.get('TEMPLATE_BATCH_CHUNK_SIZE', 250))
+    TEMPLATE_BATCH_MAX_SETS = int(os.environ.get('TEMPLATE_BATCH_MAX_SETS', 10000))  # Conjuntos de variáveis por pedido (acima: 413)
+    # Resultados renderizados reutilizados para as mesmas variáveis (bytes; 0 = desligada, templates têm de ser determinísticos)
+    TEMPLATE_RENDER_CACHE_BYTES = int(os.environ.get('TEMPLATE_RENDER_CACHE_BYTES', 0))
+    # Cache de domínios, contas e templates resolvidos nos envios (0 = desligada); invalidação entre processos via cache_versions
+    ENTITY_CACHE_TTL_SECONDS = float(os.environ.get('ENTITY_CACHE_TTL_SECONDS', 60))
+    ENTITY_CACHE_SHARED_INVALIDATION = os.environ.get('ENTITY_CACHE_SHARED_INVALIDATION', 'false').lower() == 'true'
+    ENTITY_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get('ENTITY_CACHE_VERSION_CHECK_SECONDS', 2))
+    
+    # Processo dedicado de envio (flask queue-worker)
+    QUEUE_WORKER_CONCURRENCY = int(os.environ.get('QUEUE_WORKER_CONCURRENCY', 16))  # Máximo (mínimo: EMAIL_QUEUE_MIN_WORKERS)
+    QUEUE_WORKER_HEARTBEAT_FILE = os.environ.get('QUEUE_WORKER_HEARTBEAT_FILE')  # None = só log
+    QUEUE_WORKER_HEARTBEAT_INTERVAL = float(os.environ.get('QUEUE_WORKER_HEARTBEAT_INTERVAL', 10))
+    QUEUE_WORKER_HEARTBEAT_MAX_AGE = float(os.environ.get('QUEUE_WORKER_HEARTBEAT_MAX_AGE', 60))
+    
     # Pagination
     PAGINATION_PER_PAGE = 20
     
@@ -140,6 +223,16 @@ class ProductionConfig(BaseConfig):
     LOG_LEVEL = 'INFO'  # Visível no Vercel dashboard
     LOG_FILE = None  # ✅ CRITICAL: Desabilita file logging para Vercel
     SQLALCHEMY_ECHO = False
+    
+    # Instâncias frias carregam os templates compilados da BD (sem disco partilhado)
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', 'database')
+    # Sem /dev/shm em serverless não há pool de processos: lotes renderizados no processo
+    TEMPLATE_BATCH_PROCESSES = int(os.environ.get('TEMPLATE_BATCH_PROCESSES', 1))
+    # Funções serverless congelam entre pedidos: threads de envio no processo web ficariam com
+    # leases a expirar a meio de um job. A outbox é drenada por um processo dedicado (flask queue-worker)
+    EMAIL_QUEUE_WORKERS = int(os.environ.get('EMAIL_QUEUE_WORKERS', 0))
+    # Várias instâncias em simultâneo: edições feitas numa invalidam a cache de entidades nas outras
+    ENTITY_CACHE_SHARED_INVALIDATION = os.environ.get('ENTITY_CACHE_SHARED_INVALIDATION', 'true').lower() == 'true'
 
 
 class TestingConfig(BaseConfig):
@@ -151,11 +244,13 @@ class TestingConfig(BaseConfig):
     
     # SQLite em memória para testes rápidos
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # Opções de pool do BaseConfig não se aplicam ao StaticPool do SQLite em memória
     
     # Disable external connections for testing
     WTF_CSRF_ENABLED = False
     SMTP_TESTING_MODE = True
     LOG_FILE = None  # Sem logs para testes
+    EMAIL_QUEUE_WORKERS = 0  # Outbox processada explicitamente nos testes
 
 
 # Registry de configurações
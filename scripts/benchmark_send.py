@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+SendCraft - Benchmark do pipeline de envio.
+
+Arranca um SMTP sink local (scripts/smtp_sink.py) e uma base de dados SQLite
+temporária, e mede mensagens/segundo e latência (p50/p90/p99) de:
+
+    send_email      SMTPService.send_email, envios sequenciais
+    send_bulk       SMTPService.send_bulk_emails, um lote
+    queue           EmailQueue (workers em background), um job em lote
+    api_send        POST /api/v1/send (bulk=false), pedidos sequenciais
+
+O relatório é escrito em JSON; com --baseline compara com um relatório
+anterior e termina com código 1 se o throughput de algum cenário cair
+mais do que --max-regression.
+
+Uso:
+    python scripts/benchmark_send.py --messages 500 --output bench-report.json
+    python scripts/benchmark_send.py --latency-ms 2 --rcpt-4xx 0.05 --baseline bench-report.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Callable, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_sink import SMTPSink, add_behaviour_arguments, behaviour_from_args  # noqa: E402
+
+SCENARIOS = ('send_email', 'send_bulk', 'queue', 'api_send')
+
+BODY_TEXT = 'Olá {name}, a sua encomenda #{order} foi enviada.\n' * 20
+BODY_HTML = '<p>Olá <b>{name}</b>, a sua encomenda <i>#{order}</i> foi enviada.</p>\n' * 20
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Percentil por interpolação linear (None se vazio)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return round(ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower), 3)
+
+
+def summarize(latencies_ms: List[float], succeeded: int, failed: int, elapsed: float) -> Dict[str, Any]:
+    """Resumo de um cenário."""
+    total = succeeded + failed
+    return {
+        'messages': total,
+        'succeeded': succeeded,
+        'failed': failed,
+        'elapsed_s': round(elapsed, 3),
+        'messages_per_sec': round(total / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies_ms), 3) if latencies_ms else None,
+            'p50': percentile(latencies_ms, 0.50),
+            'p90': percentile(latencies_ms, 0.90),
+            'p99': percentile(latencies_ms, 0.99),
+            'max': round(max(latencies_ms), 3) if latencies_ms else None
+        }
+    }
+
+
+def create_benchmark_app(database_path: str):
+    """Cria app SendCraft com SQLite temporário e sem logging para ficheiro."""
+    import config as app_config
+    from sendcraft import create_app
+
+    class BenchmarkConfig(app_config.LocalConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+        SQLALCHEMY_ECHO = False
+        LOG_LEVEL = 'WARNING'
+        LOG_FILE = None
+        DEBUG = False
+        # Mesma chave para cifrar e decifrar em todos os caminhos de envio
+        ENCRYPTION_KEY = app_config.LocalConfig.SECRET_KEY
+        # Workers da outbox arrancados pelo cenário queue
+        EMAIL_QUEUE_WORKERS = 0
+        OUTBOX_POLL_INTERVAL = 0.05
+
+    app_config.config['benchmark'] = BenchmarkConfig
+    return create_app('benchmark')
+
+
+def create_sender(app, sink_port: int):
+    """Cria domínio e conta apontados para o sink; devolve (conta, API key)."""
+    from sendcraft.extensions import db
+    from sendcraft.models import Domain, EmailAccount
+
+    domain = Domain(name='bench.local')
+    db.session.add(domain)
+    db.session.commit()
+
+    account = EmailAccount(
+        domain_id=domain.id,
+        local_part='sender',
+        smtp_server='127.0.0.1',
+        smtp_port=sink_port,
+        smtp_username='sender@bench.local',
+        use_tls=False,
+        use_ssl=False,
+        api_enabled=True,
+        daily_limit=10_000_000,
+        monthly_limit=10_000_000
+    )
+    account.set_password('benchmark', app.config['ENCRYPTION_KEY'])
+    db.session.add(account)
+    db.session.commit()
+
+    api_key = account.generate_api_key()
+    db.session.commit()
+    return account, api_key
+
+
+def bench_send_email(app, account, count: int) -> Dict[str, Any]:
+    """SMTPService.send_email sequencial (sessão reutilizada pelo pool)."""
+    from sendcraft.services.smtp_service import create_smtp_service
+
+    service = create_smtp_service(app.config['ENCRYPTION_KEY'])
+    latencies, succeeded = [], 0
+
+    started = time.perf_counter()
+    for i in range(count):
+        t0 = time.perf_counter()
+        success, _, _ = service.send_email(
+            account=account,
+            to_email=f'user{i}@bench.test',
+            subject=f'Encomenda #{i}',
+            html_content=BODY_HTML.format(name=f'User {i}', order=i),
+            text_content=BODY_TEXT.format(name=f'User {i}', order=i)
+        )
+        latencies.append((time.perf_counter() - t0) * 1000)
+        succeeded += success
+    elapsed = time.perf_counter() - started
+
+    return summarize(latencies, succeeded, count - succeeded, elapsed)
+
+
+def bench_send_bulk(app, account, count: int) -> Dict[str, Any]:
+    """SMTPService.send_bulk_emails com um lote de `count` destinatários."""
+    from sendcraft.services.smtp_service import create_smtp_service
+
+    service = create_smtp_service(app.config['ENCRYPTION_KEY'])
+    recipients = [
+        {'email': f'bulk{i}@bench.test', 'variables': {'name': f'User {i}', 'order': i}}
+        for i in range(count)
+    ]
+
+    started = time.perf_counter()
+    results = service.send_bulk_emails(
+        account=account,
+        recipients=recipients,
+        subject='Encomenda #{{ order }}',
+        html_template=BODY_HTML.replace('{name}', '{{ name }}').replace('{order}', '{{ order }}'),
+        text_template=BODY_TEXT.replace('{name}', '{{ name }}').replace('{order}', '{{ order }}')
+    )
+    elapsed = time.perf_counter() - started
+
+    # Latência por mensagem: tempos SMTP por fase registados no envio
+    latencies = [
+        sum(v for k, v in result['timings'].items() if k.endswith('_ms'))
+        for result in results if result.get('timings')
+    ]
+    succeeded = sum(1 for result in results if result['success'])
+    return summarize(latencies, succeeded, len(results) - succeeded, elapsed)
+
+
+def bench_queue(app, account, count: int, workers: int) -> Dict[str, Any]:
+    """EmailQueue: um job com `count` destinatários processado em background."""
+    from sendcraft.models import EmailLog
+    from sendcraft.services.email_queue import EmailQueue, EmailQueueItem, QueueStatus
+
+    email_queue = EmailQueue()
+    email_queue.init_app(app)
+    email_queue.max_workers = workers
+    email_queue.min_workers = workers  # Pool fixo: medir o envio, não o autoscaling
+    item = EmailQueueItem(
+        account=account,
+        recipients=[f'queue{i}@bench.test' for i in range(count)],
+        subject='Encomenda em lote',
+        html_content=BODY_HTML.format(name='Cliente', order='lote'),
+        text_content=BODY_TEXT.format(name='Cliente', order='lote')
+    )
+
+    started = time.perf_counter()
+    email_queue.start()
+    item_id = email_queue.add_email(item)
+    job = email_queue.get_job(item_id)
+    while job.status not in (QueueStatus.COMPLETED, QueueStatus.FAILED):
+        time.sleep(0.01)
+        job = email_queue.get_job(item_id)
+    elapsed = time.perf_counter() - started
+    email_queue.stop()
+
+    # Latência por destinatário: criação do log até marcação como enviado
+    logs = EmailLog.query.filter(EmailLog.variables_used['queue_item_id'].as_string() == item_id).all()
+    latencies = [
+        (log.sent_at - log.created_at).total_seconds() * 1000
+        for log in logs if log.sent_at
+    ]
+    return summarize(latencies, job.success_count, job.failed_count, elapsed)
+
+
+def bench_api_send(app, api_key: str, count: int) -> Dict[str, Any]:
+    """POST /api/v1/send individual via test client."""
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {api_key}'}
+    latencies, succeeded = [], 0
+
+    started = time.perf_counter()
+    for i in range(count):
+        t0 = time.perf_counter()
+        response = client.post('/api/v1/send', headers=headers, json={
+            'to': [f'api{i}@bench.test'],
+            'subject': f'Encomenda #{i}',
+            'html': BODY_HTML.format(name=f'User {i}', order=i),
+            'text': BODY_TEXT.format(name=f'User {i}', order=i)
+        })
+        latencies.append((time.perf_counter() - t0) * 1000)
+        succeeded += response.status_code == 200 and response.get_json().get('success', False)
+    elapsed = time.perf_counter() - started
+
+    return summarize(latencies, succeeded, count - succeeded, elapsed)
+
+
+def git_revision() -> Optional[str]:
+    """Commit atual (None fora de um repositório git)."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Compara throughput com um relatório anterior e devolve regressões."""
+    regressions = []
+    for name, result in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or not previous.get('messages_per_sec') or not result.get('messages_per_sec'):
+            continue
+        change = result['messages_per_sec'] / previous['messages_per_sec'] - 1
+        result['vs_baseline'] = {
+            'baseline_revision': baseline.get('revision'),
+            'messages_per_sec_change': round(change, 4),
+            'p99_ms_baseline': previous['latency_ms'].get('p99')
+        }
+        marker = '❌' if change < -max_regression else '✅'
+        print(f"{marker} {name}: {previous['messages_per_sec']} -> {result['messages_per_sec']} msg/s ({change:+.1%})")
+        if change < -max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline de envio SendCraft')
+    parser.add_argument('--messages', type=int, default=200, help='Mensagens por cenário')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Cenários separados por vírgula')
+    parser.add_argument('--queue-workers', type=int, default=2, help='Workers da EmailQueue')
+    parser.add_argument('--engine', choices=('sync', 'async'), default=None,
+                        help='SMTP_DELIVERY_ENGINE (por omissão o da configuração)')
+    parser.add_argument('--output', default='bench-report.json', help='Ficheiro do relatório JSON')
+    parser.add_argument('--baseline', help='Relatório anterior para comparação')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Queda máxima de throughput aceite face à baseline (0.2 = 20%%)')
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    sink = SMTPSink(behaviour=behaviour_from_args(args)).start()
+    workdir = tempfile.mkdtemp(prefix='sendcraft-bench-')
+    app = create_benchmark_app(os.path.join(workdir, 'bench.db'))
+    if args.engine:
+        app.config['SMTP_DELIVERY_ENGINE'] = args.engine
+
+    with app.app_context():
+        from sendcraft.extensions import db
+        db.create_all()
+        account, api_key = create_sender(app, sink.port)
+
+        runners: Dict[str, Callable[[], Dict[str, Any]]] = {
+            'send_email': lambda: bench_send_email(app, account, args.messages),
+            'send_bulk': lambda: bench_send_bulk(app, account, args.messages),
+            'queue': lambda: bench_queue(app, account, args.messages, args.queue_workers),
+            'api_send': lambda: bench_api_send(app, api_key, args.messages)
+        }
+
+        results = {}
+        for name in scenarios:
+            print(f"⏱️  {name} ({args.messages} mensagens)...")
+            sink.reset_stats()
+            result = runners[name]()
+            result['sink'] = sink.describe()['stats']
+            results[name] = result
+            latency = result['latency_ms']
+            print(f"   {result['messages_per_sec']} msg/s, p50 {latency['p50']} ms, p99 {latency['p99']} ms, "
+                  f"{result['failed']} falhas")
+
+        from sendcraft.services.smtp_metrics import get_smtp_metrics
+        report = {
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'settings': {
+                'messages': args.messages,
+                'queue_workers': args.queue_workers,
+                'engine': app.config.get('SMTP_DELIVERY_ENGINE', 'sync')
+            },
+            'sink': sink.describe()['behaviour'],
+            'scenarios': results,
+            'smtp_phases': get_smtp_metrics().snapshot()['series']
+        }
+
+    sink.stop()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"📄 Relatório: {args.output}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+SendCraft - SMTP sink local para testes de carga.
+
+Servidor SMTP em processo que aceita (e descarta) mensagens, com latência
+configurável e injeção de falhas: respostas 4xx/5xx em RCPT e DATA e
+quebras de ligação a meio da transação.
+
+Uso isolado:
+    python scripts/smtp_sink.py --port 2525 --latency-ms 5 --rcpt-5xx 0.01
+"""
+import argparse
+import random
+import socketserver
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, Optional
+
+
+@dataclass
+class SinkBehaviour:
+    """Comportamento do sink (taxas entre 0 e 1)."""
+    latency_ms: float = 0.0        # Atraso antes de cada resposta
+    data_latency_ms: float = 0.0   # Atraso extra antes de aceitar DATA
+    rcpt_4xx: float = 0.0          # RCPT TO -> 451
+    rcpt_5xx: float = 0.0          # RCPT TO -> 550
+    data_4xx: float = 0.0          # Fim de DATA -> 451
+    data_5xx: float = 0.0          # Fim de DATA -> 554
+    drop: float = 0.0              # Fechar ligação em vez de responder a MAIL FROM
+    seed: Optional[int] = None
+
+
+@dataclass
+class SinkStats:
+    """Contadores do sink."""
+    connections: int = 0
+    messages: int = 0
+    bytes: int = 0
+    rcpt_rejected: int = 0
+    data_rejected: int = 0
+    dropped: int = 0
+    commands: Dict[str, int] = field(default_factory=dict)
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Sessão SMTP do sink."""
+
+    def handle(self) -> None:
+        server: SMTPSink = self.server
+        server.count('connections')
+        self.reply('220 sendcraft-sink ESMTP')
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            command = line.decode('latin-1').strip()
+            verb = command.split(' ', 1)[0].upper()
+            server.count_command(verb)
+
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-sendcraft-sink', '250-AUTH PLAIN LOGIN', '250-PIPELINING', '250 SIZE 104857600')
+            elif verb == 'AUTH':
+                self.reply('235 2.7.0 Authentication successful')
+            elif verb == 'MAIL':
+                if server.roll('drop'):
+                    server.count('dropped')
+                    return
+                self.reply('250 2.1.0 Ok')
+            elif verb == 'RCPT':
+                if server.roll('rcpt_5xx'):
+                    server.count('rcpt_rejected')
+                    self.reply('550 5.1.1 Mailbox unavailable')
+                elif server.roll('rcpt_4xx'):
+                    server.count('rcpt_rejected')
+                    self.reply('451 4.3.0 Try again later')
+                else:
+                    self.reply('250 2.1.5 Ok')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = self.read_data()
+                if size is None:
+                    return
+                server.sleep(server.behaviour.data_latency_ms)
+                if server.roll('data_5xx'):
+                    server.count('data_rejected')
+                    self.reply('554 5.6.0 Message rejected')
+                elif server.roll('data_4xx'):
+                    server.count('data_rejected')
+                    self.reply('451 4.3.0 Queue full')
+                else:
+                    server.count('messages')
+                    server.count('bytes', size)
+                    self.reply('250 2.0.0 Ok: queued')
+            elif verb == 'QUIT':
+                self.reply('221 2.0.0 Bye')
+                return
+            else:
+                # RSET, NOOP e restantes comandos
+                self.reply('250 2.0.0 Ok')
+
+    def read_data(self) -> Optional[int]:
+        """Lê corpo do DATA até '.' e devolve o tamanho (None se a ligação caiu)."""
+        size = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return None
+            if line == b'.\r\n':
+                return size
+            size += len(line)
+
+    def reply(self, *lines: str) -> None:
+        """Envia resposta após a latência configurada."""
+        self.server.sleep(self.server.behaviour.latency_ms)
+        self.wfile.write(''.join(f'{line}\r\n' for line in lines).encode('ascii'))
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Servidor SMTP descartável com latência e falhas configuráveis."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, behaviour: Optional[SinkBehaviour] = None):
+        """
+        Inicializa sink (sem começar a aceitar ligações).
+
+        Args:
+            host: Endereço de escuta
+            port: Porta (0 = escolhida pelo sistema)
+            behaviour: Latência e taxas de falha
+        """
+        super().__init__((host, port), _SinkHandler)
+        self.behaviour = behaviour or SinkBehaviour()
+        self.stats = SinkStats()
+        self._random = random.Random(self.behaviour.seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """Porta em escuta."""
+        return self.server_address[1]
+
+    def start(self) -> 'SMTPSink':
+        """Começa a aceitar ligações num thread em background."""
+        self._thread = threading.Thread(target=self.serve_forever, name='SMTPSink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Para o sink."""
+        self.shutdown()
+        self.server_close()
+
+    def roll(self, rate_name: str) -> bool:
+        """Sorteia uma falha com a taxa indicada."""
+        rate = getattr(self.behaviour, rate_name)
+        if not rate:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Incrementa contador."""
+        with self._lock:
+            setattr(self.stats, name, getattr(self.stats, name) + amount)
+
+    def count_command(self, verb: str) -> None:
+        """Conta comandos recebidos por verbo."""
+        with self._lock:
+            self.stats.commands[verb] = self.stats.commands.get(verb, 0) + 1
+
+    def reset_stats(self) -> None:
+        """Limpa contadores."""
+        with self._lock:
+            self.stats = SinkStats()
+
+    @staticmethod
+    def sleep(milliseconds: float) -> None:
+        """Atraso simulado do servidor."""
+        if milliseconds > 0:
+            time.sleep(milliseconds / 1000)
+
+    def describe(self) -> Dict[str, Any]:
+        """Comportamento e contadores atuais."""
+        with self._lock:
+            return {
+                'behaviour': asdict(self.behaviour),
+                'stats': asdict(self.stats)
+            }
+
+
+def add_behaviour_arguments(parser: argparse.ArgumentParser) -> None:
+    """Acrescenta opções de comportamento do sink a um parser."""
+    group = parser.add_argument_group('SMTP sink')
+    group.add_argument('--latency-ms', type=float, default=0.0, help='Atraso por resposta SMTP')
+    group.add_argument('--data-latency-ms', type=float, default=0.0, help='Atraso extra no fim do DATA')
+    group.add_argument('--rcpt-4xx', type=float, default=0.0, help='Taxa de 451 em RCPT TO')
+    group.add_argument('--rcpt-5xx', type=float, default=0.0, help='Taxa de 550 em RCPT TO')
+    group.add_argument('--data-4xx', type=float, default=0.0, help='Taxa de 451 no fim do DATA')
+    group.add_argument('--data-5xx', type=float, default=0.0, help='Taxa de 554 no fim do DATA')
+    group.add_argument('--drop', type=float, default=0.0, help='Taxa de ligações fechadas em MAIL FROM')
+    group.add_argument('--seed', type=int, default=None, help='Semente para falhas reprodutíveis')
+
+
+def behaviour_from_args(args: argparse.Namespace) -> SinkBehaviour:
+    """Constrói SinkBehaviour a partir das opções da linha de comandos."""
+    return SinkBehaviour(
+        latency_ms=args.latency_ms,
+        data_latency_ms=args.data_latency_ms,
+        rcpt_4xx=args.rcpt_4xx,
+        rcpt_5xx=args.rcpt_5xx,
+        data_4xx=args.data_4xx,
+        data_5xx=args.data_5xx,
+        drop=args.drop,
+        seed=args.seed
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='SMTP sink local para SendCraft')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    add_behaviour_arguments(parser)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, behaviour_from_args(args))
+    print(f"📭 SMTP sink em {args.host}:{sink.port} (Ctrl+C para terminar)")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.server_close()
+        print(f"📊 {sink.describe()['stats']}")
+
+
+if __name__ == '__main__':
+    main()
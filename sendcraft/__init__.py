@@ -67,6 +67,9 @@ def create_app(config_name: Optional[str] = None) -> Flask:
     # Inicializar autosync se configurado
     init_autosync(app)
     
+    # Workers da outbox de envios em lote
+    init_email_queue(app)
+    
     return app
 
 
@@ -79,6 +82,15 @@ def init_autosync(app: Flask):
         app.logger.warning(f"Autosync não inicializado: {e}")
 
 
+def init_email_queue(app: Flask):
+    """Inicializar workers da queue de emails (outbox)."""
+    try:
+        from .services.email_queue import init_email_queue as start_outbox_workers
+        start_outbox_workers(app)
+    except Exception as e:
+        app.logger.warning(f"Email queue não inicializada: {e}")
+
+
 def load_environment_file(config_name: str) -> None:
     """
     Carrega ficheiro .env específico do ambiente.
@@ -156,7 +168,8 @@ def register_commands(app: Flask) -> None:
         create_admin_command,
         test_smtp_command,
         clean_logs_command,
-        seed_imap_command
+        seed_imap_command,
+        queue_worker_command
     )
     
     app.cli.add_command(init_db_command)
@@ -164,6 +177,7 @@ def register_commands(app: Flask) -> None:
     app.cli.add_command(test_smtp_command)
     app.cli.add_command(clean_logs_command)
     app.cli.add_command(seed_imap_command)
+    app.cli.add_command(queue_worker_command)
     
     # Adicionar comando seed-local-data se disponível
     try:
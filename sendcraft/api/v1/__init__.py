@@ -8,7 +8,7 @@ from flask import Blueprint, jsonify
 api_v1_bp = Blueprint('api_v1', __name__)
 
 # Importar sub-blueprints
-from . import send, accounts, templates, logs, health, emails_inbox, domain_emails
+from . import send, accounts, templates, logs, health, emails_inbox, domain_emails, outbox
 
 # Registrar sub-blueprints
 api_v1_bp.register_blueprint(send.bp)
@@ -18,6 +18,7 @@ api_v1_bp.register_blueprint(logs.bp)
 api_v1_bp.register_blueprint(health.bp)
 api_v1_bp.register_blueprint(emails_inbox.bp)
 api_v1_bp.register_blueprint(domain_emails.bp)
+api_v1_bp.register_blueprint(outbox.bp)
 
 # Rota raiz da API
 @api_v1_bp.route('/', methods=['GET'])
@@ -29,6 +30,7 @@ def api_info():
         'endpoints': {
             'health': '/api/v1/health',
             'status': '/api/v1/status',
+            'smtp_metrics': 'GET /api/v1/metrics/smtp',
             'send': {
                 'template': 'POST /api/v1/send',
                 'direct': 'POST /api/v1/send/direct',
@@ -41,7 +43,8 @@ def api_info():
             'templates': {
                 'list': 'GET /api/v1/templates/<domain>',
                 'get': 'GET /api/v1/templates/<domain>/<template_key>',
-                'preview': 'POST /api/v1/templates/<domain>/<template_key>/preview'
+                'preview': 'POST /api/v1/templates/<domain>/<template_key>/preview',
+                'render_batch': 'POST /api/v1/templates/<domain>/<template_key>/render-batch'
             },
             'logs': {
                 'list': 'GET /api/v1/logs',
@@ -52,6 +55,12 @@ def api_info():
                     'global': 'GET /api/v1/stats/global'
                 }
             },
+            'outbox': {
+                'dead_letters': 'GET /api/v1/outbox/dead-letters',
+                'dead_letter': 'GET /api/v1/outbox/dead-letters/<message_id>',
+                'replay': 'POST /api/v1/outbox/dead-letters/replay',
+                'replay_one': 'POST /api/v1/outbox/dead-letters/<message_id>/replay'
+            },
             'inbox': {
                 'list': 'GET /api/v1/inbox/<account_id>',
                 'get': 'GET /api/v1/inbox/<account_id>/<email_id>',
@@ -1,11 +1,12 @@
 """Endpoints de health check."""
-from flask import Blueprint, jsonify, current_app, g
+from flask import Blueprint, jsonify, current_app, g, request
 from datetime import datetime
 import sys
 import platform
 
 from ...extensions import db
-from ...services.auth_service import optional_api_key
+from ...services.auth_service import optional_api_key, require_api_key
+from ...services.smtp_metrics import get_smtp_metrics
 from ...utils.logging import get_logger
 
 bp = Blueprint('health', __name__)
@@ -122,6 +123,28 @@ def detailed_status():
         }), 500
 
 
+@bp.route('/metrics/smtp', methods=['GET'])
+@require_api_key
+def smtp_metrics():
+    """
+    Histogramas de latência SMTP por fase e tamanho de mensagem.
+    Filtros opcionais: ?relay=servidor:porta&account_id=N; ?reset=1 limpa após ler.
+    """
+    metrics = get_smtp_metrics()
+    snapshot = metrics.snapshot(
+        relay=request.args.get('relay'),
+        account_id=request.args.get('account_id', type=int)
+    )
+    
+    if request.args.get('reset') in ('1', 'true'):
+        metrics.reset()
+    
+    return jsonify({
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        **snapshot
+    })
+
+
 @bp.route('/ping', methods=['GET'])
 def ping():
     """
@@ -0,0 +1,124 @@
+"""Endpoints da outbox de envios em lote (dead-letter)."""
+from flask import Blueprint, jsonify, request
+
+from ...models.outbox import OutboxMessage
+from ...services.auth_service import require_api_key
+from ...services.email_queue import get_email_queue
+from ...extensions import db
+from ...utils.logging import get_logger
+
+bp = Blueprint('outbox', __name__)
+logger = get_logger(__name__)
+
+
+def _dead_letter_dict(message: OutboxMessage) -> dict:
+    """Serializa destinatário da dead-letter com o job a que pertence."""
+    data = message.to_dict()
+    data['job'] = message.job.reference
+    data['account_id'] = message.job.account_id
+    data['subject'] = (message.job.payload or {}).get('subject')
+    return data
+
+
+@bp.route('/outbox/dead-letters', methods=['GET'])
+@require_api_key
+def list_dead_letters():
+    """
+    Lista destinatários com falha definitiva (permanente ou tentativas esgotadas).
+
+    Query Parameters:
+        account_id: Filtrar por conta
+        job: Filtrar por job (QUEUE-000123)
+        limit: Número máximo de resultados (default: 50, max: 500)
+        offset: Offset para paginação (default: 0)
+    """
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        offset = int(request.args.get('offset', 0))
+        query = get_email_queue().dead_letters(
+            account_id=request.args.get('account_id', type=int),
+            job_reference=request.args.get('job')
+        )
+
+        total = query.count()
+        messages = query.limit(limit).offset(offset).all()
+
+        return jsonify({
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'count': len(messages),
+            'dead_letters': [_dead_letter_dict(message) for message in messages]
+        })
+
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid parameters',
+            'message': str(e)
+        }), 400
+
+
+@bp.route('/outbox/dead-letters/<int:message_id>', methods=['GET'])
+@require_api_key
+def get_dead_letter(message_id: int):
+    """Detalhe de um destinatário da dead-letter."""
+    message = db.session.get(OutboxMessage, message_id)
+    if not message or message.dead_lettered_at is None:
+        return jsonify({
+            'error': 'Not found',
+            'message': f'Dead letter {message_id} not found'
+        }), 404
+
+    return jsonify(_dead_letter_dict(message))
+
+
+@bp.route('/outbox/dead-letters/replay', methods=['POST'])
+@require_api_key
+def replay_dead_letters():
+    """
+    Devolve destinatários da dead-letter à outbox.
+
+    Body:
+        {"ids": [1, 2, 3]} ou {"job": "QUEUE-000123"}
+    """
+    data = request.get_json(silent=True) or {}
+    message_ids = data.get('ids')
+    job_reference = data.get('job')
+
+    if not message_ids and not job_reference:
+        return jsonify({
+            'error': 'Invalid parameters',
+            'message': 'ids or job required'
+        }), 400
+
+    if message_ids is not None and (
+            not isinstance(message_ids, list) or not all(isinstance(i, int) for i in message_ids)):
+        return jsonify({
+            'error': 'Invalid parameters',
+            'message': 'ids must be a list of integers'
+        }), 400
+
+    replayed = get_email_queue().replay_dead_letters(message_ids=message_ids, job_reference=job_reference)
+    logger.info(f"Dead letter replay requested: {replayed} messages")
+
+    return jsonify({
+        'success': True,
+        'replayed': replayed
+    })
+
+
+@bp.route('/outbox/dead-letters/<int:message_id>/replay', methods=['POST'])
+@require_api_key
+def replay_dead_letter(message_id: int):
+    """Devolve um destinatário da dead-letter à outbox."""
+    replayed = get_email_queue().replay_dead_letters(message_ids=[message_id])
+    if not replayed:
+        return jsonify({
+            'error': 'Not found',
+            'message': f'Dead letter {message_id} not found'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'replayed': replayed
+    })
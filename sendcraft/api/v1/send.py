@@ -5,9 +5,10 @@ import logging
 
 from ...models import Domain, EmailAccount, EmailTemplate, EmailLog
 from ...models.log import EmailStatus
-from ...services.smtp_service import SMTPService
+from ...services.smtp_service import SMTPService, create_smtp_service
 from ...services.email_service import EmailService
 from ...services.auth_service import require_api_key
+from ...services.entity_cache import get_entity_cache
 from ...extensions import db
 from ...utils.logging import get_logger
 
@@ -57,7 +58,7 @@ def send_email():
             }), 400
         
         # Buscar domínio
-        domain = Domain.get_by_name(data['domain'])
+        domain = get_entity_cache().get_domain(data['domain'])
         if not domain:
             return jsonify({
                 'error': 'Domain not found',
@@ -72,7 +73,7 @@ def send_email():
         
         # Buscar conta
         account_email = f"{data['account']}@{data['domain']}"
-        account = EmailAccount.get_by_email(account_email)
+        account = get_entity_cache().get_account(account_email)
         if not account:
             return jsonify({
                 'error': 'Account not found',
@@ -94,7 +95,7 @@ def send_email():
             }), 429
         
         # Buscar template
-        template = EmailTemplate.get_by_key(domain.id, data['template_key'])
+        template = get_entity_cache().get_template(domain.id, data['template_key'])
         if not template:
             return jsonify({
                 'error': 'Template not found',
@@ -119,13 +120,16 @@ def send_email():
                 'optional_variables': template.variables_optional
             }), 400
         
+        # Assunto renderizado uma vez (log e envio)
+        subject = template.render_subject(variables)
+        
         # Criar log inicial
         log = EmailLog(
             account_id=account.id,
             template_id=template.id,
             recipient_email=data['to'],
             sender_email=account.email_address,
-            subject=template.render_subject(variables),
+            subject=subject,
             status=EmailStatus.PENDING,
             variables_used=variables,
             ip_address=request.remote_addr,
@@ -139,7 +143,6 @@ def send_email():
         
         # Renderizar conteúdo
         try:
-            subject = template.render_subject(variables)
             html_content = template.render_html(variables)
             text_content = template.render_text(variables)
         except Exception as e:
@@ -150,7 +153,7 @@ def send_email():
             }), 400
         
         # Enviar email
-        smtp_service = SMTPService(current_app.config.get('ENCRYPTION_KEY'))
+        smtp_service = create_smtp_service(current_app.config.get('ENCRYPTION_KEY'))
         success, message, message_id = smtp_service.send_email(
             account=account,
             to_email=data['to'],
@@ -162,7 +165,7 @@ def send_email():
         
         # Atualizar log
         if success:
-            log.mark_sent(message_id or '', message)
+            log.mark_sent(message_id or '', message, smtp_service.last_timings)
             logger.info(f"Email sent successfully: {log.id} from {account.email_address} to {data['to']}")
         else:
             log.mark_failed(message)
@@ -244,7 +247,7 @@ def send_direct():
             }), 400
         
         # Buscar domínio
-        domain = Domain.get_by_name(data['domain'])
+        domain = get_entity_cache().get_domain(data['domain'])
         if not domain:
             return jsonify({
                 'error': 'Domain not found',
@@ -259,7 +262,7 @@ def send_direct():
         
         # Buscar conta
         account_email = f"{data['account']}@{data['domain']}"
-        account = EmailAccount.get_by_email(account_email)
+        account = get_entity_cache().get_account(account_email)
         if not account:
             return jsonify({
                 'error': 'Account not found',
@@ -297,7 +300,7 @@ def send_direct():
         log.mark_sending()
         
         # Enviar email
-        smtp_service = SMTPService(current_app.config.get('ENCRYPTION_KEY'))
+        smtp_service = create_smtp_service(current_app.config.get('ENCRYPTION_KEY'))
         success, message, message_id = smtp_service.send_email(
             account=account,
             to_email=data['to'],
@@ -309,7 +312,7 @@ def send_direct():
         
         # Atualizar log
         if success:
-            log.mark_sent(message_id or '', message)
+            log.mark_sent(message_id or '', message, smtp_service.last_timings)
             logger.info(f"Direct email sent: {log.id} from {account.email_address} to {data['to']}")
         else:
             log.mark_failed(message)
@@ -1,8 +1,13 @@
 """Endpoints de gestão de templates."""
-from flask import Blueprint, jsonify, request
+import json
+from itertools import islice
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 
 from ...models import Domain, EmailTemplate
 from ...services.auth_service import require_api_key
+from ...services.bulk_ingest import iter_lines, parse_ndjson
+from ...services.template_service import TemplateService
 from ...utils.logging import get_logger
 
 bp = Blueprint('templates', __name__, url_prefix='/templates')
@@ -263,6 +268,83 @@ def preview_template(domain: str, template_key: str):
         }), 500
 
 
+@bp.route('/<domain>/<template_key>/render-batch', methods=['POST'])
+@require_api_key
+def render_batch(domain: str, template_key: str):
+    """
+    Renderiza um template para muitos conjuntos de variáveis (resposta em stream).
+    
+    Args:
+        domain: Nome do domínio
+        template_key: Chave do template
+    
+    Body (application/x-ndjson): um objeto de variáveis por linha; ou JSON
+    {"variables": [{...}, {...}]}. Até TEMPLATE_BATCH_MAX_SETS conjuntos,
+    lidos antes de a resposta começar.
+    
+    Returns:
+        NDJSON em chunks, uma linha por conjunto de variáveis e pela mesma
+        ordem: {"index": 0, "subject": ..., "html": ..., "text": ...} ou
+        {"index": 0, "error": ...}; 413 se houver mais conjuntos do que o limite
+    """
+    domain_obj = Domain.get_by_name(domain)
+    if not domain_obj:
+        return jsonify({
+            'error': 'Domain not found',
+            'message': f"Domain '{domain}' not found"
+        }), 404
+    
+    template = EmailTemplate.get_by_key(domain_obj.id, template_key)
+    if not template:
+        return jsonify({
+            'error': 'Template not found',
+            'message': f"Template '{template_key}' not found for domain '{domain}'"
+        }), 404
+    
+    if request.mimetype in ('application/x-ndjson', 'application/jsonlines', 'application/json-seq'):
+        # Linhas inválidas passam como ValueError e saem como erro na sua posição
+        variables = (row for _, row in parse_ndjson(iter_lines(request.stream)))
+    else:
+        data = request.get_json(silent=True) or {}
+        variables = data.get('variables')
+        if not isinstance(variables, list):
+            return jsonify({
+                'error': 'Invalid parameters',
+                'message': 'Body must be NDJSON or {"variables": [...]}'
+            }), 400
+    
+    # Conjuntos lidos antes de responder (no máximo o limite + 1): corpo vazio
+    # ou lote grande demais ainda podem ser um 400 ou 413
+    max_sets = current_app.config.get('TEMPLATE_BATCH_MAX_SETS', 10000)
+    variables = list(islice(variables, max_sets + 1))
+    if not variables:
+        return jsonify({
+            'error': 'Invalid parameters',
+            'message': 'No variable sets provided'
+        }), 400
+    if len(variables) > max_sets:
+        return jsonify({
+            'error': 'Payload too large',
+            'message': f'Maximum of {max_sets} variable sets per request exceeded'
+        }), 413
+    
+    rendered = TemplateService().render_batch(template, variables)
+    
+    def lines():
+        count = failed = 0
+        for index, result in enumerate(rendered):
+            if result.error:
+                failed += 1
+                line = {'index': index, 'error': result.error}
+            else:
+                line = {'index': index, 'subject': result.subject, 'html': result.html, 'text': result.text}
+            count += 1
+            yield json.dumps(line) + '\n'
+        logger.info(f"Batch rendered template {template_key} for domain {domain}: {count} sets, {failed} failed")
+    
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+
 @bp.route('', methods=['GET'])
 @require_api_key
 def list_all_templates():
@@ -2,6 +2,8 @@
 Comandos CLI personalizados para SendCraft.
 Fornece comandos para gestão da aplicação via terminal.
 """
+import os
+
 import click
 from flask import current_app
 from flask.cli import with_appcontext
@@ -142,4 +144,59 @@ def seed_imap_command(force: bool, test: bool, sync: int) -> None:
     except Exception as e:
         click.echo(f'❌ Error: {e}', err=True)
         logger.error(f'Failed to seed IMAP account: {e}')
-        raise
\ No newline at end of file
+        raise
+
+
+@click.command('queue-worker')
+@click.option('--workers', type=int, default=None, help='Máximo de threads de envio (QUEUE_WORKER_CONCURRENCY)')
+@click.option('--heartbeat-file', default=None, help='Ficheiro de heartbeat (QUEUE_WORKER_HEARTBEAT_FILE)')
+@click.option('--heartbeat-interval', type=float, default=None, help='Segundos entre heartbeats')
+@click.option('--shutdown-timeout', type=float, default=None, help='Segundos para terminar envios ao parar')
+@click.option('--check', is_flag=True, help='Verificar heartbeat de um worker e sair (health probe)')
+@with_appcontext
+def queue_worker_command(workers: Optional[int],
+                         heartbeat_file: Optional[str],
+                         heartbeat_interval: Optional[float],
+                         shutdown_timeout: Optional[float],
+                         check: bool) -> None:
+    """
+    Processa a outbox de envios em lote num processo dedicado.
+    
+    Termina os envios em curso e devolve o resto à outbox ao receber
+    SIGTERM/SIGINT. O pool varia entre EMAIL_QUEUE_MIN_WORKERS e --workers
+    conforme o backlog. Para escalar, correr vários processos.
+    
+    Usage:
+        flask queue-worker --workers 8 --heartbeat-file /tmp/sendcraft-worker.json
+        flask queue-worker --check --heartbeat-file /tmp/sendcraft-worker.json
+    """
+    from .services.email_queue import get_email_queue
+    from .services.queue_worker import QueueWorker, check_heartbeat
+    
+    config = current_app.config
+    heartbeat_file = heartbeat_file or config.get('QUEUE_WORKER_HEARTBEAT_FILE')
+    
+    if check:
+        if not heartbeat_file:
+            raise click.UsageError('--check requer --heartbeat-file ou QUEUE_WORKER_HEARTBEAT_FILE')
+        healthy, message = check_heartbeat(heartbeat_file, config.get('QUEUE_WORKER_HEARTBEAT_MAX_AGE', 60))
+        click.echo(f"{'✅' if healthy else '❌'} {message}", err=not healthy)
+        raise SystemExit(0 if healthy else 1)
+    
+    worker = QueueWorker(
+        current_app._get_current_object(),
+        get_email_queue(),
+        workers=workers or config.get('QUEUE_WORKER_CONCURRENCY', 16),
+        heartbeat_file=heartbeat_file,
+        heartbeat_interval=heartbeat_interval or config.get('QUEUE_WORKER_HEARTBEAT_INTERVAL', 10),
+        shutdown_timeout=shutdown_timeout
+    )
+    
+    click.echo(f'📤 Queue worker {os.getpid()} com até {worker.workers} workers (Ctrl+C ou SIGTERM para parar)')
+    try:
+        worker.run()
+    except Exception as e:
+        click.echo(f'❌ Erro no queue worker: {e}', err=True)
+        logger.error(f'Queue worker failed: {e}')
+        raise
+    click.echo('✅ Queue worker terminado')
@@ -5,10 +5,12 @@ Exporta todos os modelos para fácil importação.
 from .base import BaseModel, TimestampMixin, init_db
 from .domain import Domain
 from .account import EmailAccount
-from .template import EmailTemplate
+from .template import EmailTemplate, TemplateBytecode
 from .log import EmailLog, EmailStatus
 from .email_inbox import EmailInbox
 from .autosync_config import AutosyncConfig
+from .outbox import OutboxJob, OutboxMessage, QueueStatus, QueuePriority
+from .cache_version import CacheVersion
 
 __all__ = [
     'BaseModel',
@@ -17,8 +19,14 @@ __all__ = [
     'Domain',
     'EmailAccount', 
     'EmailTemplate',
+    'TemplateBytecode',
     'EmailLog',
     'EmailStatus',
     'EmailInbox',
-    'AutosyncConfig'
+    'AutosyncConfig',
+    'OutboxJob',
+    'OutboxMessage',
+    'QueueStatus',
+    'QueuePriority',
+    'CacheVersion'
 ]
\ No newline at end of file
@@ -7,7 +7,7 @@ from email_validator import validate_email, EmailNotValidError
 from datetime import datetime
 
 from .base import BaseModel, TimestampMixin
-from ..utils.crypto import AESCipher, generate_api_key, hash_api_key, verify_api_key
+from ..utils.crypto import get_cipher, generate_api_key, hash_api_key, verify_api_key
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -153,7 +153,7 @@ class EmailAccount(BaseModel, TimestampMixin):
             encryption_key: Chave de encriptação
         """
         if password:
-            cipher = AESCipher(encryption_key)
+            cipher = get_cipher(encryption_key)
             self.smtp_password = cipher.encrypt(password)
             logger.debug(f"Password set for account {self.email_address}")
     
@@ -171,7 +171,7 @@ class EmailAccount(BaseModel, TimestampMixin):
             return ''
         
         try:
-            cipher = AESCipher(encryption_key)
+            cipher = get_cipher(encryption_key)
             return cipher.decrypt(self.smtp_password)
         except Exception as e:
             logger.error(f"Failed to decrypt password for {self.email_address}: {e}")
@@ -284,6 +284,17 @@ class EmailAccount(BaseModel, TimestampMixin):
         
         return True, "Within limits"
     
+    def get_remaining_quota(self) -> int:
+        """
+        Calcula quantos emails a conta ainda pode enviar hoje e este mês.
+        
+        Returns:
+            Menor dos restos dos limites diário e mensal (0 se algum foi atingido)
+        """
+        daily_left = self.daily_limit - self.count_emails_sent_today()
+        monthly_left = self.monthly_limit - self.count_emails_sent_this_month()
+        return max(0, min(daily_left, monthly_left))
+    
     def needs_sync(self) -> bool:
         """
         Verifica se a conta precisa de sincronização.
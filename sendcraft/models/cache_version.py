@@ -0,0 +1,28 @@
+"""Modelo de versões de caches partilhadas para SendCraft."""
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, DateTime
+
+from ..extensions import db
+
+
+class CacheVersion(db.Model):
+    """
+    Contador de versão de uma cache em processo.
+    
+    Quem altera os dados incrementa o contador; os outros processos leem-no
+    periodicamente e descartam a sua cache quando muda.
+    
+    Attributes:
+        name: Nome da cache (ex: 'entities')
+        version: Contador incrementado a cada invalidação
+        updated_at: Última invalidação
+    """
+    
+    __tablename__ = 'cache_versions'
+    
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self) -> str:
+        return f'<CacheVersion {self.name}={self.version}>'
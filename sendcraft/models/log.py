@@ -38,6 +38,7 @@ class EmailLog(BaseModel):
         smtp_response: Resposta do servidor SMTP
         error_message: Mensagem de erro (se houver)
         variables_used: Variáveis utilizadas no template
+        delivery_timings: Tempos SMTP por fase (ms) e tamanho da mensagem
         sent_at: Timestamp de envio
         delivered_at: Timestamp de entrega
         opened_at: Timestamp de abertura
@@ -74,6 +75,9 @@ class EmailLog(BaseModel):
     # Template data
     variables_used = Column(JSON)
     
+    # Delivery instrumentation (dns/connect/tls/greeting/auth/data ms, size_bytes)
+    delivery_timings = Column(JSON)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     sent_at = Column(DateTime, index=True)
@@ -234,30 +238,39 @@ class EmailLog(BaseModel):
         self.status = EmailStatus.SENDING
         self.save()
     
-    def mark_sent(self, message_id: str, smtp_response: Optional[str] = None) -> None:
+    def mark_sent(self,
+                  message_id: str,
+                  smtp_response: Optional[str] = None,
+                  timings: Optional[Dict[str, Any]] = None) -> None:
         """
         Marca email como enviado.
         
         Args:
             message_id: ID da mensagem SMTP
             smtp_response: Resposta do servidor SMTP
+            timings: Tempos SMTP por fase do envio
         """
         self.status = EmailStatus.SENT
         self.message_id = message_id
         self.smtp_response = smtp_response
+        if timings:
+            self.delivery_timings = timings
         self.sent_at = datetime.utcnow()
         self.save()
         logger.info(f"Email {self.id} marked as sent")
     
-    def mark_failed(self, error_message: str) -> None:
+    def mark_failed(self, error_message: str, timings: Optional[Dict[str, Any]] = None) -> None:
         """
         Marca email como falhou.
         
         Args:
             error_message: Mensagem de erro
+            timings: Tempos SMTP por fase (se disponíveis)
         """
         self.status = EmailStatus.FAILED
         self.error_message = error_message
+        if timings:
+            self.delivery_timings = timings
         self.save()
         logger.error(f"Email {self.id} marked as failed: {error_message}")
     
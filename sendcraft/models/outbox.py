@@ -0,0 +1,186 @@
+"""Modelos da outbox de envios em lote para SendCraft."""
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Any, Optional
+
+from sqlalchemy import Column, String, Integer, Text, ForeignKey, DateTime, JSON, Enum as SQLEnum
+from sqlalchemy.orm import relationship
+
+from .base import BaseModel
+from .log import EmailStatus
+
+
+class QueueStatus(str, Enum):
+    """Status de um job da outbox."""
+    SCHEDULED = 'scheduled'
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+
+class QueuePriority(str, Enum):
+    """Lane de um job da outbox (transactional é servida primeiro)."""
+    TRANSACTIONAL = 'transactional'
+    BULK = 'bulk'
+
+
+class OutboxJob(BaseModel):
+    """
+    Job de envio em lote persistido na base de dados.
+
+    Attributes:
+        account_id: Conta que envia
+        status: Status do job
+        priority: Lane de agendamento (transactional ou bulk)
+        payload: Conteúdo comum (subject, html_content, text_content,
+            attachments, from_name, reply_to, cc, bcc, idempotency_key, variables;
+            personalized=True: subject/html/text são templates Jinja
+            renderizados por destinatário com OutboxMessage.variables)
+        total_count: Número de destinatários
+        success_count: Destinatários enviados
+        failed_count: Destinatários falhados
+        error_message: Erro que impediu o job de ser processado
+        send_at: Envio agendado (job fica SCHEDULED até lá)
+        started_at: Primeiro envio
+        completed_at: Último destinatário processado
+    """
+
+    __tablename__ = 'outbox_jobs'
+
+    account_id = Column(Integer, ForeignKey('email_accounts.id'), nullable=False, index=True)
+    account = relationship('EmailAccount')
+
+    status = Column(SQLEnum(QueueStatus), nullable=False, default=QueueStatus.PENDING, index=True)
+    priority = Column(SQLEnum(QueuePriority), nullable=False, default=QueuePriority.BULK)
+    payload = Column(JSON, nullable=False)
+
+    total_count = Column(Integer, nullable=False, default=0)
+    success_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    error_message = Column(Text)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    send_at = Column(DateTime, index=True)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+
+    messages = relationship('OutboxMessage', back_populates='job', lazy='dynamic')
+
+    @property
+    def reference(self) -> str:
+        """ID público do job (devolvido pela API)."""
+        return f"QUEUE-{self.id:06d}"
+
+    @staticmethod
+    def parse_reference(reference: str) -> Optional[int]:
+        """
+        Converte ID público em ID do job.
+
+        Args:
+            reference: ID no formato QUEUE-000123 (ou numérico)
+
+        Returns:
+            ID do job ou None se inválido
+        """
+        value = reference[6:] if reference.startswith('QUEUE-') else reference
+        try:
+            return int(value)
+        except ValueError:
+            return None
+
+    @property
+    def processed_count(self) -> int:
+        """Destinatários já processados."""
+        return (self.success_count or 0) + (self.failed_count or 0)
+
+    def to_dict(self, include_relationships: bool = False) -> Dict[str, Any]:
+        """
+        Converte job para dicionário (sem o conteúdo da mensagem).
+
+        Args:
+            include_relationships: Se deve incluir os destinatários
+
+        Returns:
+            Dicionário com os dados
+        """
+        data = super().to_dict()
+        data.pop('payload', None)
+        data['reference'] = self.reference
+        data['status'] = self.status.value if isinstance(self.status, QueueStatus) else self.status
+        data['priority'] = self.priority.value if isinstance(self.priority, QueuePriority) else self.priority
+        data['subject'] = (self.payload or {}).get('subject')
+        data['processed_count'] = self.processed_count
+
+        if include_relationships:
+            data['recipients'] = [message.to_dict() for message in self.messages.order_by(OutboxMessage.id)]
+
+        return data
+
+    def __repr__(self) -> str:
+        return f'<OutboxJob {self.id}: {self.processed_count}/{self.total_count} ({self.status})>'
+
+
+class OutboxMessage(BaseModel):
+    """
+    Destinatário de um job da outbox (unidade reclamada pelos workers).
+
+    Attributes:
+        job_id: Job a que pertence
+        recipient_email: Email do destinatário
+        variables: Variáveis do destinatário (jobs personalizados)
+        status: PENDING, SENDING (reclamado), SENT ou FAILED
+        locked_by: Token do worker que reclamou a linha
+        locked_until: Fim do lease; após expirar outro worker pode reclamar
+        attempts: Número de tentativas de envio
+        next_attempt_at: Próxima tentativa após falha temporária (None = já)
+        dead_lettered_at: Falha definitiva (dead-letter); None enquanto houver tentativas
+        log_id: EmailLog criado para o envio
+        error_message: Último erro
+    """
+
+    __tablename__ = 'outbox_messages'
+
+    job_id = Column(Integer, ForeignKey('outbox_jobs.id'), nullable=False, index=True)
+    job = relationship('OutboxJob', back_populates='messages')
+
+    recipient_email = Column(String(200), nullable=False)
+    variables = Column(JSON)
+    status = Column(SQLEnum(EmailStatus), nullable=False, default=EmailStatus.PENDING, index=True)
+
+    locked_by = Column(String(100), index=True)
+    locked_until = Column(DateTime, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, index=True)
+    dead_lettered_at = Column(DateTime, index=True)
+
+    log_id = Column(Integer, ForeignKey('email_logs.id'))
+    error_message = Column(Text)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, index=True)
+
+    def to_dict(self, include_relationships: bool = False) -> Dict[str, Any]:
+        """
+        Converte destinatário para dicionário.
+
+        Args:
+            include_relationships: Ignorado
+
+        Returns:
+            Dicionário com os dados
+        """
+        return {
+            'id': self.id,
+            'email': self.recipient_email,
+            'status': self.status.value if isinstance(self.status, EmailStatus) else self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'dead_lettered_at': self.dead_lettered_at.isoformat() if self.dead_lettered_at else None,
+            'log_id': self.log_id,
+            'error': self.error_message,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
+
+    def __repr__(self) -> str:
+        return f'<OutboxMessage {self.id}: {self.recipient_email} ({self.status})>'
@@ -1,11 +1,15 @@
 """Modelo de Template de Email para SendCraft."""
-from sqlalchemy import Column, String, Integer, Boolean, Text, ForeignKey, JSON
+from datetime import datetime
+from sqlalchemy import Column, String, Integer, Boolean, Text, ForeignKey, JSON, DateTime, LargeBinary
 from sqlalchemy.orm import relationship
 from typing import Optional, List, Dict, Any
 import json
 from jinja2 import Template, TemplateError, meta, Environment
 
 from .base import BaseModel, TimestampMixin
+from ..extensions import db
+from ..services.template_cache import get_template_cache
+from ..services.render_cache import get_render_cache
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -165,6 +169,54 @@ class EmailTemplate(BaseModel, TimestampMixin):
         
         return variables
     
+    def compiled(self, part: str) -> Template:
+        """
+        Template compilado de uma parte (cache por id e versão).
+        
+        Args:
+            part: 'subject', 'html' ou 'text'
+            
+        Returns:
+            Template Jinja compilado
+            
+        Raises:
+            TemplateError: Se a fonte for inválida
+        """
+        source = getattr(self, f'{part}_template') or ''
+        return get_template_cache().get(self.id, self.version, part, source)
+    
+    def render_part(self, part: str, variables: Dict[str, Any]) -> str:
+        """
+        Renderiza uma parte, reutilizando o resultado de uma renderização
+        igual se a cache de resultados estiver ligada.
+        
+        Args:
+            part: 'subject', 'html' ou 'text'
+            variables: Dicionário de variáveis
+            
+        Returns:
+            Parte renderizada
+            
+        Raises:
+            TemplateError: Se a fonte for inválida ou a renderização falhar
+        """
+        source = getattr(self, f'{part}_template') or ''
+        return get_render_cache().get(self.id, self.version, part, source, variables,
+                                      lambda: self.compiled(part).render(**variables))
+    
+    def precompile(self) -> None:
+        """
+        Compila as partes do template para a cache (e bytecode cache, se
+        configurada), para que o primeiro envio de qualquer processo não
+        tenha de compilar. Erros de sintaxe são só registados.
+        """
+        for part in ('subject', 'html', 'text'):
+            if getattr(self, f'{part}_template'):
+                try:
+                    self.compiled(part)
+                except TemplateError as e:
+                    logger.warning(f"Template {self.template_key} v{self.version} {part} not precompiled: {e}")
+    
     def render_subject(self, variables: Dict[str, Any]) -> str:
         """
         Renderiza o assunto do email.
@@ -179,8 +231,7 @@ class EmailTemplate(BaseModel, TimestampMixin):
             ValueError: Se houver erro na renderização
         """
         try:
-            template = Template(self.subject_template)
-            return template.render(**variables)
+            return self.render_part('subject', variables)
         except TemplateError as e:
             error_msg = f"Erro ao renderizar assunto: {e}"
             logger.error(error_msg)
@@ -203,8 +254,7 @@ class EmailTemplate(BaseModel, TimestampMixin):
             return None
         
         try:
-            template = Template(self.html_template)
-            return template.render(**variables)
+            return self.render_part('html', variables)
         except TemplateError as e:
             error_msg = f"Erro ao renderizar HTML: {e}"
             logger.error(error_msg)
@@ -227,8 +277,7 @@ class EmailTemplate(BaseModel, TimestampMixin):
             return None
         
         try:
-            template = Template(self.text_template)
-            return template.render(**variables)
+            return self.render_part('text', variables)
         except TemplateError as e:
             error_msg = f"Erro ao renderizar texto: {e}"
             logger.error(error_msg)
@@ -311,4 +360,24 @@ class EmailTemplate(BaseModel, TimestampMixin):
             # Contar uso do template
             data['usage_count'] = self.logs.count()
         
-        return data
\ No newline at end of file
+        return data
+
+
+class TemplateBytecode(db.Model):
+    """
+    Bytecode Jinja de um template compilado, partilhado entre processos.
+    
+    Attributes:
+        cache_key: Template, versão e parte (email_template/<id>/<versão>/<parte>)
+        code: Bucket serializado pelo Jinja (inclui checksum da fonte e versão do Python)
+        updated_at: Última escrita
+    """
+    
+    __tablename__ = 'template_bytecode'
+    
+    cache_key = Column(String(200), primary_key=True)
+    code = Column(LargeBinary(length=16 * 1024 * 1024), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self) -> str:
+        return f'<TemplateBytecode {self.cache_key}>'
@@ -2,19 +2,30 @@
 SendCraft Phase 15: Email Sending API
 API para envio de emails com anexos para e-commerce
 """
-from flask import Blueprint, request, jsonify, current_app, g
+from flask import Blueprint, Response, request, jsonify, current_app, g, stream_with_context
 from flask_cors import cross_origin
 from typing import Dict, Any, List, Optional
+from itertools import chain
 import base64
+import json
 import time
 import uuid
 from datetime import datetime, timedelta
 
-from ..models import Domain, EmailAccount, EmailLog
+from ..models import Domain, EmailAccount, EmailLog, EmailTemplate, QueuePriority
 from ..models.log import EmailStatus
-from ..services.smtp_service import SMTPService
+from ..models.outbox import OutboxJob, OutboxMessage
+from ..services.smtp_service import create_smtp_service
 from ..services.attachment_service import AttachmentService
 from ..services.email_queue import get_email_queue
+from ..services.admission import get_admission_controller
+from ..services.bulk_ingest import (
+    BulkIngestor, IngestError, iter_lines, parse_ndjson, ndjson_recipients, csv_recipients
+)
+from ..services.email_queue import PersonalizedContent
+from ..services.send_scheduler import parse_send_at
+from ..services.job_progress import job_progress, progress_delta, get_job_progress_notifier, FINAL_STATUSES
+from ..services.entity_cache import get_entity_cache
 from ..services.auth_service import require_account_api_key
 from ..extensions import db
 from ..utils.logging import get_logger
@@ -56,15 +67,24 @@ def send_email():
         "domain": "alitools.pt",
         "account": "encomendas",
         "bulk": false,
-        "idempotency_key": "order-12345-confirmation"
+        "priority": "transactional",
+        "idempotency_key": "order-12345-confirmation",
+        "send_at": "2025-11-28T09:00:00Z",
+        "send_window": 600
     }
     
+    send_at agenda o envio (ISO 8601, até OUTBOX_SCHEDULE_MAX_DAYS dias);
+    envios individuais agendados passam pela outbox na lane transactional.
+    send_window espalha os destinatários por N segundos a partir de send_at
+    (default: OUTBOX_SCHEDULE_WINDOW_SECONDS acima de
+    OUTBOX_SCHEDULE_SPREAD_THRESHOLD destinatários).
+    
     Returns:
         200: Email sent successfully
         400: Validation error
         401: Authentication required
         404: Account/domain not found
-        429: Rate limit exceeded
+        429: Rate limit exceeded, or outbox saturated for bulk sends (Retry-After)
         500: Server error
     """
     try:
@@ -125,6 +145,30 @@ def send_email():
                 }
             }), 400
         
+        # Validate queue lane (only used by bulk sends; single sends are delivered inline)
+        priority = data.get('priority', QueuePriority.BULK.value)
+        if priority not in [lane.value for lane in QueuePriority]:
+            return jsonify({
+                'success': False,
+                'error': 'validation_failed',
+                'message': f'Campo "priority" inválido: {priority}',
+                'details': {
+                    'allowed_values': [lane.value for lane in QueuePriority]
+                }
+            }), 400
+        
+        # Validate schedule
+        try:
+            send_at = parse_send_at(data.get('send_at'), current_app.config.get('OUTBOX_SCHEDULE_MAX_DAYS', 30))
+            send_window = _send_window(data.get('send_window'), len(to_emails))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': 'validation_failed',
+                'message': str(e),
+                'details': {}
+            }), 400
+        
         # Use authenticated account
         account = g.account
         if not account or not account.is_active:
@@ -135,6 +179,19 @@ def send_email():
                 'details': {}
             }), 404
         
+        # Admission control: bulk work waits while the outbox is too far behind (small transactional batches always accepted)
+        if data.get('bulk', False) and not send_at:
+            admission = get_admission_controller().check(len(to_emails), QueuePriority(priority))
+            if not admission.admitted:
+                response = jsonify({
+                    'success': False,
+                    'error': 'queue_saturated',
+                    'message': f'Fila de envio saturada; tentar novamente dentro de {admission.retry_after}s',
+                    'details': admission.details
+                })
+                response.headers['Retry-After'] = str(admission.retry_after)
+                return response, 429
+        
         # Check account limits
         within_limits, limit_msg = account.is_within_limits()
         if not within_limits:
@@ -184,9 +241,14 @@ def send_email():
                 }), 200
         
         # Process email(s)
-        if data.get('bulk', False):
+        if send_at:
+            # Scheduled - held in the outbox until send_at (single sends use the transactional lane)
+            if not data.get('bulk', False):
+                data = {**data, 'priority': data.get('priority', QueuePriority.TRANSACTIONAL.value)}
+            result = _process_bulk_email(account, data, attachments, start_time, send_at, send_window)
+        elif data.get('bulk', False):
             # Bulk processing - queue for background
-            result = _process_bulk_email(account, data, attachments, start_time)
+            result = _process_bulk_email(account, data, attachments, start_time, send_window=send_window)
         else:
             # Individual processing - send immediately
             result = _process_individual_email(account, data, attachments, start_time)
@@ -202,6 +264,265 @@ def send_email():
         }), 500
 
 
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+CSV_MIMETYPES = ('text/csv', 'application/csv')
+
+
+@email_api_bp.route('/send/stream', methods=['POST'])
+@cross_origin()
+@require_account_api_key
+def send_stream():
+    """
+    Envio em lote a partir de uma lista de destinatários em stream (NDJSON ou CSV).
+    
+    POST /api/v1/send/stream?template=newsletter&priority=bulk
+    Authorization: Bearer {api_key}
+    Content-Type: application/x-ndjson | text/csv
+    
+    NDJSON: uma linha por destinatário, {"email": "...", "variables": {...}};
+    a primeira linha pode definir a mensagem:
+    {"message": {"subject": "Olá {{ nome }}", "html": "...", "text": "...",
+                 "template": "newsletter", "from_name": "...", "reply_to": "...",
+                 "variables": {...}, "idempotency_key": "..."}}
+    
+    CSV: cabeçalho com coluna email; as restantes colunas são variáveis.
+    
+    Query Parameters (sobrepostos pela linha "message" do NDJSON):
+        template: Template do domínio da conta
+        subject, from_name, reply_to, idempotency_key: Campos da mensagem
+        priority: bulk (default) ou transactional (até
+            OUTBOX_ADMISSION_TRANSACTIONAL_MAX_RECIPIENTS destinatários)
+        send_at: Envio agendado (ISO 8601)
+        send_window: Segundos por que espalhar cada job a partir de send_at
+            (default OUTBOX_SCHEDULE_WINDOW_SECONDS; 0 = sem espalhar)
+    
+    Subject, HTML e texto são templates Jinja renderizados por destinatário.
+    A lista é lida, validada e deduplicada à medida que chega e gravada em
+    jobs de OUTBOX_INGEST_JOB_SIZE destinatários.
+    
+    Returns:
+        202: Jobs criados (com contagens de duplicados e inválidos)
+        400: Formato, mensagem ou lista inválidos
+        401: Authentication required
+        413: Demasiados destinatários ou quota da conta excedida
+            (jobs já criados são devolvidos)
+        415: Content-Type não suportado
+        429: Outbox saturada (Retry-After) ou limites da conta atingidos
+    """
+    start_time = time.time()
+    account = g.account
+    config = current_app.config
+    
+    if request.mimetype in NDJSON_MIMETYPES:
+        rows = parse_ndjson(iter_lines(request.stream))
+        first = next(rows, None)
+        message = {}
+        if first and isinstance(first[1], dict) and 'message' in first[1]:
+            message = first[1]['message'] if isinstance(first[1]['message'], dict) else {}
+        elif first:
+            rows = chain([first], rows)
+        recipients = ndjson_recipients(rows)
+    elif request.mimetype in CSV_MIMETYPES:
+        message = {}
+        recipients = csv_recipients(iter_lines(request.stream))
+    else:
+        return jsonify({
+            'success': False,
+            'error': 'unsupported_media_type',
+            'message': f'Content-Type não suportado: {request.mimetype or "(vazio)"}',
+            'details': {'supported': list(NDJSON_MIMETYPES + CSV_MIMETYPES)}
+        }), 415
+    
+    message = {**{key: value for key, value in request.args.items()}, **message}
+    payload, error = _stream_payload(account, message)
+    if error:
+        return jsonify({
+            'success': False,
+            'error': 'validation_failed',
+            'message': error,
+            'details': {}
+        }), 400
+    
+    priority = message.get('priority', QueuePriority.BULK.value)
+    if priority not in [lane.value for lane in QueuePriority]:
+        return jsonify({
+            'success': False,
+            'error': 'validation_failed',
+            'message': f'Campo "priority" inválido: {priority}',
+            'details': {'allowed_values': [lane.value for lane in QueuePriority]}
+        }), 400
+    
+    try:
+        send_at = parse_send_at(message.get('send_at'), config.get('OUTBOX_SCHEDULE_MAX_DAYS', 30))
+        send_window = _send_window(message.get('send_window'), None) if send_at else 0
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': 'validation_failed',
+            'message': str(e),
+            'details': {}
+        }), 400
+    
+    # O tamanho da lista é desconhecido: recusada se a outbox já estiver saturada,
+    # e os destinatários gravados somam-se à profundidade à medida que chegam
+    admission_controller = get_admission_controller()
+    admission = admission_controller.check(0, QueuePriority(priority))
+    if not send_at and not admission.admitted:
+        response = jsonify({
+            'success': False,
+            'error': 'queue_saturated',
+            'message': f'Fila de envio saturada; tentar novamente dentro de {admission.retry_after}s',
+            'details': admission.details
+        })
+        response.headers['Retry-After'] = str(admission.retry_after)
+        return response, 429
+    
+    # Check account limits (a lista não pode exceder o que resta da quota)
+    within_limits, limit_msg = account.is_within_limits()
+    if not within_limits:
+        return jsonify({
+            'success': False,
+            'error': 'rate_limit_exceeded',
+            'message': limit_msg,
+            'details': {}
+        }), 429
+    remaining_quota = account.get_remaining_quota()
+    max_recipients = min(config.get('OUTBOX_INGEST_MAX_RECIPIENTS', 1000000), remaining_quota)
+    if priority == QueuePriority.TRANSACTIONAL.value:
+        # A lane transactional não passa pela drenagem: só para listas pequenas
+        max_recipients = min(max_recipients, admission_controller.transactional_max_recipients)
+    
+    ingestor = BulkIngestor(
+        get_email_queue(),
+        account,
+        payload,
+        priority=QueuePriority(priority),
+        job_size=config.get('OUTBOX_INGEST_JOB_SIZE', 1000),
+        max_recipients=max_recipients,
+        send_at=send_at,
+        send_window=send_window,
+        admission=admission_controller
+    )
+    try:
+        summary = ingestor.ingest(recipients)
+    except IngestError as e:
+        status = 413 if e.summary and e.summary['accepted'] else 400
+        return jsonify({
+            'success': False,
+            'error': 'invalid_stream' if status == 400 else 'too_many_recipients',
+            'message': str(e),
+            'details': {**(e.summary or {}), 'remaining_quota': remaining_quota}
+        }), status
+    except Exception as e:
+        logger.error(f"Email API stream error: {e}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'internal_server_error',
+            'message': str(e),
+            'details': ingestor.summary()
+        }), 500
+    
+    if not summary['accepted']:
+        return jsonify({
+            'success': False,
+            'error': 'no_valid_recipients',
+            'message': 'Nenhum destinatário válido no pedido',
+            'details': summary
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'status': 'scheduled' if send_at else 'queued',
+        'send_at': send_at.isoformat() + 'Z' if send_at else None,
+        **summary,
+        'processing_time_ms': int((time.time() - start_time) * 1000)
+    }), 202
+
+
+def _send_window(value: Any, recipients: Optional[int]) -> float:
+    """
+    Janela de envio de um lote agendado.
+    
+    Args:
+        value: send_window do pedido (segundos) ou None
+        recipients: Número de destinatários (None = desconhecido, como em streams)
+        
+    Returns:
+        Segundos por que espalhar os destinatários
+        
+    Raises:
+        ValueError: Se o valor não for um número não negativo
+    """
+    config = current_app.config
+    if value in (None, ''):
+        threshold = config.get('OUTBOX_SCHEDULE_SPREAD_THRESHOLD', 500)
+        if recipients is not None and recipients < threshold:
+            return 0
+        return config.get('OUTBOX_SCHEDULE_WINDOW_SECONDS', 600)
+    try:
+        window = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('send_window deve ser um número de segundos')
+    if window < 0:
+        raise ValueError('send_window não pode ser negativo')
+    return window
+
+
+def _stream_payload(account: EmailAccount, message: Dict[str, Any]):
+    """
+    Conteúdo dos jobs de um envio em stream.
+    
+    Args:
+        account: Conta autenticada
+        message: Campos da mensagem (query string e linha "message")
+        
+    Returns:
+        Tuple (payload, erro)
+    """
+    subject, html, text = message.get('subject'), message.get('html'), message.get('text')
+    
+    template_key = message.get('template')
+    if template_key:
+        template = get_entity_cache().get_template(account.domain_id, template_key)
+        if not template or not template.is_active:
+            return None, f'Template {template_key} não encontrado ou inativo'
+        subject = subject or template.subject_template
+        html = html or template.html_template
+        text = text or template.text_template
+    
+    if not subject:
+        return None, 'Campo "subject" ou "template" obrigatório'
+    if not html and not text:
+        return None, 'Pelo menos um campo de conteúdo (html ou text) é obrigatório'
+    
+    variables = message.get('variables') or {}
+    if not isinstance(variables, dict):
+        return None, 'Campo "variables" deve ser um objeto'
+    
+    payload = {
+        'subject': subject,
+        'html_content': html,
+        'text_content': text,
+        'attachments': [],
+        'from_name': message.get('from_name'),
+        'reply_to': message.get('reply_to'),
+        'cc': None,
+        'bcc': None,
+        'idempotency_key': message.get('idempotency_key'),
+        'variables': variables,
+        'template': template_key,
+        'personalized': True
+    }
+    
+    # Erros de sintaxe rejeitam o pedido em vez de cada destinatário
+    try:
+        PersonalizedContent(payload)
+    except Exception as e:
+        return None, f'Template inválido: {e}'
+    
+    return payload, None
+
+
 @email_api_bp.route('/send/<message_id>/status', methods=['GET'])
 @cross_origin()
 @require_account_api_key
@@ -212,10 +533,16 @@ def get_send_status(message_id: str):
     GET /api/v1/send/{message_id}/status
     Authorization: Bearer {api_key}
     
+    IDs de jobs em lote (QUEUE-000123) são respondidos por get_job_status.
+    
     Returns:
         200: Status information
         404: Message not found
     """
+    # Jobs em lote (QUEUE-000123) têm endpoint próprio com contadores
+    if message_id.startswith('QUEUE-'):
+        return get_job_status(message_id)
+    
     try:
         # Extract numeric ID from message_id (format: MSG-123456)
         if message_id.startswith('MSG-'):
@@ -284,6 +611,164 @@ def get_send_status(message_id: str):
         }), 500
 
 
+@email_api_bp.route('/jobs/<message_id>', methods=['GET'])
+@cross_origin()
+@require_account_api_key
+def get_job_status(message_id: str):
+    """
+    Progresso de um job em lote com resultados por destinatário.
+    
+    GET /api/v1/jobs/{message_id}?limit=100&offset=0&status=failed
+    Authorization: Bearer {api_key}
+    
+    Query Parameters:
+        limit: Destinatários por página (default: 100, max: 1000)
+        offset: Offset para paginação (default: 0)
+        status: Filtrar destinatários (pending, sending, sent, failed)
+    
+    Returns:
+        200: Contadores do job e página de destinatários
+        400: Parâmetros inválidos
+        404: Job não encontrado
+    """
+    job = _account_job(message_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'job_not_found',
+            'message': f'Job {message_id} não encontrado',
+            'details': {}
+        }), 404
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+        offset = max(0, int(request.args.get('offset', 0)))
+        status_filter = request.args.get('status')
+        query = job.messages
+        if status_filter:
+            query = query.filter(OutboxMessage.status == EmailStatus(status_filter))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': 'validation_failed',
+            'message': f'Parâmetros inválidos: {e}',
+            'details': {'allowed_status': ['pending', 'sending', 'sent', 'failed']}
+        }), 400
+    
+    recipients = query.order_by(OutboxMessage.id).limit(limit).offset(offset).all()
+    
+    return jsonify({
+        'success': True,
+        **job_progress(job),
+        'subject': (job.payload or {}).get('subject'),
+        'recipients': [message.to_dict() for message in recipients],
+        'pagination': {
+            'total': query.count() if status_filter else job.total_count,
+            'limit': limit,
+            'offset': offset,
+            'count': len(recipients)
+        },
+        'events_url': f"/api/v1/jobs/{job.reference}/events"
+    }), 200
+
+
+@email_api_bp.route('/jobs/<message_id>/events', methods=['GET'])
+@cross_origin()
+@require_account_api_key
+def stream_job_events(message_id: str):
+    """
+    Stream de progresso de um job (server-sent events).
+    
+    GET /api/v1/jobs/{message_id}/events
+    Authorization: Bearer {api_key}
+    Accept: text/event-stream
+    
+    Eventos:
+        snapshot: Estado completo ao ligar (job_progress)
+        progress: Estado completo e "delta" com a variação dos contadores
+        complete: Estado final; o stream termina
+    
+    Progresso feito por workers deste processo é enviado logo após a
+    gravação; o de outros processos em OUTBOX_EVENTS_POLL_SECONDS. A
+    ligação termina ao fim de OUTBOX_EVENTS_MAX_SECONDS (o EventSource
+    volta a ligar e recebe novo snapshot).
+    
+    Returns:
+        200: text/event-stream
+        404: Job não encontrado
+    """
+    job = _account_job(message_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'job_not_found',
+            'message': f'Job {message_id} não encontrado',
+            'details': {}
+        }), 404
+    
+    config = current_app.config
+    poll = config.get('OUTBOX_EVENTS_POLL_SECONDS', 1.0)
+    heartbeat = config.get('OUTBOX_EVENTS_HEARTBEAT_SECONDS', 15)
+    max_seconds = config.get('OUTBOX_EVENTS_MAX_SECONDS', 300)
+    job_id = job.id
+    
+    def events():
+        notifier = get_job_progress_notifier()
+        sequence = notifier.sequence
+        status, processed = job.status, job.processed_count
+        state = job_progress(job)
+        db.session.rollback()
+        yield 'retry: 3000\n' + _sse('snapshot', state)
+        
+        started = last_sent = time.monotonic()
+        while status not in FINAL_STATUSES and time.monotonic() - started < max_seconds:
+            sequence = notifier.wait(sequence, poll)
+            
+            # Só a linha do job por iteração; contagem por estado quando ela muda
+            current = db.session.get(OutboxJob, job_id, populate_existing=True)
+            if current is None:
+                break
+            if (current.status, current.processed_count) != (status, processed):
+                status, processed = current.status, current.processed_count
+                previous, state = state, job_progress(current)
+                yield _sse('progress', {**state, 'delta': progress_delta(previous, state)})
+                last_sent = time.monotonic()
+            db.session.rollback()
+            
+            if time.monotonic() - last_sent >= heartbeat:
+                yield ': heartbeat\n\n'
+                last_sent = time.monotonic()
+        
+        if status in FINAL_STATUSES:
+            yield _sse('complete', state)
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _account_job(message_id: str) -> Optional[OutboxJob]:
+    """
+    Job da outbox da conta autenticada.
+    
+    Args:
+        message_id: ID público (QUEUE-000123)
+        
+    Returns:
+        OutboxJob ou None se não existir ou for de outra conta
+    """
+    job = get_email_queue().get_job(message_id)
+    if job is None or job.account_id != g.account.id:
+        return None
+    return job
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Formata evento server-sent events."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @email_api_bp.route('/health', methods=['GET'])
 @cross_origin()
 def health_check():
@@ -433,7 +918,7 @@ def _process_individual_email(account: EmailAccount, data: Dict[str, Any], attac
         
         # Send email
         encryption_key = current_app.config.get('SECRET_KEY', '')
-        smtp_service = SMTPService(encryption_key)
+        smtp_service = create_smtp_service(encryption_key)
         
         success, message, message_id = smtp_service.send_email(
             account=account,
@@ -450,7 +935,7 @@ def _process_individual_email(account: EmailAccount, data: Dict[str, Any], attac
         
         # Update log
         if success:
-            log.mark_sent(message_id or '', message)
+            log.mark_sent(message_id or '', message, smtp_service.last_timings)
         else:
             log.mark_failed(message)
         
@@ -477,15 +962,18 @@ def _process_individual_email(account: EmailAccount, data: Dict[str, Any], attac
         }
 
 
-def _process_bulk_email(account: EmailAccount, data: Dict[str, Any], attachments: List[Dict[str, Any]], start_time: float) -> Dict[str, Any]:
+def _process_bulk_email(account: EmailAccount, data: Dict[str, Any], attachments: List[Dict[str, Any]], start_time: float,
+                        send_at: Optional[datetime] = None, send_window: float = 0) -> Dict[str, Any]:
     """
-    Processa envio de email em lote.
+    Processa envio de email em lote (ou agendado).
     
     Args:
         account: Conta de email
         data: Dados do email
         attachments: Lista de anexos
         start_time: Timestamp de início
+        send_at: Envio agendado (UTC; None = já)
+        send_window: Segundos por que espalhar os destinatários
         
     Returns:
         Dict com resultado do processamento
@@ -506,7 +994,10 @@ def _process_bulk_email(account: EmailAccount, data: Dict[str, Any], attachments
             reply_to=data.get('reply_to'),
             cc=data.get('cc'),
             bcc=data.get('bcc'),
-            idempotency_key=data.get('idempotency_key')
+            idempotency_key=data.get('idempotency_key'),
+            priority=QueuePriority(data.get('priority', QueuePriority.BULK.value)),
+            send_at=send_at,
+            send_window=send_window
         )
         
         processing_time = int((time.time() - start_time) * 1000)
@@ -514,14 +1005,16 @@ def _process_bulk_email(account: EmailAccount, data: Dict[str, Any], attachments
         return {
             'success': True,
             'message_id': queue_item_id,
-            'status': 'queued',
+            'status': 'scheduled' if send_at else 'queued',
+            'status_url': f'/api/v1/jobs/{queue_item_id}',
+            'send_at': send_at.isoformat() + 'Z' if send_at else None,
             'recipients_processed': len(data['to']),
             'recipients_success': [],
             'recipients_failed': [],
             'attachments_processed': len(attachments),
             'total_size_mb': sum(att.get('size_mb', 0) for att in attachments),
             'processing_time_ms': processing_time,
-            'message': 'Bulk email queued for processing'
+            'message': 'Email scheduled for delivery' if send_at else 'Bulk email queued for processing'
         }
         
     except Exception as e:
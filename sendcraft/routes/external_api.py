@@ -10,6 +10,7 @@ from ..models import Domain, EmailAccount, EmailTemplate, EmailLog
 from ..models.log import EmailStatus
 from ..services.smtp_service import SMTPService
 from ..services.auth_service import require_account_api_key
+from ..services.entity_cache import get_entity_cache
 from ..extensions import db
 from ..utils.logging import get_logger
 
@@ -74,7 +75,7 @@ def send_direct_email():
             }), 400
         
         # Get domain
-        domain = Domain.query.filter_by(name=data['domain']).first()
+        domain = get_entity_cache().get_domain(data['domain'])
         if not domain:
             return jsonify({
                 'error': 'Domain not found',
@@ -89,7 +90,7 @@ def send_direct_email():
         
         # Get account
         account_email = f"{data['account']}@{data['domain']}"
-        account = EmailAccount.query.filter_by(email_address=account_email).first()
+        account = get_entity_cache().get_account(account_email)
         if not account:
             return jsonify({
                 'error': 'Account not found',
@@ -140,7 +141,7 @@ def send_direct_email():
         
         # Update log
         if success:
-            log.mark_sent(message_id or '', message)
+            log.mark_sent(message_id or '', message, smtp_service.last_timings)
             logger.info(f"External API: Email sent - {log.id} from {account.email_address} to {data['to']}")
         else:
             log.mark_failed(message)
@@ -216,7 +217,7 @@ def send_template_email():
             }), 400
         
         # Get domain
-        domain = Domain.query.filter_by(name=data['domain']).first()
+        domain = get_entity_cache().get_domain(data['domain'])
         if not domain:
             return jsonify({
                 'error': 'Domain not found',
@@ -231,7 +232,7 @@ def send_template_email():
         
         # Get account
         account_email = f"{data['account']}@{data['domain']}"
-        account = EmailAccount.query.filter_by(email_address=account_email).first()
+        account = get_entity_cache().get_account(account_email)
         if not account:
             return jsonify({
                 'error': 'Account not found',
@@ -253,10 +254,7 @@ def send_template_email():
             }), 429
         
         # Get template
-        template = EmailTemplate.query.filter_by(
-            domain_id=domain.id,
-            template_key=data['template']
-        ).first()
+        template = get_entity_cache().get_template(domain.id, data['template'], active_only=False)
         
         if not template:
             return jsonify({
@@ -282,13 +280,16 @@ def send_template_email():
                 'optional_variables': template.variables_optional
             }), 400
         
+        # Render subject once (used by the log and the send)
+        subject = template.render_subject(variables)
+        
         # Create log
         log = EmailLog(
             account_id=account.id,
             template_id=template.id,
             recipient_email=data['to'],
             sender_email=account.email_address,
-            subject=template.render_subject(variables),
+            subject=subject,
             status=EmailStatus.PENDING,
             variables_used=variables,
             ip_address=request.remote_addr,
@@ -302,7 +303,6 @@ def send_template_email():
         
         # Render content
         try:
-            subject = template.render_subject(variables)
             html_content = template.render_html(variables)
             text_content = template.render_text(variables)
         except Exception as e:
@@ -326,7 +326,7 @@ def send_template_email():
         
         # Update log
         if success:
-            log.mark_sent(message_id or '', message)
+            log.mark_sent(message_id or '', message, smtp_service.last_timings)
             logger.info(f"External API: Template email sent - {log.id} from {account.email_address} to {data['to']}")
         else:
             log.mark_failed(message)
@@ -14,6 +14,11 @@ from sendcraft.utils.logging import get_logger
 from sendcraft.services.smtp_service import SMTPService
 from sendcraft.services.email_service import EmailService
 from sendcraft.services.template_service import TemplateService
+from sendcraft.services.account_cache import get_account_config_cache
+from sendcraft.services.template_cache import get_template_cache
+from sendcraft.services.render_cache import get_render_cache
+from sendcraft.services.entity_cache import get_entity_cache
+from sendcraft.services.transport_cache import get_transport_cache
 
 logger = get_logger(__name__)
 
@@ -189,6 +194,7 @@ def domains_edit(domain_id):
             domain.is_active = request.form.get('is_active') == 'on'
             
             domain.save()
+            get_entity_cache().invalidate('domain', domain.id)
             
             flash(f'Domínio {domain.name} atualizado com sucesso!', 'success')
             return redirect(url_for('web.domains_list'))
@@ -207,6 +213,7 @@ def domains_toggle(domain_id):
         domain = Domain.query.get_or_404(domain_id)
         domain.is_active = not domain.is_active
         domain.save()
+        get_entity_cache().invalidate('domain', domain.id)
         
         status = 'ativado' if domain.is_active else 'desativado'
         flash(f'Domínio {domain.name} {status} com sucesso!', 'success')
@@ -237,6 +244,7 @@ def domains_delete(domain_id):
         
         domain_name = domain.name
         domain.delete()
+        get_entity_cache().invalidate('domain', domain_id)
         
         flash(f'Domínio {domain_name} eliminado com sucesso!', 'success')
         return redirect(url_for('web.domains_list'))
@@ -440,6 +448,9 @@ def accounts_edit(account_id):
                 account.set_password(new_password, encryption_key)
             
             account.save()
+            get_account_config_cache().invalidate(account.id)
+            get_transport_cache().forget(account.id)
+            get_entity_cache().invalidate('account', account.id)
             
             email_address = f"{account.local_part}@{account.domain.name}"
             flash(f'Conta {email_address} atualizada com sucesso!', 'success')
@@ -468,6 +479,9 @@ def accounts_delete(account_id):
             return redirect(url_for('web.accounts_list'))
         
         account.delete()
+        get_account_config_cache().invalidate(account_id)
+        get_transport_cache().forget(account_id)
+        get_entity_cache().invalidate('account', account_id)
         
         flash(f'Conta {email_address} eliminada com sucesso!', 'success')
         return redirect(url_for('web.accounts_list'))
@@ -517,6 +531,7 @@ def accounts_api_enable(account_id):
             account.revoke_api_key()
         
         account.save()
+        get_entity_cache().invalidate('account', account.id)
         
         status = 'ativado' if account.api_enabled else 'desativado'
         flash(f'Acesso API {status} com sucesso!', 'success')
@@ -541,6 +556,7 @@ def accounts_api_generate(account_id):
         # Gerar nova chave
         api_key = account.generate_api_key()
         account.save()
+        get_entity_cache().invalidate('account', account.id)
         
         # Preparar dados da API atualizados
         api_data = {
@@ -577,6 +593,7 @@ def accounts_api_revoke(account_id):
         
         account.revoke_api_key()
         account.save()
+        get_entity_cache().invalidate('account', account.id)
         
         flash('API key revogada com sucesso!', 'success')
         return redirect(url_for('web.accounts_api_access', account_id=account_id))
@@ -693,6 +710,10 @@ def templates_edit(template_id):
             template.version += 1
             
             template.save()
+            get_template_cache().invalidate(template.id)
+            get_render_cache().invalidate(template.id)
+            get_entity_cache().invalidate('template', template.id)
+            template.precompile()
             
             flash(f'Template {template.template_name} atualizado com sucesso!', 'success')
             return redirect(url_for('web.templates_list'))
@@ -742,6 +763,9 @@ def templates_delete(template_id):
         template_name = template.template_name
         
         template.delete()
+        get_template_cache().invalidate(template_id)
+        get_render_cache().invalidate(template_id)
+        get_entity_cache().invalidate('template', template_id)
         
         flash(f'Template {template_name} eliminado com sucesso!', 'success')
         return redirect(url_for('web.templates_list'))
@@ -839,6 +863,7 @@ def api_domain_toggle(domain_id):
         domain = Domain.query.get_or_404(domain_id)
         domain.is_active = not domain.is_active
         domain.save()
+        get_entity_cache().invalidate('domain', domain.id)
         
         return jsonify({
             'success': True,
@@ -873,8 +898,8 @@ def api_account_test_smtp(account_id):
         start_time = time.time()
         smtp_service = SMTPService(encryption_key)
         
-        # Testar conexão usando o serviço
-        success, message = smtp_service.test_connection(account)
+        # Testar a configuração da conta; se a ligação falhar, alternativas cifradas são só uma sugestão
+        success, message, suggestion = smtp_service.test_connection_with_fallback(account)
         response_time = round((time.time() - start_time) * 1000, 2)
         
         if success:
@@ -897,6 +922,13 @@ def api_account_test_smtp(account_id):
             return jsonify({
                 'success': False,
                 'error': message,
+                'suggestion': {
+                    'port': suggestion['port'],
+                    'tls': suggestion['use_tls'],
+                    'ssl': suggestion['use_ssl'],
+                    'message': f"A porta {suggestion['port']} com "
+                               f"{'SSL' if suggestion['use_ssl'] else 'STARTTLS'} funciona: atualize a conta para a usar"
+                } if suggestion else None,
                 'details': {
                     'server': account.smtp_server,
                     'port': account.smtp_port,
@@ -923,28 +955,23 @@ def api_account_test_imap(account_id):
         
         import imaplib
         import time
+        from sendcraft.services.imap_service import IMAPService
         
         start_time = time.time()
         result = {'success': False, 'error': None, 'response_time': 0}
         
         try:
-            # Configurar timeout de 60 segundos
-            timeout = 60
+            # SSL e STARTTLS tentados em paralelo (timeout de 60s por tentativa)
+            imap = IMAPService(account=account)
+            config = get_account_config_cache().get_imap_config(account, encryption_key)
+            if not imap.connect(config):
+                raise Exception('Falha na conexão IMAP (SSL e STARTTLS)')
             
-            if account.imap_use_ssl:
-                server = imaplib.IMAP4_SSL(account.imap_server, account.imap_port, timeout=timeout)
-            else:
-                server = imaplib.IMAP4(account.imap_server, account.imap_port, timeout=timeout)
-                if account.imap_use_tls:
-                    server.starttls()
-            
-            # Tentar fazer login (sem logar password em texto plano)
-            password = account.get_password(encryption_key)
-            server.login(account.email_address, password)
-            
-            # Testar seleção de INBOX
-            server.select('INBOX', readonly=True)
-            server.logout()
+            try:
+                # Testar seleção de INBOX
+                imap.connection.select('INBOX', readonly=True)
+            finally:
+                imap.disconnect()
             
             result['success'] = True
             result['response_time'] = round((time.time() - start_time) * 1000, 2)
@@ -998,6 +1025,8 @@ def api_account_toggle(account_id):
         account = EmailAccount.query.get_or_404(account_id)
         account.is_active = not account.is_active
         account.save()
+        get_account_config_cache().invalidate(account.id)
+        get_entity_cache().invalidate('account', account.id)
         
         email_address = f"{account.local_part}@{account.domain.name}"
         
@@ -1040,6 +1069,7 @@ def api_domains_bulk():
                 affected += 1
         
         db.session.commit()
+        get_entity_cache().invalidate('domain')
         
         return jsonify({
             'success': True,
@@ -1395,7 +1425,7 @@ def emails_send():
         
         # Update log
         if success:
-            log.mark_sent(message_id or '', message)
+            log.mark_sent(message_id or '', message, smtp_service.last_timings)
             logger.info(f"Email sent successfully from {account.email_address} to {to_emails}")
         else:
             log.mark_failed(message)
@@ -0,0 +1,134 @@
+"""
+Cache de configurações de transporte das contas para SendCraft.
+Evita decriptar a password e resolver a configuração SMTP/IMAP em cada envio.
+"""
+import threading
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from ..models.account import EmailAccount
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class AccountConfigCache:
+    """
+    Cache em processo de configurações resolvidas por conta.
+
+    Cada entrada é válida enquanto o `updated_at` da conta não mudar; as
+    rotas que editam contas invalidam-na explicitamente (timestamps podem
+    não ter resolução suficiente para duas edições no mesmo segundo).
+    """
+
+    def __init__(self):
+        """Inicializa cache vazia."""
+        self._entries: Dict[Tuple[str, int, str], Tuple[Any, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self,
+            kind: str,
+            account: EmailAccount,
+            encryption_key: str,
+            loader: Callable[[EmailAccount], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Retorna configuração da conta, carregando-a se necessário.
+
+        Args:
+            kind: Tipo de configuração ('smtp' ou 'imap')
+            account: Conta de email
+            encryption_key: Chave usada para decriptar a password
+            loader: Função que resolve a configuração a partir da conta
+
+        Returns:
+            Cópia da configuração (pode ser alterada pelo chamador)
+        """
+        if account.id is None:
+            return loader(account)
+
+        key = (kind, account.id, encryption_key)
+        version = account.updated_at
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+
+        config = loader(account)
+
+        with self._lock:
+            self._entries[key] = (version, config)
+
+        return dict(config)
+
+    def get_smtp_config(self, account: EmailAccount, encryption_key: str) -> Dict[str, Any]:
+        """
+        Retorna configuração SMTP da conta (ver EmailAccount.get_smtp_config).
+
+        Args:
+            account: Conta de email
+            encryption_key: Chave para decriptar password
+
+        Returns:
+            Configuração SMTP
+        """
+        return self.get('smtp', account, encryption_key, lambda acc: acc.get_smtp_config(encryption_key))
+
+    def get_imap_config(self, account: EmailAccount, encryption_key: str) -> Dict[str, Any]:
+        """
+        Retorna configuração IMAP da conta (ver EmailAccount.get_imap_config).
+
+        Args:
+            account: Conta de email
+            encryption_key: Chave para decriptar password
+
+        Returns:
+            Configuração IMAP
+        """
+        return self.get('imap', account, encryption_key, lambda acc: acc.get_imap_config(encryption_key))
+
+    def invalidate(self, account_id: Optional[int] = None) -> None:
+        """
+        Remove entradas de uma conta (ou todas).
+
+        Args:
+            account_id: ID da conta; None limpa toda a cache
+        """
+        with self._lock:
+            if account_id is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[1] == account_id]:
+                    del self._entries[key]
+        logger.debug(f"Account config cache invalidated (account={account_id})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas da cache.
+
+        Returns:
+            Dict com entradas, hits e misses
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Instância global da cache
+_account_config_cache = AccountConfigCache()
+
+
+def get_account_config_cache() -> AccountConfigCache:
+    """
+    Retorna cache global de configurações de contas.
+
+    Returns:
+        Instância do AccountConfigCache
+    """
+    return _account_config_cache
@@ -0,0 +1,196 @@
+"""
+Controlo de admissão da outbox para SendCraft.
+
+Estima o tempo de drenagem da outbox (profundidade / débito recente) e
+recusa novo trabalho bulk quando esse tempo passa o limite configurado,
+com um Retry-After calculado para o momento em que o lote caberia.
+Envios transactional são sempre aceites enquanto forem pequenos: a
+prioridade vem do cliente, por isso um lote transactional maior do que
+transactional_max_recipients é tratado como bulk.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, or_
+
+from ..models.log import EmailStatus
+from ..models.outbox import OutboxMessage, QueuePriority
+from ..extensions import db
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class AdmissionDecision(NamedTuple):
+    """Resultado do controlo de admissão."""
+    admitted: bool
+    retry_after: int
+    details: Dict[str, Any]
+
+
+class AdmissionController:
+    """
+    Controlo de admissão por tempo de drenagem da outbox.
+
+    A profundidade (pendentes e em envio) e o débito (destinatários
+    processados na janela recente, por todos os processos) são lidos da
+    BD no máximo uma vez por refresh_seconds; entre leituras, o trabalho
+    admitido por este processo é somado à profundidade em cache para que
+    uma rajada de pedidos não passe toda pela mesma leitura.
+    """
+
+    def __init__(self,
+                 max_drain_seconds: float = 300,
+                 window_seconds: float = 60,
+                 min_rate: float = 1.0,
+                 refresh_seconds: float = 1.0,
+                 transactional_max_recipients: int = 100):
+        """
+        Inicializa controlo de admissão.
+
+        Args:
+            max_drain_seconds: Tempo de drenagem máximo com o novo lote incluído (0 = sem limite)
+            window_seconds: Janela para medir o débito
+            min_rate: Débito assumido (destinatários/s) quando não há envios recentes
+            refresh_seconds: Validade da leitura da BD
+            transactional_max_recipients: Máximo de destinatários de um lote
+                transactional admitido sem olhar à drenagem
+        """
+        self.max_drain_seconds = max_drain_seconds
+        self.window_seconds = window_seconds
+        self.min_rate = max(min_rate, 0.01)
+        self.refresh_seconds = refresh_seconds
+        self.transactional_max_recipients = transactional_max_recipients
+
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._rate = self.min_rate
+        self._read_at: Optional[float] = None
+
+        self.stats = {
+            'admitted': 0,
+            'rejected': 0
+        }
+
+    def _measure(self) -> Tuple[int, float]:
+        """
+        Lê profundidade e débito da outbox.
+
+        Returns:
+            Tuple (destinatários por enviar, destinatários processados por segundo)
+        """
+        now = datetime.utcnow()
+        # Agendados e espalhados pela janela de envio não contam até vencerem
+        depth = OutboxMessage.query.filter(
+            OutboxMessage.status.in_((EmailStatus.PENDING, EmailStatus.SENDING)),
+            or_(OutboxMessage.next_attempt_at.is_(None), OutboxMessage.next_attempt_at <= now)
+        ).count()
+
+        processed, first = db.session.query(
+            func.count(OutboxMessage.id), func.min(OutboxMessage.processed_at)
+        ).filter(OutboxMessage.processed_at >= now - timedelta(seconds=self.window_seconds)).one()
+
+        # Débito sobre o tempo efetivamente coberto: um burst recente após horas paradas não é diluído
+        span = max((now - first).total_seconds(), 1.0) if first else self.window_seconds
+        return depth, max(processed / span, self.min_rate)
+
+    def snapshot(self) -> Tuple[int, float]:
+        """
+        Profundidade e débito atuais (em cache durante refresh_seconds).
+
+        Returns:
+            Tuple (destinatários por enviar, destinatários por segundo)
+        """
+        with self._lock:
+            if self._read_at is None or time.monotonic() - self._read_at >= self.refresh_seconds:
+                self._depth, self._rate = self._measure()
+                self._read_at = time.monotonic()
+            return self._depth, self._rate
+
+    def check(self, recipients: int, priority: QueuePriority) -> AdmissionDecision:
+        """
+        Decide se um lote entra na outbox.
+
+        Args:
+            recipients: Destinatários do lote
+            priority: Lane do lote
+
+        Returns:
+            AdmissionDecision; recusado com retry_after em segundos
+        """
+        if self.max_drain_seconds <= 0:
+            return AdmissionDecision(True, 0, {})
+
+        depth, rate = self.snapshot()
+        drain = (depth + recipients) / rate
+        details = {
+            'queue_depth': depth,
+            'throughput_per_second': round(rate, 2),
+            'estimated_drain_seconds': math.ceil(drain),
+            'max_drain_seconds': self.max_drain_seconds
+        }
+
+        urgent = priority == QueuePriority.TRANSACTIONAL and recipients <= self.transactional_max_recipients
+        if urgent or drain <= self.max_drain_seconds:
+            self.record(recipients)
+            self.stats['admitted'] += 1
+            return AdmissionDecision(True, 0, details)
+
+        # Quando a outbox tiver drenado o suficiente para o lote caber no limite
+        retry_after = max(1, math.ceil(drain - self.max_drain_seconds))
+        self.stats['rejected'] += 1
+        logger.warning(f"{priority.value.capitalize()} send rejected: drain {drain:.0f}s > {self.max_drain_seconds:.0f}s "
+                       f"(depth {depth}, {rate:.1f}/s), retry after {retry_after}s")
+        return AdmissionDecision(False, retry_after, {**details, 'retry_after': retry_after})
+
+    def record(self, recipients: int) -> None:
+        """
+        Soma trabalho admitido à profundidade em cache até à próxima leitura da BD.
+
+        Para lotes de tamanho desconhecido à admissão (streams), chamado à
+        medida que os destinatários são gravados.
+
+        Args:
+            recipients: Destinatários gravados na outbox
+        """
+        with self._lock:
+            self._depth += recipients
+
+
+# Instância global
+_admission_controller: Optional[AdmissionController] = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Retorna controlo de admissão global.
+
+    Returns:
+        Instância do AdmissionController
+    """
+    global _admission_controller
+
+    if _admission_controller is None:
+        with _admission_lock:
+            if _admission_controller is None:
+                options = {}
+                try:
+                    from flask import current_app
+                    config = current_app.config
+                    options = {
+                        'max_drain_seconds': config.get('OUTBOX_ADMISSION_MAX_DRAIN_SECONDS', 300),
+                        'window_seconds': config.get('OUTBOX_ADMISSION_WINDOW_SECONDS', 60),
+                        'min_rate': config.get('OUTBOX_ADMISSION_MIN_RATE', 1.0),
+                        'refresh_seconds': config.get('OUTBOX_ADMISSION_REFRESH_SECONDS', 1.0),
+                        'transactional_max_recipients': config.get('OUTBOX_ADMISSION_TRANSACTIONAL_MAX_RECIPIENTS', 100)
+                    }
+                except RuntimeError:
+                    # Fora do contexto da app: usar defaults
+                    pass
+                _admission_controller = AdmissionController(**options)
+
+    return _admission_controller
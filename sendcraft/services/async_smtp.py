@@ -0,0 +1,827 @@
+"""
+Motor de entrega SMTP assíncrono para SendCraft.
+Mantém centenas de transações SMTP em curso num único event loop (asyncio),
+com limites de concorrência por relay e por conta.
+"""
+import asyncio
+import base64
+import concurrent.futures
+import smtplib
+import socket
+import ssl
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator, AsyncIterator
+
+from ..models.account import EmailAccount
+from ..utils.logging import get_logger
+from .smtp_service import SMTPService, MessageStream, dot_stuff
+from .smtp_pool import SMTPConnectionPool
+from .smtp_metrics import get_smtp_metrics, elapsed_ms
+from .transport_cache import get_transport_cache
+
+logger = get_logger(__name__)
+
+# Bytes lidos de cada vez no executor quando a mensagem tem anexos
+READ_BLOCK_SIZE = 256 * 1024
+
+_local_hostname: Optional[str] = None
+
+
+def _get_local_hostname() -> str:
+    """Nome local para EHLO (resolvido uma única vez por processo)."""
+    global _local_hostname
+    if _local_hostname is None:
+        _local_hostname = socket.getfqdn() or 'localhost'
+    return _local_hostname
+
+
+def _read_block(chunks: Iterator[bytes], size: int = READ_BLOCK_SIZE) -> List[bytes]:
+    """Lê blocos do iterador até somar `size` bytes (lista vazia no fim)."""
+    block = []
+    total = 0
+    for chunk in chunks:
+        block.append(chunk)
+        total += len(chunk)
+        if total >= size:
+            break
+    return block
+
+
+class AsyncSMTPConnection:
+    """Cliente SMTP mínimo sobre asyncio streams."""
+
+    def __init__(self, host: str, port: int, timeout: float = 30):
+        """
+        Inicializa cliente.
+
+        Args:
+            host: Servidor SMTP
+            port: Porta SMTP
+            timeout: Timeout por operação (segundos)
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.features: Dict[str, str] = {}
+        self.fingerprint = ''
+        self.last_used_at = time.monotonic()
+        self.messages_sent = 0
+        # Se a transação em curso já enviou DATA (a mensagem pode ter sido aceite)
+        self.data_started = False
+        # Tempos de abertura da sessão (consumidos pelo primeiro envio)
+        self.timings: Dict[str, Any] = {}
+
+    async def connect(self, use_ssl: bool = False, use_tls: bool = False) -> None:
+        """
+        Abre ligação, faz EHLO e STARTTLS se pedido.
+
+        Regista dns, connect (inclui o handshake TLS com SSL implícito),
+        greeting e tls em `timings`.
+
+        Args:
+            use_ssl: Ligação SSL implícita (porta 465)
+            use_tls: Ativar STARTTLS após EHLO
+        """
+        context = ssl.create_default_context()
+
+        start = time.perf_counter()
+        addresses = await asyncio.wait_for(
+            asyncio.get_running_loop().getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM),
+            self.timeout
+        )
+        self.timings['dns_ms'] = elapsed_ms(start)
+
+        start = time.perf_counter()
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                addresses[0][4][0],
+                self.port,
+                ssl=context if use_ssl else None,
+                server_hostname=self.host if use_ssl else None
+            ),
+            self.timeout
+        )
+        self.timings['connect_ms'] = elapsed_ms(start)
+
+        start = time.perf_counter()
+        code, message = await self._read_reply()
+        if code != 220:
+            self.close()
+            raise smtplib.SMTPConnectError(code, message)
+        self.timings['greeting_ms'] = elapsed_ms(start)
+
+        await self.ehlo()
+
+        if use_tls and not use_ssl:
+            start = time.perf_counter()
+            if 'starttls' not in self.features:
+                raise smtplib.SMTPNotSupportedError("STARTTLS extension not supported by server.")
+            code, message = await self.command('STARTTLS')
+            if code != 220:
+                raise smtplib.SMTPResponseException(code, message)
+            await asyncio.wait_for(
+                self.writer.start_tls(context, server_hostname=self.host),
+                self.timeout
+            )
+            await self.ehlo()
+            self.timings['tls_ms'] = elapsed_ms(start)
+
+    async def ehlo(self) -> None:
+        """Envia EHLO e regista extensões anunciadas."""
+        code, message = await self.command(f'EHLO {_get_local_hostname()}')
+        if code != 250:
+            raise smtplib.SMTPHeloError(code, message)
+
+        self.features = {}
+        for line in message.decode('latin-1').split('\n')[1:]:
+            parts = line.strip().split(' ', 1)
+            if parts and parts[0]:
+                self.features[parts[0].lower()] = parts[1] if len(parts) > 1 else ''
+
+    async def login(self, username: str, password: str) -> None:
+        """
+        Autentica com AUTH PLAIN ou AUTH LOGIN.
+
+        Args:
+            username: Utilizador SMTP
+            password: Password SMTP
+        """
+        mechanisms = self.features.get('auth', '').upper().split()
+
+        if 'PLAIN' in mechanisms or not mechanisms:
+            token = base64.b64encode(f'\0{username}\0{password}'.encode('utf-8')).decode('ascii')
+            code, message = await self.command(f'AUTH PLAIN {token}')
+        elif 'LOGIN' in mechanisms:
+            code, message = await self.command('AUTH LOGIN')
+            if code == 334:
+                code, message = await self.command(base64.b64encode(username.encode('utf-8')).decode('ascii'))
+            if code == 334:
+                code, message = await self.command(base64.b64encode(password.encode('utf-8')).decode('ascii'))
+        else:
+            raise smtplib.SMTPException("No suitable authentication method found.")
+
+        if code != 235:
+            raise smtplib.SMTPAuthenticationError(code, message)
+
+    async def sendmail(self, from_addr: str, to_addrs: List[str], data: AsyncIterator[bytes]) -> Dict[str, Tuple[int, bytes]]:
+        """
+        Executa transação MAIL FROM/RCPT TO/DATA.
+
+        Args:
+            from_addr: Remetente (envelope)
+            to_addrs: Destinatários (envelope)
+            data: Mensagem em blocos já com dot-stuffing e terminada em CRLF
+                (ver AsyncDeliveryEngine._read)
+
+        Returns:
+            Dict de destinatários recusados (vazio se todos aceites)
+        """
+        self.data_started = False
+        code, message = await self.command(f'MAIL FROM:<{from_addr}>')
+        if code != 250:
+            await self.rset()
+            raise smtplib.SMTPSenderRefused(code, message, from_addr)
+
+        refused = {}
+        for recipient in to_addrs:
+            code, message = await self.command(f'RCPT TO:<{recipient}>')
+            if code not in (250, 251):
+                refused[recipient] = (code, message)
+
+        if len(refused) == len(to_addrs):
+            await self.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        self.data_started = True
+        code, message = await self.command('DATA')
+        if code != 354:
+            await self.rset()
+            raise smtplib.SMTPDataError(code, message)
+
+        # Escrever por blocos: drain() limita o buffer ao high-water mark do transporte
+        try:
+            async for chunk in data:
+                self.writer.write(chunk)
+                await asyncio.wait_for(self.writer.drain(), self.timeout)
+            self.writer.write(b'.\r\n')
+            await asyncio.wait_for(self.writer.drain(), self.timeout)
+        except (ConnectionError, OSError) as e:
+            self.close()
+            raise smtplib.SMTPServerDisconnected(f'Server not connected: {e}')
+
+        code, message = await self._read_reply()
+        if code != 250:
+            await self.rset()
+            raise smtplib.SMTPDataError(code, message)
+
+        self.last_used_at = time.monotonic()
+        return refused
+
+    async def rset(self) -> bool:
+        """
+        Envia RSET.
+
+        Returns:
+            True se a sessão continua utilizável
+        """
+        try:
+            code, _ = await self.command('RSET')
+            return code == 250
+        except (smtplib.SMTPException, OSError, asyncio.TimeoutError):
+            return False
+
+    async def quit(self) -> None:
+        """Termina sessão com QUIT e fecha socket."""
+        try:
+            await self.command('QUIT')
+        except (smtplib.SMTPException, OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Fecha socket sem QUIT."""
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+            self.writer = None
+            self.reader = None
+
+    async def command(self, line: str) -> Tuple[int, bytes]:
+        """
+        Envia comando e lê resposta.
+
+        Args:
+            line: Comando sem CRLF
+
+        Returns:
+            Tuple (código, mensagem)
+        """
+        if self.writer is None:
+            raise smtplib.SMTPServerDisconnected('Server not connected')
+
+        try:
+            self.writer.write(line.encode('utf-8') + b'\r\n')
+            await asyncio.wait_for(self.writer.drain(), self.timeout)
+        except (ConnectionError, OSError) as e:
+            self.close()
+            raise smtplib.SMTPServerDisconnected(f'Server not connected: {e}')
+
+        return await self._read_reply()
+
+    async def _read_reply(self) -> Tuple[int, bytes]:
+        """Lê resposta SMTP (possivelmente multi-linha)."""
+        lines = []
+        while True:
+            try:
+                line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            except (ConnectionError, OSError) as e:
+                self.close()
+                raise smtplib.SMTPServerDisconnected(f'Connection unexpectedly closed: {e}')
+
+            if not line:
+                self.close()
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+            try:
+                code = int(line[:3])
+            except ValueError:
+                code = -1
+            lines.append(line[4:].strip(b' \t\r\n'))
+
+            if line[3:4] != b'-':
+                return code, b'\n'.join(lines)
+
+
+class AsyncDeliveryEngine:
+    """
+    Motor de entrega assíncrono com event loop dedicado.
+
+    Corre num thread próprio; outros threads submetem transações com
+    submit() e recebem um concurrent.futures.Future. A concorrência é
+    limitada globalmente, por relay (servidor:porta) e por conta.
+    """
+
+    def __init__(self,
+                 max_in_flight: int = 500,
+                 max_per_relay: int = 50,
+                 max_per_account: int = 10,
+                 timeout: float = 30,
+                 idle_timeout: float = 60,
+                 max_messages_per_session: int = 100):
+        """
+        Inicializa motor.
+
+        Args:
+            max_in_flight: Máximo de transações em curso no processo
+            max_per_relay: Máximo de transações em curso por relay
+            max_per_account: Máximo de transações em curso por conta
+            timeout: Timeout por operação SMTP (segundos)
+            idle_timeout: Segundos até fechar uma sessão idle
+            max_messages_per_session: Mensagens por sessão antes de reconectar
+        """
+        self.max_in_flight = max_in_flight
+        self.max_per_relay = max_per_relay
+        self.max_per_account = max_per_account
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_messages_per_session = max_messages_per_session
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Estado acedido apenas dentro do event loop
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._relay_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._account_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._idle: Dict[str, List[AsyncSMTPConnection]] = {}
+
+        # Contadores escritos no event loop e em submit(), lidos por outros threads
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'submitted': 0,
+            'sent': 0,
+            'failed': 0,
+            'in_flight': 0,
+            'connections_opened': 0,
+            'timed_out': 0
+        }
+        # Transações submetidas e ainda não terminadas, por conta
+        self._pending: Dict[str, int] = {}
+
+    @property
+    def running(self) -> bool:
+        """Se o event loop está ativo."""
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self) -> None:
+        """Inicia event loop num thread dedicado."""
+        with self._lock:
+            if self.running:
+                return
+
+            ready = threading.Event()
+
+            def run():
+                self.loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self.loop)
+                self._global_semaphore = asyncio.Semaphore(self.max_in_flight)
+                self.loop.create_task(self._reap_idle())
+                ready.set()
+                self.loop.run_forever()
+                self.loop.close()
+
+            self.thread = threading.Thread(target=run, name='AsyncSMTPEngine', daemon=True)
+            self.thread.start()
+            ready.wait()
+            logger.info(f"Async SMTP engine started (in_flight={self.max_in_flight}, "
+                        f"relay={self.max_per_relay}, account={self.max_per_account})")
+
+    def stop(self) -> None:
+        """Fecha sessões idle e para o event loop."""
+        with self._lock:
+            if not self.running:
+                return
+
+            future = asyncio.run_coroutine_threadsafe(self._close_idle(force=True), self.loop)
+            try:
+                future.result(timeout=5)
+            except Exception:
+                pass
+
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+            self.thread = None
+            logger.info("Async SMTP engine stopped")
+
+    def submit(self,
+               key: str,
+               config: Dict[str, Any],
+               recipients: List[str],
+               data: MessageStream,
+               max_messages: Optional[int] = None) -> concurrent.futures.Future:
+        """
+        Submete transação SMTP ao event loop.
+
+        Args:
+            key: Chave da conta (ver SMTPConnectionPool.make_key)
+            config: Configuração SMTP resolvida
+            recipients: Destinatários do envelope
+            data: Mensagem em blocos (lida durante a escrita)
+            max_messages: Mensagens por sessão antes de a fechar
+                (usa max_messages_per_session se não fornecido)
+
+        Returns:
+            Future que termina com (dict de recusados, tempos por fase) ou
+            levanta a exceção smtplib
+        """
+        if not self.running:
+            self.start()
+
+        with self._stats_lock:
+            self.stats['submitted'] += 1
+            self._pending[key] = self._pending.get(key, 0) + 1
+
+        future = asyncio.run_coroutine_threadsafe(
+            self._send(key, config, recipients, data, max_messages or self.max_messages_per_session),
+            self.loop
+        )
+        future.add_done_callback(lambda _: self._finished(key))
+        return future
+
+    def result_timeout(self, key: str) -> float:
+        """
+        Tempo máximo de espera pelo resultado de uma nova transação da conta.
+
+        Um timeout de operação para a própria transação mais a espera
+        prevista na fila: uma ronda por cada `max_per_account` transações da
+        conta (ou `max_in_flight` do processo) já submetidas.
+
+        Args:
+            key: Chave da conta
+
+        Returns:
+            Segundos a aguardar antes de cancelar
+        """
+        with self._stats_lock:
+            ahead = self._pending.get(key, 0)
+            total = sum(self._pending.values())
+        rounds = max(ahead // self.max_per_account, total // self.max_in_flight)
+        return self.timeout * (1 + rounds)
+
+    def wait(self, future: concurrent.futures.Future, timeout: float) -> Tuple[Dict[str, Tuple[int, bytes]], Dict[str, Any]]:
+        """
+        Aguarda resultado de submit(); cancela a transação se exceder o timeout.
+
+        Args:
+            future: Future devolvido por submit()
+            timeout: Segundos a aguardar (ver result_timeout)
+
+        Returns:
+            Resultado da transação
+
+        Raises:
+            TimeoutError: Se a transação não terminou a tempo (foi cancelada)
+        """
+        try:
+            return future.result(timeout=max(0.0, timeout))
+        except concurrent.futures.TimeoutError:
+            if not future.cancel() and future.done():
+                # Terminou entre o timeout e o cancelamento
+                return future.result()
+            self._count('timed_out')
+            raise TimeoutError(f"SMTP transaction did not complete within {timeout:.0f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas do motor.
+
+        Returns:
+            Dict com estatísticas
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'running': self.running,
+            'idle_connections': sum(len(conns) for conns in list(self._idle.values())),
+            'limits': {
+                'max_in_flight': self.max_in_flight,
+                'max_per_relay': self.max_per_relay,
+                'max_per_account': self.max_per_account,
+                'timeout': self.timeout
+            }
+        }
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        """Atualiza contador das estatísticas."""
+        with self._stats_lock:
+            self.stats[name] += delta
+
+    def _finished(self, key: str) -> None:
+        """Retira transação terminada (ou cancelada) das pendentes da conta."""
+        with self._stats_lock:
+            remaining = self._pending.get(key, 0) - 1
+            if remaining > 0:
+                self._pending[key] = remaining
+            else:
+                self._pending.pop(key, None)
+
+    async def _send(self,
+                    key: str,
+                    config: Dict[str, Any],
+                    recipients: List[str],
+                    data: MessageStream,
+                    max_messages: int) -> Tuple[Dict[str, Tuple[int, bytes]], Dict[str, Any]]:
+        """Executa transação respeitando os limites de concorrência."""
+        relay = f"{config['server']}:{config['port']}"
+        relay_semaphore = self._relay_semaphores.setdefault(relay, asyncio.Semaphore(self.max_per_relay))
+        account_semaphore = self._account_semaphores.setdefault(key, asyncio.Semaphore(self.max_per_account))
+
+        async with self._global_semaphore, relay_semaphore, account_semaphore:
+            self._count('in_flight')
+            try:
+                result = await self._transact(key, config, recipients, data, max_messages)
+                self._count('sent')
+                return result
+            except BaseException:
+                self._count('failed')
+                raise
+            finally:
+                self._count('in_flight', -1)
+
+    async def _transact(self,
+                        key: str,
+                        config: Dict[str, Any],
+                        recipients: List[str],
+                        data: MessageStream,
+                        max_messages: int) -> Tuple[Dict[str, Tuple[int, bytes]], Dict[str, Any]]:
+        """
+        Envia numa sessão idle ou nova.
+
+        Reconecta uma vez se a sessão desligar antes do DATA; depois do DATA
+        a mensagem pode já ter sido aceite e a falha é devolvida. A sessão é
+        fechada ao fim de `max_messages` mensagens.
+        """
+        fingerprint = SMTPConnectionPool.config_fingerprint(config)
+        size = 0
+
+        def counted():
+            nonlocal size
+            for chunk in data:
+                size += len(chunk)
+                yield chunk
+
+        for attempt in range(2):
+            conn = self._take_idle(key, fingerprint)
+            if conn is None:
+                conn = await self._open(config)
+                conn.fingerprint = fingerprint
+
+            size = 0
+            start = time.perf_counter()
+            try:
+                refused = await conn.sendmail(config['from_email'], recipients, self._read(data, counted()))
+            except smtplib.SMTPServerDisconnected:
+                conn.close()
+                if attempt or conn.data_started:
+                    raise
+                continue
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+                # sendmail já enviou RSET; reutilizar se a sessão sobreviveu
+                if conn.writer is not None:
+                    self._idle.setdefault(key, []).append(conn)
+                raise
+            except BaseException:
+                conn.close()
+                raise
+
+            data_ms = elapsed_ms(start)
+            conn.messages_sent += 1
+            if max_messages and conn.messages_sent >= max_messages:
+                await conn.quit()
+            else:
+                self._idle.setdefault(key, []).append(conn)
+            connect_timings, conn.timings = conn.timings, {}
+            return refused, {
+                'relay': f"{config['server']}:{config['port']}",
+                'reused_session': not connect_timings,
+                **connect_timings,
+                'data_ms': data_ms,
+                'size_bytes': size
+            }
+
+    @staticmethod
+    async def _read(data: MessageStream, chunks: Iterable[bytes]) -> AsyncIterator[bytes]:
+        """
+        Blocos da mensagem com dot-stuffing, prontos a escrever após DATA.
+
+        Mensagens só com bytes em memória são lidas diretamente; com anexos,
+        a leitura do disco e a codificação base64 correm no executor por
+        blocos de READ_BLOCK_SIZE, sem bloquear o event loop.
+
+        Args:
+            data: Mensagem (para saber se tem anexos)
+            chunks: Blocos a ler (data, possivelmente embrulhado)
+        """
+        stuffed = dot_stuff(chunks)
+        if all(isinstance(segment, bytes) for segment in data.segments):
+            for chunk in stuffed:
+                yield chunk
+            return
+
+        loop = asyncio.get_running_loop()
+        while True:
+            block = await loop.run_in_executor(None, _read_block, stuffed)
+            if not block:
+                return
+            for chunk in block:
+                yield chunk
+
+    async def _open(self, config: Dict[str, Any]) -> AsyncSMTPConnection:
+        """Abre e autentica nova sessão."""
+        conn = AsyncSMTPConnection(config['server'], config['port'], timeout=self.timeout)
+        try:
+            await conn.connect(use_ssl=config.get('use_ssl', False), use_tls=config.get('use_tls', False))
+            if config.get('username') and config.get('password'):
+                start = time.perf_counter()
+                await conn.login(config['username'], config['password'])
+                conn.timings['auth_ms'] = elapsed_ms(start)
+        except BaseException:
+            conn.close()
+            raise
+
+        self._count('connections_opened')
+        return conn
+
+    def _take_idle(self, key: str, fingerprint: str) -> Optional[AsyncSMTPConnection]:
+        """Obtém sessão idle válida para a conta."""
+        idle = self._idle.get(key)
+        now = time.monotonic()
+        while idle:
+            conn = idle.pop()
+            if conn.fingerprint == fingerprint and now - conn.last_used_at < self.idle_timeout and conn.writer is not None:
+                return conn
+            conn.close()
+        return None
+
+    async def _reap_idle(self) -> None:
+        """Fecha periodicamente sessões idle expiradas."""
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 2))
+            await self._close_idle()
+
+    async def _close_idle(self, force: bool = False) -> None:
+        """Fecha sessões idle (todas se force)."""
+        now = time.monotonic()
+        expired = []
+        # Retirar todas as sessões a fechar antes do primeiro await: enquanto
+        # o QUIT espera, _transact pode tirar ou devolver sessões destas listas
+        for key, conns in list(self._idle.items()):
+            keep = []
+            for conn in conns:
+                if force or now - conn.last_used_at >= self.idle_timeout:
+                    expired.append(conn)
+                else:
+                    keep.append(conn)
+            self._idle[key] = keep
+
+        for conn in expired:
+            await conn.quit()
+
+
+class AsyncSMTPService(SMTPService):
+    """
+    SMTPService que entrega através do AsyncDeliveryEngine.
+
+    Mantém o mesmo contrato (success, message, message_id) de send_email e os
+    mesmos resultados por destinatário de send_bulk_messages, mas as
+    transações de um lote correm em paralelo no event loop.
+    """
+
+    def __init__(self, encryption_key: str, engine: Optional[AsyncDeliveryEngine] = None):
+        """
+        Inicializa serviço.
+
+        Args:
+            encryption_key: Chave para decriptar passwords
+            engine: Motor assíncrono (usa o global se não fornecido)
+        """
+        super().__init__(encryption_key)
+        self.engine = engine or get_async_engine()
+
+    def _deliver(
+        self,
+        account: EmailAccount,
+        config: Dict[str, Any],
+        data: MessageStream,
+        recipients: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Entrega mensagem no event loop e aguarda o resultado (devolve os tempos por fase).
+
+        A espera é limitada por engine.result_timeout; ao fim dela a
+        transação é cancelada e a mensagem falha com TimeoutError.
+        """
+        get_transport_cache().check_available(account.id, config['server'])
+        key = self._engine_key(account, config)
+        timeout = self.engine.result_timeout(key)
+        future = self.engine.submit(key, config, recipients, data)
+        try:
+            _, timings = self.engine.wait(future, timeout)
+        except Exception as e:
+            self._transport_failed(account.id, config, e)
+            raise
+        get_smtp_metrics().record(timings['relay'], account.id, timings)
+        return timings
+
+    def send_bulk_messages(
+        self,
+        account: EmailAccount,
+        messages: Iterable[Dict[str, Any]],
+        messages_per_session: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Envia várias mensagens em paralelo no event loop.
+
+        As mensagens são construídas no thread chamador em janelas de
+        `max_in_flight` e os resultados devolvidos pela ordem de entrada.
+        Cada resultado tem um prazo (engine.result_timeout) contado desde a
+        submissão; passado o prazo a transação é cancelada.
+
+        Args:
+            account: Conta de email para envio
+            messages: Iterável de dicts com os argumentos de send_email
+                ou com to_email e prepared (PreparedMessage)
+            messages_per_session: Mensagens por sessão antes de rodar
+                (usa SMTP_MAX_MESSAGES_PER_SESSION se não fornecido)
+
+        Yields:
+            Dict por destinatário com email, success, message, message_id, timings e transient
+        """
+        config = self.get_smtp_config_with_fallback(account)
+        key = self._engine_key(account, config)
+        transports = get_transport_cache()
+        metrics = get_smtp_metrics()
+        window: List[Tuple[str, Optional[str], Any, float]] = []
+
+        def drain():
+            for to_email, message_id, pending, deadline in window:
+                if isinstance(pending, Exception):
+                    yield self._failed_result(to_email, pending)
+                    continue
+                try:
+                    _, timings = self.engine.wait(pending, deadline - time.monotonic())
+                except Exception as e:
+                    self._transport_failed(account.id, config, e)
+                    yield self._failed_result(to_email, e)
+                    continue
+                metrics.record(timings['relay'], account.id, timings)
+                yield self._bulk_result(
+                    to_email, True, f"Email enviado com sucesso para {to_email}", message_id, timings
+                )
+            window.clear()
+
+        for item in messages:
+            to_email = item.get('to_email')
+            try:
+                transports.check_available(account.id, config['server'])
+                data, recipients, message_id = self._render_item(config, item)
+                deadline = time.monotonic() + self.engine.result_timeout(key)
+                future = self.engine.submit(key, config, recipients, data, messages_per_session)
+                window.append((to_email, message_id, future, deadline))
+            except Exception as e:
+                window.append((to_email, None, e, 0.0))
+
+            if len(window) >= self.engine.max_in_flight:
+                yield from drain()
+
+        yield from drain()
+
+    @staticmethod
+    def _engine_key(account: EmailAccount, config: Dict[str, Any]) -> str:
+        """Chave da conta no motor (igual à do pool síncrono)."""
+        return SMTPConnectionPool.make_key(account.id, config)
+
+
+# Instância global do motor
+_async_engine: Optional[AsyncDeliveryEngine] = None
+_async_engine_lock = threading.Lock()
+
+
+def get_async_engine() -> AsyncDeliveryEngine:
+    """
+    Retorna motor assíncrono global, configurado a partir da app se disponível.
+
+    Returns:
+        Instância do AsyncDeliveryEngine
+    """
+    global _async_engine
+
+    if _async_engine is None:
+        with _async_engine_lock:
+            if _async_engine is None:
+                options = {}
+                try:
+                    from flask import current_app
+                    config = current_app.config
+                    options = {
+                        'max_in_flight': config.get('SMTP_ASYNC_MAX_IN_FLIGHT', 500),
+                        'max_per_relay': config.get('SMTP_ASYNC_MAX_PER_RELAY', 50),
+                        'max_per_account': config.get('SMTP_ASYNC_MAX_PER_ACCOUNT', 10),
+                        'timeout': config.get('SMTP_ASYNC_TIMEOUT', 30),
+                        'idle_timeout': config.get('SMTP_POOL_IDLE_TIMEOUT', 60),
+                        'max_messages_per_session': config.get('SMTP_MAX_MESSAGES_PER_SESSION', 100)
+                    }
+                except RuntimeError:
+                    # Fora do contexto da app: usar defaults
+                    pass
+                _async_engine = AsyncDeliveryEngine(**options)
+
+    return _async_engine
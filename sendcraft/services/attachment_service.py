@@ -274,6 +274,27 @@ class AttachmentService:
             logger.error(f"Get attachment error: {e}", exc_info=True)
             return None
     
+    def get_attachment_path(self, attachment_id: str) -> Optional[str]:
+        """
+        Localiza o ficheiro de um anexo sem o ler.
+        
+        Args:
+            attachment_id: ID do anexo
+            
+        Returns:
+            Caminho do ficheiro ou None
+        """
+        if not attachment_id.startswith('ATT-'):
+            return None
+        
+        for filename in os.listdir(self.upload_dir):
+            if filename.startswith(attachment_id):
+                file_path = os.path.join(self.upload_dir, filename)
+                if os.path.isfile(file_path):
+                    return file_path
+        
+        return None
+    
     def delete_attachment(self, attachment_id: str) -> bool:
         """
         Remove um anexo.
@@ -368,6 +389,9 @@ class AttachmentService:
         """
         Prepara anexos para envio SMTP.
         
+        Anexos guardados (attachment_id) são devolvidos com 'path' e lidos do
+        disco por blocos durante o envio, em vez de carregados em memória.
+        
         Args:
             attachments: Lista de anexos (pode incluir attachment_id ou content)
             
@@ -380,12 +404,13 @@ class AttachmentService:
             try:
                 # Se tem attachment_id, buscar anexo
                 if 'attachment_id' in attachment:
-                    stored_attachment = self.get_attachment(attachment['attachment_id'])
-                    if stored_attachment:
+                    file_path = self.get_attachment_path(attachment['attachment_id'])
+                    if file_path:
+                        filename = os.path.basename(file_path)
                         prepared_attachments.append({
-                            'filename': stored_attachment['filename'],
-                            'content_type': stored_attachment['content_type'],
-                            'content': base64.b64decode(stored_attachment['content'])
+                            'filename': filename,
+                            'content_type': self._get_content_type(filename),
+                            'path': file_path
                         })
                     else:
                         logger.warning(f"Attachment not found: {attachment['attachment_id']}")
@@ -10,6 +10,7 @@ from flask import Flask, current_app
 from ..models import AutosyncConfig, Domain
 from ..models.account import EmailAccount
 from ..services.imap_service import IMAPService
+from ..services.account_cache import get_account_config_cache
 from ..extensions import db
 from ..utils.logging import get_logger
 
@@ -221,7 +222,7 @@ class AutosyncService:
             imap = IMAPService(account=account)
             
             # Obter configuração IMAP da conta
-            imap_config = account.get_imap_config(encryption_key)
+            imap_config = get_account_config_cache().get_imap_config(account, encryption_key)
             
             # Conectar
             if not imap.connect(imap_config):
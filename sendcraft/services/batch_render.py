@@ -0,0 +1,238 @@
+"""
+Renderização em lote de templates para SendCraft.
+
+Um template, muitos conjuntos de variáveis: lotes pequenos são
+renderizados no processo com os templates compilados da cache; lotes
+grandes são divididos em blocos distribuídos por um pool de processos
+(um por core), cada um com a sua própria cache de templates compilados.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain, islice
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from ..services.template_cache import CompiledTemplateCache, get_template_cache
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+PARTS = ('subject', 'html', 'text')
+# Templates compilados mantidos por processo do pool
+WORKER_CACHE_SIZE = 64
+
+# (id, versão, subject, html, text) de um EmailTemplate: o que os processos do pool recebem
+TemplateSources = Tuple[Optional[int], Optional[int], Optional[str], Optional[str], Optional[str]]
+
+
+class RenderedEmail(NamedTuple):
+    """Resultado da renderização de um conjunto de variáveis."""
+    subject: Optional[str]
+    html: Optional[str]
+    text: Optional[str]
+    error: Optional[str] = None
+
+
+def template_sources(template) -> TemplateSources:
+    """Fontes de um EmailTemplate, sem o modelo (serializáveis para o pool)."""
+    return (template.id, template.version,
+            template.subject_template, template.html_template, template.text_template)
+
+
+def render_one(cache: CompiledTemplateCache, sources: TemplateSources, variables: Any) -> RenderedEmail:
+    """
+    Renderiza um conjunto de variáveis (mesmo resultado de EmailTemplate.render_all).
+
+    Args:
+        cache: Cache de templates compilados do processo
+        sources: Fontes do template
+        variables: Variáveis do destinatário
+
+    Returns:
+        RenderedEmail; em caso de erro só `error` é preenchido
+    """
+    if not isinstance(variables, dict):
+        return RenderedEmail(None, None, None, 'Variáveis devem ser um objeto JSON')
+
+    template_id, version, subject, html, text = sources
+    try:
+        return RenderedEmail(
+            cache.get(template_id, version, 'subject', subject or '').render(variables),
+            cache.get(template_id, version, 'html', html).render(variables) if html else None,
+            cache.get(template_id, version, 'text', text).render(variables) if text else None
+        )
+    except Exception as e:
+        # Erros do Jinja e das próprias variáveis (ex: operações entre tipos incompatíveis)
+        return RenderedEmail(None, None, None, f'Erro ao renderizar: {e}')
+
+
+_worker_cache: Optional[CompiledTemplateCache] = None
+
+
+def _render_chunk(sources: TemplateSources, chunk: List[Any]) -> List[RenderedEmail]:
+    """Renderiza um bloco num processo do pool."""
+    global _worker_cache
+    if _worker_cache is None:
+        _worker_cache = CompiledTemplateCache(WORKER_CACHE_SIZE)
+    return [render_one(_worker_cache, sources, variables) for variables in chunk]
+
+
+class BatchRenderer:
+    """
+    Motor de renderização de um template para muitos conjuntos de variáveis.
+
+    A ordem dos resultados é a das variáveis. Em paralelo, no máximo
+    2 blocos por processo estão em curso de cada vez, pelo que um
+    iterador de variáveis grande não é lido todo para memória.
+    """
+
+    def __init__(self,
+                 processes: int = 0,
+                 parallel_threshold: int = 2000,
+                 chunk_size: int = 250):
+        """
+        Inicializa motor.
+
+        Args:
+            processes: Processos do pool (0 = um por core; 1 = só no processo)
+            parallel_threshold: Conjuntos de variáveis a partir dos quais se usa o pool
+            chunk_size: Conjuntos de variáveis por bloco enviado a um processo
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.parallel_threshold = max(1, parallel_threshold)
+        self.chunk_size = max(1, chunk_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+        self.stats = {
+            'batches': 0,
+            'parallel_batches': 0,
+            'rendered': 0
+        }
+
+    def render(self, template, variables: Iterable[Any]) -> Iterator[RenderedEmail]:
+        """
+        Renderiza o template para cada conjunto de variáveis.
+
+        Args:
+            template: EmailTemplate (lido já; o gerador não volta a tocar no modelo)
+            variables: Iterável de dicts de variáveis
+
+        Returns:
+            Iterador de RenderedEmail pela mesma ordem
+        """
+        return self._render(template_sources(template), iter(variables))
+
+    def _render(self, sources: TemplateSources, variables: Iterator[Any]) -> Iterator[RenderedEmail]:
+        """Gerador por trás de render()."""
+        self.stats['batches'] += 1
+        head = list(islice(variables, self.parallel_threshold))
+
+        if self.processes <= 1 or len(head) < self.parallel_threshold:
+            cache = get_template_cache()
+            for item in chain(head, variables):
+                self.stats['rendered'] += 1
+                yield render_one(cache, sources, item)
+            return
+
+        self.stats['parallel_batches'] += 1
+        yield from self._render_parallel(sources, chain(head, variables))
+
+    def _render_parallel(self, sources: TemplateSources, variables: Iterator[Any]) -> Iterator[RenderedEmail]:
+        """Distribui blocos pelo pool mantendo a ordem."""
+        pool = self._get_pool()
+        pending = deque()
+        chunks = iter(lambda: list(islice(variables, self.chunk_size)), [])
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(_render_chunk, sources, chunk))
+                if len(pending) >= self.processes * 2:
+                    yield from self._collect(pending.popleft().result())
+            while pending:
+                yield from self._collect(pending.popleft().result())
+        except BrokenProcessPool:
+            logger.error("Template render pool died; it will be recreated on the next batch")
+            with self._pool_lock:
+                self._pool = None
+            raise
+        finally:
+            # Consumidor desistiu a meio (ex: cliente HTTP desligou): não renderizar o resto
+            for future in pending:
+                future.cancel()
+
+    def _collect(self, results: List[RenderedEmail]) -> List[RenderedEmail]:
+        """Conta resultados de um bloco."""
+        self.stats['rendered'] += len(results)
+        return results
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Pool criado na primeira utilização e reutilizado entre lotes."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn: fazer fork de um processo com threads (workers, pools SMTP) não é seguro
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    logger.info(f"Template render pool started with {self.processes} processes")
+        return self._pool
+
+    def shutdown(self) -> None:
+        """Termina o pool de processos."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas do motor.
+
+        Returns:
+            Dict com configuração e contadores
+        """
+        return {
+            **self.stats,
+            'processes': self.processes,
+            'parallel_threshold': self.parallel_threshold,
+            'chunk_size': self.chunk_size,
+            'pool_running': self._pool is not None
+        }
+
+
+# Instância global
+_batch_renderer: Optional[BatchRenderer] = None
+_batch_renderer_lock = threading.Lock()
+
+
+def get_batch_renderer() -> BatchRenderer:
+    """
+    Retorna motor de renderização em lote global.
+
+    Returns:
+        Instância do BatchRenderer
+    """
+    global _batch_renderer
+
+    if _batch_renderer is None:
+        with _batch_renderer_lock:
+            if _batch_renderer is None:
+                options = {}
+                try:
+                    from flask import current_app
+                    config = current_app.config
+                    options = {
+                        'processes': config.get('TEMPLATE_BATCH_PROCESSES', 0),
+                        'parallel_threshold': config.get('TEMPLATE_BATCH_PARALLEL_THRESHOLD', 2000),
+                        'chunk_size': config.get('TEMPLATE_BATCH_CHUNK_SIZE', 250)
+                    }
+                except RuntimeError:
+                    # Fora do contexto da app: usar defaults
+                    pass
+                _batch_renderer = BatchRenderer(**options)
+
+    return _batch_renderer
@@ -0,0 +1,268 @@
+"""
+Ingestão de listas de destinatários em stream para SendCraft.
+
+Lê NDJSON ou CSV diretamente do corpo do pedido, valida e elimina
+duplicados à medida que lê e grava a lista em jobs da outbox de tamanho
+fixo: a memória usada depende do tamanho do job, não do da lista.
+"""
+import codecs
+import csv
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple, BinaryIO
+
+from ..models import EmailAccount
+from ..models.outbox import QueuePriority
+from ..services.admission import AdmissionController
+from ..services.email_queue import EmailQueue
+from ..utils.validators import validate_email
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Erros por linha devolvidos na resposta (os restantes só são contados)
+MAX_REPORTED_ERRORS = 100
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class IngestError(ValueError):
+    """Stream inválido como um todo (formato, cabeçalho ou limite excedido)."""
+
+    # Resumo dos jobs gravados antes do erro (preenchido por BulkIngestor.ingest)
+    summary: Optional[Dict[str, Any]] = None
+
+
+def iter_lines(stream: BinaryIO) -> Iterator[str]:
+    """
+    Linhas de texto UTF-8 de um stream binário, lidas por blocos.
+
+    Args:
+        stream: Stream binário (ex: request.stream)
+
+    Yields:
+        Linhas com o terminador (o csv precisa dele para campos multi-linha)
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def parse_ndjson(lines: Iterator[str]) -> Iterator[Tuple[int, Any]]:
+    """
+    Objetos de um stream NDJSON.
+
+    Args:
+        lines: Linhas de texto
+
+    Yields:
+        Tuplos (número da linha, objeto) ou (número da linha, ValueError)
+    """
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f'JSON inválido: {e}')
+
+
+def ndjson_recipients(rows: Iterator[Tuple[int, Any]]) -> Iterator[Tuple[int, Any, Dict[str, Any]]]:
+    """
+    Destinatários de linhas NDJSON {"email": ..., "variables": {...}}.
+
+    Campos além de email e variables também passam a variáveis.
+
+    Yields:
+        Tuplos (número da linha, email, variáveis) ou (número da linha, ValueError, {})
+    """
+    for number, row in rows:
+        if isinstance(row, ValueError):
+            yield number, row, {}
+            continue
+        if not isinstance(row, dict):
+            yield number, ValueError('Linha deve ser um objeto JSON'), {}
+            continue
+        variables = row.get('variables') or {}
+        if not isinstance(variables, dict):
+            yield number, ValueError('Campo "variables" deve ser um objeto'), {}
+            continue
+        extra = {key: value for key, value in row.items() if key not in ('email', 'variables')}
+        yield number, row.get('email'), {**extra, **variables}
+
+
+def csv_recipients(lines: Iterator[str]) -> Iterator[Tuple[int, Any, Dict[str, Any]]]:
+    """
+    Destinatários de um CSV com cabeçalho; a coluna email é obrigatória e
+    as restantes colunas passam a variáveis.
+
+    Yields:
+        Tuplos (número da linha, email, variáveis)
+
+    Raises:
+        IngestError: Se o cabeçalho não tiver coluna email
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header:
+        raise IngestError('CSV vazio')
+    header = [column.strip() for column in header]
+    lowered = [column.lower() for column in header]
+    if 'email' not in lowered:
+        raise IngestError('CSV sem coluna "email" no cabeçalho')
+    email_index = lowered.index('email')
+
+    for row in reader:
+        if not any(field.strip() for field in row):
+            continue
+        variables = {
+            column: value for index, (column, value) in enumerate(zip(header, row))
+            if index != email_index and column
+        }
+        email = row[email_index] if email_index < len(row) else None
+        yield reader.line_num, email, variables
+
+
+class BulkIngestor:
+    """
+    Grava um stream de destinatários em jobs da outbox.
+
+    Os destinatários são validados e deduplicados (por digest de 8 bytes do
+    email normalizado) à medida que chegam, e gravados em jobs de job_size
+    destinatários com o mesmo conteúdo.
+    """
+
+    def __init__(self,
+                 queue: EmailQueue,
+                 account: EmailAccount,
+                 payload: Dict[str, Any],
+                 priority: QueuePriority = QueuePriority.BULK,
+                 job_size: int = 1000,
+                 max_recipients: int = 1000000,
+                 send_at: Optional[datetime] = None,
+                 send_window: float = 0,
+                 admission: Optional[AdmissionController] = None):
+        """
+        Inicializa ingestão.
+
+        Args:
+            queue: Outbox de destino
+            account: Conta que envia
+            payload: Conteúdo comum dos jobs (ver OutboxJob.payload)
+            priority: Lane dos jobs
+            job_size: Destinatários por job
+            max_recipients: Máximo de destinatários aceites por stream
+            send_at: Envio agendado (UTC; None = já)
+            send_window: Segundos por que espalhar cada job a partir de send_at
+            admission: Controlo de admissão a que somar os destinatários gravados
+        """
+        self.queue = queue
+        self.account = account
+        self.payload = payload
+        self.priority = priority
+        self.job_size = max(1, job_size)
+        self.max_recipients = max_recipients
+        self.send_at = send_at
+        self.send_window = send_window
+        self.admission = admission
+
+        self.jobs: List[str] = []
+        self.accepted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._seen = set()
+        self._chunk: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+
+    def ingest(self, recipients: Iterator[Tuple[int, Any, Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Consome o stream e grava os jobs.
+
+        Jobs já gravados mantêm-se se o stream falhar a meio; a exceção
+        leva o resumo até esse ponto em `summary`.
+
+        Args:
+            recipients: Tuplos (número da linha, email, variáveis)
+
+        Returns:
+            Resumo (jobs, accepted, duplicates, invalid, errors)
+        """
+        try:
+            for line, email, variables in recipients:
+                self.add(line, email, variables)
+            self.flush()
+        except IngestError as e:
+            self.flush()
+            e.summary = self.summary()
+            raise
+
+        logger.info(f"Bulk ingestion for account {self.account.id}: {self.accepted} recipients "
+                    f"in {len(self.jobs)} jobs ({self.duplicates} duplicates, {self.invalid} invalid)")
+        return self.summary()
+
+    def add(self, line: int, email: Any, variables: Dict[str, Any]) -> None:
+        """Valida, deduplica e acumula um destinatário."""
+        if isinstance(email, ValueError):
+            self._reject(line, str(email))
+            return
+        if not isinstance(email, str):
+            self._reject(line, 'Campo "email" em falta')
+            return
+
+        email = email.strip()
+        valid, error = validate_email(email)
+        if not valid:
+            self._reject(line, error, email)
+            return
+
+        digest = hashlib.blake2b(email.lower().encode(), digest_size=8).digest()
+        if digest in self._seen:
+            self.duplicates += 1
+            return
+        if self.accepted >= self.max_recipients:
+            raise IngestError(f'Máximo de {self.max_recipients} destinatários por pedido excedido')
+        self._seen.add(digest)
+
+        self._chunk.append((email, variables or None))
+        self.accepted += 1
+        if len(self._chunk) >= self.job_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Grava os destinatários acumulados como um job."""
+        if not self._chunk:
+            return
+        self.jobs.append(self.queue.add_job(self.account, self.payload, self._chunk, self.priority,
+                                            send_at=self.send_at, send_window=self.send_window))
+        if self.admission is not None and self.send_at is None:
+            self.admission.record(len(self._chunk))
+        self._chunk = []
+
+    def _reject(self, line: int, error: str, email: Optional[str] = None) -> None:
+        """Conta linha inválida e guarda o erro enquanto houver espaço."""
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'email': email, 'error': error})
+
+    def summary(self) -> Dict[str, Any]:
+        """Resumo da ingestão."""
+        return {
+            'jobs': self.jobs,
+            'accepted': self.accepted,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': self.errors,
+            'errors_truncated': self.invalid > len(self.errors)
+        }
@@ -1,36 +1,127 @@
 """
 Serviço de Queue de Emails para SendCraft Phase 15
-Processamento assíncrono de emails em lote
+Processamento assíncrono de emails em lote através de uma outbox na base de dados
 """
+import atexit
+import os
+import random
+import socket
 import threading
 import time
-import queue
-from typing import Dict, Any, List, Optional, Callable
-from datetime import datetime
-from enum import Enum
+import uuid
+from itertools import groupby
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+from datetime import datetime, timedelta
+
+from flask import Flask, current_app
+from jinja2 import TemplateError, nodes
+from jinja2.sandbox import ImmutableSandboxedEnvironment, SecurityError
+from sqlalchemy import and_, or_, inspect, func, insert
+from sqlalchemy.exc import SQLAlchemyError
 
 from ..models import EmailAccount, EmailLog
 from ..models.log import EmailStatus
-from ..services.smtp_service import SMTPService
+from ..models.outbox import OutboxJob, OutboxMessage, QueueStatus, QueuePriority
+from ..services.smtp_service import create_smtp_service, PreparedMessage
 from ..services.attachment_service import AttachmentService
+from ..services.log_writer import DeliveryLogWriter
+from ..services.job_progress import get_job_progress_notifier
+from ..services.queue_autoscaler import WorkerAutoscaler
+from ..services.send_scheduler import SendScheduler, spread_offsets
 from ..extensions import db
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Mensagens preparadas mantidas por worker (uma por job)
+PREPARED_CACHE_SIZE = 16
+
+# Ordem de envio dentro de um lote reclamado
+LANE_ORDER = (QueuePriority.TRANSACTIONAL, QueuePriority.BULK)
+
+# Segundos entre verificações de trabalho transactional durante um lote bulk
+PREEMPT_CHECK_INTERVAL = 0.5
+
+
+class ClaimedMessage(NamedTuple):
+    """Cópia de uma linha reclamada (as atualizações são gravadas em lote)."""
+    id: int
+    job_id: int
+    recipient_email: str
+    attempts: int
+    log_id: Optional[int]
+    variables: Optional[Dict[str, Any]]
+
+
+class PersonalizedContent:
+    """
+    Templates de um job personalizado, compilados uma vez por worker.
+
+    O texto vem do cliente da API: é compilado num ambiente Jinja em
+    sandbox (sem acesso a atributos internos nem a métodos que alterem
+    objetos), e acessos explícitos a atributos privados são recusados
+    logo na compilação.
+    """
+
+    environment = ImmutableSandboxedEnvironment()
+
+    def __init__(self, payload: Dict[str, Any], attachments: Optional[List[Dict[str, Any]]] = None):
+        """
+        Compila subject/html/text do job.
+
+        Args:
+            payload: Payload do job (personalized=True)
+            attachments: Anexos já preparados para SMTP
+
+        Raises:
+            TemplateError: Se um template tiver erros de sintaxe ou aceder a atributos privados
+        """
+        self.subject = self._compile(payload.get('subject') or '')
+        self.html = self._compile(payload['html_content']) if payload.get('html_content') else None
+        self.text = self._compile(payload['text_content']) if payload.get('text_content') else None
+        self.variables = payload.get('variables') or {}
+        self.options = {
+            'from_name': payload.get('from_name'),
+            'reply_to': payload.get('reply_to'),
+            'cc': payload.get('cc'),
+            'bcc': payload.get('bcc'),
+            'attachments': attachments or None
+        }
+
+    @classmethod
+    def _compile(cls, source: str):
+        """Compila template recusando acessos a atributos que comecem por '_'."""
+        for node in cls.environment.parse(source).find_all((nodes.Getattr, nodes.Getitem)):
+            name = node.attr if isinstance(node, nodes.Getattr) else getattr(node.arg, 'value', None)
+            if isinstance(name, str) and name.startswith('_'):
+                raise SecurityError(f'Acesso a atributo não permitido: {name}')
+        return cls.environment.from_string(source)
 
-class QueueStatus(str, Enum):
-    """Status da queue de emails."""
-    PENDING = 'pending'
-    PROCESSING = 'processing'
-    COMPLETED = 'completed'
-    FAILED = 'failed'
+    def context(self, variables: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Variáveis do job com as do destinatário por cima."""
+        return {**self.variables, **(variables or {})}
+
+    def render(self, to_email: str, variables: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Mensagem de um destinatário (argumentos de send_email).
+
+        Raises:
+            TemplateError: Se a renderização falhar
+        """
+        context = self.context(variables)
+        return {
+            'to_email': to_email,
+            'subject': self.subject.render(context),
+            'html_content': self.html.render(context) if self.html else None,
+            'text_content': self.text.render(context) if self.text else None,
+            **self.options
+        }
 
 
 class EmailQueueItem:
     """Item da queue de emails."""
-    
-    def __init__(self, 
+
+    def __init__(self,
                  account: EmailAccount,
                  recipients: List[str],
                  subject: str,
@@ -42,10 +133,13 @@ class EmailQueueItem:
                  cc: Optional[List[str]] = None,
                  bcc: Optional[List[str]] = None,
                  idempotency_key: Optional[str] = None,
-                 variables: Optional[Dict[str, Any]] = None):
+                 variables: Optional[Dict[str, Any]] = None,
+                 priority: QueuePriority = QueuePriority.BULK,
+                 send_at: Optional[datetime] = None,
+                 send_window: float = 0):
         """
         Inicializa item da queue.
-        
+
         Args:
             account: Conta de email para envio
             recipients: Lista de destinatários
@@ -59,6 +153,9 @@ class EmailQueueItem:
             bcc: Lista BCC
             idempotency_key: Chave de idempotência
             variables: Variáveis para templates
+            priority: Lane de agendamento (transactional passa à frente de bulk)
+            send_at: Envio agendado (UTC; None = já)
+            send_window: Segundos por que espalhar os destinatários a partir de send_at
         """
         self.account = account
         self.recipients = recipients
@@ -72,241 +169,1076 @@ class EmailQueueItem:
         self.bcc = bcc
         self.idempotency_key = idempotency_key
         self.variables = variables or {}
-        
-        # Metadados
+        self.priority = QueuePriority(priority)
+        self.send_at = send_at
+        self.send_window = send_window
         self.created_at = datetime.utcnow()
-        self.status = QueueStatus.PENDING
-        self.processed_count = 0
-        self.success_count = 0
-        self.failed_count = 0
-        self.results = []
-        self.error_message = None
+
+    def to_payload(self) -> Dict[str, Any]:
+        """
+        Conteúdo comum a todos os destinatários, para guardar no job.
+
+        Returns:
+            Dict serializável em JSON
+        """
+        return {
+            'subject': self.subject,
+            'html_content': self.html_content,
+            'text_content': self.text_content,
+            'attachments': self.attachments,
+            'from_name': self.from_name,
+            'reply_to': self.reply_to,
+            'cc': self.cc,
+            'bcc': self.bcc,
+            'idempotency_key': self.idempotency_key,
+            'variables': self.variables
+        }
 
 
 class EmailQueue:
-    """Queue simples para processamento de emails em lote."""
-    
+    """
+    Queue de emails em lote persistida na base de dados (outbox).
+
+    Cada destinatário é uma linha em outbox_messages. Os workers reclamam
+    linhas em lotes repartidos com deficit round-robin entre filas
+    (conta, lane), para que um lote grande de uma conta não atrase os
+    envios das outras nem a lane transactional: com SELECT ... FOR UPDATE SKIP LOCKED onde a base de
+    dados o suporta, ou com um UPDATE condicional por token nos restantes
+    casos (SQLite). Cada reclamação tem um lease renovado por heartbeat;
+    se o processo morrer, as linhas voltam a ficar disponíveis quando o
+    lease expira. Vários processos podem drenar a mesma outbox.
+
+    O pool de workers varia entre min_workers e max_workers conforme o
+    backlog (ver WorkerAutoscaler); workers a mais terminam entre lotes.
+    """
+
     def __init__(self, max_workers: int = 2):
         """
         Inicializa queue de emails.
-        
+
         Args:
             max_workers: Número máximo de workers
         """
         self.max_workers = max_workers
-        self.queue = queue.Queue()
+        self.min_workers = 1
+        self.batch_size = 50
+        self.lease_seconds = 120
+        self.poll_interval = 1.0
+        self.shutdown_timeout = 30
+        self.lane_weights = {QueuePriority.TRANSACTIONAL: 8, QueuePriority.BULK: 1}
+        self.max_attempts = 5
+        self.retry_base_seconds = 30.0
+        self.retry_max_seconds = 3600.0
+        self.log_flush_size = 1
+        self.log_flush_interval = 0.5
+        self.autoscale_interval = 2.0
+        self.target_drain_seconds = 10.0
+        self.max_queue_age = 60.0
+        self.scale_down_delay = 30.0
+        self.max_workers_per_relay = 4
+
+        self.app: Optional[Flask] = None
         self.workers = []
         self.running = False
         self.attachment_service = AttachmentService()
-        
-        # Estatísticas
+        self._wakeup = threading.Event()
+        self._skip_locked: Optional[bool] = None
+        self._deficits: Dict[Tuple[int, QueuePriority], int] = {}
+        self._round_robin = 0
+        self.autoscaler = WorkerAutoscaler(self.min_workers, self.max_workers)
+        self.target_workers = 0
+        self._pool_lock = threading.Lock()
+        self._worker_seq = 0
+        self._scale_event = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+        # Workers deste processo a enviar para cada relay (servidor:porta)
+        self._relay_sessions: Dict[str, int] = {}
+        self.schedule_horizon = 60.0
+        self.scheduler = SendScheduler(self.schedule_horizon)
+        self._scheduler_thread: Optional[threading.Thread] = None
+
+        # Estatísticas deste processo
         self.stats = {
             'total_processed': 0,
             'total_success': 0,
             'total_failed': 0,
+            'total_retried': 0,
             'active_workers': 0
         }
-    
+        # Último acesso à outbox bem sucedido (health check dos workers)
+        self.last_poll_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Configura queue a partir da app.
+
+        Args:
+            app: Aplicação Flask
+        """
+        self.app = app
+        self.max_workers = app.config.get('EMAIL_QUEUE_WORKERS', self.max_workers)
+        self.min_workers = app.config.get('EMAIL_QUEUE_MIN_WORKERS', self.min_workers)
+        self.batch_size = app.config.get('OUTBOX_BATCH_SIZE', self.batch_size)
+        self.lease_seconds = app.config.get('OUTBOX_LEASE_SECONDS', self.lease_seconds)
+        self.poll_interval = app.config.get('OUTBOX_POLL_INTERVAL', self.poll_interval)
+        self.shutdown_timeout = app.config.get('OUTBOX_SHUTDOWN_TIMEOUT', self.shutdown_timeout)
+        self.lane_weights = {
+            QueuePriority.TRANSACTIONAL: app.config.get('OUTBOX_TRANSACTIONAL_WEIGHT', 8),
+            QueuePriority.BULK: app.config.get('OUTBOX_BULK_WEIGHT', 1)
+        }
+        self.max_attempts = app.config.get('OUTBOX_MAX_ATTEMPTS', self.max_attempts)
+        self.retry_base_seconds = app.config.get('OUTBOX_RETRY_BASE_SECONDS', self.retry_base_seconds)
+        self.retry_max_seconds = app.config.get('OUTBOX_RETRY_MAX_SECONDS', self.retry_max_seconds)
+        self.log_flush_size = app.config.get('OUTBOX_LOG_FLUSH_SIZE', self.log_flush_size)
+        self.log_flush_interval = app.config.get('OUTBOX_LOG_FLUSH_INTERVAL', self.log_flush_interval)
+        self.autoscale_interval = app.config.get('OUTBOX_AUTOSCALE_INTERVAL', self.autoscale_interval)
+        self.target_drain_seconds = app.config.get('OUTBOX_TARGET_DRAIN_SECONDS', self.target_drain_seconds)
+        self.max_queue_age = app.config.get('OUTBOX_MAX_QUEUE_AGE', self.max_queue_age)
+        self.scale_down_delay = app.config.get('OUTBOX_SCALE_DOWN_DELAY', self.scale_down_delay)
+        self.max_workers_per_relay = app.config.get('OUTBOX_MAX_WORKERS_PER_RELAY', self.max_workers_per_relay)
+        self.schedule_horizon = app.config.get('OUTBOX_SCHEDULE_HORIZON_SECONDS', self.schedule_horizon)
+        self.scheduler.horizon_seconds = self.schedule_horizon
+
     def start(self) -> None:
         """Inicia workers da queue."""
         if self.running:
             logger.warning("Email queue is already running")
             return
-        
+
+        # Workers correm fora do pedido: guardar a app para abrir contexto próprio
+        if self.app is None:
+            self.app = current_app._get_current_object()
+
         self.running = True
-        
-        # Criar workers
-        for i in range(self.max_workers):
-            worker = threading.Thread(
-                target=self._worker_loop,
-                name=f"EmailWorker-{i+1}",
-                daemon=True
+        self._wakeup.clear()
+        self._scale_event.clear()
+        self.autoscaler = WorkerAutoscaler(
+            min_workers=self.min_workers,
+            max_workers=self.max_workers,
+            target_drain_seconds=self.target_drain_seconds,
+            max_queue_age=self.max_queue_age,
+            scale_down_delay=self.scale_down_delay,
+            max_workers_per_relay=self.max_workers_per_relay
+        )
+
+        # Pool fixo se min >= max; caso contrário começa no mínimo e o supervisor ajusta
+        autoscale = self.autoscaler.min_workers < self.max_workers
+        self._resize(self.autoscaler.min_workers if autoscale else self.max_workers)
+        if autoscale:
+            self._supervisor = threading.Thread(target=self._autoscale_loop, name="EmailQueueAutoscaler", daemon=True)
+            self._supervisor.start()
+        if self.max_workers > 0:
+            self.scheduler.wakeup.clear()
+            self._scheduler_thread = threading.Thread(target=self._scheduler_loop, name="EmailQueueScheduler",
+                                                      daemon=True)
+            self._scheduler_thread.start()
+
+        logger.info(f"Email queue started with {len(self.workers)} workers "
+                    f"(min {self.autoscaler.min_workers}, max {self.max_workers})")
+
+    def _resize(self, target: int) -> None:
+        """
+        Ajusta o pool ao alvo.
+
+        Novos workers arrancam de imediato; os excedentes terminam no fim
+        do lote em curso (_retire_surplus).
+
+        Args:
+            target: Número de workers pretendido
+        """
+        with self._pool_lock:
+            self.target_workers = target
+            self.workers = [w for w in self.workers if w.is_alive()]
+            while len(self.workers) < target:
+                self._worker_seq += 1
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"EmailWorker-{self._worker_seq}",
+                    daemon=True
+                )
+                worker.start()
+                self.workers.append(worker)
+
+        # Workers parados à espera de trabalho verificam o alvo já
+        self._wakeup.set()
+
+    def _retire_surplus(self) -> bool:
+        """Retira o worker atual do pool se este exceder o alvo."""
+        current = threading.current_thread()
+        with self._pool_lock:
+            if len(self.workers) > self.target_workers and current in self.workers:
+                self.workers.remove(current)
+                return True
+        return False
+
+    def _autoscale_loop(self) -> None:
+        """Supervisor: reavalia o pool a cada OUTBOX_AUTOSCALE_INTERVAL ou quando chega trabalho."""
+        while self.running:
+            self._scale_event.wait(self.autoscale_interval)
+            self._scale_event.clear()
+            if not self.running:
+                break
+
+            try:
+                with self.app.app_context():
+                    relay_depth, oldest_age = self._backlog_by_relay()
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"Autoscaler error: {e}")
+                continue
+
+            with self._pool_lock:
+                current = len(self.workers)
+            decision = self.autoscaler.decide(current, relay_depth, oldest_age, time.monotonic())
+            if decision:
+                logger.info(f"Email queue {decision['action']}: {decision['from']} -> {decision['to']} workers "
+                            f"({decision['reason']}, depth {decision['depth']}, "
+                            f"oldest {decision['oldest_age']}s, latency {decision['latency_ms']} ms)")
+                self._resize(decision['to'])
+
+    def _scheduler_loop(self) -> None:
+        """Liberta jobs agendados quando vencem (ver SendScheduler)."""
+        idle_wait = self.poll_interval
+        while self.running:
+            try:
+                with self.app.app_context():
+                    released, wait = self.scheduler.tick()
+                    db.session.remove()
+                idle_wait = self.poll_interval
+            except Exception as e:
+                logger.error(f"Scheduler error: {e}")
+                wait = idle_wait
+                idle_wait = min(idle_wait * 2, 60)
+                released = 0
+
+            if released:
+                self._wakeup.set()
+                self._scale_event.set()
+            self.scheduler.wakeup.wait(wait)
+            self.scheduler.wakeup.clear()
+
+    def _backlog_by_relay(self) -> Tuple[Dict[str, int], float]:
+        """
+        Trabalho por fazer na outbox, por relay.
+
+        Returns:
+            Tuple (destinatários pendentes ou em envio por relay,
+            idade em segundos do mais antigo)
+        """
+        now = datetime.utcnow()
+        rows = db.session.query(
+            EmailAccount.smtp_server, EmailAccount.smtp_port,
+            func.count(OutboxMessage.id), func.min(OutboxMessage.created_at)
+        ).join(OutboxJob, OutboxMessage.job_id == OutboxJob.id).join(
+            EmailAccount, OutboxJob.account_id == EmailAccount.id
+        ).filter(
+            or_(
+                and_(
+                    OutboxMessage.status == EmailStatus.PENDING,
+                    or_(OutboxMessage.next_attempt_at.is_(None), OutboxMessage.next_attempt_at <= now)
+                ),
+                OutboxMessage.status == EmailStatus.SENDING
             )
-            worker.start()
-            self.workers.append(worker)
-        
-        logger.info(f"Email queue started with {self.max_workers} workers")
-    
-    def stop(self) -> None:
-        """Para workers da queue."""
+        ).group_by(EmailAccount.smtp_server, EmailAccount.smtp_port).all()
+
+        relay_depth = {f"{server}:{port}": count for server, port, count, _ in rows}
+        oldest = min((created_at for *_, created_at in rows if created_at), default=None)
+        return relay_depth, (now - oldest).total_seconds() if oldest else 0.0
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Para workers da queue.
+
+        Cada worker termina o envio em curso e devolve à outbox as linhas
+        reclamadas que ainda não enviou.
+
+        Args:
+            timeout: Segundos a aguardar pelos workers (OUTBOX_SHUTDOWN_TIMEOUT se None)
+        """
         if not self.running:
             return
-        
+
         self.running = False
-        
+        self._wakeup.set()
+        self._scale_event.set()
+        self.scheduler.wakeup.set()
+
         # Aguardar workers terminarem
-        for worker in self.workers:
-            worker.join(timeout=5)
-        
+        deadline = time.monotonic() + (self.shutdown_timeout if timeout is None else timeout)
+        if self._scheduler_thread is not None:
+            self._scheduler_thread.join(timeout=max(0.0, deadline - time.monotonic()))
+            self._scheduler_thread = None
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=max(0.0, deadline - time.monotonic()))
+            self._supervisor = None
+        workers = list(self.workers)
+        for worker in workers:
+            worker.join(timeout=max(0.0, deadline - time.monotonic()))
+
+        still_running = [w.name for w in workers if w.is_alive()]
+        if still_running:
+            logger.warning(f"Email workers still running after shutdown timeout: {', '.join(still_running)}")
+
         self.workers.clear()
+        self.target_workers = 0
         logger.info("Email queue stopped")
-    
+
     def add_email(self, queue_item: EmailQueueItem) -> str:
         """
-        Adiciona email à queue.
-        
+        Adiciona email à outbox.
+
         Args:
             queue_item: Item da queue
-            
+
         Returns:
-            ID do item (timestamp)
-        """
-        item_id = f"QUEUE-{int(queue_item.created_at.timestamp())}"
-        self.queue.put((item_id, queue_item))
-        
-        logger.info(f"Email added to queue: {item_id} ({len(queue_item.recipients)} recipients)")
-        return item_id
-    
+            ID do job (QUEUE-000123)
+        """
+        return self.add_job(
+            queue_item.account,
+            queue_item.to_payload(),
+            [(recipient, None) for recipient in queue_item.recipients],
+            queue_item.priority,
+            created_at=queue_item.created_at,
+            send_at=queue_item.send_at,
+            send_window=queue_item.send_window
+        )
+
+    def add_job(self,
+                account: EmailAccount,
+                payload: Dict[str, Any],
+                recipients: List[Tuple[str, Optional[Dict[str, Any]]]],
+                priority: QueuePriority = QueuePriority.BULK,
+                created_at: Optional[datetime] = None,
+                send_at: Optional[datetime] = None,
+                send_window: float = 0) -> str:
+        """
+        Grava job e destinatários na outbox (um INSERT em lote).
+
+        Um job com send_at fica SCHEDULED até o SendScheduler o libertar;
+        com send_window, o next_attempt_at dos destinatários é espalhado
+        pela janela a partir de send_at.
+
+        Args:
+            account: Conta de email para envio
+            payload: Conteúdo comum (ver OutboxJob.payload)
+            recipients: Tuplos (email, variáveis do destinatário ou None)
+            priority: Lane de agendamento
+            created_at: Data de criação (default: agora)
+            send_at: Envio agendado (UTC; None = já)
+            send_window: Segundos por que espalhar os destinatários
+
+        Returns:
+            ID do job (QUEUE-000123)
+        """
+        job = OutboxJob(
+            account_id=account.id,
+            status=QueueStatus.SCHEDULED if send_at else QueueStatus.PENDING,
+            priority=priority,
+            payload=payload,
+            total_count=len(recipients),
+            created_at=created_at or datetime.utcnow(),
+            send_at=send_at
+        )
+        db.session.add(job)
+        db.session.flush()
+
+        start = send_at or datetime.utcnow()
+        offsets = spread_offsets(len(recipients), send_window)
+        db.session.execute(insert(OutboxMessage), [
+            {
+                'job_id': job.id,
+                'recipient_email': email,
+                'variables': variables,
+                'status': EmailStatus.PENDING,
+                'next_attempt_at': start + timedelta(seconds=offset) if send_at or offset else None
+            }
+            for (email, variables), offset in zip(recipients, offsets)
+        ])
+        db.session.commit()
+
+        if send_at:
+            if self.running:
+                self.scheduler.schedule(job.id, send_at)
+            logger.info(f"Email scheduled: {job.reference} ({job.total_count} recipients) at {send_at.isoformat()}")
+            return job.reference
+
+        # Acordar workers e supervisor deste processo (os de outros processos fazem polling)
+        self._wakeup.set()
+        self._scale_event.set()
+
+        logger.info(f"Email added to queue: {job.reference} ({job.total_count} recipients)")
+        return job.reference
+
+    def get_job(self, reference: str) -> Optional[OutboxJob]:
+        """
+        Obtém job da outbox pelo ID público.
+
+        Args:
+            reference: ID devolvido por add_email (QUEUE-000123)
+
+        Returns:
+            OutboxJob atualizado a partir da BD, ou None
+        """
+        job_id = OutboxJob.parse_reference(reference)
+        if job_id is None:
+            return None
+        return db.session.get(OutboxJob, job_id, populate_existing=True)
+
+    def dead_letters(self,
+                     account_id: Optional[int] = None,
+                     job_reference: Optional[str] = None):
+        """
+        Query dos destinatários na dead-letter (falha definitiva), mais recentes primeiro.
+
+        Args:
+            account_id: Filtrar por conta
+            job_reference: Filtrar por job (QUEUE-000123)
+
+        Returns:
+            Query de OutboxMessage
+        """
+        query = OutboxMessage.query.filter(OutboxMessage.dead_lettered_at.isnot(None))
+        if account_id is not None:
+            query = query.join(OutboxJob).filter(OutboxJob.account_id == account_id)
+        if job_reference is not None:
+            query = query.filter(OutboxMessage.job_id == OutboxJob.parse_reference(job_reference))
+        return query.order_by(OutboxMessage.dead_lettered_at.desc(), OutboxMessage.id.desc())
+
+    def replay_dead_letters(self,
+                            message_ids: Optional[List[int]] = None,
+                            job_reference: Optional[str] = None) -> int:
+        """
+        Devolve destinatários da dead-letter à outbox com tentativas a zero.
+
+        Args:
+            message_ids: IDs de OutboxMessage a repetir
+            job_reference: Repetir todos os destinatários falhados do job
+
+        Returns:
+            Número de destinatários devolvidos à outbox
+        """
+        if not message_ids and not job_reference:
+            return 0
+
+        query = OutboxMessage.query.filter(
+            OutboxMessage.dead_lettered_at.isnot(None),
+            OutboxMessage.status == EmailStatus.FAILED
+        )
+        if message_ids:
+            query = query.filter(OutboxMessage.id.in_(message_ids))
+        if job_reference:
+            query = query.filter(OutboxMessage.job_id == OutboxJob.parse_reference(job_reference))
+
+        messages = query.with_for_update().all()
+        per_job: Dict[int, int] = {}
+        for message in messages:
+            message.status = EmailStatus.PENDING
+            message.attempts = 0
+            message.next_attempt_at = None
+            message.dead_lettered_at = None
+            message.processed_at = None
+            per_job[message.job_id] = per_job.get(message.job_id, 0) + 1
+
+        for job_id, count in per_job.items():
+            OutboxJob.query.filter_by(id=job_id).update({
+                OutboxJob.failed_count: OutboxJob.failed_count - count,
+                OutboxJob.status: QueueStatus.PROCESSING,
+                OutboxJob.completed_at: None
+            }, synchronize_session=False)
+
+        db.session.commit()
+        self._wakeup.set()
+
+        if messages:
+            logger.info(f"Replayed {len(messages)} dead-lettered outbox messages from {len(per_job)} jobs")
+        return len(messages)
+
     def get_queue_size(self) -> int:
         """
-        Retorna tamanho atual da queue.
-        
+        Retorna destinatários por enviar na outbox.
+
         Returns:
-            Número de itens na queue
+            Número de destinatários pendentes ou em envio
         """
-        return self.queue.qsize()
-    
+        return OutboxMessage.query.filter(
+            OutboxMessage.status.in_((EmailStatus.PENDING, EmailStatus.SENDING))
+        ).count()
+
     def get_stats(self) -> Dict[str, Any]:
         """
         Retorna estatísticas da queue.
-        
+
         Returns:
             Dict com estatísticas
         """
+        by_status = dict(
+            db.session.query(OutboxMessage.status, db.func.count(OutboxMessage.id))
+            .group_by(OutboxMessage.status).all()
+        )
         return {
             **self.stats,
-            'queue_size': self.get_queue_size(),
+            'queue_size': by_status.get(EmailStatus.PENDING, 0) + by_status.get(EmailStatus.SENDING, 0),
+            'outbox': {status.value: count for status, count in by_status.items()},
             'running': self.running,
-            'active_workers': len([w for w in self.workers if w.is_alive()])
+            'active_workers': len([w for w in self.workers if w.is_alive()]),
+            'target_workers': self.target_workers,
+            'relay_sessions': {relay: count for relay, count in self._relay_sessions.items() if count},
+            'autoscale': self.autoscaler.snapshot(),
+            'scheduler': self.scheduler.snapshot(),
+            'last_poll_at': self.last_poll_at.isoformat() if self.last_poll_at else None,
+            'last_error': self.last_error
         }
-    
+
+    def process_pending(self, worker_name: str = 'inline') -> int:
+        """
+        Processa um lote da outbox no thread atual (requer contexto da app).
+
+        Args:
+            worker_name: Nome do worker (para o token de reclamação)
+
+        Returns:
+            Número de destinatários processados
+        """
+        token = self._claim_token(worker_name)
+        claimed = self._claim_batch(token)
+        if not claimed:
+            return 0
+        return self._process_claimed(token, claimed, {})
+
     def _worker_loop(self) -> None:
         """Loop principal do worker."""
-        logger.info(f"Email worker {threading.current_thread().name} started")
-        
+        name = threading.current_thread().name
+        logger.info(f"Email worker {name} started")
+        prepared_cache: Dict[int, PreparedMessage] = {}
+        idle_wait = self.poll_interval
+
         while self.running:
+            if self._retire_surplus():
+                break
             try:
-                # Tentar obter item da queue (timeout 1s)
-                item_id, queue_item = self.queue.get(timeout=1)
-                
-                # Processar item
-                self._process_queue_item(item_id, queue_item)
-                
-                # Marcar como concluído
-                self.queue.task_done()
-                
-            except queue.Empty:
-                # Timeout - continuar loop
-                continue
+                with self.app.app_context():
+                    token = self._claim_token(name)
+                    claimed = self._claim_batch(token)
+                    processed = self._process_claimed(token, claimed, prepared_cache) if claimed else 0
+                    db.session.remove()
+
+                self.last_poll_at = datetime.utcnow()
+                self.last_error = None
+                idle_wait = self.poll_interval
+                # Sem lote ou com os relays do lote ocupados por outros workers
+                if not processed:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+
             except Exception as e:
-                logger.error(f"Worker error: {e}", exc_info=True)
-        
-        logger.info(f"Email worker {threading.current_thread().name} stopped")
-    
-    def _process_queue_item(self, item_id: str, queue_item: EmailQueueItem) -> None:
-        """
-        Processa item da queue.
-        
+                # BD indisponível ou tabela em falta: esperar cada vez mais antes de voltar a tentar
+                logger.error(f"Worker error: {e}")
+                self.last_error = str(e)
+                self._wakeup.wait(idle_wait)
+                idle_wait = min(idle_wait * 2, 60)
+
+        logger.info(f"Email worker {name} stopped")
+
+    @staticmethod
+    def _claim_token(worker_name: str) -> str:
+        """Token único de uma reclamação (host:pid:worker:aleatório)."""
+        return f"{socket.gethostname()[:40]}:{os.getpid()}:{worker_name[:20]}:{uuid.uuid4().hex[:8]}"
+
+    def _supports_skip_locked(self) -> bool:
+        """Se a base de dados suporta SELECT ... FOR UPDATE SKIP LOCKED."""
+        if self._skip_locked is None:
+            dialect = db.engine.dialect
+            version = dialect.server_version_info or ()
+            if dialect.name == 'postgresql':
+                self._skip_locked = version >= (9, 5)
+            elif dialect.name in ('mysql', 'mariadb'):
+                self._skip_locked = version >= ((10, 6) if getattr(dialect, 'is_mariadb', False) else (8, 0, 1))
+            else:
+                self._skip_locked = False
+        return self._skip_locked
+
+    def _schedule(self, backlog: Dict[Tuple[int, QueuePriority], int]) -> Dict[Tuple[int, QueuePriority], int]:
+        """
+        Distribui um lote pelas filas (conta, lane) com deficit round-robin.
+
+        Cada fila ativa recebe por ronda um quantum igual ao peso da sua lane;
+        o défice não usado transita para o lote seguinte e é descartado quando
+        a fila esvazia. O início da ronda roda entre lotes para que nenhuma
+        conta fique sempre à frente.
+
         Args:
-            item_id: ID do item
-            queue_item: Item da queue
+            backlog: Destinatários por enviar por (account_id, lane)
+
+        Returns:
+            Número de destinatários a reclamar por (account_id, lane)
+        """
+        for key in list(self._deficits):
+            if key not in backlog:
+                del self._deficits[key]
+
+        keys = sorted(backlog, key=lambda k: (k[0], k[1].value))
+        if not keys:
+            return {}
+        offset = self._round_robin % len(keys)
+        keys = keys[offset:] + keys[:offset]
+        self._round_robin += 1
+
+        allocation: Dict[Tuple[int, QueuePriority], int] = {}
+        remaining = self.batch_size
+        while remaining > 0:
+            served = False
+            for key in keys:
+                waiting = backlog[key] - allocation.get(key, 0)
+                if waiting <= 0:
+                    self._deficits.pop(key, None)
+                    continue
+                deficit = self._deficits.get(key, 0) + self.lane_weights.get(key[1], 1)
+                take = min(deficit, waiting, remaining)
+                allocation[key] = allocation.get(key, 0) + take
+                self._deficits[key] = deficit - take
+                remaining -= take
+                served = True
+                if remaining <= 0:
+                    break
+            if not served:
+                break
+
+        return allocation
+
+    def _claim_batch(self, token: str) -> List['ClaimedMessage']:
+        """
+        Reclama até batch_size destinatários pendentes ou com lease expirado.
+
+        Os jobs ativos (poucos) servem de índice: o backlog de cada fila
+        (conta, lane) é estimado pelos contadores do job e o lote é
+        repartido por _schedule antes de selecionar as linhas. Contas cujo
+        relay já está no limite de workers deste processo são ignoradas.
+
+        Args:
+            token: Token desta reclamação
+
+        Returns:
+            Cópias das linhas reclamadas (status SENDING, locked_by=token),
+            lane transactional primeiro
+        """
+        now = datetime.utcnow()
+        claimable = or_(
+            and_(
+                OutboxMessage.status == EmailStatus.PENDING,
+                or_(OutboxMessage.next_attempt_at.is_(None), OutboxMessage.next_attempt_at <= now)
+            ),
+            and_(OutboxMessage.status == EmailStatus.SENDING, OutboxMessage.locked_until < now)
+        )
+        claim = {
+            OutboxMessage.status: EmailStatus.SENDING,
+            OutboxMessage.locked_by: token,
+            OutboxMessage.locked_until: now + timedelta(seconds=self.lease_seconds),
+            OutboxMessage.attempts: OutboxMessage.attempts + 1
+        }
+
+        active_jobs = db.session.query(
+            OutboxJob.id, OutboxJob.account_id, OutboxJob.priority,
+            OutboxJob.total_count - OutboxJob.success_count - OutboxJob.failed_count,
+            EmailAccount.smtp_server, EmailAccount.smtp_port
+        ).join(EmailAccount, OutboxJob.account_id == EmailAccount.id).filter(
+            OutboxJob.status.in_((QueueStatus.PENDING, QueueStatus.PROCESSING))
+        ).all()
+
+        backlog: Dict[Tuple[int, QueuePriority], int] = {}
+        jobs_by_key: Dict[Tuple[int, QueuePriority], List[int]] = {}
+        lanes: Dict[int, QueuePriority] = {}
+        for job_id, account_id, priority, waiting, server, port in active_jobs:
+            # Relays já com max_workers_per_relay workers deste processo ficam para outro worker
+            if waiting > 0 and self._relay_sessions.get(f"{server}:{port}", 0) < self.max_workers_per_relay:
+                key = (account_id, priority)
+                backlog[key] = backlog.get(key, 0) + waiting
+                jobs_by_key.setdefault(key, []).append(job_id)
+                lanes[job_id] = priority
+
+        ids = []
+        job_ids = set()
+        for key, count in self._schedule(backlog).items():
+            candidates = OutboxMessage.query.with_entities(OutboxMessage.id, OutboxMessage.job_id).filter(
+                OutboxMessage.job_id.in_(jobs_by_key[key]), claimable
+            ).order_by(OutboxMessage.id).limit(count)
+
+            if self._supports_skip_locked():
+                candidates = candidates.with_for_update(skip_locked=True)
+            # Sem SKIP LOCKED: o UPDATE condicional só apanha linhas ainda reclamáveis,
+            # pelo que um worker concorrente que chegue primeiro fica com elas
+            for row in candidates:
+                ids.append(row.id)
+                job_ids.add(row.job_id)
+
+        if not ids:
+            db.session.rollback()
+            return []
+
+        OutboxMessage.query.filter(OutboxMessage.id.in_(ids), claimable).update(claim, synchronize_session=False)
+        OutboxJob.query.filter(OutboxJob.id.in_(job_ids), OutboxJob.status == QueueStatus.PENDING).update(
+            {OutboxJob.status: QueueStatus.PROCESSING, OutboxJob.started_at: now},
+            synchronize_session=False
+        )
+        db.session.commit()
+
+        claimed = [
+            ClaimedMessage(*row) for row in db.session.query(
+                OutboxMessage.id, OutboxMessage.job_id, OutboxMessage.recipient_email,
+                OutboxMessage.attempts, OutboxMessage.log_id, OutboxMessage.variables
+            ).filter_by(locked_by=token, status=EmailStatus.SENDING)
+        ]
+        claimed.sort(key=lambda m: (LANE_ORDER.index(lanes[m.job_id]), m.job_id, m.id))
+        return claimed
+
+    def _transactional_waiting(self) -> bool:
+        """Se há destinatários da lane transactional por reclamar."""
+        job_ids = db.session.query(OutboxJob.id).filter(
+            OutboxJob.status.in_((QueueStatus.PENDING, QueueStatus.PROCESSING)),
+            OutboxJob.priority == QueuePriority.TRANSACTIONAL
+        )
+        return db.session.query(
+            OutboxMessage.query.filter(
+                OutboxMessage.job_id.in_(job_ids.scalar_subquery()),
+                OutboxMessage.status == EmailStatus.PENDING,
+                or_(OutboxMessage.next_attempt_at.is_(None), OutboxMessage.next_attempt_at <= datetime.utcnow())
+            ).exists()
+        ).scalar()
+
+    def _heartbeat(self, token: str) -> None:
+        """Renova o lease das linhas ainda reclamadas por este token."""
+        OutboxMessage.query.filter_by(locked_by=token, status=EmailStatus.SENDING).update(
+            {OutboxMessage.locked_until: datetime.utcnow() + timedelta(seconds=self.lease_seconds)},
+            synchronize_session=False
+        )
+        db.session.commit()
+
+    def _release(self, token: str) -> int:
+        """Devolve à outbox as linhas reclamadas e não enviadas (paragem ou preempção)."""
+        # Linhas devolvidas sem tentativa de envio não contam como tentativa
+        released = OutboxMessage.query.filter_by(locked_by=token, status=EmailStatus.SENDING).update(
+            {
+                OutboxMessage.status: EmailStatus.PENDING,
+                OutboxMessage.locked_by: None,
+                OutboxMessage.locked_until: None,
+                OutboxMessage.attempts: OutboxMessage.attempts - 1
+            },
+            synchronize_session=False
+        )
+        db.session.commit()
+        if released:
+            logger.info(f"Released {released} unsent outbox messages")
+        return released
+
+    def _process_claimed(self,
+                         token: str,
+                         claimed: List['ClaimedMessage'],
+                         prepared_cache: Dict[int, PreparedMessage]) -> int:
         """
+        Envia as linhas reclamadas, agrupadas por job.
+
+        Args:
+            token: Token da reclamação
+            claimed: Linhas reclamadas (ordenadas por job)
+            prepared_cache: Mensagens preparadas por job (reutilizadas entre lotes)
+
+        Returns:
+            Número de destinatários processados
+        """
+        writer = DeliveryLogWriter(self.log_flush_size, self.log_flush_interval)
+        processed = 0
+
         try:
-            logger.info(f"Processing queue item: {item_id}")
-            queue_item.status = QueueStatus.PROCESSING
-            
-            # Preparar anexos
-            smtp_attachments = self.attachment_service.prepare_attachments_for_smtp(
-                queue_item.attachments
-            )
-            
-            # Processar cada destinatário
-            for recipient in queue_item.recipients:
+            for job_id, job_messages in groupby(claimed, key=lambda m: m.job_id):
+                if self._stopping():
+                    break
+                job = db.session.get(OutboxJob, job_id)
+                relay = f"{job.account.smtp_server}:{job.account.smtp_port}"
+                if not self._acquire_relay(relay):
+                    # Outro worker ocupou o último lugar do relay: estas linhas voltam à outbox
+                    continue
                 try:
-                    # Criar log de email
-                    log = EmailLog(
-                        account_id=queue_item.account.id,
-                        recipient_email=recipient,
-                        sender_email=queue_item.account.email_address,
-                        subject=queue_item.subject,
-                        status=EmailStatus.PENDING,
-                        variables_used={
-                            'idempotency_key': queue_item.idempotency_key,
-                            'queue_item_id': item_id,
-                            **queue_item.variables
-                        }
-                    )
-                    db.session.add(log)
-                    db.session.commit()
-                    
-                    # Marcar como enviando
-                    log.mark_sending()
-                    
-                    # Enviar email
-                    encryption_key = db.app.config.get('SECRET_KEY', '')
-                    smtp_service = SMTPService(encryption_key)
-                    
-                    success, message, message_id = smtp_service.send_email(
-                        account=queue_item.account,
-                        to_email=recipient,
-                        subject=queue_item.subject,
-                        html_content=queue_item.html_content,
-                        text_content=queue_item.text_content,
-                        from_name=queue_item.from_name,
-                        reply_to=queue_item.reply_to,
-                        cc=queue_item.cc,
-                        bcc=queue_item.bcc,
-                        attachments=smtp_attachments if smtp_attachments else None
-                    )
-                    
-                    # Atualizar log
-                    if success:
-                        log.mark_sent(message_id or '', message)
-                        queue_item.success_count += 1
-                        queue_item.results.append({
-                            'email': recipient,
-                            'status': 'sent',
-                            'message_id': message_id,
-                            'log_id': log.id
-                        })
+                    job_processed, preempted = self._process_job(token, job, list(job_messages),
+                                                                 prepared_cache, writer)
+                finally:
+                    self._release_relay(relay)
+                processed += job_processed
+                if preempted:
+                    # Restantes linhas bulk voltam à outbox; o próximo lote serve a lane transactional
+                    break
+        finally:
+            # Resultados gravados antes de devolver o resto: uma linha enviada nunca volta à outbox
+            db.session.rollback()
+            try:
+                writer.flush()
+            except Exception:
+                # Sem gravar os resultados não se devolve nada: as linhas voltam quando o lease expirar
+                logger.error(f"Keeping claim {token} until lease expiry", exc_info=True)
+            else:
+                self._release(token)
+
+        return processed
+
+    def _acquire_relay(self, relay: str) -> bool:
+        """Reserva lugar de um worker no relay (máximo max_workers_per_relay por processo)."""
+        with self._pool_lock:
+            if self._relay_sessions.get(relay, 0) >= self.max_workers_per_relay:
+                return False
+            self._relay_sessions[relay] = self._relay_sessions.get(relay, 0) + 1
+            return True
+
+    def _release_relay(self, relay: str) -> None:
+        """Liberta lugar reservado por _acquire_relay."""
+        with self._pool_lock:
+            self._relay_sessions[relay] -= 1
+
+    def _stopping(self) -> bool:
+        """Se o worker atual deve parar de iniciar novos envios."""
+        return not self.running and threading.current_thread() in self.workers
+
+    def _process_job(self,
+                     token: str,
+                     job: OutboxJob,
+                     job_messages: List['ClaimedMessage'],
+                     prepared_cache: Dict[int, PreparedMessage],
+                     writer: DeliveryLogWriter) -> Tuple[int, bool]:
+        """
+        Envia os destinatários reclamados de um job na mesma sessão SMTP.
+
+        Um job bulk é interrompido se entretanto chegar trabalho transactional.
+
+        Args:
+            token: Token da reclamação
+            job: Job da outbox
+            job_messages: Linhas reclamadas do job
+            prepared_cache: Mensagens preparadas por job
+            writer: Buffer de resultados
+
+        Returns:
+            Tuple (destinatários processados, interrompido por trabalho transactional)
+        """
+        by_email: Dict[str, List[ClaimedMessage]] = {}
+        remaining = {message.id: message for message in job_messages}
+        next_heartbeat = time.monotonic() + self.lease_seconds / 3
+        preemptible = job.priority != QueuePriority.TRANSACTIONAL
+        reference = job.reference
+        preempted = False
+        processed = 0
+        log_ids: Dict[int, int] = {}
+
+        try:
+            smtp_service = create_smtp_service(current_app.config.get('SECRET_KEY', ''))
+            prepared = prepared_cache.get(job.id)
+            if prepared is None:
+                prepared = self._prepare_job(job, smtp_service)
+                if len(prepared_cache) >= PREPARED_CACHE_SIZE:
+                    prepared_cache.pop(next(iter(prepared_cache)))
+                prepared_cache[job.id] = prepared
+
+            # Um INSERT em lote para os logs de todos os destinatários reclamados
+            log_ids = writer.create_logs([
+                (message.id, message.log_id, self._log_values(job, message, prepared)) for message in job_messages
+            ])
+            account = job.account
+            last_result = time.monotonic()
+
+            def messages():
+                nonlocal preempted
+                next_check = time.monotonic() + PREEMPT_CHECK_INTERVAL
+                for message in job_messages:
+                    # Paragem: não começar novos envios
+                    if self._stopping():
+                        return
+                    if preemptible and time.monotonic() >= next_check:
+                        if self._transactional_waiting():
+                            preempted = True
+                            return
+                        next_check = time.monotonic() + PREEMPT_CHECK_INTERVAL
+                    if isinstance(prepared, PersonalizedContent):
+                        try:
+                            rendered = prepared.render(message.recipient_email, message.variables)
+                        except TemplateError as e:
+                            # Variáveis deste destinatário não servem o template: falha definitiva só dele
+                            self._record_result(writer, job.id, reference, message, log_ids.get(message.id),
+                                                {'success': False, 'message': f'Template rendering error: {e}'})
+                            del remaining[message.id]
+                            continue
                     else:
-                        log.mark_failed(message)
-                        queue_item.failed_count += 1
-                        queue_item.results.append({
-                            'email': recipient,
-                            'status': 'failed',
-                            'error': message,
-                            'log_id': log.id
-                        })
-                    
-                    queue_item.processed_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process recipient {recipient}: {e}")
-                    queue_item.failed_count += 1
-                    queue_item.results.append({
-                        'email': recipient,
-                        'status': 'failed',
-                        'error': str(e)
-                    })
-                    queue_item.processed_count += 1
-            
-            # Marcar como concluído
-            queue_item.status = QueueStatus.COMPLETED
-            
-            # Atualizar estatísticas
-            self.stats['total_processed'] += queue_item.processed_count
-            self.stats['total_success'] += queue_item.success_count
-            self.stats['total_failed'] += queue_item.failed_count
-            
-            logger.info(f"Queue item completed: {item_id} - {queue_item.success_count} sent, {queue_item.failed_count} failed")
-            
+                        rendered = {'to_email': message.recipient_email, 'prepared': prepared}
+                    by_email.setdefault(message.recipient_email, []).append(message)
+                    yield rendered
+
+            for result in smtp_service.send_bulk_messages(account, messages()):
+                message = by_email[result['email']].pop(0)
+                self._record_result(writer, job.id, reference, message, log_ids.get(message.id), result)
+                del remaining[message.id]
+                processed += 1
+                # Latência por envio vista pelo worker (sessão SMTP incluída) para o autoscaler
+                now = time.monotonic()
+                self.autoscaler.observe_latency(now - last_result)
+                last_result = now
+
+                heartbeat_due = time.monotonic() >= next_heartbeat
+                # Gravar antes de prolongar o lease: o lease nunca cobre resultados com mais de lease/3 por gravar
+                if writer.due() or heartbeat_due:
+                    writer.flush()
+                if heartbeat_due:
+                    self._heartbeat(token)
+                    next_heartbeat = time.monotonic() + self.lease_seconds / 3
+
+        except SQLAlchemyError:
+            # Falha da BD (incluindo um flush): não é falha de envio. Os resultados ficam no
+            # buffer e _process_claimed devolve à outbox só as linhas ainda por enviar
+            db.session.rollback()
+            raise
         except Exception as e:
-            logger.error(f"Queue item processing failed: {item_id} - {e}", exc_info=True)
-            queue_item.status = QueueStatus.FAILED
-            queue_item.error_message = str(e)
-    
-    def process_bulk_email(self, 
+            # Conta, configuração SMTP ou conteúdo inválidos: falhar o que falta deste lote
+            logger.error(f"Queue item processing failed: {reference} - {e}", exc_info=True)
+            db.session.rollback()
+            OutboxJob.query.filter_by(id=job.id).update({OutboxJob.error_message: str(e)},
+                                                        synchronize_session=False)
+            for message in remaining.values():
+                log_id = log_ids.get(message.id, message.log_id)
+                self._record_result(writer, job.id, reference, message, log_id, {'success': False, 'message': str(e)})
+                processed += 1
+
+        writer.flush()
+        self._complete_if_done(job)
+        return processed, preempted
+
+    def _prepare_job(self, job: OutboxJob, smtp_service):
+        """
+        Codifica o conteúdo comum do job (uma vez por worker).
+
+        Returns:
+            PreparedMessage, ou PersonalizedContent para jobs personalizados
+        """
+        payload = job.payload
+        smtp_attachments = self.attachment_service.prepare_attachments_for_smtp(payload.get('attachments') or [])
+        if payload.get('personalized'):
+            return PersonalizedContent(payload, smtp_attachments)
+
+        return smtp_service.prepare_message(
+            account=job.account,
+            subject=payload.get('subject'),
+            html_content=payload.get('html_content'),
+            text_content=payload.get('text_content'),
+            from_name=payload.get('from_name'),
+            reply_to=payload.get('reply_to'),
+            cc=payload.get('cc'),
+            bcc=payload.get('bcc'),
+            attachments=smtp_attachments if smtp_attachments else None
+        )
+
+    @staticmethod
+    def _log_values(job: OutboxJob, message: 'ClaimedMessage', prepared=None) -> Dict[str, Any]:
+        """Colunas do EmailLog do destinatário (status sending: a linha já está reclamada)."""
+        payload = job.payload
+        subject = payload.get('subject')
+        variables = payload.get('variables') or {}
+        if isinstance(prepared, PersonalizedContent):
+            variables = prepared.context(message.variables)
+            try:
+                subject = prepared.subject.render(variables)
+            except TemplateError:
+                pass
+        return {
+            'account_id': job.account_id,
+            'recipient_email': message.recipient_email,
+            'sender_email': job.account.email_address,
+            'subject': subject,
+            'status': EmailStatus.SENDING,
+            'variables_used': {
+                'idempotency_key': payload.get('idempotency_key'),
+                'queue_item_id': job.reference,
+                **variables
+            }
+        }
+
+    def _record_result(self,
+                       writer: DeliveryLogWriter,
+                       job_id: int,
+                       reference: str,
+                       message: 'ClaimedMessage',
+                       log_id: Optional[int],
+                       result: Dict[str, Any]) -> None:
+        """
+        Acumula resultado do destinatário, do log e dos contadores do job.
+
+        Falhas temporárias voltam a pending com next_attempt_at (backoff
+        exponencial com jitter) até OUTBOX_MAX_ATTEMPTS; as restantes falhas
+        ficam na dead-letter.
+        """
+        success = result['success']
+        now = datetime.utcnow()
+        row = {'id': message.id, 'locked_by': None, 'locked_until': None,
+               'error_message': None if success else result['message']}
+
+        if not success and result.get('transient') and message.attempts < self.max_attempts:
+            delay = self.retry_delay(message.attempts)
+            row.update(status=EmailStatus.PENDING, next_attempt_at=now + timedelta(seconds=delay))
+            log = {'id': log_id, 'status': EmailStatus.PENDING, 'error_message': result['message']}
+            writer.record(row, log if log_id else None)
+
+            logger.warning(f"Transient failure for {message.recipient_email} ({reference}), "
+                           f"attempt {message.attempts}/{self.max_attempts}, retrying in {delay:.0f}s")
+            self.stats['total_retried'] += 1
+            self.last_poll_at = now
+            return
+
+        row.update(
+            status=EmailStatus.SENT if success else EmailStatus.FAILED,
+            next_attempt_at=None,
+            dead_lettered_at=None if success else now,
+            processed_at=now
+        )
+        if success:
+            log = {'id': log_id, 'status': EmailStatus.SENT, 'message_id': result.get('message_id') or '',
+                   'smtp_response': result['message'], 'sent_at': now}
+            if result.get('timings'):
+                log['delivery_timings'] = result['timings']
+        else:
+            log = {'id': log_id, 'status': EmailStatus.FAILED, 'error_message': result['message']}
+            logger.error(f"Email {log_id} marked as failed: {result['message']}")
+
+        writer.record(row, log if log_id else None, job_id, 'success' if success else 'failed')
+
+        self.stats['total_processed'] += 1
+        self.last_poll_at = now
+        self.stats['total_success' if success else 'total_failed'] += 1
+
+    def retry_delay(self, attempts: int) -> float:
+        """
+        Espera até à próxima tentativa (exponencial com jitter).
+
+        Args:
+            attempts: Tentativas já feitas
+
+        Returns:
+            Segundos entre metade e a totalidade do backoff exponencial
+        """
+        backoff = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** max(attempts - 1, 0))
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    @staticmethod
+    def _complete_if_done(job: OutboxJob) -> None:
+        """Marca job como concluído quando todos os destinatários foram processados."""
+        completed = OutboxJob.query.filter(
+            OutboxJob.id == job.id,
+            OutboxJob.status != QueueStatus.COMPLETED,
+            OutboxJob.success_count + OutboxJob.failed_count >= OutboxJob.total_count
+        ).update(
+            {OutboxJob.status: QueueStatus.COMPLETED, OutboxJob.completed_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.session.commit()
+
+        if completed:
+            get_job_progress_notifier().publish()
+            db.session.refresh(job)
+            logger.info(f"Queue item completed: {job.reference} - {job.success_count} sent, {job.failed_count} failed")
+
+    def process_bulk_email(self,
                           account: EmailAccount,
                           recipients: List[str],
                           subject: str,
@@ -318,10 +1250,13 @@ class EmailQueue:
                           cc: Optional[List[str]] = None,
                           bcc: Optional[List[str]] = None,
                           idempotency_key: Optional[str] = None,
-                          variables: Optional[Dict[str, Any]] = None) -> str:
+                          variables: Optional[Dict[str, Any]] = None,
+                          priority: QueuePriority = QueuePriority.BULK,
+                          send_at: Optional[datetime] = None,
+                          send_window: float = 0) -> str:
         """
         Processa email em lote.
-        
+
         Args:
             account: Conta de email
             recipients: Lista de destinatários
@@ -335,7 +1270,10 @@ class EmailQueue:
             bcc: Lista BCC
             idempotency_key: Chave de idempotência
             variables: Variáveis
-            
+            priority: Lane de agendamento
+            send_at: Envio agendado (UTC; None = já)
+            send_window: Segundos por que espalhar os destinatários
+
         Returns:
             ID do item da queue
         """
@@ -352,15 +1290,55 @@ class EmailQueue:
             cc=cc,
             bcc=bcc,
             idempotency_key=idempotency_key,
-            variables=variables
+            variables=variables,
+            priority=priority,
+            send_at=send_at,
+            send_window=send_window
         )
-        
+
         # Adicionar à queue
         return self.add_email(queue_item)
 
 
 # Instância global da queue
 email_queue = EmailQueue(max_workers=2)
+_start_lock = threading.Lock()
+
+
+def init_email_queue(app: Flask) -> None:
+    """
+    Configura a queue global e agenda o arranque dos workers do processo web.
+
+    Os workers arrancam no primeiro pedido HTTP (depois do fork dos
+    servidores WSGI e nunca em comandos CLI), com EMAIL_QUEUE_WORKERS > 0
+    e se a tabela da outbox existir (migrações aplicadas).
+
+    Args:
+        app: Aplicação Flask
+    """
+    email_queue.init_app(app)
+
+    if email_queue.max_workers <= 0 or app.testing:
+        return
+
+    checked = threading.Event()
+
+    def start_workers_on_first_request() -> None:
+        if checked.is_set():
+            return
+        with _start_lock:
+            if checked.is_set():
+                return
+            checked.set()
+
+            if not inspect(db.engine).has_table(OutboxMessage.__tablename__):
+                logger.info("Outbox tables missing (run 'flask db upgrade'); email queue workers not started")
+                return
+
+            email_queue.start()
+            atexit.register(email_queue.stop)
+
+    app.before_request(start_workers_on_first_request)
 
 
 def start_email_queue() -> None:
@@ -376,7 +1354,7 @@ def stop_email_queue() -> None:
 def get_email_queue() -> EmailQueue:
     """
     Retorna instância da queue global.
-    
+
     Returns:
         Instância da EmailQueue
     """
@@ -5,7 +5,7 @@ from flask import current_app
 
 from ..models import Domain, EmailAccount, EmailTemplate, EmailLog
 from ..models.log import EmailStatus
-from ..services.smtp_service import SMTPService
+from ..services.smtp_service import create_smtp_service
 from ..services.template_service import TemplateService
 from ..extensions import db
 from ..utils.logging import get_logger
@@ -24,7 +24,7 @@ class EmailService:
             encryption_key: Chave de encriptação (usa config se não fornecida)
         """
         self.encryption_key = encryption_key or current_app.config.get('ENCRYPTION_KEY')
-        self.smtp_service = SMTPService(self.encryption_key)
+        self.smtp_service = create_smtp_service(self.encryption_key)
         self.template_service = TemplateService()
     
     def send_email(
@@ -150,7 +150,7 @@ class EmailService:
             
             # Atualizar log
             if success:
-                log.mark_sent(message_id, message)
+                log.mark_sent(message_id, message, self.smtp_service.last_timings)
             else:
                 log.mark_failed(message)
             
@@ -227,34 +227,104 @@ class EmailService:
             'errors': []
         }
         
-        # Processar em lotes
-        for i in range(0, len(recipients), batch_size):
-            batch = recipients[i:i + batch_size]
-            
-            for recipient in batch:
+        # Resolver domínio, conta e template uma única vez
+        domain = Domain.get_by_name(domain_name)
+        account = domain.get_account_by_local_part(account_local_part) if domain else None
+        template = domain.get_template_by_key(template_key) if domain else None
+        
+        error = None
+        if not domain or not domain.is_active:
+            error = f"Domain {domain_name} not found or inactive"
+        elif not account or not account.is_active:
+            error = f"Account {account_local_part}@{domain_name} not found or inactive"
+        elif not template:
+            error = f"Template {template_key} not found"
+        else:
+            within_limits, limit_msg = account.is_within_limits()
+            if not within_limits:
+                error = limit_msg
+        
+        if error:
+            results['failed'] = len(recipients)
+            results['errors'] = [{'email': r.get('email'), 'error': error} for r in recipients]
+            return results
+        
+        pending_logs = {}
+        
+        def valid_recipients():
+            for recipient in recipients:
+                is_valid, missing = template.validate_variables(recipient.get('variables', {}))
+                if not is_valid:
+                    results['failed'] += 1
+                    results['errors'].append({
+                        'email': recipient.get('email'),
+                        'error': f"Missing required variables: {', '.join(missing)}"
+                    })
+                    continue
+                yield recipient
+        
+        def prepared_messages():
+            # Renderização em lote (pool de processos em campanhas grandes), pela ordem dos destinatários
+            valid = list(valid_recipients())
+            rendered_all = self.template_service.render_batch(
+                template, (recipient.get('variables', {}) for recipient in valid)
+            )
+            for recipient, rendered in zip(valid, rendered_all):
                 email = recipient.get('email')
                 variables = recipient.get('variables', {})
                 
-                success, message, log_id = self.send_template_email(
-                    domain_name=domain_name,
-                    account_local_part=account_local_part,
-                    to_email=email,
-                    template_key=template_key,
-                    variables=variables,
-                    from_name=from_name
+                if rendered.error:
+                    results['failed'] += 1
+                    results['errors'].append({'email': email, 'error': rendered.error})
+                    continue
+                
+                log = EmailLog(
+                    account_id=account.id,
+                    template_id=template.id,
+                    recipient_email=email,
+                    sender_email=account.email_address,
+                    subject=rendered.subject,
+                    status=EmailStatus.SENDING,
+                    variables_used=variables
                 )
+                db.session.add(log)
+                pending_logs.setdefault(email, []).append(log)
                 
-                if success:
-                    results['sent'] += 1
-                else:
-                    results['failed'] += 1
-                    results['errors'].append({
-                        'email': email,
-                        'error': message
-                    })
+                yield {
+                    'to_email': email,
+                    'subject': rendered.subject,
+                    'html_content': rendered.html,
+                    'text_content': rendered.text,
+                    'from_name': from_name
+                }
+        
+        # Entregar todas as mensagens em sessões SMTP partilhadas
+        processed = 0
+        for result in self.smtp_service.send_bulk_messages(account, prepared_messages()):
+            log = pending_logs[result['email']].pop(0)
+            
+            if result['success']:
+                log.status = EmailStatus.SENT
+                log.message_id = result['message_id']
+                log.smtp_response = result['message']
+                log.delivery_timings = result['timings']
+                log.sent_at = datetime.utcnow()
+                results['sent'] += 1
+            else:
+                log.status = EmailStatus.FAILED
+                log.error_message = result['message']
+                results['failed'] += 1
+                results['errors'].append({
+                    'email': result['email'],
+                    'error': result['message']
+                })
             
             # Commit após cada lote
-            db.session.commit()
+            processed += 1
+            if processed % batch_size == 0:
+                db.session.commit()
+        
+        db.session.commit()
         
         return results
     
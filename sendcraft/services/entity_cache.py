@@ -0,0 +1,303 @@
+"""
+Cache de resolução de domínios, contas e templates para SendCraft.
+
+Os endpoints de envio resolvem o domínio pelo nome, a conta pelo email e
+o template pela chave em cada pedido. Esta cache guarda cópias destacadas
+das entidades resolvidas durante alguns segundos e junta-as à sessão do
+pedido sem ir à BD (Session.merge com load=False). As rotas que editam
+domínios, contas e templates invalidam-na explicitamente; com
+invalidação partilhada, a invalidação chega aos outros processos através
+de um contador na tabela cache_versions.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from sqlalchemy import inspect, select, update, insert
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..extensions import db
+from ..models import Domain, EmailAccount, EmailTemplate
+from ..models.cache_version import CacheVersion
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Nome do contador desta cache na tabela cache_versions
+VERSION_NAME = 'entities'
+
+
+def _snapshot(instance):
+    """
+    Cópia destacada das colunas de uma entidade (sem relações carregadas).
+
+    Args:
+        instance: Entidade carregada da BD
+
+    Returns:
+        Nova instância destacada, com a mesma identidade
+    """
+    mapper = inspect(instance).mapper
+    copy = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        set_committed_value(copy, attr.key, getattr(instance, attr.key))
+    make_transient_to_detached(copy)
+    return copy
+
+
+class EntityCache:
+    """
+    Cache read-through em processo de Domain, EmailAccount e EmailTemplate.
+
+    Cada entrada expira ao fim de `ttl` segundos. Só são guardadas
+    entidades encontradas (um domínio criado a seguir a um 404 é visto de
+    imediato). As entidades devolvidas pertencem à sessão do pedido e
+    são só para leitura: editar uma entidade deve ser feito numa rota que
+    a carregue da BD e depois chame invalidate().
+    """
+
+    def __init__(self,
+                 ttl: float = 60,
+                 shared_invalidation: bool = False,
+                 version_check_interval: float = 2):
+        """
+        Inicializa cache vazia.
+
+        Args:
+            ttl: Segundos de validade de cada entrada (0 = cache desligada)
+            shared_invalidation: Propagar invalidações entre processos pela tabela cache_versions
+            version_check_interval: Segundos entre leituras do contador partilhado
+        """
+        self.ttl = ttl
+        self.shared_invalidation = shared_invalidation
+        self.version_check_interval = version_check_interval
+        self._entries: Dict[Tuple, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        # Incrementada em cada invalidação: um carregamento que a atravessou não é guardado
+        self._generation = 0
+        self._shared_version: Optional[int] = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get_domain(self, name: str) -> Optional[Domain]:
+        """
+        Domínio pelo nome (ver Domain.get_by_name).
+
+        Args:
+            name: Nome do domínio
+
+        Returns:
+            Domínio ou None
+        """
+        return self._get(('domain', name), lambda: Domain.get_by_name(name))
+
+    def get_account(self, email: str) -> Optional[EmailAccount]:
+        """
+        Conta pelo endereço de email (ver EmailAccount.get_by_email).
+
+        Args:
+            email: Endereço de email
+
+        Returns:
+            Conta ou None
+        """
+        return self._get(('account', email), lambda: EmailAccount.get_by_email(email))
+
+    def get_template(self, domain_id: int, template_key: str, active_only: bool = True) -> Optional[EmailTemplate]:
+        """
+        Template pela chave no domínio (ver EmailTemplate.get_by_key).
+
+        Args:
+            domain_id: ID do domínio
+            template_key: Chave do template
+            active_only: Só templates ativos (False devolve também inativos)
+
+        Returns:
+            Template ou None
+        """
+        if active_only:
+            loader = lambda: EmailTemplate.get_by_key(domain_id, template_key)
+        else:
+            loader = lambda: EmailTemplate.query.filter_by(
+                domain_id=domain_id, template_key=template_key
+            ).first()
+        return self._get(('template', domain_id, template_key, active_only), loader)
+
+    def _get(self, key: Tuple, loader: Callable[[], Any]) -> Any:
+        """
+        Retorna entidade da cache (na sessão atual) ou carrega-a.
+
+        Args:
+            key: Tipo da entidade e chave de pesquisa
+            loader: Consulta à BD
+
+        Returns:
+            Entidade ou None
+        """
+        if self.ttl <= 0:
+            return loader()
+
+        self._check_shared_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                snapshot = entry[1]
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                    self.expirations += 1
+                self.misses += 1
+                snapshot = None
+                generation = self._generation
+
+        if snapshot is not None:
+            # Sem SQL: se a entidade já estiver na sessão, é essa a devolvida
+            return db.session.merge(snapshot, load=False)
+
+        instance = loader()
+        if instance is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (now + self.ttl, _snapshot(instance))
+        return instance
+
+    def invalidate(self, kind: Optional[str] = None, entity_id: Optional[int] = None) -> None:
+        """
+        Remove entradas de uma entidade, de um tipo ou todas; com invalidação
+        partilhada, incrementa também o contador lido pelos outros processos.
+
+        Chamar depois do commit da alteração.
+
+        Args:
+            kind: 'domain', 'account' ou 'template' (None = tudo)
+            entity_id: ID da entidade (None = todas as do tipo)
+        """
+        self._discard(kind, entity_id)
+        if self.shared_invalidation:
+            self._bump_shared_version()
+        logger.debug(f"Entity cache invalidated (kind={kind}, id={entity_id})")
+
+    def _discard(self, kind: Optional[str] = None, entity_id: Optional[int] = None) -> None:
+        """Remove entradas localmente."""
+        with self._lock:
+            self.invalidations += 1
+            self._generation += 1
+            if kind is None:
+                self._entries.clear()
+                return
+            for key in [
+                k for k, (_, snapshot) in self._entries.items()
+                if k[0] == kind and (entity_id is None or snapshot.id == entity_id)
+            ]:
+                del self._entries[key]
+
+    def _check_shared_version(self) -> None:
+        """Lê o contador partilhado de tempos a tempos e limpa a cache se mudou."""
+        if not self.shared_invalidation:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._version_checked_at < self.version_check_interval:
+                return
+            self._version_checked_at = now
+
+        table = CacheVersion.__table__
+        try:
+            # Ligação própria: não abre nem termina a transação da sessão do pedido
+            with db.engine.connect() as conn:
+                version = conn.execute(
+                    select(table.c.version).where(table.c.name == VERSION_NAME)
+                ).scalar() or 0
+        except Exception as e:
+            logger.warning(f"Entity cache version check failed: {e}")
+            self._discard()
+            return
+
+        if version != self._shared_version:
+            if self._shared_version is not None:
+                self._discard()
+            self._shared_version = version
+
+    def _bump_shared_version(self) -> None:
+        """Incrementa o contador partilhado."""
+        table = CacheVersion.__table__
+        values = {'updated_at': datetime.utcnow()}
+        try:
+            with db.engine.begin() as conn:
+                updated = conn.execute(
+                    update(table).where(table.c.name == VERSION_NAME)
+                    .values(version=table.c.version + 1, **values)
+                ).rowcount
+                if not updated:
+                    conn.execute(insert(table).values(name=VERSION_NAME, version=1, **values))
+                version = conn.execute(
+                    select(table.c.version).where(table.c.name == VERSION_NAME)
+                ).scalar()
+        except Exception as e:
+            # Os outros processos ficam com as entradas até ao fim do TTL
+            logger.warning(f"Entity cache version bump failed: {e}")
+            return
+
+        with self._lock:
+            # O próprio incremento não deve limpar a cache outra vez na próxima leitura
+            if self._shared_version is None or self._shared_version == version - 1:
+                self._shared_version = version
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas da cache.
+
+        Returns:
+            Dict com entradas, TTL e contadores
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+                'shared_invalidation': self.shared_invalidation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+
+# Instância global
+_entity_cache: Optional[EntityCache] = None
+_entity_cache_lock = threading.Lock()
+
+
+def get_entity_cache() -> EntityCache:
+    """
+    Retorna cache global de resolução de entidades.
+
+    Returns:
+        Instância do EntityCache
+    """
+    global _entity_cache
+
+    if _entity_cache is None:
+        with _entity_cache_lock:
+            if _entity_cache is None:
+                options = {}
+                try:
+                    from flask import current_app
+                    config = current_app.config
+                    options = {
+                        'ttl': config.get('ENTITY_CACHE_TTL_SECONDS', 60),
+                        'shared_invalidation': config.get('ENTITY_CACHE_SHARED_INVALIDATION', False),
+                        'version_check_interval': config.get('ENTITY_CACHE_VERSION_CHECK_SECONDS', 2)
+                    }
+                except RuntimeError:
+                    # Fora do contexto da app: usar defaults
+                    pass
+                _entity_cache = EntityCache(**options)
+
+    return _entity_cache
@@ -14,6 +14,8 @@ from email.message import EmailMessage
 
 from ..models import EmailAccount, EmailInbox
 from ..extensions import db
+from .account_cache import get_account_config_cache
+from .transport_probe import race_connections
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -38,20 +40,23 @@ class IMAPService:
         """
         Conecta ao servidor IMAP usando configuração cPanel VBS (60s timeout + socket options).
         
+        SSL e o fallback STARTTLS são ligados em paralelo (ver race_connections),
+        pelo que um servidor que não responde num modo não bloqueia o outro.
+        O login só é feito na ligação vencedora: uma password errada conta
+        uma única tentativa falhada no servidor, sem fallback.
+        
         Args:
             config: Configuração IMAP (opcional, usa account se não fornecido)
             
         Returns:
             True se conectou com sucesso
         """
-        import socket
-        
         try:
             # Usar config fornecido ou do account
             if not config and self.account:
                 from flask import current_app
                 encryption_key = current_app.config.get('SECRET_KEY', '')
-                config = self.account.get_imap_config(encryption_key)
+                config = get_account_config_cache().get_imap_config(self.account, encryption_key)
             
             if not config:
                 logger.error("No IMAP configuration provided")
@@ -66,95 +71,98 @@ class IMAPService:
             
             logger.info(f"🔗 Connecting to {server}:{port} as {username} (cPanel VBS mode)")
             
-            # PRIMARY: SSL/TLS connection (993 from cPanel VBS)
+            # PRIMARY: SSL/TLS (993 from cPanel VBS); FALLBACK: STARTTLS (porta 143)
+            # Ambos ligam em paralelo; fica a primeira ligação cifrada
+            candidates = []
             if use_ssl:
+                candidates.append(('ssl', port))
+            candidates.append(('starttls', 143))
+            
+            index, connection, errors = race_connections(
+                candidates,
+                connect=lambda candidate: self._open_connection(server, *candidate),
+                close=lambda conn: conn.shutdown()
+            )
+            
+            if connection is None:
+                for (mode, candidate_port), error in zip(candidates, errors):
+                    if error is not None:
+                        logger.warning(f"IMAP {mode.upper()} connection to {server}:{candidate_port} failed: {error}")
+                self.is_connected = False
+                return False
+            
+            mode, candidate_port = candidates[index]
+            try:
+                result = connection.login(username, password)
+                if result[0] != 'OK':
+                    raise imaplib.IMAP4.error(f"Login failed: {result}")
+            except Exception as e:
+                logger.error(f"IMAP login to {server}:{candidate_port} failed: {e}")
                 try:
-                    # Criar contexto SSL seguro (cPanel compatible)
-                    ssl_context = ssl.create_default_context()
-                    ssl_context.minimum_version = ssl.TLSVersion.TLSv1_2
-                    ssl_context.check_hostname = True
-                    ssl_context.verify_mode = ssl.CERT_REQUIRED
-                    
-                    # Create SSL connection
-                    self.connection = imaplib.IMAP4_SSL(server, port, ssl_context=ssl_context)
-                    
-                    # CRITICAL: Apply cPanel timeout (60 seconds from VBS: 0000003c hex)
-                    self.connection.sock.settimeout(60)
-                    
-                    # CRITICAL: Apply cPanel socket options (Windows Live Mail settings)
-                    self.connection.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
-                    if hasattr(socket, 'TCP_NODELAY'):
-                        self.connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-                    
-                    # Authenticate
-                    result = self.connection.login(username, password)
-                    
-                    if result[0] == 'OK':
-                        self.is_connected = True
-                        logger.info("✅ IMAP connected with cPanel VBS settings (SSL 60s timeout)")
-                        return True
-                        
-                except (socket.timeout, ssl.SSLError, ConnectionResetError) as e:
-                    logger.warning(f"SSL connection failed: {e}")
-                    logger.info("🔄 Trying cPanel STARTTLS fallback (port 143)...")
-                    
-                    # FALLBACK: STARTTLS configuration (from non-SSL VBS file)
-                    return self._connect_starttls_cpanel(server, username, password)
-                    
-            else:
-                # Non-SSL connection with STARTTLS
-                return self._connect_starttls_cpanel(server, username, password)
+                    connection.shutdown()
+                except Exception:
+                    pass
+                self.is_connected = False
+                return False
+            
+            self.connection = connection
+            self.is_connected = True
+            logger.info(f"✅ IMAP connected with cPanel VBS settings ({mode.upper()} {candidate_port}, 60s timeout)")
+            return True
             
-        except imaplib.IMAP4.error as e:
-            logger.error(f"IMAP error during connection: {e}")
-            self.is_connected = False
-            return False
         except Exception as e:
             logger.error(f"Failed to connect to IMAP server: {e}")
             self.is_connected = False
             return False
     
-    def _connect_starttls_cpanel(self, server: str, username: str, password: str) -> bool:
+    @staticmethod
+    def _open_connection(server: str, mode: str, port: int) -> imaplib.IMAP4:
         """
-        Fallback to STARTTLS using cPanel non-SSL VBS settings (port 143).
+        Abre ligação IMAP cifrada (ainda sem login) com as opções de socket do cPanel.
         
         Args:
             server: IMAP server hostname
-            username: Username for authentication
-            password: Password for authentication
+            mode: 'ssl' (SSL implícito) ou 'starttls'
+            port: Porta IMAP
             
         Returns:
-            True if connection successful
+            Ligação IMAP por autenticar
+            
+        Raises:
+            OSError, ssl.SSLError, imaplib.IMAP4.error: Se a ligação ou o STARTTLS falharem
         """
         import socket
         
-        try:
-            logger.info("📡 Connecting via STARTTLS (port 143)...")
+        if mode == 'ssl':
+            # Criar contexto SSL seguro (cPanel compatible)
+            ssl_context = ssl.create_default_context()
+            ssl_context.minimum_version = ssl.TLSVersion.TLSv1_2
+            ssl_context.check_hostname = True
+            ssl_context.verify_mode = ssl.CERT_REQUIRED
             
-            # Connect to port 143 (non-SSL from VBS)
-            self.connection = imaplib.IMAP4(server, 143)
+            connection = imaplib.IMAP4_SSL(server, port, ssl_context=ssl_context, timeout=60)
+        else:
+            connection = imaplib.IMAP4(server, port, timeout=60)
+        
+        try:
+            # CRITICAL: Apply cPanel timeout (60 seconds from VBS: 0000003c hex)
+            connection.sock.settimeout(60)
             
-            # Apply same 60s timeout as SSL version
-            self.connection.sock.settimeout(60)
-            self.connection.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # CRITICAL: Apply cPanel socket options (Windows Live Mail settings)
+            connection.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
             if hasattr(socket, 'TCP_NODELAY'):
-                self.connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            
-            # Start TLS
-            self.connection.starttls()
-            
-            # Login
-            result = self.connection.login(username, password)
-            
-            if result[0] == 'OK':
-                self.is_connected = True
-                logger.info("✅ IMAP connected via STARTTLS (143) with cPanel settings")
-                return True
-                
-        except Exception as e:
-            logger.error(f"STARTTLS fallback failed: {e}")
-            
-        return False
+                connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            
+            if mode == 'starttls':
+                connection.starttls()
+        except BaseException:
+            try:
+                connection.shutdown()
+            except Exception:
+                pass
+            raise
+        
+        return connection
     
     def disconnect(self) -> None:
         """Desconecta do servidor IMAP."""
@@ -566,7 +574,7 @@ class IMAPService:
             if not self.is_connected:
                 from flask import current_app
                 encryption_key = current_app.config.get('SECRET_KEY', '')
-                config = account.get_imap_config(encryption_key)
+                config = get_account_config_cache().get_imap_config(account, encryption_key)
                 if not self.connect(config):
                     return 0
             
@@ -0,0 +1,157 @@
+"""
+Progresso dos jobs da outbox para SendCraft.
+
+Contadores de um job lidos da BD (fonte de verdade, partilhada por todos
+os processos) e um notificador em processo que acorda os streams SSE
+quando os workers deste processo gravam resultados, para que não tenham
+de esperar pelo próximo polling.
+"""
+import threading
+from typing import Dict, Any, Optional
+
+from sqlalchemy import func, case
+
+from ..models.log import EmailStatus
+from ..models.outbox import OutboxJob, OutboxMessage, QueueStatus, QueuePriority
+from ..extensions import db
+
+# Contadores incluídos nos deltas do stream de eventos
+PROGRESS_COUNTERS = ('pending', 'retrying', 'sending', 'sent', 'failed', 'dead_lettered')
+FINAL_STATUSES = (QueueStatus.COMPLETED, QueueStatus.FAILED)
+
+
+def job_progress(job: OutboxJob) -> Dict[str, Any]:
+    """
+    Estado e contadores de um job (requer contexto da app).
+
+    Args:
+        job: Job da outbox
+
+    Returns:
+        Dict com status, timestamps e contadores por estado dos destinatários
+    """
+    counts = {counter: 0 for counter in PROGRESS_COUNTERS}
+    rows = db.session.query(
+        OutboxMessage.status,
+        func.count(OutboxMessage.id),
+        func.sum(case((OutboxMessage.attempts > 0, 1), else_=0)),
+        func.count(OutboxMessage.dead_lettered_at)
+    ).filter(OutboxMessage.job_id == job.id).group_by(OutboxMessage.status).all()
+
+    for status, count, attempted, dead_lettered in rows:
+        counts['dead_lettered'] += dead_lettered
+        if status == EmailStatus.PENDING:
+            counts['pending'] += count
+            counts['retrying'] += attempted or 0
+        elif status == EmailStatus.SENDING:
+            counts['sending'] += count
+        elif status == EmailStatus.FAILED:
+            counts['failed'] += count
+        else:
+            counts['sent'] += count
+
+    total = job.total_count or 0
+    processed = counts['sent'] + counts['failed']
+    status = job.status.value if isinstance(job.status, QueueStatus) else job.status
+
+    return {
+        'message_id': job.reference,
+        'status': status,
+        'priority': job.priority.value if isinstance(job.priority, QueuePriority) else job.priority,
+        'total': total,
+        'processed': processed,
+        'progress': round(processed / total, 4) if total else 1.0,
+        'counts': counts,
+        'created_at': _timestamp(job.created_at),
+        'send_at': _timestamp(job.send_at),
+        'started_at': _timestamp(job.started_at),
+        'completed_at': _timestamp(job.completed_at),
+        'error_message': job.error_message
+    }
+
+
+def progress_delta(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Diferença dos contadores entre dois estados de job_progress().
+
+    Args:
+        previous: Estado anterior (None = tudo novo)
+        current: Estado atual
+
+    Returns:
+        Contadores que mudaram, com a variação
+    """
+    before = previous['counts'] if previous else {}
+    return {
+        counter: current['counts'][counter] - before.get(counter, 0)
+        for counter in PROGRESS_COUNTERS
+        if current['counts'][counter] != before.get(counter, 0)
+    }
+
+
+def _timestamp(value) -> Optional[str]:
+    """Datetime UTC naive em ISO 8601 com Z."""
+    return value.isoformat() + 'Z' if value else None
+
+
+class JobProgressNotifier:
+    """
+    Sinal em processo de que houve progresso em jobs da outbox.
+
+    Guarda só um número de sequência global: quem espera volta a ler o
+    seu job da BD quando a sequência muda (ou no timeout, para o
+    progresso feito por workers de outros processos).
+    """
+
+    def __init__(self):
+        """Inicializa notificador."""
+        self._condition = threading.Condition()
+        self._sequence = 0
+
+    @property
+    def sequence(self) -> int:
+        """Sequência atual."""
+        return self._sequence
+
+    def publish(self) -> None:
+        """Assinala progresso (chamado depois do commit dos resultados)."""
+        with self._condition:
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def wait(self, sequence: int, timeout: float) -> int:
+        """
+        Espera por progresso posterior a `sequence`.
+
+        Args:
+            sequence: Última sequência vista
+            timeout: Segundos máximos de espera
+
+        Returns:
+            Sequência atual
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != sequence, timeout)
+            return self._sequence
+
+
+# Instância global
+_job_progress_notifier: Optional[JobProgressNotifier] = None
+_notifier_lock = threading.Lock()
+
+
+def get_job_progress_notifier() -> JobProgressNotifier:
+    """
+    Retorna notificador de progresso global.
+
+    Returns:
+        Instância do JobProgressNotifier
+    """
+    global _job_progress_notifier
+
+    if _job_progress_notifier is None:
+        with _notifier_lock:
+            if _job_progress_notifier is None:
+                _job_progress_notifier = JobProgressNotifier()
+
+    return _job_progress_notifier
@@ -0,0 +1,149 @@
+"""
+Escrita em lote dos resultados de envio para SendCraft.
+
+Os workers da outbox acumulam as transições de estado (OutboxMessage,
+EmailLog e contadores do job) e gravam-nas numa única transação com
+executemany, quando o buffer atinge um tamanho ou uma idade máxima.
+"""
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import update
+
+from ..models import EmailLog
+from ..models.outbox import OutboxJob, OutboxMessage
+from ..extensions import db
+from ..services.job_progress import get_job_progress_notifier
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class DeliveryLogWriter:
+    """
+    Buffer de group commit para os resultados de um worker.
+
+    O estado "enviado" de uma linha e o respetivo EmailLog são sempre
+    escritos na mesma transação. Quem usa o buffer tem de chamar flush()
+    antes de devolver linhas reclamadas à outbox. Por omissão cada
+    resultado é gravado antes do envio seguinte; com flush_size > 1 um
+    processo que morra sem flush pode voltar a enviar, depois de o lease
+    expirar, no máximo os resultados ainda em buffer.
+    """
+
+    def __init__(self, flush_size: int = 1, flush_interval: float = 0.5):
+        """
+        Inicializa buffer.
+
+        Args:
+            flush_size: Resultados acumulados que forçam escrita (1 = sem agrupamento)
+            flush_interval: Idade máxima em segundos do resultado mais antigo por gravar
+        """
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._messages: List[Dict[str, Any]] = []
+        self._logs: List[Dict[str, Any]] = []
+        self._counters: Dict[int, List[int]] = {}
+        self._oldest: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def create_logs(self, logs: List[Tuple[int, Optional[int], Dict[str, Any]]]) -> Dict[int, int]:
+        """
+        Cria (ou reativa) os EmailLog de um lote reclamado numa transação.
+
+        Args:
+            logs: Tuplos (id da OutboxMessage, log_id existente ou None,
+                colunas do EmailLog a criar)
+
+        Returns:
+            log_id por id de OutboxMessage
+        """
+        new_logs = [(message_id, EmailLog(**values)) for message_id, log_id, values in logs if log_id is None]
+        log_ids = {message_id: log_id for message_id, log_id, _ in logs if log_id is not None}
+
+        if new_logs:
+            db.session.add_all([log for _, log in new_logs])
+            db.session.flush()
+            log_ids.update((message_id, log.id) for message_id, log in new_logs)
+            db.session.execute(update(OutboxMessage), [
+                {'id': message_id, 'log_id': log.id} for message_id, log in new_logs
+            ])
+
+        # Logs de tentativas anteriores voltam a "sending"
+        reused = [{'id': log_id, 'status': values['status']} for _, log_id, values in logs if log_id is not None]
+        if reused:
+            db.session.execute(update(EmailLog), reused)
+
+        db.session.commit()
+        return log_ids
+
+    def record(self,
+               message: Dict[str, Any],
+               log: Optional[Dict[str, Any]] = None,
+               job_id: Optional[int] = None,
+               outcome: Optional[str] = None) -> None:
+        """
+        Acumula transição de um destinatário.
+
+        Args:
+            message: Colunas da OutboxMessage a atualizar (com 'id')
+            log: Colunas do EmailLog a atualizar (com 'id')
+            job_id: Job a que pertence
+            outcome: 'success' ou 'failed' para os contadores do job (None = não conta)
+        """
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._messages.append(message)
+        if log is not None:
+            self._logs.append(log)
+        if outcome is not None:
+            counters = self._counters.setdefault(job_id, [0, 0])
+            counters[0 if outcome == 'success' else 1] += 1
+
+    def due(self) -> bool:
+        """Se o buffer atingiu o tamanho ou a idade de escrita."""
+        return bool(self._messages) and (
+            len(self._messages) >= self.flush_size
+            or time.monotonic() - self._oldest >= self.flush_interval
+        )
+
+    def flush(self) -> int:
+        """
+        Grava o buffer numa transação (executemany por tabela).
+
+        Se a transação falhar, o buffer mantém-se (o próximo flush volta a
+        tentar) e a exceção é propagada: quem reclamou as linhas não as pode
+        devolver à outbox, porque algumas já foram enviadas.
+
+        Returns:
+            Número de destinatários gravados
+        """
+        if not self._messages:
+            return 0
+
+        messages, logs, counters = self._messages, self._logs, self._counters
+
+        try:
+            db.session.execute(update(OutboxMessage), messages)
+            if logs:
+                db.session.execute(update(EmailLog), logs)
+            for job_id, (success, failed) in counters.items():
+                OutboxJob.query.filter_by(id=job_id).update({
+                    OutboxJob.success_count: OutboxJob.success_count + success,
+                    OutboxJob.failed_count: OutboxJob.failed_count + failed
+                }, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.error(f"Failed to write {len(messages)} delivery results", exc_info=True)
+            raise
+
+        # Só depois do commit: as atualizações são idempotentes e os contadores só contam uma vez
+        self._messages, self._logs, self._counters, self._oldest = [], [], {}, None
+
+        if counters:
+            get_job_progress_notifier().publish()
+        logger.debug(f"Wrote {len(messages)} delivery results ({len(logs)} logs, {len(counters)} jobs)")
+        return len(messages)
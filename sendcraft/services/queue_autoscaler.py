@@ -0,0 +1,180 @@
+"""
+Autoscaling dos workers da outbox para SendCraft.
+
+Decide quantos workers um processo deve ter a partir da profundidade da
+outbox, da idade do destinatário pendente mais antigo e da latência
+observada por envio, sem exceder o limite de sessões por relay SMTP.
+"""
+import math
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# Latência assumida antes da primeira medição (segundos por envio)
+DEFAULT_SEND_SECONDS = 0.1
+# Peso de cada nova medição na média móvel exponencial da latência
+LATENCY_SMOOTHING = 0.2
+
+
+class WorkerAutoscaler:
+    """
+    Política de dimensionamento do pool de workers.
+
+    O alvo é o número de workers que drena o backlog em
+    target_drain_seconds à latência observada (lei de Little). Se o
+    pendente mais antigo exceder max_queue_age, junta-se mais um worker
+    mesmo que o backlog não o justifique. Cada relay conta no máximo com
+    max_workers_per_relay workers. Subidas são imediatas; descidas só
+    depois de o alvo ficar abaixo do pool durante scale_down_delay
+    segundos, para que uma pausa curta não desfaça o pool a meio de um burst.
+    """
+
+    def __init__(self,
+                 min_workers: int = 1,
+                 max_workers: int = 8,
+                 target_drain_seconds: float = 30,
+                 max_queue_age: float = 60,
+                 scale_down_delay: float = 30,
+                 max_workers_per_relay: int = 4):
+        """
+        Inicializa política.
+
+        Args:
+            min_workers: Workers mantidos mesmo sem trabalho
+            max_workers: Máximo de workers do processo
+            target_drain_seconds: Tempo em que o backlog deve ser drenado
+            max_queue_age: Idade em segundos do pendente mais antigo que força subida
+            scale_down_delay: Segundos com alvo inferior antes de reduzir
+            max_workers_per_relay: Máximo de workers a enviar para o mesmo relay
+        """
+        self.min_workers = max(0, min(min_workers, max_workers))
+        self.max_workers = max_workers
+        self.target_drain_seconds = max(target_drain_seconds, 1)
+        self.max_queue_age = max_queue_age
+        self.scale_down_delay = scale_down_delay
+        self.max_workers_per_relay = max(1, max_workers_per_relay)
+
+        self.latency: Optional[float] = None
+        self.scale_ups = 0
+        self.scale_downs = 0
+        self.last_observation: Dict[str, Any] = {}
+        self.decisions: deque = deque(maxlen=20)
+        self._below_since: Optional[float] = None
+
+    def observe_latency(self, seconds: float) -> None:
+        """
+        Regista duração de um envio.
+
+        Args:
+            seconds: Segundos entre resultados consecutivos de um worker
+        """
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def desired(self, current: int, relay_depth: Dict[str, int], oldest_age: float) -> Tuple[int, str]:
+        """
+        Calcula o alvo sem histerese.
+
+        Args:
+            current: Workers atuais
+            relay_depth: Destinatários prontos a enviar por relay
+            oldest_age: Idade em segundos do pendente mais antigo
+
+        Returns:
+            Tuple (workers, motivo)
+        """
+        depth = sum(relay_depth.values())
+        if not depth:
+            return self.min_workers, 'idle'
+
+        latency = self.latency if self.latency is not None else DEFAULT_SEND_SECONDS
+        wanted = math.ceil(depth * latency / self.target_drain_seconds)
+        reason = 'backlog'
+        if oldest_age > self.max_queue_age and wanted <= current:
+            wanted = current + 1
+            reason = 'age'
+
+        # Um worker a mais para um relay saturado só abre mais sessões ao mesmo servidor
+        ceiling = sum(min(self.max_workers_per_relay, count) for count in relay_depth.values())
+        if wanted > ceiling:
+            wanted = ceiling
+            reason = 'relay_limit'
+
+        return max(self.min_workers, min(self.max_workers, wanted)), reason
+
+    def decide(self,
+               current: int,
+               relay_depth: Dict[str, int],
+               oldest_age: float,
+               now: float) -> Optional[Dict[str, Any]]:
+        """
+        Decide mudança do pool.
+
+        Args:
+            current: Workers atuais
+            relay_depth: Destinatários prontos a enviar por relay
+            oldest_age: Idade em segundos do pendente mais antigo
+            now: Instante atual (time.monotonic)
+
+        Returns:
+            Decisão (action, from, to, reason, ...) ou None se o pool se mantém
+        """
+        target, reason = self.desired(current, relay_depth, oldest_age)
+        self.last_observation = {
+            'depth': sum(relay_depth.values()),
+            'relays': len(relay_depth),
+            'oldest_age': round(oldest_age, 1),
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'desired': target,
+            'reason': reason
+        }
+
+        if target >= current:
+            self._below_since = None
+            if target == current:
+                return None
+            self.scale_ups += 1
+            return self._decision('scale_up', current, target, reason)
+
+        if self._below_since is None:
+            self._below_since = now
+        if now - self._below_since < self.scale_down_delay:
+            return None
+
+        self._below_since = None
+        self.scale_downs += 1
+        return self._decision('scale_down', current, target, reason)
+
+    def _decision(self, action: str, current: int, target: int, reason: str) -> Dict[str, Any]:
+        """Regista decisão no histórico."""
+        decision = {
+            'at': datetime.utcnow().isoformat(),
+            'action': action,
+            'from': current,
+            'to': target,
+            **self.last_observation,
+            'reason': reason
+        }
+        self.decisions.append(decision)
+        return decision
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Estado da política para get_stats().
+
+        Returns:
+            Dict com limites, contadores e decisões recentes
+        """
+        recent: List[Dict[str, Any]] = list(self.decisions)
+        return {
+            'min_workers': self.min_workers,
+            'max_workers': self.max_workers,
+            'max_workers_per_relay': self.max_workers_per_relay,
+            'scale_ups': self.scale_ups,
+            'scale_downs': self.scale_downs,
+            'last_observation': self.last_observation,
+            'last_decision': recent[-1] if recent else None,
+            'recent_decisions': recent
+        }
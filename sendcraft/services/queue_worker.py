@@ -0,0 +1,174 @@
+"""
+Processo dedicado de envio para SendCraft.
+
+Corre um pool de workers da outbox fora do processo web (flask queue-worker),
+com paragem ordenada em SIGTERM/SIGINT e heartbeat para health checks.
+Vários processos podem correr em paralelo (um por core ou por réplica):
+a reclamação de linhas da outbox garante que cada destinatário é enviado
+uma única vez.
+"""
+import json
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from flask import Flask
+
+from .email_queue import EmailQueue
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class QueueWorker:
+    """Pool de workers da outbox num processo próprio."""
+
+    def __init__(self,
+                 app: Flask,
+                 queue: EmailQueue,
+                 workers: int,
+                 heartbeat_file: Optional[str] = None,
+                 heartbeat_interval: float = 10,
+                 shutdown_timeout: Optional[float] = None):
+        """
+        Inicializa processo de envio.
+
+        Args:
+            app: Aplicação Flask
+            queue: Queue da outbox a usar
+            workers: Número máximo de threads de envio (o pool varia com o backlog)
+            heartbeat_file: Ficheiro JSON reescrito a cada heartbeat (None = só log)
+            heartbeat_interval: Segundos entre heartbeats
+            shutdown_timeout: Segundos para terminar envios em curso ao parar
+        """
+        self.app = app
+        self.queue = queue
+        self.workers = workers
+        self.heartbeat_file = heartbeat_file
+        self.heartbeat_interval = heartbeat_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.started_at: Optional[datetime] = None
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        """Arranca workers e bloqueia até receber SIGTERM/SIGINT."""
+        previous_handlers = {
+            signum: signal.signal(signum, self.request_stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        self.queue.init_app(self.app)
+        self.queue.max_workers = self.workers
+        self.started_at = datetime.utcnow()
+        self.queue.start()
+        logger.info(f"Queue worker {os.getpid()} started with up to {self.workers} workers")
+
+        try:
+            while not self._stop.is_set():
+                self.beat('running')
+                self._stop.wait(self.heartbeat_interval)
+
+            logger.info(f"Queue worker {os.getpid()} draining")
+            self.beat('draining')
+            self.queue.stop(timeout=self.shutdown_timeout)
+        finally:
+            self.beat('stopped')
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        logger.info(f"Queue worker {os.getpid()} stopped")
+
+    def request_stop(self, signum: int = signal.SIGTERM, frame=None) -> None:
+        """Pede paragem ordenada (handler de sinal)."""
+        logger.info(f"Queue worker received {signal.Signals(signum).name}, stopping")
+        self._stop.set()
+
+    def health(self, state: str) -> Dict[str, Any]:
+        """
+        Estado atual do processo.
+
+        Args:
+            state: running, draining ou stopped
+
+        Returns:
+            Dict serializável em JSON
+        """
+        with self.app.app_context():
+            try:
+                stats = self.queue.get_stats()
+            except Exception as e:
+                stats = {**self.queue.stats, 'last_error': str(e)}
+
+        alive = len([w for w in self.queue.workers if w.is_alive()])
+        min_workers = min(self.queue.min_workers, self.workers)
+        return {
+            'state': state,
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+            'workers': self.workers,
+            'alive_workers': alive,
+            'min_workers': min_workers,
+            'healthy': state != 'running' or (alive >= min_workers and not stats.get('last_error')),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'heartbeat_at': datetime.utcnow().isoformat(),
+            'stats': stats
+        }
+
+    def beat(self, state: str) -> Dict[str, Any]:
+        """
+        Regista heartbeat (log e, se configurado, ficheiro).
+
+        Args:
+            state: running, draining ou stopped
+
+        Returns:
+            Estado registado
+        """
+        health = self.health(state)
+        stats = health['stats']
+        logger.debug(
+            f"Queue worker heartbeat: {state}, {health['alive_workers']}/{self.workers} workers, "
+            f"{stats.get('total_processed', 0)} processed, queue size {stats.get('queue_size', '?')}"
+        )
+        if not health['healthy']:
+            logger.warning(f"Queue worker unhealthy: {stats.get('last_error') or 'workers not running'}")
+
+        if self.heartbeat_file:
+            # Escrita atómica: um probe nunca lê um ficheiro a meio
+            temp_path = f"{self.heartbeat_file}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(health, f)
+            os.replace(temp_path, self.heartbeat_file)
+
+        return health
+
+
+def check_heartbeat(path: str, max_age: float) -> Tuple[bool, str]:
+    """
+    Verifica heartbeat escrito por um processo de envio (liveness probe).
+
+    Args:
+        path: Ficheiro de heartbeat
+        max_age: Idade máxima em segundos
+
+    Returns:
+        Tuple (saudável, mensagem)
+    """
+    try:
+        with open(path) as f:
+            health = json.load(f)
+        age = time.time() - os.path.getmtime(path)
+    except (OSError, ValueError) as e:
+        return False, f"Heartbeat indisponível: {e}"
+
+    if age > max_age:
+        return False, f"Heartbeat com {age:.0f}s (máximo {max_age:.0f}s)"
+    if health.get('state') != 'running':
+        return False, f"Worker {health.get('pid')} em estado {health.get('state')}"
+    if not health.get('healthy'):
+        return False, f"Worker {health.get('pid')} sem saúde: {health.get('stats', {}).get('last_error')}"
+    return True, f"Worker {health.get('pid')} ativo ({health.get('alive_workers')}/{health.get('workers')} workers, {age:.0f}s)"
@@ -0,0 +1,195 @@
+"""
+Cache de resultados renderizados de templates para SendCraft.
+
+Emails de estado de encomenda ou de recuperação de password são muitas
+vezes renderizados com as mesmas variáveis (novas tentativas, pedidos
+duplicados). Com a cache ligada, o resultado de cada parte é guardado
+por template, versão e digest das variáveis, e uma renderização repetida
+não volta a executar o template. O limite é em bytes, não em entradas,
+porque um HTML pesado pode valer centenas de assuntos.
+"""
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def variables_digest(variables: Dict[str, Any]) -> Optional[bytes]:
+    """
+    Digest estável de um dict de variáveis (independente da ordem das chaves).
+
+    Pensado para variáveis vindas de JSON: tuplos e listas, ou chaves 1 e
+    '1', têm o mesmo digest.
+
+    Args:
+        variables: Variáveis do template
+
+    Returns:
+        Digest de 16 bytes ou None se houver valores não serializáveis em JSON
+        (ex: datetimes, objetos), que não são cacheados
+    """
+    try:
+        encoded = json.dumps(variables, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.blake2b(encoded.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class RenderedOutputCache:
+    """
+    Cache LRU de partes renderizadas por (id do template, versão, parte, variáveis).
+
+    Como na CompiledTemplateCache, cada entrada guarda também a fonte, para
+    que um template alterado sem mudar de versão não devolva o resultado
+    antigo. Erros de renderização não são cacheados. Só devem passar por
+    aqui templates determinísticos: um template que use o filtro random
+    ou lipsum() devolveria sempre o primeiro resultado.
+    """
+
+    def __init__(self, max_bytes: int = 0):
+        """
+        Inicializa cache vazia.
+
+        Args:
+            max_bytes: Memória máxima dos resultados guardados (0 = cache desligada)
+        """
+        self.max_bytes = max(0, max_bytes)
+        self._entries: 'OrderedDict[Tuple[int, int, str, bytes], Tuple[str, str, int]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Se a cache está ligada."""
+        return self.max_bytes > 0
+
+    def get(self,
+            template_id: Optional[int],
+            version: Optional[int],
+            part: str,
+            source: str,
+            variables: Dict[str, Any],
+            render: Callable[[], str]) -> str:
+        """
+        Retorna parte renderizada, renderizando-a se necessário.
+
+        Args:
+            template_id: ID do EmailTemplate (None = não guardado, não é cacheado)
+            version: Versão do template
+            part: Parte do template ('subject', 'html' ou 'text')
+            source: Fonte Jinja da parte
+            variables: Variáveis da renderização
+            render: Função que renderiza a parte
+
+        Returns:
+            Resultado renderizado
+        """
+        if not self.enabled or template_id is None:
+            return render()
+
+        digest = variables_digest(variables)
+        if digest is None:
+            with self._lock:
+                self.uncacheable += 1
+            return render()
+
+        key = (template_id, version, part, digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == source:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        output = render()
+        size = sys.getsizeof(output)
+        if size > self.max_bytes:
+            return output
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[2]
+            self._entries[key] = (source, output, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+        return output
+
+    def invalidate(self, template_id: Optional[int] = None) -> None:
+        """
+        Remove resultados de um template (ou toda a cache).
+
+        Args:
+            template_id: ID do template; None limpa toda a cache
+        """
+        with self._lock:
+            if template_id is None:
+                self._entries.clear()
+                self._size = 0
+            else:
+                for key in [k for k in self._entries if k[0] == template_id]:
+                    self._size -= self._entries.pop(key)[2]
+        logger.debug(f"Rendered output cache invalidated (template={template_id})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas da cache.
+
+        Returns:
+            Dict com entradas, bytes usados, limite e contadores
+        """
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'uncacheable': self.uncacheable
+            }
+
+
+# Instância global
+_render_cache: Optional[RenderedOutputCache] = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderedOutputCache:
+    """
+    Retorna cache global de resultados renderizados.
+
+    Returns:
+        Instância do RenderedOutputCache
+    """
+    global _render_cache
+
+    if _render_cache is None:
+        with _render_cache_lock:
+            if _render_cache is None:
+                options = {}
+                try:
+                    from flask import current_app
+                    options = {'max_bytes': current_app.config.get('TEMPLATE_RENDER_CACHE_BYTES', 0)}
+                except RuntimeError:
+                    # Fora do contexto da app: cache desligada
+                    pass
+                _render_cache = RenderedOutputCache(**options)
+
+    return _render_cache
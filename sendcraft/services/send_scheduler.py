@@ -0,0 +1,215 @@
+"""
+Agendamento de envios (send_at) para SendCraft.
+
+Jobs agendados ficam na outbox com status SCHEDULED e send_at indexado.
+O SendScheduler mantém em memória um heap só com os jobs que vencem no
+horizonte próximo (recarregado da BD periodicamente) e passa cada job a
+PENDING quando chega a hora; os destinatários de lotes grandes têm
+next_attempt_at espalhado pela janela de envio, pelo que os workers os
+vão reclamando ao longo dela em vez de todos no mesmo instante.
+"""
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+
+from ..models.outbox import OutboxJob, QueueStatus
+from ..extensions import db
+from ..services.job_progress import get_job_progress_notifier
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def parse_send_at(value: Any, max_days: Optional[float] = None) -> Optional[datetime]:
+    """
+    Converte send_at da API em datetime UTC naive.
+
+    Args:
+        value: ISO 8601 (com Z ou offset; sem fuso = UTC) ou None
+        max_days: Antecedência máxima permitida
+
+    Returns:
+        datetime UTC, ou None se não agendado ou já passado
+
+    Raises:
+        ValueError: Se o formato for inválido ou a data exceder max_days
+    """
+    if value in (None, ''):
+        return None
+    if not isinstance(value, str):
+        raise ValueError('send_at deve ser uma data ISO 8601')
+
+    try:
+        send_at = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'send_at inválido: {value}')
+    if send_at.tzinfo is not None:
+        send_at = send_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    now = datetime.utcnow()
+    if max_days and send_at > now + timedelta(days=max_days):
+        raise ValueError(f'send_at não pode exceder {max_days:g} dias')
+    return send_at if send_at > now else None
+
+
+def spread_offsets(count: int, window_seconds: float) -> List[float]:
+    """
+    Desfasamentos (segundos) para espalhar `count` destinatários pela janela.
+
+    Args:
+        count: Número de destinatários
+        window_seconds: Duração da janela (0 = todos no início)
+
+    Returns:
+        Lista de desfasamentos crescentes, o primeiro 0
+    """
+    if count <= 1 or window_seconds <= 0:
+        return [0.0] * count
+    step = window_seconds / count
+    return [index * step for index in range(count)]
+
+
+class SendScheduler:
+    """
+    Heap de jobs agendados a libertar no horizonte próximo.
+
+    A BD é a fonte de verdade: o heap só guarda (send_at, job_id) dos jobs
+    que vencem nos próximos horizon_seconds, e a passagem a PENDING é um
+    UPDATE condicional, pelo que vários processos podem correr o
+    agendador em simultâneo.
+    """
+
+    def __init__(self, horizon_seconds: float = 60):
+        """
+        Inicializa agendador.
+
+        Args:
+            horizon_seconds: Antecedência com que os jobs são carregados da BD
+        """
+        self.horizon_seconds = horizon_seconds
+        self.wakeup = threading.Event()
+        self._heap: List[Tuple[datetime, int]] = []
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._loaded_until: Optional[datetime] = None
+        self._next_load = 0.0
+
+        self.stats = {
+            'released_jobs': 0,
+            'loaded_jobs': 0
+        }
+
+    def schedule(self, job_id: int, send_at: datetime) -> None:
+        """
+        Regista job agendado por este processo (evita esperar pela próxima carga).
+
+        Args:
+            job_id: ID do job
+            send_at: Data de envio (UTC)
+        """
+        with self._lock:
+            # Fora do horizonte (ou antes da primeira carga): a próxima carga trata dele
+            if self._loaded_until is None or send_at > self._loaded_until:
+                return
+            self._push(send_at, job_id)
+        self.wakeup.set()
+
+    def _push(self, send_at: datetime, job_id: int) -> None:
+        """Insere no heap se ainda não estiver (requer lock)."""
+        if job_id not in self._queued:
+            heapq.heappush(self._heap, (send_at, job_id))
+            self._queued.add(job_id)
+
+    def load(self) -> int:
+        """
+        Carrega da BD os jobs agendados até ao fim do horizonte (requer contexto da app).
+
+        Returns:
+            Número de jobs novos no heap
+        """
+        until = datetime.utcnow() + timedelta(seconds=self.horizon_seconds)
+        rows = db.session.query(OutboxJob.send_at, OutboxJob.id).filter(
+            OutboxJob.status == QueueStatus.SCHEDULED,
+            OutboxJob.send_at <= until
+        ).all()
+
+        with self._lock:
+            before = len(self._queued)
+            for send_at, job_id in rows:
+                self._push(send_at, job_id)
+            loaded = len(self._queued) - before
+            self._loaded_until = until
+
+        self._next_load = time.monotonic() + self.horizon_seconds / 2
+        self.stats['loaded_jobs'] += loaded
+        return loaded
+
+    def due(self) -> List[int]:
+        """
+        Retira do heap os jobs já vencidos.
+
+        Returns:
+            IDs dos jobs a libertar
+        """
+        now = datetime.utcnow()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, job_id = heapq.heappop(self._heap)
+                self._queued.discard(job_id)
+                due.append(job_id)
+        return due
+
+    def release(self, job_ids: List[int]) -> int:
+        """
+        Passa jobs agendados a PENDING (requer contexto da app).
+
+        Args:
+            job_ids: IDs dos jobs vencidos
+
+        Returns:
+            Jobs libertados por este processo
+        """
+        if not job_ids:
+            return 0
+        released = OutboxJob.query.filter(
+            OutboxJob.id.in_(job_ids),
+            OutboxJob.status == QueueStatus.SCHEDULED
+        ).update({OutboxJob.status: QueueStatus.PENDING}, synchronize_session=False)
+        db.session.commit()
+
+        if released:
+            get_job_progress_notifier().publish()
+            self.stats['released_jobs'] += released
+            logger.info(f"Released {released} scheduled outbox jobs")
+        return released
+
+    def tick(self) -> Tuple[int, float]:
+        """
+        Uma iteração do agendador (requer contexto da app).
+
+        Returns:
+            Tuple (jobs libertados, segundos até à próxima iteração)
+        """
+        if time.monotonic() >= self._next_load:
+            self.load()
+        released = self.release(self.due())
+
+        wait = max(0.0, self._next_load - time.monotonic())
+        with self._lock:
+            if self._heap:
+                until_next = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                wait = min(wait, max(until_next, 0.0))
+        return released, wait
+
+    def snapshot(self) -> dict:
+        """Estado do agendador para get_stats()."""
+        with self._lock:
+            next_due = self._heap[0][0].isoformat() if self._heap else None
+            return {
+                **self.stats,
+                'upcoming_jobs': len(self._heap),
+                'next_due_at': next_due
+            }
@@ -0,0 +1,237 @@
+"""
+Métricas de latência SMTP por fase para SendCraft.
+Mede DNS, TCP, TLS, greeting, AUTH e DATA por relay e conta, em histogramas
+mantidos em memória no processo.
+"""
+import bisect
+import smtplib
+import socket
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Fases registadas (em milissegundos)
+PHASES = ('dns', 'connect', 'tls', 'greeting', 'auth', 'data')
+
+# Limites superiores dos buckets
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+SIZE_BUCKETS_BYTES = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 10485760, 26214400)
+
+
+class Histogram:
+    """Histograma de buckets fixos com contagem, soma, mínimo e máximo."""
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        """
+        Inicializa histograma.
+
+        Args:
+            bounds: Limites superiores dos buckets (ordem crescente)
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        """
+        Regista uma observação.
+
+        Args:
+            value: Valor observado
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Estima um percentil pelo limite superior do bucket correspondente.
+
+        Args:
+            fraction: Percentil entre 0 e 1 (ex.: 0.99)
+
+        Returns:
+            Valor estimado ou None se vazio
+        """
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                return min(upper, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna resumo do histograma.
+
+        Returns:
+            Dict com count, avg, min, max, p50, p90, p99 e buckets
+        """
+        return {
+            'count': self.count,
+            'avg': round(self.total / self.count, 2) if self.count else None,
+            'min': round(self.min, 2) if self.min is not None else None,
+            'max': round(self.max, 2) if self.max is not None else None,
+            'p50': self.percentile(0.50),
+            'p90': self.percentile(0.90),
+            'p99': self.percentile(0.99),
+            'buckets': {
+                (str(bound) if index < len(self.bounds) else '+inf'): count
+                for index, (bound, count) in enumerate(zip(list(self.bounds) + [None], self.counts))
+                if count
+            }
+        }
+
+
+class SMTPMetrics:
+    """Histogramas de latência por fase e de tamanho de mensagem, por relay e conta."""
+
+    def __init__(self):
+        """Inicializa registo vazio."""
+        self._series: Dict[Tuple[str, Optional[int]], Dict[str, Histogram]] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def record(self,
+               relay: str,
+               account_id: Optional[int],
+               timings: Dict[str, Any]) -> None:
+        """
+        Regista tempos de uma ligação ou envio.
+
+        Args:
+            relay: Servidor:porta
+            account_id: ID da conta
+            timings: Dict com '<fase>_ms' e opcionalmente 'size_bytes'
+        """
+        with self._lock:
+            series = self._series.get((relay, account_id))
+            if series is None:
+                series = self._series[(relay, account_id)] = {}
+
+            for phase in PHASES:
+                value = timings.get(f'{phase}_ms')
+                if value is not None:
+                    histogram = series.get(phase)
+                    if histogram is None:
+                        histogram = series[phase] = Histogram(LATENCY_BUCKETS_MS)
+                    histogram.observe(value)
+
+            size = timings.get('size_bytes')
+            if size is not None:
+                histogram = series.get('size_bytes')
+                if histogram is None:
+                    histogram = series['size_bytes'] = Histogram(SIZE_BUCKETS_BYTES)
+                histogram.observe(size)
+
+    def snapshot(self, relay: Optional[str] = None, account_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Retorna histogramas, opcionalmente filtrados.
+
+        Args:
+            relay: Filtrar por relay (servidor:porta)
+            account_id: Filtrar por conta
+
+        Returns:
+            Dict com uma entrada por relay/conta
+        """
+        with self._lock:
+            series = [
+                {
+                    'relay': key[0],
+                    'account_id': key[1],
+                    'phases_ms': {name: h.snapshot() for name, h in histograms.items() if name != 'size_bytes'},
+                    'size_bytes': histograms['size_bytes'].snapshot() if 'size_bytes' in histograms else None
+                }
+                for key, histograms in self._series.items()
+                if (relay is None or key[0] == relay) and (account_id is None or key[1] == account_id)
+            ]
+
+        return {
+            'since': self.started_at,
+            'series': series
+        }
+
+    def reset(self) -> None:
+        """Limpa todos os histogramas."""
+        with self._lock:
+            self._series.clear()
+            self.started_at = time.time()
+
+
+def elapsed_ms(start: float) -> float:
+    """Milissegundos desde `start` (perf_counter)."""
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def _timed_socket(smtp: smtplib.SMTP, host: str, port: int, timeout: Any) -> socket.socket:
+    """Resolve e liga registando 'dns' e 'connect' em smtp.timings."""
+    start = time.perf_counter()
+    addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    smtp.timings['dns_ms'] = elapsed_ms(start)
+
+    start = time.perf_counter()
+    last_error: Optional[Exception] = None
+    for family, socktype, proto, _, address in addresses:
+        try:
+            sock = socket.create_connection(address[:2], timeout, smtp.source_address)
+            smtp.timings['connect_ms'] = elapsed_ms(start)
+            # Como no asyncio: sem Nagle, o '.' final do DATA não espera pelo ACK atrasado
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return sock
+        except OSError as e:
+            last_error = e
+    raise last_error or OSError(f"getaddrinfo returned no addresses for {host}")
+
+
+class TimedSMTP(smtplib.SMTP):
+    """smtplib.SMTP que regista a duração de DNS e TCP connect em `timings`."""
+
+    def __init__(self, *args, **kwargs):
+        self.timings: Dict[str, Any] = {}
+        super().__init__(*args, **kwargs)
+
+    def _get_socket(self, host, port, timeout):
+        return _timed_socket(self, host, port, timeout)
+
+
+class TimedSMTP_SSL(smtplib.SMTP_SSL):
+    """smtplib.SMTP_SSL que regista DNS, TCP connect e handshake TLS em `timings`."""
+
+    def __init__(self, *args, **kwargs):
+        self.timings: Dict[str, Any] = {}
+        super().__init__(*args, **kwargs)
+
+    def _get_socket(self, host, port, timeout):
+        sock = _timed_socket(self, host, port, timeout)
+        start = time.perf_counter()
+        sock = self.context.wrap_socket(sock, server_hostname=self._host)
+        self.timings['tls_ms'] = elapsed_ms(start)
+        return sock
+
+
+# Instância global das métricas
+_smtp_metrics = SMTPMetrics()
+
+
+def get_smtp_metrics() -> SMTPMetrics:
+    """
+    Retorna registo global de métricas SMTP.
+
+    Returns:
+        Instância do SMTPMetrics
+    """
+    return _smtp_metrics
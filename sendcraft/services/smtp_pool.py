@@ -0,0 +1,397 @@
+"""
+Pool de conexões SMTP persistentes para SendCraft.
+Reutiliza sessões autenticadas por conta em vez de abrir TCP + TLS + AUTH por email.
+"""
+import atexit
+import hashlib
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, List, Iterator
+
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class PooledConnection:
+    """Sessão SMTP autenticada mantida pelo pool."""
+
+    def __init__(self, key: str, smtp: smtplib.SMTP, fingerprint: str = ''):
+        """
+        Inicializa conexão do pool.
+
+        Args:
+            key: Chave do pool a que a conexão pertence
+            smtp: Objeto SMTP conectado e autenticado
+            fingerprint: Resumo da configuração usada na ligação
+        """
+        self.key = key
+        self.smtp = smtp
+        self.fingerprint = fingerprint
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.messages_sent = 0
+
+    def is_alive(self) -> bool:
+        """
+        Verifica se a sessão continua válida enviando NOOP.
+
+        Returns:
+            True se o servidor respondeu 250
+        """
+        try:
+            code, _ = self.smtp.noop()
+            return code == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close(self) -> None:
+        """Fecha a sessão SMTP sem propagar erros."""
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                self.smtp.close()
+            except Exception:
+                pass
+
+
+class _AccountPool:
+    """Estado interno do pool de uma conta/relay."""
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.idle: List[PooledConnection] = []
+        self.total = 0
+        self.created = 0
+        self.reused = 0
+
+
+class SMTPConnectionPool:
+    """
+    Pool de sessões SMTP por conta com tamanho limitado.
+
+    Cada chave (conta + relay) mantém no máximo `max_size` sessões, entre
+    idle e em uso. Sessões idle há mais de `idle_timeout` segundos são
+    fechadas; sessões reutilizadas após `noop_interval` segundos sem uso
+    são verificadas com NOOP antes de serem entregues.
+    """
+
+    def __init__(self,
+                 max_size: int = 3,
+                 idle_timeout: float = 60.0,
+                 noop_interval: float = 5.0,
+                 acquire_timeout: float = 30.0,
+                 max_messages_per_session: int = 100):
+        """
+        Inicializa pool.
+
+        Args:
+            max_size: Máximo de sessões por conta
+            idle_timeout: Segundos até fechar uma sessão idle
+            noop_interval: Segundos de inatividade a partir dos quais se faz NOOP
+            acquire_timeout: Segundos a aguardar por uma sessão livre
+            max_messages_per_session: Mensagens por sessão antes de reconectar
+        """
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.noop_interval = noop_interval
+        self.acquire_timeout = acquire_timeout
+        self.max_messages_per_session = max_messages_per_session
+
+        self._pools: Dict[str, _AccountPool] = {}
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._last_sweep = time.monotonic()
+
+    @staticmethod
+    def make_key(account_id: Optional[int], config: Dict[str, Any]) -> str:
+        """
+        Gera chave do pool para uma conta e configuração.
+
+        Args:
+            account_id: ID da conta
+            config: Configuração SMTP resolvida
+
+        Returns:
+            Chave do pool
+        """
+        return f"{account_id}:{config.get('username')}@{config['server']}:{config['port']}"
+
+    @staticmethod
+    def config_fingerprint(config: Dict[str, Any]) -> str:
+        """Resumo da configuração para detetar alterações (password incluída)."""
+        raw = '|'.join(str(config.get(k)) for k in ('server', 'port', 'username', 'password', 'use_ssl', 'use_tls'))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def acquire(self,
+                key: str,
+                config: Dict[str, Any],
+                connect: Callable[[Dict[str, Any]], smtplib.SMTP]) -> PooledConnection:
+        """
+        Obtém sessão do pool, criando uma nova se necessário.
+
+        Args:
+            key: Chave do pool
+            config: Configuração SMTP resolvida
+            connect: Função que cria uma sessão autenticada
+
+        Returns:
+            Conexão do pool (uso exclusivo até release/discard)
+
+        Raises:
+            TimeoutError: Se o pool estiver cheio durante `acquire_timeout`
+        """
+        fingerprint = self.config_fingerprint(config)
+        deadline = time.monotonic() + self.acquire_timeout
+        stale: List[PooledConnection] = []
+
+        with self._available:
+            self._sweep_locked(stale)
+            pool = self._pools.get(key)
+            if pool is None or pool.fingerprint != fingerprint:
+                # Configuração alterada: sessões antigas deixam de servir
+                if pool is not None:
+                    stale.extend(pool.idle)
+                    pool.total -= len(pool.idle)
+                    pool.idle = []
+                    pool.fingerprint = fingerprint
+                else:
+                    pool = self._pools[key] = _AccountPool(fingerprint)
+
+            while True:
+                if pool.idle:
+                    conn = pool.idle.pop()
+                    break
+                if pool.total < self.max_size:
+                    pool.total += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"SMTP pool exhausted for {key} ({self.max_size} sessions)")
+                self._available.wait(remaining)
+
+        self._close_all(stale)
+
+        if conn is not None:
+            idle_for = time.monotonic() - conn.last_used_at
+            if idle_for < self.noop_interval or conn.is_alive():
+                with self._lock:
+                    pool.reused += 1
+                return conn
+
+            logger.debug(f"Discarding dead pooled SMTP session for {key}")
+            conn.close()
+
+        # Criar nova sessão (slot já reservado)
+        try:
+            smtp = connect(config)
+        except Exception:
+            with self._available:
+                pool.total -= 1
+                self._available.notify()
+            raise
+
+        with self._lock:
+            pool.created += 1
+        logger.debug(f"Opened pooled SMTP session for {key}")
+        return PooledConnection(key, smtp, fingerprint)
+
+    def release(self, conn: PooledConnection) -> None:
+        """
+        Devolve sessão saudável ao pool.
+
+        Args:
+            conn: Conexão obtida com acquire()
+        """
+        conn.last_used_at = time.monotonic()
+        rotate = (self.max_messages_per_session and
+                  conn.messages_sent >= self.max_messages_per_session)
+
+        with self._available:
+            pool = self._pools.get(conn.key)
+            if pool is None or rotate or pool.fingerprint != conn.fingerprint:
+                if pool is not None:
+                    pool.total -= 1
+                close = True
+            else:
+                pool.idle.append(conn)
+                close = False
+            self._available.notify()
+
+        if close:
+            conn.close()
+
+    def discard(self, conn: PooledConnection) -> None:
+        """
+        Fecha sessão com erro e liberta o seu lugar no pool.
+
+        Args:
+            conn: Conexão obtida com acquire()
+        """
+        with self._available:
+            pool = self._pools.get(conn.key)
+            if pool is not None:
+                pool.total -= 1
+            self._available.notify()
+        conn.close()
+
+    @contextmanager
+    def connection(self,
+                   key: str,
+                   config: Dict[str, Any],
+                   connect: Callable[[Dict[str, Any]], smtplib.SMTP]) -> Iterator[PooledConnection]:
+        """
+        Context manager que obtém e devolve uma sessão.
+
+        Erros SMTP de protocolo (destinatário/remetente recusado, erro de dados)
+        mantêm a sessão após RSET; qualquer outro erro descarta-a.
+
+        Args:
+            key: Chave do pool
+            config: Configuração SMTP resolvida
+            connect: Função que cria uma sessão autenticada
+
+        Yields:
+            Conexão do pool
+        """
+        conn = self.acquire(key, config, connect)
+        try:
+            yield conn
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+            if self.reset(conn):
+                self.release(conn)
+            else:
+                self.discard(conn)
+            raise
+        except BaseException:
+            self.discard(conn)
+            raise
+        else:
+            self.release(conn)
+
+    @staticmethod
+    def reset(conn: PooledConnection) -> bool:
+        """
+        Envia RSET para limpar uma transação falhada.
+
+        Args:
+            conn: Conexão do pool
+
+        Returns:
+            True se a sessão continua utilizável
+        """
+        try:
+            code, _ = conn.smtp.rset()
+            return code == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def evict_idle(self) -> int:
+        """
+        Fecha sessões idle expiradas.
+
+        Returns:
+            Número de sessões fechadas
+        """
+        stale: List[PooledConnection] = []
+        with self._lock:
+            self._sweep_locked(stale, force=True)
+        self._close_all(stale)
+        return len(stale)
+
+    def close_all(self) -> None:
+        """Fecha todas as sessões idle."""
+        stale: List[PooledConnection] = []
+        with self._available:
+            for pool in self._pools.values():
+                stale.extend(pool.idle)
+                pool.total -= len(pool.idle)
+                pool.idle = []
+            self._available.notify_all()
+        self._close_all(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas do pool.
+
+        Returns:
+            Dict com estatísticas por chave
+        """
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'idle_timeout': self.idle_timeout,
+                'pools': {
+                    key: {
+                        'idle': len(pool.idle),
+                        'in_use': pool.total - len(pool.idle),
+                        'created': pool.created,
+                        'reused': pool.reused
+                    }
+                    for key, pool in self._pools.items()
+                }
+            }
+
+    def _sweep_locked(self, stale: List[PooledConnection], force: bool = False) -> None:
+        """Remove sessões idle expiradas (chamar com lock)."""
+        now = time.monotonic()
+        if not force and now - self._last_sweep < min(self.idle_timeout, 5.0):
+            return
+        self._last_sweep = now
+
+        for pool in self._pools.values():
+            keep = []
+            for conn in pool.idle:
+                if now - conn.last_used_at > self.idle_timeout:
+                    stale.append(conn)
+                    pool.total -= 1
+                else:
+                    keep.append(conn)
+            pool.idle = keep
+
+    @staticmethod
+    def _close_all(connections: List[PooledConnection]) -> None:
+        """Fecha lista de sessões fora do lock."""
+        for conn in connections:
+            conn.close()
+
+
+# Instância global do pool
+_smtp_pool: Optional[SMTPConnectionPool] = None
+_smtp_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """
+    Retorna pool SMTP global, configurado a partir da app se disponível.
+
+    Returns:
+        Instância do SMTPConnectionPool
+    """
+    global _smtp_pool
+
+    if _smtp_pool is None:
+        with _smtp_pool_lock:
+            if _smtp_pool is None:
+                options = {}
+                try:
+                    from flask import current_app
+                    config = current_app.config
+                    options = {
+                        'max_size': config.get('SMTP_POOL_MAX_SIZE', 3),
+                        'idle_timeout': config.get('SMTP_POOL_IDLE_TIMEOUT', 60),
+                        'noop_interval': config.get('SMTP_POOL_NOOP_INTERVAL', 5),
+                        'acquire_timeout': config.get('SMTP_POOL_ACQUIRE_TIMEOUT', 30),
+                        'max_messages_per_session': config.get('SMTP_MAX_MESSAGES_PER_SESSION', 100)
+                    }
+                except RuntimeError:
+                    # Fora do contexto da app: usar defaults
+                    pass
+                _smtp_pool = SMTPConnectionPool(**options)
+                atexit.register(_smtp_pool.close_all)
+
+    return _smtp_pool
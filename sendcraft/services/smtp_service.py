@@ -1,20 +1,217 @@
 """Serviço SMTP para SendCraft."""
+import base64
+import io
 import smtplib
 import ssl
+import time
+import uuid
+from email.generator import BytesGenerator
+from email.message import Message
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email.utils import formataddr, make_msgid
-from email import encoders
-from typing import Dict, Any, Optional, List, Tuple
+from email.policy import compat32
+from email.utils import formataddr, formatdate, make_msgid
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator, Union
 import logging
 
 from ..models.account import EmailAccount
-from ..utils.crypto import AESCipher
+from ..utils.crypto import get_cipher
+from .account_cache import get_account_config_cache
+from .transport_cache import get_transport_cache
+from .transport_probe import race_connections
+from .smtp_pool import get_smtp_pool
+from .smtp_metrics import get_smtp_metrics, elapsed_ms, TimedSMTP, TimedSMTP_SSL
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Política de serialização para o comando DATA (linhas terminadas em CRLF)
+SMTP_POLICY = compat32.clone(linesep='\r\n')
+
+# Bytes de anexo lidos por bloco (múltiplo de 57 = uma linha base64 de 76 caracteres)
+BASE64_CHUNK_SIZE = 57 * 1024
+
+
+def flatten_message(msg: Message) -> bytes:
+    """
+    Serializa mensagem MIME em bytes com CRLF, como send_message faria.
+    
+    Args:
+        msg: Mensagem MIME
+        
+    Returns:
+        Mensagem serializada (sem dot-stuffing)
+    """
+    buffer = io.BytesIO()
+    BytesGenerator(buffer, policy=SMTP_POLICY).flatten(msg, linesep='\r\n')
+    return buffer.getvalue()
+
+
+def iter_base64(attachment: Dict[str, Any], chunk_size: int = BASE64_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Codifica anexo em base64 por blocos, lendo do disco quando há 'path'.
+    
+    Args:
+        attachment: Dict com 'path' (ficheiro) ou 'content' (bytes)
+        chunk_size: Bytes lidos por bloco (múltiplo de 57)
+        
+    Yields:
+        Linhas base64 de 76 caracteres terminadas em CRLF
+    """
+    path = attachment.get('path')
+    if path:
+        with open(path, 'rb') as f:
+            while True:
+                raw = f.read(chunk_size)
+                if not raw:
+                    break
+                yield base64.encodebytes(raw).replace(b'\n', b'\r\n')
+        return
+    
+    content = attachment.get('content') or b''
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    view = memoryview(content)
+    for offset in range(0, len(view), chunk_size):
+        yield base64.encodebytes(view[offset:offset + chunk_size]).replace(b'\n', b'\r\n')
+
+
+def dot_stuff(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Aplica dot-stuffing a uma mensagem em blocos e garante terminação em CRLF.
+    
+    Args:
+        chunks: Blocos da mensagem serializada
+        
+    Yields:
+        Blocos prontos a escrever após o comando DATA (sem o terminador '.')
+    """
+    at_line_start = True
+    last = b''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if at_line_start and chunk[:1] == b'.':
+            chunk = b'.' + chunk
+        chunk = chunk.replace(b'\n.', b'\n..')
+        at_line_start = chunk.endswith(b'\n')
+        last = chunk
+        yield chunk
+    
+    if not last.endswith(b'\r\n'):
+        yield b'\r\n'
+
+
+class MessageStream:
+    """
+    Mensagem serializada gerada por blocos.
+    
+    Os anexos são codificados em base64 à medida que a mensagem é escrita,
+    pelo que a memória usada por envio não depende do tamanho dos anexos.
+    Pode ser iterada várias vezes (ex.: reenvio após reconexão).
+    """
+    
+    def __init__(self, segments: List[Union[bytes, Dict[str, Any]]]):
+        """
+        Inicializa stream.
+        
+        Args:
+            segments: Blocos de bytes ou anexos (dict com 'path' ou 'content')
+        """
+        self.segments = segments
+    
+    def __iter__(self) -> Iterator[bytes]:
+        for segment in self.segments:
+            if isinstance(segment, bytes):
+                yield segment
+            else:
+                yield from iter_base64(segment)
+    
+    def __bytes__(self) -> bytes:
+        return b''.join(self)
+
+
+class PreparedMessage:
+    """
+    Mensagem codificada uma única vez e reutilizada por vários destinatários.
+    
+    Os headers comuns e as partes de texto são guardados em bytes e os anexos
+    como referências (ficheiro ou bytes) codificadas durante o envio; por
+    destinatário apenas se geram To, Date e Message-ID.
+    """
+    
+    def __init__(self,
+                 headers: bytes,
+                 body: List[Union[bytes, Dict[str, Any]]],
+                 msgid_domain: str,
+                 cc: Optional[List[str]] = None,
+                 bcc: Optional[List[str]] = None):
+        """
+        Inicializa mensagem preparada.
+        
+        Args:
+            headers: Headers comuns serializados (terminados em CRLF)
+            body: Segmentos do corpo MIME (ver MessageStream)
+            msgid_domain: Domínio usado nos Message-ID
+            cc: Lista de emails CC
+            bcc: Lista de emails BCC
+        """
+        self.headers = headers
+        self.body = body
+        self.msgid_domain = msgid_domain
+        self.extra_recipients = list(cc or []) + list(bcc or [])
+    
+    @classmethod
+    def from_message(cls,
+                     msg: MIMEMultipart,
+                     msgid_domain: str,
+                     cc: Optional[List[str]] = None,
+                     bcc: Optional[List[str]] = None,
+                     attachments: Optional[List[Tuple[bytes, Dict[str, Any]]]] = None) -> 'PreparedMessage':
+        """
+        Cria mensagem preparada a partir de uma mensagem MIME sem headers por destinatário.
+        
+        Args:
+            msg: Mensagem multipart com as partes de texto (sem To/Date/Message-ID)
+            msgid_domain: Domínio usado nos Message-ID
+            cc: Lista de emails CC
+            bcc: Lista de emails BCC
+            attachments: Lista de (headers da parte, anexo) a acrescentar
+            
+        Returns:
+            PreparedMessage
+        """
+        headers, body = flatten_message(msg).split(b'\r\n\r\n', 1)
+        segments: List[Union[bytes, Dict[str, Any]]] = [body]
+        
+        if attachments:
+            delimiter = b'--' + msg.get_boundary().encode('ascii')
+            closing = body.rindex(delimiter + b'--')
+            segments = [body[:closing]]
+            for part_headers, attachment in attachments:
+                segments.extend((delimiter + b'\r\n' + part_headers, attachment, b'\r\n'))
+            segments.append(body[closing:])
+        
+        return cls(headers + b'\r\n', segments, msgid_domain, cc, bcc)
+    
+    def for_recipient(self, to_email: str) -> Tuple[MessageStream, List[str], str]:
+        """
+        Gera a mensagem final para um destinatário.
+        
+        Args:
+            to_email: Email do destinatário
+            
+        Returns:
+            Tuple (mensagem para DATA, destinatários SMTP, Message-ID)
+        """
+        message_id = make_msgid(domain=self.msgid_domain)
+        stamp = (SMTP_POLICY.fold_binary('To', to_email) +
+                 SMTP_POLICY.fold_binary('Date', formatdate(localtime=True)) +
+                 SMTP_POLICY.fold_binary('Message-ID', message_id))
+        data = MessageStream([stamp, self.headers, b'\r\n', *self.body])
+        return data, [to_email] + self.extra_recipients, message_id
+
 
 class SMTPService:
     """Serviço para envio de emails via SMTP."""
@@ -27,10 +224,29 @@ class SMTPService:
             encryption_key: Chave para decriptar passwords
         """
         self.encryption_key = encryption_key
-        self.cipher = AESCipher(encryption_key)
+        self.cipher = get_cipher(encryption_key)
+        # Tempos por fase do último send_email (ver _transact)
+        self.last_timings: Optional[Dict[str, Any]] = None
+        self.probe_timeout = 10
+        try:
+            from flask import current_app
+            self.probe_timeout = current_app.config.get('SMTP_PROBE_TIMEOUT', 10)
+        except RuntimeError:
+            pass
     
     def get_smtp_config_with_fallback(self, account: EmailAccount) -> Dict[str, Any]:
-        """Obter configuração SMTP com fallback inteligente."""
+        """Obter configuração SMTP com fallback inteligente (em cache por conta)."""
+        config = self.get_account_smtp_config(account)
+        
+        # Perfil de transporte descoberto (porta/SSL/TLS que funcionou) tem prioridade
+        return get_transport_cache().apply(account.id, config)
+    
+    def get_account_smtp_config(self, account: EmailAccount) -> Dict[str, Any]:
+        """Configuração SMTP da conta com defaults por domínio, sem perfil de transporte aplicado."""
+        return get_account_config_cache().get('smtp', account, self.encryption_key, self._resolve_smtp_config)
+    
+    def _resolve_smtp_config(self, account: EmailAccount) -> Dict[str, Any]:
+        """Resolve configuração SMTP da conta aplicando os defaults por domínio."""
         config = account.get_smtp_config(self.encryption_key)
         
         # Se servidor não está configurado, usar baseado no domínio
@@ -53,39 +269,88 @@ class SMTPService:
         return config
 
     def test_connection_with_fallback(self, account: EmailAccount) -> Tuple[bool, str, Dict]:
-        """Testar conexão SMTP com múltiplas configurações de fallback."""
-        base_config = self.get_smtp_config_with_fallback(account)
+        """
+        Testa a configuração da conta e, se a ligação falhar, procura alternativas.
         
-        # Configurações para testar em ordem
-        fallback_configs = [
+        O resultado é sempre o da configuração da conta. Uma alternativa
+        cifrada que funcione é devolvida só como sugestão: não é guardada
+        nem usada nos envios. Credenciais recusadas não são repetidas
+        noutras portas.
+        
+        Args:
+            account: Conta de email para testar
+            
+        Returns:
+            Tuple (sucesso da configuração da conta, mensagem, configuração
+            alternativa que funcionou ou {})
+        """
+        config = self.get_account_smtp_config(account)
+        success, message, error = self._check_connection(account, config)
+        if success or isinstance(error, smtplib.SMTPAuthenticationError):
+            return success, message, {}
+        
+        alternatives = [cfg for cfg in self._fallback_configs(config)[1:]
+                        if (cfg['port'], cfg['use_ssl'], cfg['use_tls']) !=
+                        (config['port'], config['use_ssl'], config['use_tls'])]
+        found, _, suggestion = self._probe_fallbacks(config, alternatives)
+        if found:
+            logger.info(f"SMTP for {account.email_address} works with port={suggestion['port']}, "
+                        f"ssl={suggestion['use_ssl']}, tls={suggestion['use_tls']} (suggested, not applied)")
+        return False, message, suggestion if found else {}
+    
+    @staticmethod
+    def _fallback_configs(base_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Configurações a testar, por ordem de preferência.
+        
+        Só candidatos cifrados: a porta 25 sem SSL/TLS enviaria as
+        credenciais em claro, e bastaria bloquear 465 e 587 para a forçar.
+        """
+        return [
             base_config,  # Configuração principal
             {**base_config, 'port': 465, 'use_ssl': True, 'use_tls': False},   # SSL
             {**base_config, 'port': 587, 'use_ssl': False, 'use_tls': True},   # STARTTLS
-            {**base_config, 'port': 25, 'use_ssl': False, 'use_tls': False},   # Plain
         ]
+    
+    def _probe_fallbacks(self,
+                         base_config: Dict[str, Any],
+                         candidates: Optional[List[Dict[str, Any]]] = None) -> Tuple[bool, str, Dict]:
+        """
+        Testa as configurações de fallback em paralelo (happy eyeballs).
         
-        last_error = "Nenhuma configuração SMTP funcionou"
+        Devolve a primeira configuração que ligar e autenticar; as restantes
+        são canceladas ou fechadas assim que terminarem.
         
-        for i, test_config in enumerate(fallback_configs):
-            try:
-                logger.info(f"Testing SMTP config {i+1}/{len(fallback_configs)}: {test_config['server']}:{test_config['port']}")
-                
-                with self._create_smtp_connection(test_config) as server:
-                    success_message = f"Conexão SMTP bem-sucedida (config {i+1})"
-                    logger.info(f"SMTP test successful for {account.email_address} with config {i+1}")
-                    
-                    # Se não é a config principal e funcionou, sugerir atualização
-                    if i > 0:
-                        logger.info(f"Consider updating account {account.email_address} SMTP config to: port={test_config['port']}, ssl={test_config['use_ssl']}, tls={test_config['use_tls']}")
-                    
-                    return True, success_message, test_config
-                    
-            except Exception as e:
-                last_error = str(e)
-                logger.debug(f"SMTP config {i+1} failed for {account.email_address}: {e}")
-                continue
+        Args:
+            base_config: Configuração SMTP resolvida
+            candidates: Configurações a testar (default: _fallback_configs)
+        """
+        fallback_configs = candidates if candidates is not None else self._fallback_configs(base_config)
+        logger.info(f"Probing {len(fallback_configs)} SMTP configs for {base_config['server']} concurrently")
+        
+        index, smtp, errors = race_connections(
+            fallback_configs,
+            connect=lambda cfg: self._create_smtp_connection(cfg, timeout=self.probe_timeout),
+            close=self._close_quietly
+        )
+        
+        if smtp is None:
+            for cfg, error in zip(fallback_configs, errors):
+                if error is not None:
+                    logger.debug(f"SMTP config failed for {cfg['server']}:{cfg['port']}: {error}")
+            last_error = next((str(e) for e in reversed(errors) if e is not None), "Nenhuma configuração SMTP funcionou")
+            return False, last_error, {}
         
-        return False, last_error, {}
+        self._close_quietly(smtp)
+        return True, f"Conexão SMTP bem-sucedida (config {index+1})", fallback_configs[index]
+    
+    @staticmethod
+    def _close_quietly(smtp: smtplib.SMTP) -> None:
+        """Termina sessão SMTP de teste sem propagar erros."""
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
 
     def test_connection(self, account: EmailAccount) -> Tuple[bool, str]:
         """
@@ -97,13 +362,21 @@ class SMTPService:
         Returns:
             Tuple (success, message)
         """
+        success, message, _ = self._check_connection(account, self.get_account_smtp_config(account))
+        return success, message
+    
+    def _check_connection(self, account: EmailAccount, config: Dict[str, Any]) -> Tuple[bool, str, Optional[Exception]]:
+        """
+        Liga e autentica com uma configuração (sem cache de transporte).
+        
+        Returns:
+            Tuple (success, message, exceção ou None)
+        """
         try:
-            config = self.get_smtp_config_with_fallback(account)
-            
             with self._create_smtp_connection(config) as server:
                 # Se chegou aqui, a conexão foi bem-sucedida
                 logger.info(f"SMTP connection test successful for {account.email_address}")
-                return True, "Conexão SMTP estabelecida com sucesso"
+                return True, "Conexão SMTP estabelecida com sucesso", None
                 
         except smtplib.SMTPAuthenticationError as e:
             error_code = getattr(e, 'smtp_code', None)
@@ -118,22 +391,22 @@ class SMTPService:
                 error_msg = f"Erro de autenticação SMTP (código {error_code}): {error_msg_raw}"
             
             logger.error(f"SMTP authentication failed for {account.email_address}: {e} (code: {error_code})")
-            return False, error_msg
+            return False, error_msg, e
             
         except smtplib.SMTPConnectError as e:
             error_msg = f"Erro de conexão SMTP: {str(e)}"
             logger.error(f"SMTP connection failed for {account.email_address}: {e}")
-            return False, error_msg
+            return False, error_msg, e
             
         except smtplib.SMTPServerDisconnected as e:
             error_msg = f"Servidor SMTP desconectado: {str(e)}"
             logger.error(f"SMTP server disconnected for {account.email_address}: {e}")
-            return False, error_msg
+            return False, error_msg, e
             
         except Exception as e:
             error_msg = f"Erro na conexão SMTP: {str(e)}"
             logger.error(f"SMTP test failed for {account.email_address}: {e}")
-            return False, error_msg
+            return False, error_msg, e
     
     def send_email(
         self,
@@ -166,77 +439,134 @@ class SMTPService:
         Returns:
             Tuple (success, message, message_id)
         """
+        self.last_timings = None
         try:
             config = self.get_smtp_config_with_fallback(account)
             
             # Criar mensagem
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = self._format_from_address(config, from_name)
-            msg['To'] = to_email
-            msg['Message-ID'] = make_msgid()
-            
-            # Headers opcionais
-            if reply_to:
-                msg['Reply-To'] = reply_to
-            
-            if cc:
-                msg['Cc'] = ', '.join(cc)
-            
-            # Adicionar conteúdo
-            if text_content:
-                text_part = MIMEText(text_content, 'plain', 'utf-8')
-                msg.attach(text_part)
+            prepared = self._prepare(
+                config=config,
+                subject=subject,
+                html_content=html_content,
+                text_content=text_content,
+                from_name=from_name,
+                reply_to=reply_to,
+                cc=cc,
+                bcc=bcc,
+                attachments=attachments
+            )
+            data, recipients, message_id = prepared.for_recipient(to_email)
             
-            if html_content:
-                html_part = MIMEText(html_content, 'html', 'utf-8')
-                msg.attach(html_part)
+            # Enviar usando sessão do pool
+            self.last_timings = self._deliver(account, config, data, recipients)
             
-            # Se não há conteúdo, criar texto padrão
-            if not text_content and not html_content:
-                default_text = MIMEText('(Mensagem sem conteúdo)', 'plain', 'utf-8')
-                msg.attach(default_text)
-            
-            # Adicionar anexos se houver
-            if attachments:
-                for attachment in attachments:
-                    self._add_attachment(msg, attachment)
-            
-            # Preparar lista de destinatários
-            recipients = [to_email]
-            if cc:
-                recipients.extend(cc)
-            if bcc:
-                recipients.extend(bcc)
+            success_msg = f"Email enviado com sucesso para {to_email}"
+            logger.info(f"Email sent successfully from {account.email_address} to {to_email}")
+            return True, success_msg, message_id
+                
+        except Exception as e:
+            return False, self._describe_send_error(e), None
+    
+    def send_bulk_messages(
+        self,
+        account: EmailAccount,
+        messages: Iterable[Dict[str, Any]],
+        messages_per_session: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Envia várias mensagens numa única sessão SMTP autenticada.
+        
+        Cada mensagem é uma transação MAIL FROM/RCPT TO/DATA na mesma sessão.
+        Após uma falha por mensagem é enviado RSET; a sessão é substituída
+        ao fim de `messages_per_session` mensagens ou se o servidor desligar.
+        
+        Args:
+            account: Conta de email para envio
+            messages: Iterável de dicts com os argumentos de send_email
+                (to_email, subject, html_content, text_content, from_name,
+                reply_to, cc, bcc, attachments) ou com to_email e
+                prepared (PreparedMessage partilhada por vários destinatários)
+            messages_per_session: Mensagens por sessão antes de rodar
+                (usa SMTP_MAX_MESSAGES_PER_SESSION se não fornecido)
             
-            # Enviar
-            with self._create_smtp_connection(config) as server:
-                server.send_message(msg, from_addr=config['from_email'], to_addrs=recipients)
-                message_id = msg.get('Message-ID', '')
+        Yields:
+            Dict por destinatário com email, success, message, message_id,
+            timings (tempos por fase, ver _transact) e transient (falha temporária)
+        """
+        pool = get_smtp_pool()
+        limit = messages_per_session or pool.max_messages_per_session
+        config = self.get_smtp_config_with_fallback(account)
+        key = pool.make_key(account.id, config)
+        
+        conn = None
+        session_count = 0
+        connect_error = None
+        connect_transient = False
+        
+        try:
+            for item in messages:
+                to_email = item.get('to_email')
                 
-                success_msg = f"Email enviado com sucesso para {to_email}"
-                logger.info(f"Email sent successfully from {account.email_address} to {to_email}")
-                return True, success_msg, message_id
+                if connect_error:
+                    # Sem sessão possível: falhar restantes sem voltar a ligar
+                    yield self._bulk_result(to_email, False, connect_error, None, transient=connect_transient)
+                    continue
                 
-        except smtplib.SMTPRecipientsRefused as e:
-            error_msg = f"Destinatário recusado: {str(e)}"
-            logger.error(f"Recipients refused: {e}")
-            return False, error_msg, None
-            
-        except smtplib.SMTPSenderRefused as e:
-            error_msg = f"Remetente recusado: {str(e)}"
-            logger.error(f"Sender refused: {e}")
-            return False, error_msg, None
-            
-        except smtplib.SMTPDataError as e:
-            error_msg = f"Erro de dados SMTP: {str(e)}"
-            logger.error(f"SMTP data error: {e}")
-            return False, error_msg, None
-            
-        except Exception as e:
-            error_msg = f"Erro ao enviar email: {str(e)}"
-            logger.error(f"Failed to send email: {e}")
-            return False, error_msg, None
+                try:
+                    data, recipients, message_id = self._render_item(config, item)
+                except Exception as e:
+                    yield self._failed_result(to_email, e)
+                    continue
+                
+                result = None
+                for attempt in range(2):
+                    if conn is None:
+                        try:
+                            conn = pool.acquire(key, config, lambda cfg: self._open_transport(account.id, cfg))
+                            session_count = 0
+                        except Exception as e:
+                            connect_error = self._describe_send_error(e)
+                            connect_transient = self.is_transient_error(e)
+                            result = self._bulk_result(to_email, False, connect_error, None, transient=connect_transient)
+                            break
+                    
+                    try:
+                        _, timings = self._transact(account.id, config, conn.smtp, recipients, data)
+                        conn.messages_sent += 1
+                        session_count += 1
+                        result = self._bulk_result(
+                            to_email, True, f"Email enviado com sucesso para {to_email}", message_id, timings
+                        )
+                        break
+                    except smtplib.SMTPServerDisconnected as e:
+                        data_started = getattr(conn.smtp, 'data_started', False)
+                        pool.discard(conn)
+                        conn = None
+                        if attempt or data_started:
+                            result = self._failed_result(to_email, e)
+                            break
+                        logger.warning(f"Bulk SMTP session for {account.email_address} disconnected, reconnecting: {e}")
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        result = self._failed_result(to_email, e)
+                        if not pool.reset(conn):
+                            pool.discard(conn)
+                            conn = None
+                        break
+                    except Exception as e:
+                        result = self._failed_result(to_email, e)
+                        pool.discard(conn)
+                        conn = None
+                        break
+                
+                yield result
+                
+                # Rodar sessão após o limite configurado
+                if conn is not None and session_count >= limit:
+                    pool.discard(conn)
+                    conn = None
+        finally:
+            if conn is not None:
+                pool.release(conn)
     
     def send_bulk_emails(
         self,
@@ -245,7 +575,8 @@ class SMTPService:
         subject: str,
         html_template: Optional[str] = None,
         text_template: Optional[str] = None,
-        from_name: Optional[str] = None
+        from_name: Optional[str] = None,
+        messages_per_session: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Envia emails em massa.
@@ -257,63 +588,441 @@ class SMTPService:
             html_template: Template HTML
             text_template: Template texto
             from_name: Nome do remetente
+            messages_per_session: Mensagens por sessão SMTP antes de rodar
             
         Returns:
             Lista de resultados por destinatário
         """
+        from jinja2 import Template
+        
+        html_tmpl = Template(html_template) if html_template else None
+        text_tmpl = Template(text_template) if text_template else None
         results = []
         
-        for recipient in recipients:
-            email = recipient.get('email')
-            variables = recipient.get('variables', {})
-            
-            # Renderizar conteúdo para este destinatário
-            try:
-                from jinja2 import Template
-                
-                html_content = None
-                if html_template:
-                    html_tmpl = Template(html_template)
-                    html_content = html_tmpl.render(**variables)
-                
-                text_content = None
-                if text_template:
-                    text_tmpl = Template(text_template)
-                    text_content = text_tmpl.render(**variables)
+        def rendered_messages():
+            for recipient in recipients:
+                email = recipient.get('email')
+                variables = recipient.get('variables', {})
                 
-                # Enviar email
-                success, message, message_id = self.send_email(
-                    account=account,
-                    to_email=email,
-                    subject=subject,
-                    html_content=html_content,
-                    text_content=text_content,
-                    from_name=from_name
-                )
+                # Renderizar conteúdo para este destinatário
+                try:
+                    html_content = html_tmpl.render(**variables) if html_tmpl else None
+                    text_content = text_tmpl.render(**variables) if text_tmpl else None
+                except Exception as e:
+                    results.append(self._bulk_result(email, False, str(e), None))
+                    continue
                 
-                results.append({
-                    'email': email,
-                    'success': success,
-                    'message': message,
-                    'message_id': message_id
-                })
-                
-            except Exception as e:
-                results.append({
-                    'email': email,
-                    'success': False,
-                    'message': str(e),
-                    'message_id': None
-                })
+                yield {
+                    'to_email': email,
+                    'subject': subject,
+                    'html_content': html_content,
+                    'text_content': text_content,
+                    'from_name': from_name
+                }
+        
+        for result in self.send_bulk_messages(account, rendered_messages(), messages_per_session):
+            results.append(result)
         
         return results
     
-    def _create_smtp_connection(self, config: Dict[str, Any]):
+    def prepare_message(
+        self,
+        account: EmailAccount,
+        subject: str,
+        html_content: Optional[str] = None,
+        text_content: Optional[str] = None,
+        from_name: Optional[str] = None,
+        reply_to: Optional[str] = None,
+        cc: Optional[List[str]] = None,
+        bcc: Optional[List[str]] = None,
+        attachments: Optional[List[Dict[str, Any]]] = None
+    ) -> PreparedMessage:
+        """
+        Codifica uma mensagem uma única vez para envio a vários destinatários.
+        
+        Usar com send_bulk_messages passando {'to_email': ..., 'prepared': ...}
+        por destinatário: corpo e anexos não voltam a ser codificados.
+        
+        Args:
+            account: Conta de email para envio
+            subject: Assunto do email
+            html_content: Conteúdo HTML
+            text_content: Conteúdo texto plano
+            from_name: Nome do remetente
+            reply_to: Email de resposta
+            cc: Lista de emails CC
+            bcc: Lista de emails BCC
+            attachments: Lista de anexos
+            
+        Returns:
+            PreparedMessage
+        """
+        config = self.get_smtp_config_with_fallback(account)
+        return self._prepare(
+            config=config,
+            subject=subject,
+            html_content=html_content,
+            text_content=text_content,
+            from_name=from_name,
+            reply_to=reply_to,
+            cc=cc,
+            bcc=bcc,
+            attachments=attachments
+        )
+    
+    def _prepare(
+        self,
+        config: Dict[str, Any],
+        subject: str,
+        html_content: Optional[str] = None,
+        text_content: Optional[str] = None,
+        from_name: Optional[str] = None,
+        reply_to: Optional[str] = None,
+        cc: Optional[List[str]] = None,
+        bcc: Optional[List[str]] = None,
+        attachments: Optional[List[Dict[str, Any]]] = None
+    ) -> PreparedMessage:
+        """
+        Constrói e codifica a parte da mensagem comum a todos os destinatários.
+        
+        Args:
+            config: Configuração SMTP resolvida
+            subject: Assunto do email
+            html_content: Conteúdo HTML
+            text_content: Conteúdo texto plano
+            from_name: Nome do remetente
+            reply_to: Email de resposta
+            cc: Lista de emails CC
+            bcc: Lista de emails BCC
+            attachments: Lista de anexos
+            
+        Returns:
+            PreparedMessage
+        """
+        # Boundary definido à partida: evita procurar colisões no corpo inteiro
+        msg = MIMEMultipart('alternative', boundary=f"{'=' * 15}{uuid.uuid4().hex}==")
+        msg['Subject'] = subject
+        msg['From'] = self._format_from_address(config, from_name)
+        
+        # Headers opcionais
+        if reply_to:
+            msg['Reply-To'] = reply_to
+        
+        if cc:
+            msg['Cc'] = ', '.join(cc)
+        
+        # Adicionar conteúdo
+        if text_content:
+            text_part = MIMEText(text_content, 'plain', 'utf-8')
+            msg.attach(text_part)
+        
+        if html_content:
+            html_part = MIMEText(html_content, 'html', 'utf-8')
+            msg.attach(html_part)
+        
+        # Se não há conteúdo, criar texto padrão
+        if not text_content and not html_content:
+            default_text = MIMEText('(Mensagem sem conteúdo)', 'plain', 'utf-8')
+            msg.attach(default_text)
+        
+        # Anexos são codificados apenas durante o envio (ver MessageStream)
+        attachment_parts = []
+        for attachment in attachments or []:
+            part_headers = self._attachment_headers(attachment)
+            if part_headers:
+                attachment_parts.append((part_headers, attachment))
+        
+        # Message-ID no domínio da conta (evita socket.getfqdn() por mensagem)
+        msgid_domain = config['from_email'].rpartition('@')[2] or None
+        return PreparedMessage.from_message(msg, msgid_domain, cc, bcc, attachment_parts)
+    
+    def _render_item(self, config: Dict[str, Any], item: Dict[str, Any]) -> Tuple[MessageStream, List[str], str]:
+        """
+        Gera dados SMTP de um item de send_bulk_messages.
+        
+        Args:
+            config: Configuração SMTP resolvida
+            item: Dict com to_email e prepared, ou com os argumentos de send_email
+            
+        Returns:
+            Tuple (dados para DATA, destinatários SMTP, Message-ID)
+        """
+        prepared = item.get('prepared')
+        if prepared is None:
+            fields = {k: v for k, v in item.items() if k != 'to_email'}
+            prepared = self._prepare(config=config, **fields)
+        return prepared.for_recipient(item['to_email'])
+    
+    @staticmethod
+    def _describe_send_error(error: Exception) -> str:
+        """
+        Converte exceção de envio em mensagem de erro e regista-a.
+        
+        Args:
+            error: Exceção capturada no envio
+            
+        Returns:
+            Mensagem de erro
+        """
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            logger.error(f"Recipients refused: {error}")
+            return f"Destinatário recusado: {str(error)}"
+        
+        if isinstance(error, smtplib.SMTPSenderRefused):
+            logger.error(f"Sender refused: {error}")
+            return f"Remetente recusado: {str(error)}"
+        
+        if isinstance(error, smtplib.SMTPDataError):
+            logger.error(f"SMTP data error: {error}")
+            return f"Erro de dados SMTP: {str(error)}"
+        
+        logger.error(f"Failed to send email: {error}")
+        return f"Erro ao enviar email: {str(error)}"
+    
+    @staticmethod
+    def is_transient_error(error: Exception) -> bool:
+        """
+        Classifica falha de envio como temporária (vale a pena repetir) ou permanente.
+        
+        Respostas 4xx, quebras de ligação, timeouts e relays inacessíveis são
+        temporárias; respostas 5xx e erros de conteúdo são permanentes.
+        
+        Args:
+            error: Exceção capturada no envio
+            
+        Returns:
+            True se a falha for temporária
+        """
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            codes = [code for code, _ in error.recipients.values()]
+            return bool(codes) and all(400 <= code < 500 for code in codes)
+        
+        if isinstance(error, smtplib.SMTPConnectError):
+            return not 500 <= error.smtp_code < 600
+        
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 400 <= error.smtp_code < 500
+        
+        return isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+    
+    @staticmethod
+    def _bulk_result(email: str,
+                     success: bool,
+                     message: str,
+                     message_id: Optional[str],
+                     timings: Optional[Dict[str, Any]] = None,
+                     transient: bool = False) -> Dict[str, Any]:
+        """Formata resultado por destinatário dos envios em massa."""
+        return {
+            'email': email,
+            'success': success,
+            'message': message,
+            'message_id': message_id,
+            'timings': timings,
+            'transient': transient
+        }
+    
+    def _failed_result(self, email: str, error: Exception) -> Dict[str, Any]:
+        """Resultado de falha por destinatário, com a classificação do erro."""
+        return self._bulk_result(
+            email, False, self._describe_send_error(error), None, transient=self.is_transient_error(error)
+        )
+    
+    def _deliver(
+        self,
+        account: EmailAccount,
+        config: Dict[str, Any],
+        data: MessageStream,
+        recipients: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Entrega mensagem usando uma sessão do pool SMTP da conta.
+        
+        Se a sessão reutilizada tiver sido fechada pelo servidor
+        (SMTPServerDisconnected) antes do DATA, reconecta e tenta uma vez
+        mais; depois do DATA a mensagem pode já ter sido aceite, pelo que a
+        falha é devolvida e a repetição fica a cargo da fila.
+        
+        Args:
+            account: Conta de email para envio
+            config: Configuração SMTP resolvida
+            data: Mensagem serializada (ver PreparedMessage.for_recipient)
+            recipients: Lista de destinatários (To + Cc + Bcc)
+            
+        Returns:
+            Tempos por fase do envio (ver _transact)
+        """
+        pool = get_smtp_pool()
+        key = pool.make_key(account.id, config)
+        
+        for attempt in range(2):
+            smtp = None
+            try:
+                with pool.connection(key, config, lambda cfg: self._open_transport(account.id, cfg)) as conn:
+                    smtp = conn.smtp
+                    _, timings = self._transact(account.id, config, smtp, recipients, data)
+                    conn.messages_sent += 1
+                return timings
+            except smtplib.SMTPServerDisconnected as e:
+                if attempt or getattr(smtp, 'data_started', False):
+                    raise
+                logger.warning(f"Pooled SMTP session for {account.email_address} disconnected, reconnecting: {e}")
+    
+    @staticmethod
+    def _relay(config: Dict[str, Any]) -> str:
+        """Identificador do relay nas métricas (servidor:porta)."""
+        return f"{config['server']}:{config['port']}"
+    
+    def _transact(
+        self,
+        account_id: int,
+        config: Dict[str, Any],
+        smtp: smtplib.SMTP,
+        recipients: List[str],
+        data: Iterable[bytes]
+    ) -> Tuple[Dict[str, Tuple[int, bytes]], Dict[str, Any]]:
+        """
+        Envia mensagem numa sessão e regista os tempos por fase.
+        
+        Os tempos de ligação (dns, connect, tls, greeting, auth) só entram
+        no primeiro envio de cada sessão; os seguintes têm reused_session.
+        
+        Args:
+            account_id: ID da conta
+            config: Configuração SMTP resolvida
+            smtp: Sessão SMTP autenticada
+            recipients: Destinatários (envelope)
+            data: Mensagem em blocos
+            
+        Returns:
+            Tuple (destinatários recusados, tempos por fase)
+        """
+        size = 0
+        
+        def counted():
+            nonlocal size
+            for chunk in data:
+                size += len(chunk)
+                yield chunk
+        
+        start = time.perf_counter()
+        refused = self._send_stream(smtp, config['from_email'], recipients, counted())
+        
+        connect_timings = getattr(smtp, 'timings', None) or {}
+        smtp.timings = {}
+        timings = {
+            'relay': self._relay(config),
+            'reused_session': not connect_timings,
+            **connect_timings,
+            'data_ms': elapsed_ms(start),
+            'size_bytes': size
+        }
+        get_smtp_metrics().record(timings['relay'], account_id, timings)
+        return refused, timings
+    
+    @staticmethod
+    def _send_stream(
+        smtp: smtplib.SMTP,
+        from_addr: str,
+        recipients: List[str],
+        data: Iterable[bytes]
+    ) -> Dict[str, Tuple[int, bytes]]:
+        """
+        Executa transação SMTP escrevendo a mensagem por blocos no socket.
+        
+        Equivalente a smtplib.SMTP.sendmail, mas sem juntar a mensagem
+        inteira em memória antes do comando DATA. Marca `smtp.data_started`
+        ao enviar DATA: a partir daí uma quebra de ligação não é repetida.
+        
+        Args:
+            smtp: Sessão SMTP autenticada
+            from_addr: Remetente (envelope)
+            recipients: Destinatários (envelope)
+            data: Mensagem em blocos (ver MessageStream)
+            
+        Returns:
+            Dict de destinatários recusados (vazio se todos aceites)
+        """
+        def abort():
+            try:
+                smtp.rset()
+            except (smtplib.SMTPException, OSError):
+                pass
+        
+        smtp.data_started = False
+        smtp.ehlo_or_helo_if_needed()
+        code, response = smtp.mail(from_addr)
+        if code != 250:
+            if code == 421:
+                smtp.close()
+            else:
+                abort()
+            raise smtplib.SMTPSenderRefused(code, response, from_addr)
+        
+        refused = {}
+        for recipient in recipients:
+            code, response = smtp.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+            if code == 421:
+                smtp.close()
+                raise smtplib.SMTPRecipientsRefused(refused)
+        
+        if len(refused) == len(recipients):
+            abort()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        
+        smtp.data_started = True
+        smtp.putcmd('data')
+        code, response = smtp.getreply()
+        if code != 354:
+            abort()
+            raise smtplib.SMTPDataError(code, response)
+        
+        for chunk in dot_stuff(data):
+            smtp.send(chunk)
+        smtp.send(b'.\r\n')
+        
+        code, response = smtp.getreply()
+        if code != 250:
+            abort()
+            raise smtplib.SMTPDataError(code, response)
+        
+        return refused
+    
+    def _open_transport(self, account_id: int, config: Dict[str, Any]) -> smtplib.SMTP:
+        """
+        Abre sessão para envio, falhando de imediato se o relay estiver inacessível.
+        
+        Erros de ligação marcam o relay como inacessível (ver TransportProfileCache).
+        
+        Args:
+            account_id: ID da conta
+            config: Configuração SMTP resolvida
+            
+        Returns:
+            Objeto SMTP conectado e autenticado
+        """
+        transports = get_transport_cache()
+        transports.check_available(account_id, config['server'])
+        
+        try:
+            return self._create_smtp_connection(config)
+        except Exception as e:
+            self._transport_failed(account_id, config, e)
+            raise
+    
+    def _transport_failed(self, account_id: int, config: Dict[str, Any], error: Exception) -> None:
+        """Reporta erro de envio à cache de transporte."""
+        get_transport_cache().report_failure(account_id, config, error)
+    
+    def _create_smtp_connection(self, config: Dict[str, Any], timeout: float = 30):
         """
         Cria conexão SMTP configurada.
         
         Args:
             config: Configuração SMTP da conta
+            timeout: Timeout de ligação e operações (segundos)
             
         Returns:
             Objeto SMTP conectado e autenticado
@@ -327,24 +1036,31 @@ class SMTPService:
         
         logger.debug(f"Creating SMTP connection to {server}:{port}")
         
-        # Criar conexão
+        # Criar conexão (DNS, TCP e TLS implícito medidos em smtp.timings)
+        start = time.perf_counter()
         if use_ssl:
             context = ssl.create_default_context()
-            smtp = smtplib.SMTP_SSL(server, port, context=context, timeout=30)
+            smtp = TimedSMTP_SSL(server, port, context=context, timeout=timeout)
         else:
-            smtp = smtplib.SMTP(server, port, timeout=30)
+            smtp = TimedSMTP(server, port, timeout=timeout)
+        timings = smtp.timings
+        timings['greeting_ms'] = round(max(elapsed_ms(start) - sum(timings.values()), 0.0), 2)
         
         # Configurar debug se em desenvolvimento
         smtp.set_debuglevel(0)  # Set to 1 for debug output
         
         # Ativar TLS se necessário
         if use_tls and not use_ssl:
+            start = time.perf_counter()
             context = ssl.create_default_context()
             smtp.starttls(context=context)
+            timings['tls_ms'] = elapsed_ms(start)
         
         # Autenticar
         if username and password:
+            start = time.perf_counter()
             smtp.login(username, password)
+            timings['auth_ms'] = elapsed_ms(start)
             logger.debug(f"SMTP authentication successful for {username}")
         
         return smtp
@@ -367,30 +1083,25 @@ class SMTPService:
             return formataddr((name, email))
         return email
     
-    def _add_attachment(self, msg: MIMEMultipart, attachment: Dict[str, Any]) -> None:
+    @staticmethod
+    def _attachment_headers(attachment: Dict[str, Any]) -> Optional[bytes]:
         """
-        Adiciona anexo à mensagem.
+        Serializa os headers da parte MIME de um anexo.
         
         Args:
-            msg: Mensagem MIME
-            attachment: Dicionário com dados do anexo
+            attachment: Dicionário com filename e 'path' (ficheiro) ou 'content' (bytes)
+            
+        Returns:
+            Headers da parte seguidos de linha em branco, ou None se o anexo estiver vazio
         """
         filename = attachment.get('filename', 'attachment')
-        content = attachment.get('content')
-        content_type = attachment.get('content_type', 'application/octet-stream')
         
-        if not content:
-            return
+        if not attachment.get('content') and not attachment.get('path'):
+            return None
         
-        # Criar parte do anexo
+        # Criar parte do anexo (payload codificado em base64 durante o envio)
         part = MIMEBase('application', 'octet-stream')
-        
-        # Se content é string, converter para bytes
-        if isinstance(content, str):
-            content = content.encode('utf-8')
-        
-        part.set_payload(content)
-        encoders.encode_base64(part)
+        part['Content-Transfer-Encoding'] = 'base64'
         
         # Adicionar headers
         part.add_header(
@@ -398,4 +1109,31 @@ class SMTPService:
             f'attachment; filename="{filename}"'
         )
         
-        msg.attach(part)
\ No newline at end of file
+        return flatten_message(part)
+
+
+def create_smtp_service(encryption_key: str) -> SMTPService:
+    """
+    Cria serviço SMTP conforme o motor de entrega configurado.
+    
+    Com SMTP_DELIVERY_ENGINE='async' devolve um AsyncSMTPService, que
+    mantém o mesmo contrato mas entrega através do event loop partilhado.
+    
+    Args:
+        encryption_key: Chave para decriptar passwords
+        
+    Returns:
+        Instância de SMTPService
+    """
+    engine = 'sync'
+    try:
+        from flask import current_app
+        engine = current_app.config.get('SMTP_DELIVERY_ENGINE', 'sync')
+    except RuntimeError:
+        pass
+    
+    if engine == 'async':
+        from .async_smtp import AsyncSMTPService
+        return AsyncSMTPService(encryption_key)
+    
+    return SMTPService(encryption_key)
@@ -0,0 +1,302 @@
+"""
+Cache de templates Jinja compilados para SendCraft.
+
+Compilar um template custa muito mais do que renderizá-lo: os templates
+dos EmailTemplate são compilados uma vez por processo num Environment
+partilhado e reutilizados até a versão mudar. Com uma bytecode cache
+(ficheiros ou BD), o código gerado é gravado quando o template é guardado
+e um processo novo só tem de o carregar, sem voltar a compilar.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from jinja2 import Environment, Template, BytecodeCache, FileSystemBytecodeCache
+from jinja2.bccache import Bucket
+from sqlalchemy import select, update, insert, delete
+
+from ..extensions import db
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Entradas (template, versão, parte) mantidas por defeito
+DEFAULT_CACHE_SIZE = 512
+BYTECODE_KEY_PREFIX = 'email_template'
+
+
+def bytecode_name(template_id: int, version: Optional[int], part: str) -> str:
+    """Nome Jinja de uma parte de um EmailTemplate (chave da bytecode cache)."""
+    return f"{BYTECODE_KEY_PREFIX}/{template_id}/{version}/{part}"
+
+
+class DatabaseBytecodeCache(BytecodeCache):
+    """
+    Bytecode cache na tabela template_bytecode, partilhada pelas instâncias.
+
+    Para ambientes sem disco partilhado nem persistente (serverless). Usa
+    uma ligação própria, fora da sessão do pedido, para que gravar um
+    bucket nunca faça commit de trabalho pendente de quem renderiza. Falhas
+    da BD são registadas e o template é compilado como sem cache.
+    """
+
+    def __init__(self):
+        """Inicializa cache sobre a tabela template_bytecode."""
+        from ..models.template import TemplateBytecode
+        self.table = TemplateBytecode.__table__
+
+    def get_cache_key(self, name: str, filename: Optional[str] = None) -> str:
+        """Chave legível (template/versão/parte) para poder invalidar por template."""
+        return name
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        """Carrega bucket da BD (o Jinja descarta-o se a fonte ou o Python mudaram)."""
+        try:
+            with db.engine.connect() as conn:
+                code = conn.execute(
+                    select(self.table.c.code).where(self.table.c.cache_key == bucket.key)
+                ).scalar()
+        except Exception as e:
+            logger.warning(f"Template bytecode load failed for {bucket.key}: {e}")
+            return
+        if code is not None:
+            bucket.bytecode_from_string(code)
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        """Grava bucket na BD."""
+        values = {'code': bucket.bytecode_to_string(), 'updated_at': datetime.utcnow()}
+        try:
+            with db.engine.begin() as conn:
+                updated = conn.execute(
+                    update(self.table).where(self.table.c.cache_key == bucket.key).values(**values)
+                ).rowcount
+                if not updated:
+                    conn.execute(insert(self.table).values(cache_key=bucket.key, **values))
+        except Exception as e:
+            # Inclui a corrida com outra instância a gravar a mesma chave
+            logger.warning(f"Template bytecode store failed for {bucket.key}: {e}")
+
+    def clear(self, prefix: str = '') -> None:
+        """
+        Remove buckets gravados.
+
+        Args:
+            prefix: Só as chaves com este prefixo ('' = todas)
+        """
+        statement = delete(self.table)
+        if prefix:
+            statement = statement.where(self.table.c.cache_key.startswith(prefix, autoescape=True))
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(statement)
+        except Exception as e:
+            logger.warning(f"Template bytecode clear failed: {e}")
+
+
+def create_bytecode_cache(backend: Optional[str], directory: Optional[str] = None) -> Optional[BytecodeCache]:
+    """
+    Cria a bytecode cache configurada.
+
+    Args:
+        backend: 'filesystem', 'database' ou vazio (sem bytecode cache)
+        directory: Diretório da cache em ficheiros (default: diretório temporário)
+
+    Returns:
+        BytecodeCache ou None
+
+    Raises:
+        ValueError: Se o backend for desconhecido
+    """
+    if not backend:
+        return None
+    if backend == 'filesystem':
+        if not directory:
+            return FileSystemBytecodeCache()
+        os.makedirs(directory, exist_ok=True)
+        return FileSystemBytecodeCache(directory)
+    if backend == 'database':
+        return DatabaseBytecodeCache()
+    raise ValueError(f'TEMPLATE_BYTECODE_CACHE inválido: {backend}')
+
+
+class CompiledTemplateCache:
+    """
+    Cache LRU de templates compilados por (id do template, versão, parte).
+
+    O Environment tem as opções por defeito do jinja2.Template (sem
+    autoescape), pelo que o resultado é o mesmo de compilar a fonte em
+    cada chamada. Cada entrada guarda também a fonte: um template editado
+    sem mudar de versão (ou alterado em memória para pré-visualização) é
+    recompilado em vez de devolver o compilado antigo. Numa falha da LRU o
+    código vem da bytecode cache, se houver, antes de se compilar a fonte.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE, bytecode_cache: Optional[BytecodeCache] = None):
+        """
+        Inicializa cache vazia.
+
+        Args:
+            max_size: Máximo de templates compilados mantidos
+            bytecode_cache: Cache persistente do código compilado (None = só em memória)
+        """
+        self.max_size = max(1, max_size)
+        self.environment = Environment(bytecode_cache=bytecode_cache)
+        self._entries: 'OrderedDict[Tuple[int, int, str], Tuple[str, Template]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytecode_loads = 0
+        self.compilations = 0
+
+    def get(self, template_id: Optional[int], version: Optional[int], part: str, source: str) -> Template:
+        """
+        Retorna template compilado, compilando-o se necessário.
+
+        Args:
+            template_id: ID do EmailTemplate (None = não guardado, não é cacheado)
+            version: Versão do template
+            part: Parte do template ('subject', 'html' ou 'text')
+            source: Fonte Jinja
+
+        Returns:
+            Template compilado
+
+        Raises:
+            TemplateSyntaxError: Se a fonte for inválida
+        """
+        if template_id is None:
+            return self.environment.from_string(source)
+
+        key = (template_id, version, part)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == source:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Compilar fora do lock: dois threads podem compilar a mesma entrada, o resultado é igual
+        compiled = self._load(bytecode_name(template_id, version, part), source)
+
+        with self._lock:
+            self._entries[key] = (source, compiled)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return compiled
+
+    def _load(self, name: str, source: str) -> Template:
+        """
+        Compila fonte, usando a bytecode cache se configurada (como jinja2.BaseLoader.load).
+
+        Args:
+            name: Nome do template na bytecode cache
+            source: Fonte Jinja
+
+        Returns:
+            Template compilado
+        """
+        environment = self.environment
+        bytecode_cache = environment.bytecode_cache
+        if bytecode_cache is None:
+            self.compilations += 1
+            return environment.from_string(source)
+
+        bucket = bytecode_cache.get_bucket(environment, name, None, source)
+        code = bucket.code
+        if code is None:
+            self.compilations += 1
+            code = environment.compile(source, name)
+            bucket.code = code
+            try:
+                bytecode_cache.set_bucket(bucket)
+            except OSError as e:
+                # Diretório sem escrita ou cheio: continua a funcionar só com a LRU
+                logger.warning(f"Template bytecode store failed for {name}: {e}")
+        else:
+            self.bytecode_loads += 1
+
+        return environment.template_class.from_code(environment, code, environment.make_globals(None))
+
+    def invalidate(self, template_id: Optional[int] = None) -> None:
+        """
+        Remove todas as versões de um template (ou toda a cache), também da
+        bytecode cache em BD.
+
+        Args:
+            template_id: ID do template; None limpa toda a cache
+        """
+        with self._lock:
+            if template_id is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == template_id]:
+                    del self._entries[key]
+
+        bytecode_cache = self.environment.bytecode_cache
+        if isinstance(bytecode_cache, DatabaseBytecodeCache):
+            prefix = f"{BYTECODE_KEY_PREFIX}/{template_id}/" if template_id is not None else BYTECODE_KEY_PREFIX
+            bytecode_cache.clear(prefix)
+        logger.debug(f"Compiled template cache invalidated (template={template_id})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas da cache.
+
+        Returns:
+            Dict com entradas, limite, hits, misses e evictions
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytecode_cache': type(self.environment.bytecode_cache).__name__
+                if self.environment.bytecode_cache else None,
+                'bytecode_loads': self.bytecode_loads,
+                'compilations': self.compilations
+            }
+
+
+# Instância global
+_template_cache: Optional[CompiledTemplateCache] = None
+_template_cache_lock = threading.Lock()
+
+
+def get_template_cache() -> CompiledTemplateCache:
+    """
+    Retorna cache global de templates compilados.
+
+    Returns:
+        Instância do CompiledTemplateCache
+    """
+    global _template_cache
+
+    if _template_cache is None:
+        with _template_cache_lock:
+            if _template_cache is None:
+                options = {}
+                try:
+                    from flask import current_app
+                    config = current_app.config
+                    options = {
+                        'max_size': config.get('TEMPLATE_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+                        'bytecode_cache': create_bytecode_cache(
+                            config.get('TEMPLATE_BYTECODE_CACHE'),
+                            config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+                        )
+                    }
+                except RuntimeError:
+                    # Fora do contexto da app: usar defaults (sem bytecode cache)
+                    pass
+                _template_cache = CompiledTemplateCache(**options)
+
+    return _template_cache
@@ -1,8 +1,12 @@
 """Serviço de Templates para SendCraft."""
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator
 from jinja2 import Template, Environment, meta, TemplateError
 
 from ..models import Domain, EmailTemplate
+from ..services.template_cache import get_template_cache
+from ..services.render_cache import get_render_cache
+from ..services.entity_cache import get_entity_cache
+from ..services.batch_render import RenderedEmail, get_batch_renderer
 from ..extensions import db
 from ..utils.logging import get_logger
 
@@ -92,6 +96,8 @@ class TemplateService:
                 is_active=True
             )
             
+            template.precompile()
+            
             logger.info(f"Template {template_key} created for domain {domain_name}")
             return True, "Template created successfully", template
             
@@ -146,6 +152,10 @@ class TemplateService:
                 template.version += 1
             
             template.save()
+            get_template_cache().invalidate(template.id)
+            get_render_cache().invalidate(template.id)
+            get_entity_cache().invalidate('template', template.id)
+            template.precompile()
             
             logger.info(f"Template {template_key} updated for domain {domain_name}")
             return True, "Template updated successfully", template
@@ -193,6 +203,9 @@ class TemplateService:
                 template.delete()
                 message = "Template deleted successfully"
             
+            get_template_cache().invalidate(template.id)
+            get_render_cache().invalidate(template.id)
+            get_entity_cache().invalidate('template', template.id)
             logger.info(f"Template {template_key} {'deactivated' if soft_delete else 'deleted'}")
             return True, message
             
@@ -252,6 +265,26 @@ class TemplateService:
             logger.error(error_msg)
             return False, error_msg, None
     
+    def render_batch(
+        self,
+        template: EmailTemplate,
+        variables: Iterable[Dict[str, Any]]
+    ) -> Iterator[RenderedEmail]:
+        """
+        Renderiza um template para muitos conjuntos de variáveis.
+        
+        Lotes a partir de TEMPLATE_BATCH_PARALLEL_THRESHOLD são
+        distribuídos por um pool de processos (ver BatchRenderer).
+        
+        Args:
+            template: Template a renderizar
+            variables: Iterável de dicts de variáveis (pode ser um gerador)
+            
+        Returns:
+            Iterador de RenderedEmail (subject, html, text, error) pela mesma ordem
+        """
+        return get_batch_renderer().render(template, variables)
+    
     def validate_template_syntax(
         self,
         subject_template: Optional[str],
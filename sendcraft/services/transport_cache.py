@@ -0,0 +1,227 @@
+"""
+Cache de perfis de transporte SMTP para SendCraft.
+Regista a combinação (porta, SSL, TLS) que funcionou por conta e relay, e
+marca como inacessíveis, durante algum tempo, relays que recusam ligações.
+
+Um perfil nunca é menos seguro do que a configuração da conta: uma conta
+com SSL ou STARTTLS não passa a enviar credenciais em claro porque alguém
+no caminho bloqueou as portas cifradas.
+"""
+import smtplib
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Campos da configuração SMTP que formam um perfil de transporte
+PROFILE_FIELDS = ('port', 'use_ssl', 'use_tls')
+
+# Erros que indicam problema de transporte (e não de credenciais ou de mensagem);
+# uma sessão que cai a meio (SMTPServerDisconnected) não torna o relay inacessível
+TRANSPORT_ERRORS = (OSError, smtplib.SMTPConnectError, smtplib.SMTPNotSupportedError)
+
+
+def is_encrypted(config: Dict[str, Any]) -> bool:
+    """Se a configuração usa SSL ou STARTTLS."""
+    return bool(config.get('use_ssl') or config.get('use_tls'))
+
+
+def is_downgrade(profile: Dict[str, Any], configured: Dict[str, Any]) -> bool:
+    """
+    Se um perfil é menos seguro do que a configuração da conta.
+
+    Args:
+        profile: Perfil candidato (port, use_ssl, use_tls)
+        configured: Configuração da conta
+
+    Returns:
+        True se a conta usa SSL/STARTTLS e o perfil não
+    """
+    return is_encrypted(configured) and not is_encrypted(profile)
+
+
+class TransportUnavailableError(smtplib.SMTPConnectError):
+    """Relay marcado como inacessível até à próxima sondagem."""
+
+    def __init__(self, server: str, retry_in: float):
+        super().__init__(-1, f"Servidor SMTP {server} inacessível; nova verificação em {int(retry_in)}s")
+
+
+class TransportProfileCache:
+    """
+    Perfis de transporte por conta e relay.
+
+    Após um erro de ligação o perfil guardado é esquecido (volta a usar-se
+    a configuração da conta) e o relay fica marcado como inacessível
+    durante `retry_after` segundos: os envios falham de imediato em vez de
+    esperarem pelo timeout de ligação, e a outbox volta a tentá-los com
+    backoff. Não há sondagem automática de alternativas.
+    """
+
+    def __init__(self, retry_after: float = 60.0):
+        """
+        Inicializa cache.
+
+        Args:
+            retry_after: Segundos até voltar a tentar um relay inacessível
+        """
+        self.retry_after = retry_after
+        self._profiles: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        self._unreachable: Dict[Tuple[int, str], float] = {}
+        self._lock = threading.Lock()
+
+    def get_profile(self, account_id: int, server: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna perfil descoberto para a conta/relay.
+
+        Args:
+            account_id: ID da conta
+            server: Servidor SMTP
+
+        Returns:
+            Dict com port, use_ssl e use_tls, ou None
+        """
+        with self._lock:
+            profile = self._profiles.get((account_id, server))
+            return dict(profile) if profile else None
+
+    def apply(self, account_id: int, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Aplica o perfil descoberto (se existir) a uma configuração SMTP.
+
+        Perfis menos seguros do que a configuração são ignorados.
+
+        Args:
+            account_id: ID da conta
+            config: Configuração SMTP (alterada no local)
+
+        Returns:
+            A mesma configuração
+        """
+        profile = self.get_profile(account_id, config['server'])
+        if profile and not is_downgrade(profile, config):
+            config.update(profile)
+        return config
+
+    def record_success(self, account_id: int, config: Dict[str, Any], configured: Dict[str, Any]) -> bool:
+        """
+        Regista o perfil de uma configuração que ligou com sucesso.
+
+        Args:
+            account_id: ID da conta
+            config: Configuração SMTP que funcionou
+            configured: Configuração da conta (sem perfil aplicado)
+
+        Returns:
+            False se o perfil for menos seguro do que a configuração (não é guardado)
+        """
+        key = (account_id, config['server'])
+        profile = {field: config[field] for field in PROFILE_FIELDS}
+        if is_downgrade(profile, configured):
+            logger.warning(f"Refusing SMTP transport profile without SSL/TLS for account {account_id} "
+                           f"@ {config['server']} (account is configured for an encrypted transport)")
+            return False
+        with self._lock:
+            previous = self._profiles.get(key)
+            self._profiles[key] = profile
+            self._unreachable.pop(key, None)
+        if previous != profile:
+            logger.info(f"SMTP transport profile for account {account_id} @ {config['server']}: "
+                        f"port={profile['port']}, ssl={profile['use_ssl']}, tls={profile['use_tls']}")
+        return True
+
+    def check_available(self, account_id: int, server: str) -> None:
+        """
+        Falha de imediato se o relay estiver marcado como inacessível.
+
+        Args:
+            account_id: ID da conta
+            server: Servidor SMTP
+
+        Raises:
+            TransportUnavailableError: Se a última ligação falhou há menos de `retry_after`
+        """
+        with self._lock:
+            until = self._unreachable.get((account_id, server))
+        if until is not None:
+            remaining = until - time.monotonic()
+            if remaining > 0:
+                raise TransportUnavailableError(server, remaining)
+
+    def report_failure(self, account_id: int, config: Dict[str, Any], error: Exception) -> None:
+        """
+        Regista erro de envio; se for de transporte, esquece o perfil e marca o relay.
+
+        Args:
+            account_id: ID da conta
+            config: Configuração SMTP usada no envio
+            error: Exceção do envio
+        """
+        if not isinstance(error, TRANSPORT_ERRORS) or isinstance(error, TransportUnavailableError):
+            return
+
+        key = (account_id, config['server'])
+        with self._lock:
+            self._profiles.pop(key, None)
+            self._unreachable[key] = time.monotonic() + self.retry_after
+        logger.warning(f"SMTP transport error for account {account_id} @ {config['server']} ({error}); "
+                       f"failing fast for {self.retry_after}s")
+
+    def forget(self, account_id: int) -> None:
+        """
+        Remove perfis e marcações de uma conta (ex.: após edição).
+
+        Args:
+            account_id: ID da conta
+        """
+        with self._lock:
+            for store in (self._profiles, self._unreachable):
+                for key in [k for k in store if k[0] == account_id]:
+                    del store[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Retorna estado da cache.
+
+        Returns:
+            Dict com perfis e relays inacessíveis
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'profiles': {f"{k[0]}@{k[1]}": dict(v) for k, v in self._profiles.items()},
+                'unreachable': {f"{k[0]}@{k[1]}": round(until - now, 1)
+                                for k, until in self._unreachable.items() if until > now}
+            }
+
+
+# Instância global da cache
+_transport_cache: Optional[TransportProfileCache] = None
+_transport_cache_lock = threading.Lock()
+
+
+def get_transport_cache() -> TransportProfileCache:
+    """
+    Retorna cache global de perfis de transporte.
+
+    Returns:
+        Instância do TransportProfileCache
+    """
+    global _transport_cache
+
+    if _transport_cache is None:
+        with _transport_cache_lock:
+            if _transport_cache is None:
+                retry_after = 60
+                try:
+                    from flask import current_app
+                    retry_after = current_app.config.get('SMTP_TRANSPORT_RETRY_AFTER', 60)
+                except RuntimeError:
+                    # Fora do contexto da app: usar defaults
+                    pass
+                _transport_cache = TransportProfileCache(retry_after=retry_after)
+
+    return _transport_cache
@@ -0,0 +1,91 @@
+"""
+Sondagem concorrente de configurações de transporte (SMTP/IMAP) para SendCraft.
+Corre as configurações candidatas em paralelo, ao estilo happy eyeballs.
+"""
+import queue
+import threading
+from typing import Any, Callable, List, Optional, Tuple
+
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Atraso entre o arranque de candidatos consecutivos (segundos)
+DEFAULT_STAGGER = 0.25
+
+
+def race_connections(candidates: List[Any],
+                     connect: Callable[[Any], Any],
+                     close: Callable[[Any], None],
+                     stagger: float = DEFAULT_STAGGER) -> Tuple[Optional[int], Any, List[Optional[Exception]]]:
+    """
+    Tenta ligar com várias configurações em paralelo e devolve a primeira sessão.
+
+    O candidato i arranca ao fim de i * `stagger` segundos, ou logo que o
+    anterior falhe, o que dá vantagem à ordem de preferência sem esperar
+    pelos timeouts em série. Quando um candidato vence, os que ainda não
+    arrancaram são cancelados e as sessões que terminem depois são fechadas.
+
+    Args:
+        candidates: Configurações por ordem de preferência
+        connect: Função que abre e autentica uma sessão para um candidato
+        close: Função que fecha uma sessão perdedora
+        stagger: Atraso entre arranques (segundos)
+
+    Returns:
+        Tuple (índice vencedor, sessão, erros por candidato); índice e sessão
+        são None se nenhum candidato funcionou
+    """
+    if not candidates:
+        return None, None, []
+
+    done = threading.Event()
+    starts = [threading.Event() for _ in candidates]
+    results: 'queue.Queue[Tuple[int, Any, Optional[Exception]]]' = queue.Queue()
+    lock = threading.Lock()
+    state = {'winner': None}
+
+    def attempt(index: int, candidate: Any) -> None:
+        if index:
+            starts[index].wait(index * stagger)
+        if done.is_set():
+            results.put((index, None, None))
+            return
+
+        try:
+            session = connect(candidate)
+        except Exception as e:
+            # Falha rápida: arrancar já o candidato seguinte
+            if index + 1 < len(starts):
+                starts[index + 1].set()
+            results.put((index, None, e))
+            return
+
+        with lock:
+            won = state['winner'] is None
+            if won:
+                state['winner'] = index
+
+        if won:
+            done.set()
+            for event in starts:
+                event.set()
+            results.put((index, session, None))
+        else:
+            try:
+                close(session)
+            except Exception:
+                pass
+            results.put((index, None, None))
+
+    for index, candidate in enumerate(candidates):
+        threading.Thread(target=attempt, args=(index, candidate), name=f'TransportProbe-{index}', daemon=True).start()
+
+    errors: List[Optional[Exception]] = [None] * len(candidates)
+    for _ in candidates:
+        index, session, error = results.get()
+        if session is not None:
+            return index, session, errors
+        errors[index] = error
+
+    return None, None, errors
@@ -272,7 +272,7 @@ async function testSMTPConnection(accountId) {
             SendCraft.showToast('✅ Conexão SMTP bem-sucedida!', 'success');
             updateSMTPStatus(accountId, 'success');
         } else {
-            SendCraft.showToast(`❌ Erro SMTP: ${result.error}`, 'danger');
+            SendCraft.showToast(`❌ Erro SMTP: ${result.error}${result.suggestion ? ' — ' + result.suggestion.message : ''}`, 'danger');
             updateSMTPStatus(accountId, 'error');
         }
     } catch (error) {
@@ -1,6 +1,7 @@
 """Utilitários de criptografia para SendCraft."""
 from cryptography.fernet import Fernet
 import base64
+import functools
 import hashlib
 import secrets
 from typing import Optional
@@ -67,6 +68,20 @@ class AESCipher:
         return secrets.token_urlsafe(32)
 
 
+@functools.lru_cache(maxsize=16)
+def get_cipher(key: str) -> AESCipher:
+    """
+    Retorna cipher partilhado para a chave (derivação SHA-256 feita uma vez).
+    
+    Args:
+        key: Chave de encriptação
+        
+    Returns:
+        Instância de AESCipher
+    """
+    return AESCipher(key)
+
+
 def hash_api_key(api_key: str) -> str:
     """
     Cria hash seguro de API key.
@@ -0,0 +1,37 @@
+"""
+Testes do controlo de admissão da outbox.
+"""
+from sendcraft.models.outbox import QueuePriority
+from sendcraft.services.admission import AdmissionController
+
+
+def controller(depth: int, rate: float = 1.0) -> AdmissionController:
+    """Controlo com 100s de drenagem máxima e leitura da BD fixa."""
+    admission = AdmissionController(max_drain_seconds=100, refresh_seconds=3600,
+                                    transactional_max_recipients=10)
+    admission._measure = lambda: (depth, rate)
+    return admission
+
+
+def test_small_transactional_batch_admitted_when_saturated():
+    """Lotes transactional pequenos entram mesmo com a outbox saturada."""
+    admission = controller(depth=500)
+    assert admission.check(10, QueuePriority.TRANSACTIONAL).admitted
+    assert not admission.check(1, QueuePriority.BULK).admitted
+
+
+def test_large_transactional_batch_treated_as_bulk():
+    """Marcar um lote grande como transactional não contorna a admissão."""
+    admission = controller(depth=50)
+    decision = admission.check(200, QueuePriority.TRANSACTIONAL)
+    assert not decision.admitted
+    assert decision.retry_after == 150
+
+
+def test_recorded_rows_count_against_cached_depth():
+    """Destinatários gravados por um stream contam até à próxima leitura."""
+    admission = controller(depth=0)
+    assert admission.check(0, QueuePriority.BULK).admitted
+    admission.record(150)
+    assert admission.snapshot()[0] == 150
+    assert not admission.check(0, QueuePriority.BULK).admitted
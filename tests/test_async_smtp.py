@@ -0,0 +1,188 @@
+"""
+Testes do motor de entrega assíncrono.
+"""
+import asyncio
+import smtplib
+import threading
+import time
+
+import pytest
+
+from sendcraft.services.async_smtp import AsyncDeliveryEngine
+from sendcraft.services.smtp_service import MessageStream
+
+
+class FakeConnection:
+    """Sessão idle cujo QUIT demora."""
+
+    def __init__(self, fingerprint, last_used_at):
+        self.fingerprint = fingerprint
+        self.last_used_at = last_used_at
+        self.writer = object()
+        self.quit_called = False
+
+    async def quit(self):
+        self.quit_called = True
+        await asyncio.sleep(0.01)
+        self.writer = None
+
+    def close(self):
+        self.writer = None
+
+
+def test_close_idle_does_not_return_taken_session():
+    """Uma sessão tirada durante o QUIT de outra não volta à lista de idle."""
+    engine = AsyncDeliveryEngine(idle_timeout=60)
+    now = time.monotonic()
+    expired = FakeConnection('fp', now - 120)
+    fresh = FakeConnection('fp', now)
+    engine._idle['account'] = [fresh, expired]
+
+    async def scenario():
+        closing = asyncio.ensure_future(engine._close_idle())
+        await asyncio.sleep(0)  # _close_idle está à espera do QUIT
+        taken = engine._take_idle('account', 'fp')
+        await closing
+        return taken
+
+    taken = asyncio.run(scenario())
+    assert taken is fresh
+    assert expired.quit_called
+    assert engine._idle['account'] == []
+
+
+def test_get_stats_returns_snapshot():
+    """get_stats devolve cópia dos contadores."""
+    engine = AsyncDeliveryEngine()
+    engine._count('sent')
+    stats = engine.get_stats()
+    engine._count('sent')
+    assert stats['sent'] == 1
+    assert engine.get_stats()['sent'] == 2
+
+
+class FakeSession:
+    """Sessão SMTP que regista mensagens e pode desligar durante a transação."""
+
+    def __init__(self, disconnect_after_data=False):
+        self.fingerprint = ''
+        self.last_used_at = time.monotonic()
+        self.messages_sent = 0
+        self.data_started = False
+        self.timings = {}
+        self.writer = object()
+        self.disconnect_after_data = disconnect_after_data
+        self.received = []
+        self.quit_called = False
+
+    async def sendmail(self, from_addr, to_addrs, data):
+        self.data_started = True
+        body = b''.join([chunk async for chunk in data])
+        if self.disconnect_after_data:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.received.append(body)
+        return {}
+
+    async def quit(self):
+        self.quit_called = True
+        self.writer = None
+
+    def close(self):
+        self.writer = None
+
+
+CONFIG = {'server': 'relay.test', 'port': 587, 'from_email': 'a@example.com', 'use_tls': True}
+
+
+def open_sessions(engine, **kwargs):
+    """Substitui _open por sessões falsas; devolve a lista das abertas."""
+    opened = []
+
+    async def fake_open(config):
+        session = FakeSession(**kwargs)
+        opened.append(session)
+        return session
+
+    engine._open = fake_open
+    return opened
+
+
+def test_wait_cancels_transaction_on_timeout():
+    """Uma transação que excede o prazo é cancelada no event loop."""
+    engine = AsyncDeliveryEngine(timeout=0.05)
+    started = threading.Event()
+
+    async def hang(*args):
+        started.set()
+        await asyncio.sleep(60)
+
+    engine._transact = hang
+    try:
+        future = engine.submit('account', CONFIG, ['b@example.com'], MessageStream([b'x']))
+        started.wait(1)
+        with pytest.raises(TimeoutError):
+            engine.wait(future, engine.result_timeout('account'))
+        assert future.cancelled()
+
+        deadline = time.monotonic() + 1
+        while engine.get_stats()['in_flight'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = engine.get_stats()
+        assert stats['in_flight'] == 0
+        assert stats['timed_out'] == 1
+        assert engine._pending == {}
+    finally:
+        engine.stop()
+
+
+def test_result_timeout_includes_queue_wait():
+    """O prazo cresce uma ronda por cada max_per_account transações pendentes da conta."""
+    engine = AsyncDeliveryEngine(timeout=10, max_per_account=2)
+    assert engine.result_timeout('account') == 10
+    engine._pending['account'] = 5
+    assert engine.result_timeout('account') == 30
+    assert engine.result_timeout('other') == 10
+
+
+def test_session_closed_after_messages_per_session():
+    """A sessão é fechada com QUIT ao fim de max_messages mensagens."""
+    engine = AsyncDeliveryEngine()
+    opened = open_sessions(engine)
+
+    async def scenario():
+        for _ in range(3):
+            await engine._transact('account', CONFIG, ['b@example.com'], MessageStream([b'Hi\r\n']), 2)
+
+    asyncio.run(scenario())
+    assert len(opened) == 2
+    assert opened[0].quit_called and len(opened[0].received) == 2
+    assert engine._idle['account'] == [opened[1]]
+
+
+def test_no_retry_after_data():
+    """Desligar depois do DATA não reenvia (a mensagem pode ter sido aceite)."""
+    engine = AsyncDeliveryEngine()
+    opened = open_sessions(engine, disconnect_after_data=True)
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        asyncio.run(engine._transact('account', CONFIG, ['b@example.com'], MessageStream([b'Hi\r\n']), 100))
+    assert len(opened) == 1
+
+
+def test_attachments_read_off_event_loop():
+    """Com anexos, os blocos são lidos no executor e mantêm o dot-stuffing."""
+    data = MessageStream([b'Hi\r\n.', {'content': b'x' * 100}])
+    threads = set()
+
+    def chunks():
+        for chunk in data:
+            threads.add(threading.get_ident())
+            yield chunk
+
+    async def scenario():
+        return threading.get_ident(), b''.join([chunk async for chunk in AsyncDeliveryEngine._read(data, chunks())])
+
+    loop_thread, body = asyncio.run(scenario())
+    assert loop_thread not in threads
+    assert body.startswith(b'Hi\r\n..')
+    assert body.endswith(b'\r\n')
@@ -0,0 +1,165 @@
+"""
+Testes do envio em stream da API de email.
+"""
+import json
+
+import pytest
+
+from sendcraft.extensions import db
+from sendcraft.models import Domain, EmailAccount
+from sendcraft.models.log import EmailStatus
+from sendcraft.models.outbox import OutboxJob, OutboxMessage, QueueStatus
+from sendcraft.services import admission as admission_module
+from sendcraft.services.admission import AdmissionController
+from sendcraft.services.email_queue import PersonalizedContent, get_email_queue
+from sendcraft.services.job_progress import get_job_progress_notifier
+
+
+@pytest.fixture
+def api_account(app):
+    """Conta com API ativa; devolve (conta, api key)."""
+    domain = Domain(name='stream.test')
+    db.session.add(domain)
+    db.session.commit()
+
+    account = EmailAccount(
+        domain_id=domain.id,
+        local_part='sender',
+        smtp_server='127.0.0.1',
+        smtp_port=2525,
+        daily_limit=100,
+        monthly_limit=1000,
+        api_enabled=True
+    )
+    account.set_password('secret', app.config['ENCRYPTION_KEY'])
+    api_key = account.generate_api_key()
+    db.session.add(account)
+    db.session.commit()
+    return account, api_key
+
+
+def stream(client, api_key, count, message=None, **params):
+    """POST /api/v1/send/stream com `count` destinatários NDJSON."""
+    lines = [json.dumps({'message': message or {'subject': 'Olá', 'text': 'Olá {{ email }}'}})]
+    lines += [json.dumps({'email': f'user{i}@example.com'}) for i in range(count)]
+    return client.post(
+        '/api/v1/send/stream',
+        query_string=params,
+        data='\n'.join(lines),
+        headers={'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/x-ndjson'}
+    )
+
+
+def test_stream_rejected_when_account_limit_reached(client, api_account, monkeypatch):
+    """Com o limite diário atingido, a lista não é ingerida."""
+    account, api_key = api_account
+    monkeypatch.setattr(EmailAccount, 'count_emails_sent_today', lambda self: 100)
+
+    response = stream(client, api_key, 5)
+    assert response.status_code == 429
+    assert response.get_json()['error'] == 'rate_limit_exceeded'
+    assert OutboxMessage.query.count() == 0
+
+
+def test_stream_capped_at_remaining_quota(client, api_account, monkeypatch):
+    """Uma lista maior do que o resto da quota é cortada com 413."""
+    account, api_key = api_account
+    monkeypatch.setattr(EmailAccount, 'count_emails_sent_today', lambda self: 97)
+
+    response = stream(client, api_key, 5)
+    assert response.status_code == 413
+    body = response.get_json()
+    assert body['error'] == 'too_many_recipients'
+    assert body['details']['remaining_quota'] == 3
+    assert OutboxMessage.query.count() <= 3
+
+
+def test_transactional_stream_capped(client, api_account, monkeypatch):
+    """Um stream transactional não passa do limite da lane e conta para a profundidade."""
+    account, api_key = api_account
+    admission = AdmissionController(transactional_max_recipients=3)
+    monkeypatch.setattr(admission_module, '_admission_controller', admission)
+
+    response = stream(client, api_key, 5, priority='transactional')
+    assert response.status_code == 413
+    assert OutboxMessage.query.count() == 3
+    assert admission.snapshot()[0] == 3
+
+
+@pytest.mark.parametrize('payload', [
+    "{{ cycler.__init__.__globals__.os.popen('id').read() }}",
+    "{{ cycler['__init__'] }}",
+    "{{ ''.__class__.__mro__ }}"
+])
+def test_stream_rejects_sandbox_escape(client, api_account, payload):
+    """Templates enviados pelo cliente não chegam a atributos internos do Python."""
+    account, api_key = api_account
+    response = stream(client, api_key, 1, message={'subject': 'Olá', 'text': payload})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'validation_failed'
+    assert OutboxMessage.query.count() == 0
+
+
+def test_personalized_content_sandboxed_at_render():
+    """Chaves privadas montadas em runtime não passam do sandbox."""
+    content = PersonalizedContent({'subject': "{% set k = '__cl' ~ 'ass__' %}{{ email[k] }}", 'text_content': 'x'})
+    assert 'class' not in content.render('a@example.com', {'email': 'a@example.com'})['subject']
+
+
+def read_event(chunks) -> tuple:
+    """Próximo evento SSE do stream: (nome, dados)."""
+    for chunk in chunks:
+        text = chunk.decode('utf-8')
+        if text.startswith('retry:'):
+            text = text.split('\n', 1)[1]
+        if text.startswith('event:'):
+            name, data = text.strip().split('\n')
+            return name[len('event: '):], json.loads(data[len('data: '):])
+    return None, None
+
+
+def set_progress(job: OutboxJob, sent: int, status: QueueStatus) -> None:
+    """Marca os primeiros `sent` destinatários como enviados e assinala progresso."""
+    for message in job.messages.order_by(OutboxMessage.id).limit(sent):
+        message.status = EmailStatus.SENT
+    job.success_count = sent
+    job.status = status
+    db.session.commit()
+    get_job_progress_notifier().publish()
+
+
+def test_job_events_sequence(app, client, api_account):
+    """O stream envia snapshot, progress com delta por cada avanço e complete no fim."""
+    account, api_key = api_account
+    app.config['OUTBOX_EVENTS_POLL_SECONDS'] = 0.01
+    reference = get_email_queue().add_job(
+        account, {'subject': 'Olá', 'text_content': 'Olá'},
+        [(f'user{i}@example.com', None) for i in range(3)]
+    )
+    job = db.session.get(OutboxJob, OutboxJob.parse_reference(reference))
+
+    response = client.get(f'/api/v1/jobs/{reference}/events', buffered=False,
+                          headers={'Authorization': f'Bearer {api_key}'})
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+
+    name, data = read_event(chunks)
+    assert name == 'snapshot'
+    assert data['counts']['pending'] == 3 and data['processed'] == 0
+
+    set_progress(job, 2, QueueStatus.PROCESSING)
+    name, data = read_event(chunks)
+    assert name == 'progress'
+    assert data['delta'] == {'pending': -2, 'sent': 2}
+    assert data['status'] == 'processing' and data['processed'] == 2
+
+    set_progress(job, 3, QueueStatus.COMPLETED)
+    name, data = read_event(chunks)
+    assert name == 'progress'
+    assert data['delta'] == {'pending': -1, 'sent': 1}
+    name, data = read_event(chunks)
+    assert name == 'complete'
+    assert data['status'] == 'completed' and data['progress'] == 1.0
+    assert read_event(chunks) == (None, None)
+    response.close()
+
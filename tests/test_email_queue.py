@@ -0,0 +1,427 @@
+"""
+Testes da outbox de emails (reclamação, leases, retries e group commit).
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from config import TestingConfig
+from sendcraft import create_app
+from sendcraft.extensions import db
+from sendcraft.models import Domain, EmailAccount
+from sendcraft.models.log import EmailStatus
+from sendcraft.models.outbox import OutboxJob, OutboxMessage, QueuePriority, QueueStatus
+from sendcraft.services import email_queue as email_queue_module
+from sendcraft.services.email_queue import EmailQueue
+from sendcraft.services.log_writer import DeliveryLogWriter
+from sendcraft.services.send_scheduler import SendScheduler, parse_send_at
+
+
+class FakeSMTPService:
+    """SMTPService sem rede: aceita as mensagens (salvo `failures`) e regista os destinatários."""
+
+    def __init__(self):
+        self.sent: List[str] = []
+        self.failures: Dict[str, Dict[str, Any]] = {}
+
+    def prepare_message(self, **kwargs) -> Dict[str, Any]:
+        return kwargs
+
+    def send_bulk_messages(self, account, messages: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for item in messages:
+            failure = self.failures.get(item['to_email'])
+            if failure:
+                yield {'email': item['to_email'], 'success': False, 'message_id': None, **failure}
+                continue
+            self.sent.append(item['to_email'])
+            yield {'email': item['to_email'], 'success': True, 'message': '250 OK', 'message_id': '<test>'}
+
+
+@pytest.fixture
+def account(app):
+    """Conta de envio de teste."""
+    domain = Domain(name='queue.test')
+    db.session.add(domain)
+    db.session.commit()
+
+    account = EmailAccount(
+        domain_id=domain.id,
+        local_part='sender',
+        smtp_server='127.0.0.1',
+        smtp_port=2525,
+        use_tls=False,
+        use_ssl=False
+    )
+    account.set_password('secret', app.config['ENCRYPTION_KEY'])
+    db.session.add(account)
+    db.session.commit()
+    return account
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    """Substitui o serviço SMTP usado pelos workers."""
+    service = FakeSMTPService()
+    monkeypatch.setattr(email_queue_module, 'create_smtp_service', lambda key: service)
+    return service
+
+
+@pytest.fixture
+def queue(app):
+    """Outbox configurada a partir da app (sem workers)."""
+    queue = EmailQueue()
+    queue.init_app(app)
+    return queue
+
+
+def add_job(queue: EmailQueue, account: EmailAccount, count: int) -> str:
+    """Job com `count` destinatários."""
+    payload = {'subject': 'Teste', 'text_content': 'Olá'}
+    return queue.add_job(account, payload, [(f'user{i}@example.com', None) for i in range(count)])
+
+
+def messages_by_status() -> Dict[EmailStatus, int]:
+    """Linhas da outbox por estado."""
+    db.session.expire_all()
+    counts: Dict[EmailStatus, int] = {}
+    for message in OutboxMessage.query.all():
+        counts[message.status] = counts.get(message.status, 0) + 1
+    return counts
+
+
+def test_sent_rows_committed_before_next_send(app, account, smtp, queue, monkeypatch):
+    """Por omissão, cada envio fica gravado como SENT antes de o seguinte começar."""
+    assert queue.log_flush_size == 1
+    add_job(queue, account, 3)
+    sent_before = []
+    original = smtp.send_bulk_messages
+
+    def send_bulk_messages(account, messages):
+        for result in original(account, messages):
+            sent_before.append(OutboxMessage.query.filter_by(status=EmailStatus.SENT).count())
+            yield result
+
+    monkeypatch.setattr(smtp, 'send_bulk_messages', send_bulk_messages)
+    assert queue.process_pending() == 3
+    assert sent_before == [0, 1, 2]
+
+
+def test_failed_flush_does_not_release_sent_rows(app, account, smtp, queue, monkeypatch):
+    """Um commit de resultados falhado não devolve à outbox linhas já enviadas."""
+    queue.log_flush_size = 2
+    reference = add_job(queue, account, 4)
+
+    # Falha o commit do primeiro flush com resultados (depois de 2 envios)
+    armed = {'flushes': 0, 'fail': False}
+    original_flush = DeliveryLogWriter.flush
+
+    def flush(self):
+        if len(self) and armed['flushes'] == 0:
+            armed['flushes'] += 1
+            armed['fail'] = True
+        return original_flush(self)
+
+    def before_commit(session):
+        if armed['fail']:
+            armed['fail'] = False
+            raise OperationalError('COMMIT', {}, Exception('database is locked'))
+
+    monkeypatch.setattr(DeliveryLogWriter, 'flush', flush)
+    event.listen(db.session, 'before_commit', before_commit)
+    try:
+        with pytest.raises(OperationalError):
+            queue.process_pending()
+    finally:
+        event.remove(db.session, 'before_commit', before_commit)
+
+    # Os 2 enviados foram gravados pelo flush final; os 2 por enviar voltaram a pending sem tentativa
+    assert len(smtp.sent) == 2
+    assert messages_by_status() == {EmailStatus.SENT: 2, EmailStatus.PENDING: 2}
+    assert all(m.attempts == 0 for m in OutboxMessage.query.filter_by(status=EmailStatus.PENDING))
+
+    assert queue.process_pending() == 2
+    assert sorted(smtp.sent) == sorted(f'user{i}@example.com' for i in range(4))
+
+    job = queue.get_job(reference)
+    assert job.status == QueueStatus.COMPLETED
+    assert (job.success_count, job.failed_count) == (4, 0)
+
+
+def test_flush_keeps_buffer_when_commit_fails(app, account, queue):
+    """O buffer só é limpo depois do commit."""
+    add_job(queue, account, 1)
+    message = OutboxMessage.query.first()
+    writer = DeliveryLogWriter(flush_size=10)
+    writer.record({'id': message.id, 'status': EmailStatus.SENT}, job_id=message.job_id, outcome='success')
+
+    def before_commit(session):
+        raise OperationalError('COMMIT', {}, Exception('database is locked'))
+
+    event.listen(db.session, 'before_commit', before_commit)
+    try:
+        with pytest.raises(OperationalError):
+            writer.flush()
+    finally:
+        event.remove(db.session, 'before_commit', before_commit)
+
+    assert len(writer) == 1
+    assert writer.flush() == 1
+    assert len(writer) == 0
+    assert db.session.get(OutboxJob, message.job_id).success_count == 1
+
+
+def test_claim_is_exclusive_across_workers(tmp_path, monkeypatch):
+    """Dois workers que selecionam as mesmas linhas nunca as reclamam os dois (SQLite sem SKIP LOCKED)."""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'outbox.db'}")
+    app = create_app('testing')
+    queue = EmailQueue()
+    queue.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        domain = Domain(name='claim.test')
+        db.session.add(domain)
+        db.session.commit()
+        account = EmailAccount(domain_id=domain.id, local_part='sender', smtp_server='127.0.0.1', smtp_port=2525)
+        account.set_password('secret', app.config['ENCRYPTION_KEY'])
+        db.session.add(account)
+        db.session.commit()
+        add_job(queue, account, 20)
+        db.session.remove()
+
+    # Os dois workers leem os candidatos antes de qualquer um fazer o UPDATE
+    barrier = threading.Barrier(2, timeout=10)
+    waited = threading.local()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE outbox_messages') and not getattr(waited, 'done', False):
+            waited.done = True
+            barrier.wait()
+
+    claims: Dict[str, List[int]] = {}
+    errors: List[BaseException] = []
+
+    def worker(name: str) -> None:
+        try:
+            with app.app_context():
+                claims[name] = [m.id for m in queue._claim_batch(queue._claim_token(name))]
+                db.session.remove()
+        except BaseException as e:
+            errors.append(e)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        threads = [threading.Thread(target=worker, args=(name,)) for name in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(15)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert not errors
+    assert not set(claims['a']) & set(claims['b'])
+    assert len(claims['a']) + len(claims['b']) == 20
+
+    with app.app_context():
+        assert all(m.attempts == 1 for m in OutboxMessage.query)
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+def test_expired_lease_is_reclaimed(app, account, queue):
+    """Linhas de um worker cujo lease expirou passam para outro; o token antigo já não as toca."""
+    add_job(queue, account, 3)
+    stale = queue._claim_token('stale')
+    assert len(queue._claim_batch(stale)) == 3
+    assert queue._claim_batch(queue._claim_token('other')) == []
+
+    OutboxMessage.query.update({OutboxMessage.locked_until: datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+    fresh = queue._claim_token('fresh')
+    assert len(queue._claim_batch(fresh)) == 3
+    assert queue._release(stale) == 0
+
+    db.session.expire_all()
+    messages = OutboxMessage.query.all()
+    assert all(m.locked_by == fresh and m.status == EmailStatus.SENDING for m in messages)
+    assert all(m.attempts == 2 for m in messages)
+
+
+def test_retry_delay_backoff_bounds(queue):
+    """Espera entre metade e a totalidade do backoff exponencial, limitada por retry_max_seconds."""
+    queue.retry_base_seconds = 10
+    queue.retry_max_seconds = 60
+    for attempts, backoff in ((0, 10), (1, 10), (2, 20), (3, 40), (4, 60), (10, 60)):
+        for _ in range(50):
+            assert backoff / 2 <= queue.retry_delay(attempts) <= backoff
+
+
+def test_transient_failure_retried_then_dead_lettered(app, account, smtp, queue):
+    """Falhas temporárias voltam a pending com next_attempt_at até max_attempts; depois dead-letter."""
+    queue.max_attempts = 2
+    reference = add_job(queue, account, 1)
+    smtp.failures['user0@example.com'] = {'message': '421 Try again later', 'transient': True}
+
+    assert queue.process_pending() == 1
+    db.session.expire_all()
+    message = OutboxMessage.query.one()
+    assert message.status == EmailStatus.PENDING
+    assert message.attempts == 1
+    assert message.next_attempt_at > datetime.utcnow()
+    assert message.locked_by is None and message.dead_lettered_at is None
+
+    # Ainda em backoff: não é reclamada
+    assert queue.process_pending() == 0
+
+    message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert queue.process_pending() == 1
+
+    db.session.expire_all()
+    message = OutboxMessage.query.one()
+    assert message.status == EmailStatus.FAILED
+    assert message.attempts == 2
+    assert message.dead_lettered_at is not None
+    job = queue.get_job(reference)
+    assert job.status == QueueStatus.COMPLETED
+    assert (job.success_count, job.failed_count) == (0, 1)
+
+
+def test_permanent_failure_dead_lettered_immediately(app, account, smtp, queue):
+    """Falhas definitivas vão logo para a dead-letter."""
+    add_job(queue, account, 2)
+    smtp.failures['user1@example.com'] = {'message': '550 No such user', 'transient': False}
+
+    assert queue.process_pending() == 2
+    db.session.expire_all()
+    failed = OutboxMessage.query.filter_by(status=EmailStatus.FAILED).one()
+    assert failed.recipient_email == 'user1@example.com'
+    assert failed.attempts == 1 and failed.dead_lettered_at is not None
+    assert messages_by_status() == {EmailStatus.SENT: 1, EmailStatus.FAILED: 1}
+
+
+def test_release_does_not_repend_sent_rows(app, account, queue):
+    """_release só devolve linhas ainda em envio; as já gravadas como enviadas ficam."""
+    add_job(queue, account, 3)
+    token = queue._claim_token('worker')
+    claimed = queue._claim_batch(token)
+
+    writer = DeliveryLogWriter(flush_size=10)
+    writer.record({'id': claimed[0].id, 'status': EmailStatus.SENT, 'locked_by': None, 'locked_until': None,
+                   'processed_at': datetime.utcnow()}, job_id=claimed[0].job_id, outcome='success')
+    writer.flush()
+
+    assert queue._release(token) == 2
+    db.session.expire_all()
+    sent = db.session.get(OutboxMessage, claimed[0].id)
+    assert sent.status == EmailStatus.SENT and sent.attempts == 1
+    pending = OutboxMessage.query.filter_by(status=EmailStatus.PENDING).all()
+    assert len(pending) == 2
+    assert all(m.attempts == 0 and m.locked_by is None for m in pending)
+
+
+def test_schedule_shares_batch_between_accounts():
+    """Uma conta com backlog grande não ocupa o lote de outra conta com poucos envios."""
+    queue = EmailQueue()
+    queue.batch_size = 10
+    bulk = QueuePriority.BULK
+
+    assert queue._schedule({(1, bulk): 1000, (2, bulk): 3}) == {(1, bulk): 7, (2, bulk): 3}
+    assert queue._schedule({(1, bulk): 1000, (2, bulk): 1000}) == {(1, bulk): 5, (2, bulk): 5}
+
+
+def test_schedule_weights_lanes():
+    """Por ronda, a lane transactional recebe o seu peso e a bulk continua a avançar."""
+    queue = EmailQueue()
+    queue.batch_size = 9
+    allocation = queue._schedule({(1, QueuePriority.TRANSACTIONAL): 100, (1, QueuePriority.BULK): 100})
+    assert allocation == {(1, QueuePriority.TRANSACTIONAL): 8, (1, QueuePriority.BULK): 1}
+
+
+def test_schedule_fair_across_batches():
+    """Com lotes que não dividem pelas filas, as contas ficam dentro do limite do DRR e empatam."""
+    queue = EmailQueue()
+    queue.batch_size = 5
+    queue.lane_weights = {QueuePriority.BULK: 2}
+    backlog = {(account_id, QueuePriority.BULK): 10 ** 6 for account_id in (1, 2, 3)}
+
+    totals = {key: 0 for key in backlog}
+    for _ in range(30):
+        for key, count in queue._schedule(backlog).items():
+            totals[key] += count
+        # Limite do DRR: um quantum mais um destinatário por cada uma das duas filas
+        assert max(totals.values()) - min(totals.values()) <= 2 + 2
+    assert set(totals.values()) == {50}
+
+    # Défices de filas que esvaziaram são descartados
+    queue._schedule({(1, QueuePriority.BULK): 100})
+    assert list(queue._deficits) == [(1, QueuePriority.BULK)]
+
+
+def test_scheduled_job_released_when_due(app, account, smtp, queue):
+    """Um job agendado só é reclamado depois de o agendador o passar a PENDING."""
+    later = add_job_at(queue, account, datetime.utcnow() + timedelta(seconds=30))
+    due = add_job_at(queue, account, datetime.utcnow() - timedelta(seconds=1))
+
+    assert queue.process_pending() == 0
+    released, wait = queue.scheduler.tick()
+    assert released == 1
+    assert 0 < wait <= 30
+
+    db.session.expire_all()
+    assert job_status(due) == QueueStatus.PENDING
+    assert job_status(later) == QueueStatus.SCHEDULED
+    assert queue.process_pending() == 1
+    assert queue.scheduler.snapshot()['upcoming_jobs'] == 1
+
+
+def test_scheduled_job_released_once_across_schedulers(app, account, queue):
+    """A passagem a PENDING é condicional: dois agendadores libertam o job uma única vez."""
+    add_job_at(queue, account, datetime.utcnow() - timedelta(seconds=1))
+    first, second = SendScheduler(), SendScheduler()
+    first.load()
+    second.load()
+    assert first.release(first.due()) + second.release(second.due()) == 1
+
+
+def test_send_window_spreads_recipients(app, account, queue):
+    """Com send_window, os destinatários vencem espalhados pela janela a partir de send_at."""
+    send_at = datetime.utcnow() + timedelta(minutes=5)
+    queue.add_job(account, {'subject': 'Teste', 'text_content': 'Olá'},
+                  [(f'user{i}@example.com', None) for i in range(4)], send_at=send_at, send_window=60)
+    offsets = sorted((m.next_attempt_at - send_at).total_seconds() for m in OutboxMessage.query.all())
+    assert offsets == [0, 15, 30, 45]
+
+
+def test_parse_send_at():
+    """send_at em ISO 8601 é convertido para UTC; datas passadas enviam já."""
+    future = datetime.utcnow() + timedelta(hours=1)
+    assert parse_send_at(future.replace(microsecond=0).isoformat() + 'Z') == future.replace(microsecond=0)
+    offset = (future + timedelta(hours=2)).replace(microsecond=0).isoformat() + '+02:00'
+    assert parse_send_at(offset) == future.replace(microsecond=0)
+    assert parse_send_at('2000-01-01T00:00:00Z') is None
+    assert parse_send_at(None) is None
+    with pytest.raises(ValueError):
+        parse_send_at('amanhã')
+    with pytest.raises(ValueError):
+        parse_send_at((datetime.utcnow() + timedelta(days=40)).isoformat(), max_days=30)
+
+
+def add_job_at(queue: EmailQueue, account: EmailAccount, send_at: datetime) -> str:
+    """Job de um destinatário agendado para `send_at`."""
+    return queue.add_job(account, {'subject': 'Teste', 'text_content': 'Olá'},
+                         [(f'{send_at.timestamp()}@example.com', None)], send_at=send_at)
+
+
+def job_status(reference: str) -> QueueStatus:
+    """Estado do job pela referência (QUEUE-000123)."""
+    return db.session.get(OutboxJob, OutboxJob.parse_reference(reference)).status
@@ -0,0 +1,174 @@
+"""
+Testes da invalidação das caches de domínios, contas e templates pelas rotas de edição.
+"""
+import pytest
+from sqlalchemy import event
+
+from sendcraft.extensions import db
+from sendcraft.models import Domain, EmailAccount, EmailTemplate
+from sendcraft.services import entity_cache as entity_cache_module
+from sendcraft.services import render_cache as render_cache_module
+from sendcraft.services import template_cache as template_cache_module
+from sendcraft.services.entity_cache import EntityCache
+from sendcraft.services.render_cache import RenderedOutputCache
+from sendcraft.services.template_cache import CompiledTemplateCache
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    """Caches globais novas e ligadas: (entidades, compilados, resultados)."""
+    entities, compiled, rendered = EntityCache(ttl=60), CompiledTemplateCache(), RenderedOutputCache(1 << 20)
+    monkeypatch.setattr(entity_cache_module, '_entity_cache', entities)
+    monkeypatch.setattr(template_cache_module, '_template_cache', compiled)
+    monkeypatch.setattr(render_cache_module, '_render_cache', rendered)
+    return entities, compiled, rendered
+
+
+@pytest.fixture
+def template(app):
+    """Template ativo num domínio de teste."""
+    domain = Domain(name='cache.test')
+    db.session.add(domain)
+    db.session.commit()
+    template = EmailTemplate(
+        domain_id=domain.id,
+        template_key='order',
+        template_name='Order',
+        subject_template='Encomenda {{ numero }}',
+        html_template='<p>{{ numero }}</p>'
+    )
+    db.session.add(template)
+    db.session.commit()
+    return template
+
+
+def warm_template(caches, template: EmailTemplate) -> None:
+    """Resolve e renderiza o template, enchendo as três caches."""
+    entities, compiled, rendered = caches
+    assert entities.get_template(template.domain_id, template.template_key) is not None
+    assert template.render_part('subject', {'numero': 1}) == 'Encomenda 1'
+    assert entities.get_stats()['entries'] == 1
+    assert compiled.get_stats()['entries'] == 1
+    assert rendered.get_stats()['entries'] == 1
+
+
+def assert_template_dropped(caches) -> None:
+    """Nenhuma das caches guarda ainda o template."""
+    entities, compiled, rendered = caches
+    assert entities.get_stats()['entries'] == 0
+    assert compiled.get_stats()['entries'] == 0
+    assert rendered.get_stats()['entries'] == 0
+
+
+def test_web_template_edit_invalidates_caches(client, caches, template):
+    """Editar um template na interface web limpa as caches de entidades, compilados e resultados."""
+    warm_template(caches, template)
+    response = client.post(f'/templates/{template.id}/edit', data={
+        'template_name': 'Order', 'subject': 'Encomenda {{ numero }}', 'is_active': 'on'
+    })
+    assert response.status_code == 302
+
+    # O precompile volta a compilar a nova versão
+    entities, compiled, rendered = caches
+    assert entities.get_stats()['entries'] == 0
+    assert rendered.get_stats()['entries'] == 0
+    assert {key[1] for key in compiled._entries} == {2}
+
+
+def test_web_template_delete_invalidates_caches(client, caches, template):
+    """Eliminar um template na interface web limpa as três caches."""
+    warm_template(caches, template)
+    response = client.post(f'/templates/{template.id}/delete')
+    assert response.status_code == 302
+    assert_template_dropped(caches)
+
+
+@pytest.fixture
+def account(app, template):
+    """Conta ativa no domínio do template."""
+    account = EmailAccount(
+        domain_id=template.domain_id,
+        local_part='orders',
+        smtp_server='127.0.0.1',
+        smtp_port=2525
+    )
+    account.set_password('secret', app.config['ENCRYPTION_KEY'])
+    db.session.add(account)
+    db.session.commit()
+    return account
+
+
+def count_queries(app, action) -> int:
+    """Número de comandos SQL executados por `action`."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        action()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements)
+
+
+def test_warm_lookup_issues_no_queries(app, caches, account):
+    """Domínio, conta e template já resolvidos vêm da cache sem SQL."""
+    entities = caches[0]
+
+    def resolve():
+        domain = entities.get_domain('cache.test')
+        assert entities.get_account('orders@cache.test').id == account.id
+        assert entities.get_template(domain.id, 'order').template_key == 'order'
+
+    resolve()
+    db.session.expunge_all()
+    assert count_queries(app, resolve) == 0
+    assert entities.get_stats()['hits'] == 3
+
+
+def test_web_domain_toggle_invalidates(client, caches, template):
+    """Desativar um domínio na interface web é visto no pedido seguinte."""
+    entities = caches[0]
+    assert entities.get_domain('cache.test').is_active
+    assert client.post(f'/domains/{template.domain_id}/toggle').status_code == 302
+    db.session.expunge_all()
+    assert not entities.get_domain('cache.test').is_active
+
+
+def test_web_account_toggle_invalidates(client, caches, account):
+    """Desativar uma conta na interface web é visto no pedido seguinte."""
+    entities = caches[0]
+    assert entities.get_account('orders@cache.test').is_active
+    assert client.post(f'/api/accounts/{account.id}/toggle').get_json()['success']
+    db.session.expunge_all()
+    assert not entities.get_account('orders@cache.test').is_active
+
+
+def test_load_racing_invalidation_not_stored(app, caches, template):
+    """Um carregamento que atravessou uma invalidação não fica na cache."""
+    entities = caches[0]
+
+    def loader():
+        domain = Domain.get_by_name('cache.test')
+        entities.invalidate('domain', domain.id)
+        return domain
+
+    assert entities._get(('domain', 'cache.test'), loader) is not None
+    assert entities.get_stats()['entries'] == 0
+
+
+def test_shared_invalidation_reaches_other_process(app, template):
+    """Com invalidação partilhada, a invalidação de um processo limpa a cache do outro."""
+    first = EntityCache(ttl=60, shared_invalidation=True, version_check_interval=0)
+    second = EntityCache(ttl=60, shared_invalidation=True, version_check_interval=0)
+    for cache in (first, second):
+        cache.get_domain('cache.test')
+        cache.get_domain('cache.test')
+    assert second.get_stats()['hits'] == 1
+
+    first.invalidate('domain', template.domain_id)
+    second.get_domain('cache.test')
+    assert second.get_stats()['misses'] == 2
+    assert first.get_stats()['entries'] == 0
@@ -0,0 +1,110 @@
+"""
+Testes do heartbeat do processo de envio e do health probe (flask queue-worker --check).
+"""
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from sendcraft.services.email_queue import EmailQueue
+from sendcraft.services.queue_worker import QueueWorker, check_heartbeat
+
+
+def write_heartbeat(path, **fields) -> str:
+    """Grava um heartbeat saudável em `path`, com `fields` por cima."""
+    health = {'state': 'running', 'pid': 4242, 'healthy': True, 'workers': 4, 'alive_workers': 4, 'stats': {}}
+    health.update(fields)
+    path.write_text(json.dumps(health))
+    return str(path)
+
+
+def test_healthy_heartbeat(tmp_path):
+    """Um heartbeat recente de um worker a correr e saudável passa."""
+    healthy, message = check_heartbeat(write_heartbeat(tmp_path / 'hb.json'), 60)
+    assert healthy
+    assert '4242' in message and '4/4' in message
+
+
+@pytest.mark.parametrize('fields, expected', [
+    ({'state': 'draining'}, 'draining'),
+    ({'state': 'stopped'}, 'stopped'),
+    ({'healthy': False, 'stats': {'last_error': 'database is locked'}}, 'database is locked')
+])
+def test_unhealthy_heartbeat(tmp_path, fields, expected):
+    """Um worker a parar ou sem saúde falha o probe com o motivo na mensagem."""
+    healthy, message = check_heartbeat(write_heartbeat(tmp_path / 'hb.json', **fields), 60)
+    assert not healthy
+    assert expected in message
+
+
+def test_stale_heartbeat(tmp_path):
+    """Um heartbeat mais velho do que max_age falha mesmo com estado saudável."""
+    path = write_heartbeat(tmp_path / 'hb.json')
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    healthy, message = check_heartbeat(path, 60)
+    assert not healthy
+    assert 'máximo 60s' in message
+
+
+@pytest.mark.parametrize('content', [None, 'not json'])
+def test_missing_or_corrupt_heartbeat(tmp_path, content):
+    """Sem ficheiro, ou com conteúdo ilegível, o probe falha."""
+    path = tmp_path / 'hb.json'
+    if content is not None:
+        path.write_text(content)
+    healthy, message = check_heartbeat(str(path), 60)
+    assert not healthy
+    assert message.startswith('Heartbeat indisponível')
+
+
+def test_beat_writes_file_read_by_probe(app, tmp_path):
+    """O heartbeat gravado pelo worker é lido pelo probe; sem workers vivos não está saudável."""
+    path = str(tmp_path / 'hb.json')
+    queue = EmailQueue(max_workers=2)
+    worker = QueueWorker(app, queue, workers=2, heartbeat_file=path)
+
+    worker.beat('running')
+    assert not check_heartbeat(path, 60)[0]
+    assert os.listdir(tmp_path) == ['hb.json']
+
+    queue.workers = [SimpleNamespace(is_alive=lambda: True)] * 2
+    worker.beat('running')
+    healthy, message = check_heartbeat(path, 60)
+    assert healthy
+    assert f'{os.getpid()}' in message and '2/2' in message
+
+
+def test_check_exit_codes(runner, tmp_path):
+    """--check sai com 0 para um worker saudável e 1 caso contrário."""
+    path = write_heartbeat(tmp_path / 'hb.json')
+    result = runner.invoke(args=['queue-worker', '--check', '--heartbeat-file', path])
+    assert result.exit_code == 0
+
+    write_heartbeat(tmp_path / 'hb.json', state='stopped')
+    result = runner.invoke(args=['queue-worker', '--check', '--heartbeat-file', path])
+    assert result.exit_code == 1
+
+    result = runner.invoke(args=['queue-worker', '--check', '--heartbeat-file', str(tmp_path / 'missing.json')])
+    assert result.exit_code == 1
+
+
+def test_check_uses_configured_file_and_max_age(app, runner, tmp_path):
+    """Sem --heartbeat-file usa QUEUE_WORKER_HEARTBEAT_FILE e QUEUE_WORKER_HEARTBEAT_MAX_AGE."""
+    path = write_heartbeat(tmp_path / 'hb.json')
+    old = time.time() - 30
+    os.utime(path, (old, old))
+    app.config['QUEUE_WORKER_HEARTBEAT_FILE'] = path
+
+    app.config['QUEUE_WORKER_HEARTBEAT_MAX_AGE'] = 60
+    assert runner.invoke(args=['queue-worker', '--check']).exit_code == 0
+    app.config['QUEUE_WORKER_HEARTBEAT_MAX_AGE'] = 10
+    assert runner.invoke(args=['queue-worker', '--check']).exit_code == 1
+
+
+def test_check_requires_heartbeat_file(app, runner):
+    """--check sem ficheiro configurado é um erro de utilização (exit 2)."""
+    app.config['QUEUE_WORKER_HEARTBEAT_FILE'] = None
+    assert runner.invoke(args=['queue-worker', '--check']).exit_code == 2
@@ -0,0 +1,135 @@
+"""
+Testes da entrega SMTP síncrona (sessões do pool).
+"""
+import smtplib
+from types import SimpleNamespace
+
+import pytest
+
+from sendcraft.services import smtp_service as smtp_service_module
+from sendcraft.services.smtp_pool import SMTPConnectionPool
+from sendcraft.services.smtp_service import SMTPService, MessageStream, dot_stuff
+
+
+class FakeSMTP(smtplib.SMTP):
+    """Sessão SMTP em memória que pode desligar numa fase da transação."""
+
+    def __init__(self, drop_at=None):
+        super().__init__()
+        self.drop_at = drop_at
+        self.sent = []
+        self.command = None
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, sender, options=()):
+        self._drop('mail')
+        return 250, b'OK'
+
+    def rcpt(self, recip, options=()):
+        self._drop('rcpt')
+        return 250, b'OK'
+
+    def putcmd(self, cmd, args=''):
+        self.command = cmd
+
+    def getreply(self):
+        if self.command == 'data':
+            self.command = None
+            return 354, b'Go ahead'
+        self._drop('end_of_data')
+        return 250, b'Queued'
+
+    def send(self, s):
+        self.sent.append(s)
+
+    def rset(self):
+        return 250, b'OK'
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _drop(self, stage):
+        if stage == self.drop_at:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+
+CONFIG = {'server': 'relay.test', 'port': 587, 'username': 'a@example.com', 'from_email': 'a@example.com'}
+ACCOUNT = SimpleNamespace(id=1, email_address='a@example.com')
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """SMTPService com pool próprio; `service.opened` lista as sessões abertas."""
+    monkeypatch.setattr(smtp_service_module, 'get_smtp_pool', lambda: SMTPConnectionPool())
+    service = SMTPService('test-key')
+    service.opened = []
+    service.drops = []
+
+    def open_transport(account_id, config):
+        smtp = FakeSMTP(service.drops.pop(0) if service.drops else None)
+        service.opened.append(smtp)
+        return smtp
+
+    monkeypatch.setattr(service, '_open_transport', open_transport)
+    return service
+
+
+def test_disconnect_before_data_reconnects(service):
+    """Uma sessão fechada antes do DATA é substituída e a mensagem segue na nova."""
+    service.drops = ['mail']
+    service._deliver(ACCOUNT, CONFIG, MessageStream([b'Hi\r\n']), ['b@example.com'])
+    assert len(service.opened) == 2
+    assert service.opened[0].sent == []
+    assert b''.join(service.opened[1].sent) == b'Hi\r\n.\r\n'
+
+
+def test_disconnect_after_data_not_resent(service):
+    """Sem resposta ao fim do DATA a mensagem falha em vez de ser reenviada."""
+    service.drops = ['end_of_data']
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        service._deliver(ACCOUNT, CONFIG, MessageStream([b'Hi\r\n']), ['b@example.com'])
+    assert len(service.opened) == 1
+
+
+def test_bulk_disconnect_after_data_not_resent(service):
+    """No envio em lote, a mesma mensagem também não é repetida após o DATA."""
+    service.drops = ['end_of_data']
+    messages = [{'to_email': 'b@example.com', 'prepared': None}]
+    service.get_smtp_config_with_fallback = lambda account: dict(CONFIG)
+    service._render_item = lambda config, item: (MessageStream([b'Hi\r\n']), [item['to_email']], '<id@test>')
+
+    results = list(service.send_bulk_messages(ACCOUNT, messages))
+    assert [r['success'] for r in results] == [False]
+    assert results[0]['transient']
+    assert len(service.opened) == 1
+
+
+@pytest.mark.parametrize('chunks, expected', [
+    ([b'Hi\r\n', b'.hidden\r\n'], b'Hi\r\n..hidden\r\n'),
+    ([b'Hi\r\n', b'', b'.hidden\r\n'], b'Hi\r\n..hidden\r\n'),
+    ([b'Hi\r', b'\n.hidden\r\n'], b'Hi\r\n..hidden\r\n'),
+    ([b'a\r\n.b\r\n.c\r\n'], b'a\r\n..b\r\n..c\r\n'),
+    ([b'.\r\n'], b'..\r\n'),
+    ([b'Hi', b'.not a line start'], b'Hi.not a line start\r\n'),
+    ([b'sem CRLF final'], b'sem CRLF final\r\n')
+])
+def test_dot_stuff(chunks, expected):
+    """Pontos no início de linha são duplicados mesmo quando a linha começa noutro bloco."""
+    assert b''.join(dot_stuff(chunks)) == expected
+
+
+def test_send_stream_dot_stuffs_across_chunks():
+    """O DATA escrito por blocos nunca contém um '.' sozinho antes do terminador."""
+    smtp = FakeSMTP()
+    data = MessageStream([b'Subject: x\r\n\r\nlinha\r\n', b'.\r\n', b'..dois\r\nfim'])
+    SMTPService._send_stream(smtp, 'a@example.com', ['b@example.com'], data)
+
+    body = b''.join(smtp.sent)
+    assert body == b'Subject: x\r\n\r\nlinha\r\n..\r\n...dois\r\nfim\r\n.\r\n'
+    assert body.count(b'\r\n.\r\n') == 1 and body.endswith(b'\r\n.\r\n')
+    assert smtp.data_started
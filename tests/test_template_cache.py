@@ -0,0 +1,186 @@
+"""
+Testes das caches de templates compilados e de resultados renderizados.
+"""
+import sys
+
+import pytest
+
+from sendcraft.extensions import db
+from sendcraft.models import Domain, EmailTemplate
+from sendcraft.models.template import TemplateBytecode
+from sendcraft.services import render_cache as render_cache_module
+from sendcraft.services import template_cache as template_cache_module
+from sendcraft.services.render_cache import RenderedOutputCache
+from sendcraft.services.template_cache import (
+    CompiledTemplateCache, DatabaseBytecodeCache, bytecode_name, create_bytecode_cache
+)
+from sendcraft.services.template_service import TemplateService
+
+
+@pytest.fixture
+def compiled(monkeypatch):
+    """Cache global de templates compilados nova."""
+    cache = CompiledTemplateCache()
+    monkeypatch.setattr(template_cache_module, '_template_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def template(app):
+    """Template ativo em templates.test."""
+    domain = Domain(name='templates.test')
+    db.session.add(domain)
+    db.session.commit()
+    template = EmailTemplate(
+        domain_id=domain.id,
+        template_key='order',
+        template_name='Order',
+        subject_template='Encomenda {{ numero }}',
+        text_template='Total: {{ total }}'
+    )
+    db.session.add(template)
+    db.session.commit()
+    return template
+
+
+def test_template_compiled_once(compiled, template):
+    """Renderizações seguidas da mesma versão reutilizam o template compilado."""
+    for numero in range(3):
+        assert template.render_subject({'numero': numero}) == f'Encomenda {numero}'
+    stats = compiled.get_stats()
+    assert stats['compilations'] == 1
+    assert stats['hits'] == 2
+
+
+def test_template_update_invalidates_compiled(compiled, template):
+    """update_template sobe a versão, esquece as versões antigas e renderiza a fonte nova."""
+    template.render_subject({'numero': 1})
+    success, _, updated = TemplateService().update_template(
+        'templates.test', 'order', subject_template='Pedido {{ numero }}'
+    )
+    assert success and updated.version == 2
+    assert {key[:2] for key in compiled._entries} == {(template.id, 2)}
+    assert template.render_subject({'numero': 1}) == 'Pedido 1'
+
+
+def test_same_version_source_change_recompiled(compiled, template):
+    """Uma fonte alterada sem mudar de versão (pré-visualização) não devolve o compilado antigo."""
+    template.render_subject({'numero': 1})
+    template.subject_template = 'Rascunho {{ numero }}'
+    assert template.render_subject({'numero': 1}) == 'Rascunho 1'
+
+
+def test_compiled_cache_evicts_least_recently_used():
+    """Acima de max_size, sai a entrada usada há mais tempo."""
+    cache = CompiledTemplateCache(max_size=2)
+    cache.get(1, 1, 'subject', 'a')
+    cache.get(2, 1, 'subject', 'b')
+    cache.get(1, 1, 'subject', 'a')
+    cache.get(3, 1, 'subject', 'c')
+    assert list(cache._entries) == [(1, 1, 'subject'), (3, 1, 'subject')]
+    assert cache.get_stats()['evictions'] == 1
+
+
+@pytest.mark.parametrize('backend', ['database', 'filesystem'])
+def test_bytecode_loaded_by_fresh_process(template, backend, tmp_path, monkeypatch):
+    """O código gravado no precompile é carregado por uma cache nova, sem compilar."""
+    writer = CompiledTemplateCache(bytecode_cache=create_bytecode_cache(backend, str(tmp_path)))
+    monkeypatch.setattr(template_cache_module, '_template_cache', writer)
+    template.precompile()
+    assert writer.get_stats()['compilations'] == 2
+
+    # Processo novo: LRU vazia, mesma bytecode cache
+    fresh = CompiledTemplateCache(bytecode_cache=create_bytecode_cache(backend, str(tmp_path)))
+    monkeypatch.setattr(template_cache_module, '_template_cache', fresh)
+    assert template.render_subject({'numero': 7}) == 'Encomenda 7'
+    assert template.render_text({'total': 3}) == 'Total: 3'
+    stats = fresh.get_stats()
+    assert stats['bytecode_loads'] == 2
+    assert stats['compilations'] == 0
+
+
+def test_bytecode_rows_removed_on_invalidate(template):
+    """Invalidar um template apaga só as suas linhas em template_bytecode."""
+    cache = CompiledTemplateCache(bytecode_cache=DatabaseBytecodeCache())
+    cache.get(template.id, 1, 'subject', 'a')
+    cache.get(template.id + 1, 1, 'subject', 'b')
+    assert TemplateBytecode.query.count() == 2
+
+    cache.invalidate(template.id)
+    assert [row.cache_key for row in TemplateBytecode.query] == [bytecode_name(template.id + 1, 1, 'subject')]
+
+
+def test_bytecode_from_other_source_ignored(template):
+    """Um bucket gravado para outra fonte não é usado (checksum do Jinja)."""
+    cache = CompiledTemplateCache(bytecode_cache=DatabaseBytecodeCache())
+    cache.get(template.id, 1, 'subject', 'antigo {{ x }}')
+
+    fresh = CompiledTemplateCache(bytecode_cache=DatabaseBytecodeCache())
+    assert fresh.get(template.id, 1, 'subject', 'novo {{ x }}').render(x=1) == 'novo 1'
+    assert fresh.get_stats()['bytecode_loads'] == 0
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """Cache global de resultados renderizados ligada (1 MiB)."""
+    cache = RenderedOutputCache(max_bytes=1 << 20)
+    monkeypatch.setattr(render_cache_module, '_render_cache', cache)
+    return cache
+
+
+def test_repeated_render_served_from_cache(compiled, rendered, template):
+    """A mesma versão com as mesmas variáveis (por qualquer ordem) não volta a renderizar."""
+    assert template.render_text({'total': 3, 'numero': 1}) == 'Total: 3'
+    assert template.render_text({'numero': 1, 'total': 3}) == 'Total: 3'
+    assert template.render_text({'numero': 1, 'total': 4}) == 'Total: 4'
+    stats = rendered.get_stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 2)
+
+
+def test_template_update_invalidates_rendered(compiled, rendered, template):
+    """update_template esquece os resultados do template; a nova fonte é renderizada."""
+    template.render_subject({'numero': 1})
+    TemplateService().update_template('templates.test', 'order', subject_template='Pedido {{ numero }}')
+    assert rendered.get_stats()['entries'] == 0
+    assert template.render_subject({'numero': 1}) == 'Pedido 1'
+
+
+def test_template_delete_invalidates_rendered(compiled, rendered, template):
+    """Desativar um template também esquece os seus resultados."""
+    template.render_subject({'numero': 1})
+    assert TemplateService().delete_template('templates.test', 'order')[0]
+    assert rendered.get_stats()['entries'] == 0
+
+
+def test_rendered_cache_bounded_by_bytes():
+    """A memória guardada não passa de max_bytes; saem primeiro as entradas mais antigas."""
+    size = sys.getsizeof('x' * 100)
+    cache = RenderedOutputCache(max_bytes=2 * size)
+    for template_id in (1, 2, 3):
+        cache.get(template_id, 1, 'html', 'src', {}, lambda: 'x' * 100)
+    stats = cache.get_stats()
+    assert stats['bytes'] <= 2 * size
+    assert stats['evictions'] == 1
+    assert [key[0] for key in cache._entries] == [2, 3]
+
+    # Um resultado maior do que a cache inteira não é guardado
+    cache.get(4, 1, 'html', 'src', {}, lambda: 'x' * 1000)
+    assert [key[0] for key in cache._entries] == [2, 3]
+
+
+def test_non_json_variables_not_cached(rendered):
+    """Variáveis não serializáveis em JSON renderizam sempre e contam como uncacheable."""
+    calls = []
+    for _ in range(2):
+        rendered.get(1, 1, 'html', 'src', {'when': object()}, lambda: calls.append(1) or 'ok')
+    assert len(calls) == 2
+    assert rendered.get_stats()['uncacheable'] == 2
+    assert rendered.get_stats()['entries'] == 0
+
+
+def test_rendered_cache_off_by_default(app):
+    """Com TEMPLATE_RENDER_CACHE_BYTES=0 a cache não guarda nada."""
+    cache = RenderedOutputCache(app.config.get('TEMPLATE_RENDER_CACHE_BYTES', 0))
+    assert not cache.enabled
+    cache.get(1, 1, 'html', 'src', {}, lambda: 'ok')
+    assert cache.get_stats()['entries'] == 0
@@ -0,0 +1,63 @@
+"""
+Testes da renderização em lote da API de templates.
+"""
+import json
+
+import pytest
+
+from sendcraft.extensions import db
+from sendcraft.models import Domain, EmailTemplate
+
+API_KEY = 'SC_test_api_key_12345678901234567890'
+
+
+@pytest.fixture
+def template(app):
+    """Template de teste e API key de configuração."""
+    app.config['API_KEYS'] = {'tests': API_KEY}
+    app.config['TEMPLATE_BATCH_MAX_SETS'] = 3
+
+    domain = Domain(name='render.test')
+    db.session.add(domain)
+    db.session.commit()
+    template = EmailTemplate(
+        domain_id=domain.id,
+        template_key='welcome',
+        template_name='Welcome',
+        subject_template='Olá {{ nome }}',
+        text_template='Bem-vindo, {{ nome }}'
+    )
+    db.session.add(template)
+    db.session.commit()
+    return template
+
+
+def render_batch(client, body, mimetype='application/x-ndjson'):
+    """POST /api/v1/templates/render.test/welcome/render-batch."""
+    return client.post(
+        '/api/v1/templates/render.test/welcome/render-batch',
+        data=body,
+        headers={'Authorization': f'Bearer {API_KEY}', 'Content-Type': mimetype}
+    )
+
+
+def test_render_batch_within_limit(client, template):
+    """Até TEMPLATE_BATCH_MAX_SETS conjuntos, cada um tem a sua linha."""
+    body = '\n'.join(json.dumps({'nome': name}) for name in ('Ana', 'Rui', 'Eva'))
+    response = render_batch(client, body)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['subject'] for line in lines] == ['Olá Ana', 'Olá Rui', 'Olá Eva']
+
+
+@pytest.mark.parametrize('mimetype', ['application/x-ndjson', 'application/json'])
+def test_render_batch_over_limit_rejected(client, template, mimetype):
+    """Mais conjuntos do que o limite: 413 antes de renderizar."""
+    sets = [{'nome': f'user{i}'} for i in range(4)]
+    if mimetype == 'application/json':
+        body = json.dumps({'variables': sets})
+    else:
+        body = '\n'.join(json.dumps(variables) for variables in sets)
+    response = render_batch(client, body, mimetype)
+    assert response.status_code == 413
+    assert response.get_json()['error'] == 'Payload too large'
@@ -0,0 +1,164 @@
+"""
+Testes da sondagem de configurações SMTP/IMAP.
+"""
+import smtplib
+import threading
+import time
+
+import pytest
+
+from sendcraft.services.imap_service import IMAPService
+from sendcraft.services.smtp_service import SMTPService
+from sendcraft.services.transport_cache import TransportProfileCache, TransportUnavailableError
+
+
+def test_plaintext_smtp_never_probed(monkeypatch):
+    """A porta 25 sem TLS não é candidata, mesmo com os candidatos cifrados bloqueados."""
+    service = SMTPService('test-key')
+    attempts = []
+
+    def connect(config, timeout=None):
+        attempts.append(config['port'])
+        if config['port'] == 587:
+            time.sleep(0.3)  # Handshake TLS lento
+            return object()
+        raise OSError('connection refused')
+
+    monkeypatch.setattr(service, '_create_smtp_connection', connect)
+    monkeypatch.setattr(service, '_close_quietly', lambda smtp: None)
+
+    base = {'server': 'mail.example.com', 'port': 465, 'use_ssl': True, 'use_tls': False}
+    success, _, config = service._probe_fallbacks(base)
+    assert success and config['port'] == 587
+    assert 25 not in attempts
+
+    attempts.clear()
+
+    def refuse(config, timeout=None):
+        attempts.append(config['port'])
+        raise OSError('connection refused')
+
+    monkeypatch.setattr(service, '_create_smtp_connection', refuse)
+    success, _, config = service._probe_fallbacks(base)
+    assert not success and config == {}
+    assert 25 not in attempts
+
+
+def test_transport_cache_refuses_downgrade():
+    """Um perfil sem SSL/TLS nunca é guardado nem aplicado a uma conta cifrada."""
+    cache = TransportProfileCache()
+    configured = {'server': 'mail.example.com', 'port': 587, 'use_ssl': False, 'use_tls': True}
+    plaintext = {**configured, 'port': 25, 'use_tls': False}
+
+    assert not cache.record_success(1, plaintext, configured)
+    assert cache.get_profile(1, 'mail.example.com') is None
+
+    # Perfil antigo em memória: apply() continua a não o usar
+    cache._profiles[(1, 'mail.example.com')] = {'port': 25, 'use_ssl': False, 'use_tls': False}
+    assert cache.apply(1, dict(configured)) == configured
+
+    ssl = {**configured, 'port': 465, 'use_ssl': True, 'use_tls': False}
+    assert cache.record_success(1, ssl, configured)
+    assert cache.apply(1, dict(configured))['port'] == 465
+
+
+def test_transport_failure_does_not_reprobe(monkeypatch):
+    """Um erro de ligação esquece o perfil e marca o relay, sem sondar alternativas."""
+    cache = TransportProfileCache(retry_after=30)
+    configured = {'server': 'mail.example.com', 'port': 587, 'use_ssl': False, 'use_tls': True}
+    cache.record_success(1, {**configured, 'port': 465, 'use_ssl': True, 'use_tls': False}, configured)
+    monkeypatch.setattr(threading, 'Thread', lambda *a, **k: pytest.fail('no background probe'))
+
+    cache.report_failure(1, configured, ConnectionRefusedError('refused'))
+    assert cache.get_profile(1, 'mail.example.com') is None
+    with pytest.raises(TransportUnavailableError):
+        cache.check_available(1, 'mail.example.com')
+
+
+class FakeIMAP:
+    """Ligação IMAP que recusa a password."""
+
+    logins = 0
+
+    def login(self, username, password):
+        FakeIMAP.logins += 1
+        raise OSError('AUTHENTICATIONFAILED')
+
+    def shutdown(self):
+        pass
+
+
+def test_imap_login_attempted_once_on_auth_failure(monkeypatch):
+    """Uma password errada não é tentada também no fallback STARTTLS."""
+    FakeIMAP.logins = 0
+    monkeypatch.setattr(IMAPService, '_open_connection', staticmethod(lambda server, mode, port: FakeIMAP()))
+
+    service = IMAPService()
+    config = {'server': 'mail.example.com', 'port': 993, 'username': 'u', 'password': 'wrong', 'use_ssl': True}
+    assert service.connect(config) is False
+    time.sleep(0.5)  # Deixar o candidato STARTTLS terminar
+    assert FakeIMAP.logins == 1
+
+
+class FakeSMTP:
+    """Sessão SMTP de teste."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def smtp_account(app):
+    """Conta configurada para STARTTLS na porta 587."""
+    from sendcraft.extensions import db
+    from sendcraft.models import Domain, EmailAccount
+
+    domain = Domain(name='fallback.test')
+    db.session.add(domain)
+    db.session.commit()
+    account = EmailAccount(domain_id=domain.id, local_part='sender', smtp_server='mail.fallback.test',
+                           smtp_port=587, use_tls=True, use_ssl=False)
+    account.set_password('secret', app.config['ENCRYPTION_KEY'])
+    db.session.add(account)
+    db.session.commit()
+    return account
+
+
+def test_smtp_ui_test_reports_configured_transport(client, smtp_account, monkeypatch):
+    """O botão Test SMTP falha se a configuração da conta falhar; o fallback é só sugestão."""
+    attempts = []
+
+    def connect(self, config, timeout=30):
+        attempts.append(config['port'])
+        if config['port'] != 465:
+            raise ConnectionRefusedError('connection refused')
+        return FakeSMTP()
+
+    monkeypatch.setattr(SMTPService, '_create_smtp_connection', connect)
+    monkeypatch.setattr(SMTPService, '_close_quietly', staticmethod(lambda smtp: None))
+    cache = TransportProfileCache()
+    monkeypatch.setattr('sendcraft.services.smtp_service.get_transport_cache', lambda: cache)
+
+    body = client.post(f'/api/accounts/{smtp_account.id}/test-smtp').get_json()
+    assert body['success'] is False
+    assert body['suggestion']['port'] == 465 and body['suggestion']['ssl'] is True
+    assert body['details']['port'] == 587
+    assert cache.get_profile(smtp_account.id, 'mail.fallback.test') is None
+    assert attempts[0] == 587 and 25 not in attempts
+
+
+def test_smtp_ui_test_does_not_retry_rejected_credentials(client, smtp_account, monkeypatch):
+    """Credenciais recusadas não são tentadas noutras portas."""
+    attempts = []
+
+    def connect(self, config, timeout=30):
+        attempts.append(config['port'])
+        raise smtplib.SMTPAuthenticationError(535, b'bad credentials')
+
+    monkeypatch.setattr(SMTPService, '_create_smtp_connection', connect)
+    body = client.post(f'/api/accounts/{smtp_account.id}/test-smtp').get_json()
+    assert body['success'] is False and body['suggestion'] is None
+    assert attempts == [587]